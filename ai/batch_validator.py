@@ -0,0 +1,544 @@
+# ai/batch_validator.py
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ai.services.price_service import FALLBACK_TOKEN_PRICES
+from ai.strategy_generator import VALIDATION_TOKEN_MAPPING
+
+# Step actions, as codes in StepBatch.action
+OTHER, SUPPLY, ADD_LIQUIDITY, SWAP, BORROW, BORROW_USDQ, PROVIDE_STABILITY = range(7)
+ACTION_CODES = {
+    "supply": SUPPLY,
+    "add_liquidity": ADD_LIQUIDITY,
+    "swap": SWAP,
+    "borrow": BORROW,
+    "borrow_usdq": BORROW_USDQ,
+    "provide_stability": PROVIDE_STABILITY
+}
+
+# Strategy names validate_strategy_logic keeps in an APY range: (low, high, clamp_low, clamp_high)
+APY_RANGES = {
+    "Anchor": (1.0, 6.0, 2.0, 5.0),
+    "Zenith": (4.0, 20.0, 5.0, 15.0),
+    "Wildcard": (10.0, 40.0, 15.0, 30.0)
+}
+
+# APY of the stability pool step added for unused USDQ
+UNUSED_USDQ_STABILITY_APY = 7.0
+
+@dataclass
+class StepBatch:
+    """The steps of many strategies as (strategy, step position) arrays
+
+    Strategies with fewer steps are padded; padding has exists=False. Tokens
+    are columns of the balance matrix, wallet tokens first in wallet order.
+    Build one from strategy dicts with encode_steps, or straight from arrays
+    of generated candidates with StepBatch.from_arrays.
+    """
+    names: List[Any]
+    columns: Dict[Any, int]
+    exists: np.ndarray
+    action: np.ndarray
+    token: np.ndarray
+    normalized: np.ndarray
+    amount: np.ndarray
+    fields_ok: np.ndarray
+    expected_apy: np.ndarray
+    apy_error: np.ndarray
+    usdq_amount: np.ndarray
+    usdq_error: np.ndarray
+    # The dicts the arrays came from (empty when built from arrays)
+    strategies: List[Dict] = field(default_factory=list)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.exists.shape
+
+    @classmethod
+    def from_arrays(
+        cls,
+        wallet_balances: Dict[str, float],
+        token_names: Sequence[str],
+        token: np.ndarray,
+        action: np.ndarray,
+        amount: np.ndarray,
+        expected_apy: np.ndarray,
+        usdq_amount: Optional[np.ndarray] = None,
+        exists: Optional[np.ndarray] = None,
+        names: Optional[Sequence[Any]] = None
+    ) -> "StepBatch":
+        """A batch of (strategy, step position) arrays with no dicts behind it
+
+        Args:
+            wallet_balances: Balances the batch will be checked against
+            token_names: Token name of each index used in token
+            token: Index into token_names of each step's token
+            action: ACTION_CODES value of each step
+            amount: Amount of each step
+            expected_apy: APY of each step
+            usdq_amount: USDQ borrowed by borrow_usdq steps
+            exists: False for padding (defaults to every step existing)
+            names: Strategy name of each row, for the tier APY ranges
+        """
+        columns = _wallet_columns(wallet_balances)
+        raw = np.array([columns.setdefault(name, len(columns)) for name in token_names], dtype=np.int64)
+        normal = np.array([
+            columns.setdefault(VALIDATION_TOKEN_MAPPING.get(name, name), len(columns)) for name in token_names
+        ], dtype=np.int64)
+        named = np.array([bool(name) for name in token_names], dtype=bool)
+
+        amount = np.asarray(amount, dtype=np.float64)
+        exists = np.ones(amount.shape, dtype=bool) if exists is None else np.asarray(exists, dtype=bool)
+        token = np.where(exists, token, 0)
+        return cls(
+            names=list(names) if names is not None else [None] * amount.shape[0],
+            columns=columns,
+            exists=exists,
+            action=np.where(exists, action, OTHER).astype(np.int8),
+            token=raw[token],
+            normalized=normal[token],
+            amount=amount,
+            fields_ok=exists & named[token] & (amount > 0),
+            expected_apy=np.asarray(expected_apy, dtype=np.float64),
+            apy_error=np.zeros(amount.shape, dtype=bool),
+            usdq_amount=np.zeros(amount.shape) if usdq_amount is None else np.asarray(usdq_amount, dtype=np.float64),
+            usdq_error=np.zeros(amount.shape, dtype=bool)
+        )
+
+@dataclass
+class BatchResult:
+    """What validation did to each (strategy, step position)"""
+    # Final step amounts, and which ones were cut
+    amount: np.ndarray
+    amount_changed: np.ndarray
+    # Final borrow_usdq USDQ amounts, and which ones were capped
+    usdq_amount: np.ndarray
+    usdq_changed: np.ndarray
+    # Steps that stay in the strategy
+    kept: np.ndarray
+    # Strategies left with no step, replaced by a single AAVE supply step
+    fallback: np.ndarray
+    # Strategies given a stability pool step for unused USDQ, and its amount
+    adds_stability: np.ndarray
+    added_usdq: np.ndarray
+    total_expected_apy: np.ndarray
+
+def _wallet_columns(wallet_balances: Dict[str, float]) -> Dict[Any, int]:
+    """Balance matrix columns: wallet tokens in wallet order, then WETH and USDQ"""
+    columns: Dict[Any, int] = {}
+    for token in list(wallet_balances) + ["WETH", "USDQ"]:
+        columns.setdefault(token, len(columns))
+    return columns
+
+def encode_steps(strategies: Sequence[Dict], wallet_balances: Dict[str, float]) -> StepBatch:
+    """Lay the strategies' steps out as arrays for batch validation
+
+    Amounts are parsed up front (so a bad amount raises, as it does in the
+    per-strategy validators); APYs and USDQ amounts are parsed leniently and
+    only raise once a validator actually uses them.
+    """
+    columns = _wallet_columns(wallet_balances)
+    action_codes = ACTION_CODES
+    token_mapping = VALIDATION_TOKEN_MAPPING
+    nan = float("nan")
+
+    # Flat per-step values, scattered into the padded arrays at the end
+    rows, positions = [], []
+    actions, tokens, normalized, amounts, fields_ok = [], [], [], [], []
+    apys, apy_errors, usdq_amounts, usdq_errors = [], [], [], []
+    width = 0
+    for i, strategy in enumerate(strategies):
+        steps = strategy.get("steps", [])
+        width = max(width, len(steps))
+        for j, step in enumerate(steps):
+            get = step.get
+            step_token = get("token", "")
+            step_amount = float(get("amount", 0))
+            step_action = get("action", "")
+
+            column = columns.get(step_token)
+            if column is None:
+                column = columns[step_token] = len(columns)
+            normal = token_mapping.get(step_token, step_token)
+            normal_column = columns.get(normal)
+            if normal_column is None:
+                normal_column = columns[normal] = len(columns)
+
+            try:
+                apy, apy_error = float(get("expected_apy", 0)), False
+            except (TypeError, ValueError):
+                apy, apy_error = nan, True
+            usdq, usdq_error = 0.0, False
+            if step_action == "borrow_usdq":
+                try:
+                    usdq = float(get("usdq_amount", 0))
+                except (TypeError, ValueError):
+                    usdq, usdq_error = nan, True
+
+            rows.append(i)
+            positions.append(j)
+            actions.append(action_codes.get(step_action, OTHER))
+            tokens.append(column)
+            normalized.append(normal_column)
+            amounts.append(step_amount)
+            fields_ok.append(bool(get("protocol", "") and step_action and step_token and step_amount > 0))
+            apys.append(apy)
+            apy_errors.append(apy_error)
+            usdq_amounts.append(usdq)
+            usdq_errors.append(usdq_error)
+
+    shape = (len(strategies), width)
+    index = (np.array(rows, dtype=np.int64), np.array(positions, dtype=np.int64))
+
+    def scatter(values, dtype):
+        array = np.zeros(shape, dtype=dtype)
+        array[index] = np.array(values, dtype=dtype)
+        return array
+
+    return StepBatch(
+        names=[strategy.get("name") for strategy in strategies],
+        columns=columns,
+        exists=scatter([True] * len(rows), bool),
+        action=scatter(actions, np.int8),
+        token=scatter(tokens, np.int64),
+        normalized=scatter(normalized, np.int64),
+        amount=scatter(amounts, np.float64),
+        fields_ok=scatter(fields_ok, bool),
+        expected_apy=scatter(apys, np.float64),
+        apy_error=scatter(apy_errors, bool),
+        usdq_amount=scatter(usdq_amounts, np.float64),
+        usdq_error=scatter(usdq_errors, bool),
+        strategies=list(strategies)
+    )
+
+def _abs_apy(apy: np.ndarray) -> np.ndarray:
+    """Borrowing (negative APY) counts by its magnitude, as in the per-strategy validators"""
+    return np.where(apy < 0, -apy, apy)
+
+class BatchStrategyValidator:
+    """Validates many strategies against one wallet's balances at once
+
+    Gives the same results as StrategyGenerator.validate_strategy and
+    validate_strategy_logic applied to each strategy in turn: the same amount
+    adjustments, removed steps, added stability pool step and recomputed
+    APYs. Balances are a (strategy, token) matrix; steps are applied one
+    position at a time across every strategy, since a step depends on the
+    balances the earlier steps left.
+
+    check_balances and check_logic work on a StepBatch and return a
+    BatchResult, so numerically generated candidates never need to become
+    dicts. validate_strategies and validate_strategies_logic take and update
+    strategy dicts in place, like the per-strategy methods.
+
+    One deliberate difference: borrowing a token the wallet doesn't hold
+    raises KeyError in validate_strategy, while here it just adds the balance.
+    """
+
+    def __init__(self, prices: Optional[Dict[str, float]] = None):
+        self.prices = FALLBACK_TOKEN_PRICES if prices is None else prices
+
+    @classmethod
+    def for_generator(cls, generator: Any) -> "BatchStrategyValidator":
+        """A validator pricing tokens like the generator: its price service's prices, if it has one"""
+        price_service = getattr(generator, "price_service", None)
+        return cls(price_service.prices() if price_service is not None else None)
+
+    def _price(self, token: Any) -> float:
+        return self.prices.get(token, 1.0)
+
+    def _raise_parse_error(self, batch: StepBatch, errors: np.ndarray, field_name: str):
+        """Re-parse the first bad value that was used, raising the same error float() would"""
+        if errors.any():
+            i, j = np.argwhere(errors)[0]
+            float(batch.strategies[i]["steps"][j].get(field_name, 0))
+
+    def _balances(self, batch: StepBatch, wallet_balances: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+        n = batch.shape[0]
+        available = np.zeros((n, len(batch.columns)))
+        present = np.zeros((n, len(batch.columns)), dtype=bool)
+        for token, balance in wallet_balances.items():
+            available[:, batch.columns[token]] = float(balance)
+            present[:, batch.columns[token]] = True
+        return available, present
+
+    def check_balances(self, batch: StepBatch, wallet_balances: Dict[str, float]) -> BatchResult:
+        """validate_strategy's checks for every strategy in batch"""
+        n, width = batch.shape
+        rows = np.arange(n)
+        columns = batch.columns
+        available, present = self._balances(batch, wallet_balances)
+
+        # The wallet's ETH is also available as WETH
+        eth, weth, usdq = columns.get("ETH"), columns["WETH"], columns["USDQ"]
+        if "ETH" in wallet_balances and "WETH" not in wallet_balances:
+            available[:, weth] = available[:, eth]
+            present[:, weth] = True
+        # Tokens in the order validate_strategy sums the wallet's value over
+        value_columns = [c for token, c in columns.items() if token != "USDQ"]
+        prices = np.array([self._price(token) for token in columns])
+
+        kept = np.zeros((n, width), dtype=bool)
+        amounts = batch.amount.copy()
+        amount_changed = np.zeros((n, width), dtype=bool)
+        usdq_amounts = batch.usdq_amount.copy()
+        usdq_changed = np.zeros((n, width), dtype=bool)
+
+        for j in range(width):
+            action = batch.action[:, j]
+            ok = batch.fields_ok[:, j]
+            t = batch.normalized[:, j]
+            raw = batch.token[:, j]
+            amount = amounts[:, j]
+            have = present[rows, t]
+            balance = available[rows, t]
+
+            # Borrow USDQ against collateral the strategy still has
+            borrow_usdq = ok & (action == BORROW_USDQ) & have & ~(balance < amount)
+            if borrow_usdq.any():
+                self._raise_parse_error(batch, borrow_usdq & batch.usdq_error[:, j], "usdq_amount")
+                r = rows[borrow_usdq]
+                available[r, t[r]] -= amount[r]
+                # At most 20% of the remaining wallet value (and at least 5 USDQ)
+                total_value = np.zeros(len(r))
+                for c in value_columns:
+                    total_value = np.where(present[r, c], total_value + available[r, c] * prices[c], total_value)
+                max_usdq = total_value * 0.2
+                max_usdq = np.where(max_usdq > 5.0, max_usdq, 5.0)
+                capped = usdq_amounts[r, j] > max_usdq
+                usdq_amounts[r, j] = np.where(capped, max_usdq, usdq_amounts[r, j])
+                usdq_changed[r, j] = capped
+                available[r, usdq] = np.where(present[r, usdq], available[r, usdq], 0.0) + usdq_amounts[r, j]
+                present[r, usdq] = True
+                kept[r, j] = True
+
+            # Supply or add liquidity, cut to 95% of what's left when short
+            supply = ok & ((action == SUPPLY) | (action == ADD_LIQUIDITY)) & have
+            short = supply & (balance < amount)
+            reduced = balance * 0.95
+            reduced = np.where(reduced > 0, reduced, 0.0)
+            supply &= ~(short & ~(reduced > 0))
+            short &= supply
+            amounts[short, j] = reduced[short]
+            amount_changed[short, j] = True
+            r = rows[supply]
+            available[r, t[r]] -= amounts[r, j]
+            kept[r, j] = True
+
+            # Borrowing adds to the balance (WETH to both ETH and WETH)
+            borrow = ok & (action == BORROW)
+            if eth is not None:
+                borrow_weth = borrow & (raw == weth) & present[:, eth]
+                r = rows[borrow_weth]
+                available[r, eth] += amount[r]
+                available[r, weth] += amount[r]
+                present[r, weth] = True
+            else:
+                borrow_weth = np.zeros(n, dtype=bool)
+            r = rows[borrow & ~borrow_weth]
+            available[r, t[r]] = np.where(present[r, t[r]], available[r, t[r]], 0.0) + amount[r]
+            present[r, t[r]] = True
+            kept[borrow, j] = True
+
+            # Stability pool deposits, cut to 95% of the USDQ left when short
+            stability = ok & (action == PROVIDE_STABILITY)
+            have_usdq = present[:, usdq]
+            usdq_balance = np.where(have_usdq, available[:, usdq], 0.0)
+            short = stability & (raw == usdq) & (~have_usdq | (available[:, usdq] < amount))
+            reduced = usdq_balance * 0.95
+            stability &= ~(short & (reduced <= 0))
+            short &= stability
+            amounts[short, j] = reduced[short]
+            amount_changed[short, j] = True
+            r = rows[stability & have_usdq]
+            available[r, usdq] -= amounts[r, j]
+            kept[stability, j] = True
+
+        self._raise_parse_error(batch, kept & batch.apy_error, "expected_apy")
+
+        # Average APY over the kept steps, borrowing counted by its magnitude
+        total_apy = np.zeros(n)
+        for j in range(width):
+            total_apy = np.where(kept[:, j], total_apy + _abs_apy(batch.expected_apy[:, j]), total_apy)
+        counts = kept.sum(axis=1)
+        # A strategy left with no steps falls back to one 2% AAVE supply step
+        fallback = counts == 0
+        total_apy[fallback] = 2.0
+        average_apy = total_apy / np.maximum(1, counts)
+
+        return BatchResult(
+            amount=amounts,
+            amount_changed=amount_changed,
+            usdq_amount=usdq_amounts,
+            usdq_changed=usdq_changed,
+            kept=kept,
+            fallback=fallback,
+            adds_stability=np.zeros(n, dtype=bool),
+            added_usdq=np.zeros(n),
+            total_expected_apy=np.where(average_apy > 1.0, average_apy, 1.0)
+        )
+
+    def check_logic(self, batch: StepBatch, wallet_balances: Dict[str, float]) -> BatchResult:
+        """validate_strategy_logic's checks for every strategy in batch"""
+        n, width = batch.shape
+        rows = np.arange(n)
+        usdq = batch.columns["USDQ"]
+        available, present = self._balances(batch, wallet_balances)
+
+        amounts = batch.amount.copy()
+        modified = np.zeros((n, width), dtype=bool)
+        removed = np.zeros((n, width), dtype=bool)
+        borrowed_usdq = np.zeros(n)
+        used_usdq = np.zeros(n)
+
+        def balance_of(r, c):
+            return np.where(present[r, c], available[r, c], 0.0)
+
+        for j in range(width):
+            exists = batch.exists[:, j]
+            action = batch.action[:, j]
+            t = batch.token[:, j]
+            have = present[rows, t]
+
+            # Spending more than is left: cut to 95% of it, or drop the step
+            spends = exists & ((action == SUPPLY) | (action == ADD_LIQUIDITY) | (action == SWAP))
+            short = spends & (~have | (available[rows, t] < amounts[:, j]))
+            reduced = balance_of(rows, t) * 0.95
+            modified[:, j] = short & (reduced > 0)
+            removed[:, j] = short & ~(reduced > 0)
+            amounts[modified[:, j], j] = reduced[modified[:, j]]
+            amount = amounts[:, j]
+
+            r = rows[spends & ~removed[:, j]]
+            available[r, t[r]] = balance_of(r, t[r]) - amount[r]
+            present[r, t[r]] = True
+
+            r = rows[exists & (action == BORROW)]
+            available[r, t[r]] = balance_of(r, t[r]) + amount[r]
+            present[r, t[r]] = True
+
+            borrow_usdq = exists & (action == BORROW_USDQ)
+            if borrow_usdq.any():
+                self._raise_parse_error(batch, borrow_usdq & batch.usdq_error[:, j], "usdq_amount")
+                r = rows[borrow_usdq]
+                available[r, t[r]] = balance_of(r, t[r]) - amount[r]
+                present[r, t[r]] = True
+                available[r, usdq] = balance_of(r, usdq) + batch.usdq_amount[r, j]
+                present[r, usdq] = True
+                borrowed_usdq[r] += batch.usdq_amount[r, j]
+
+            r = rows[exists & (action == PROVIDE_STABILITY) & (t == usdq)]
+            used_usdq[r] += amount[r]
+            available[r, usdq] = balance_of(r, usdq) - amount[r]
+            present[r, usdq] = True
+
+        # Borrowed USDQ that is mostly unused goes into the stability pool
+        adds_stability = (borrowed_usdq > 0) & (used_usdq < borrowed_usdq * 0.8)
+
+        kept = batch.exists & ~removed
+        self._raise_parse_error(batch, kept & batch.apy_error, "expected_apy")
+        total_apy = np.zeros(n)
+        for j in range(width):
+            total_apy = np.where(kept[:, j], total_apy + _abs_apy(batch.expected_apy[:, j]), total_apy)
+        total_apy = np.where(adds_stability, total_apy + UNUSED_USDQ_STABILITY_APY, total_apy)
+        average_apy = total_apy / np.maximum(1, kept.sum(axis=1) + adds_stability)
+
+        # Pull APYs that are way off back into the tier's range
+        total_expected_apy = average_apy.copy()
+        names = np.array(batch.names, dtype=object)
+        for name, (low, high, clamp_low, clamp_high) in APY_RANGES.items():
+            off = (names == name) & ((average_apy < low) | (average_apy > high))
+            clamped = np.where(average_apy < clamp_high, average_apy, clamp_high)
+            clamped = np.where(clamped > clamp_low, clamped, clamp_low)
+            total_expected_apy = np.where(off, clamped, total_expected_apy)
+
+        return BatchResult(
+            amount=amounts,
+            amount_changed=modified,
+            usdq_amount=batch.usdq_amount,
+            usdq_changed=np.zeros((n, width), dtype=bool),
+            kept=kept,
+            fallback=np.zeros(n, dtype=bool),
+            adds_stability=adds_stability,
+            added_usdq=borrowed_usdq - used_usdq,
+            total_expected_apy=total_expected_apy
+        )
+
+    def _write_changes(self, batch: StepBatch, result: BatchResult):
+        """Copy cut amounts and capped USDQ amounts back into the step dicts"""
+        for i, j in zip(*np.nonzero(result.amount_changed)):
+            batch.strategies[i]["steps"][j]["amount"] = float(result.amount[i, j])
+        for i, j in zip(*np.nonzero(result.usdq_changed)):
+            batch.strategies[i]["steps"][j]["usdq_amount"] = float(result.usdq_amount[i, j])
+
+    def validate_strategies(self, strategies: Sequence[Dict], wallet_balances: Dict[str, float]) -> List[Dict]:
+        """StrategyGenerator.validate_strategy for every strategy
+
+        Args:
+            strategies: Strategy dicts (updated in place)
+            wallet_balances: Token balances shared by every strategy
+
+        Returns:
+            The validated strategies, in the same order
+        """
+        batch = encode_steps(strategies, wallet_balances)
+        result = self.check_balances(batch, wallet_balances)
+        self._write_changes(batch, result)
+
+        fallback_token = None
+        for strategy, kept, fallback, apy in zip(
+            batch.strategies, result.kept.tolist(), result.fallback.tolist(), result.total_expected_apy.tolist()
+        ):
+            if fallback:
+                if fallback_token is None:
+                    # The token with the highest balance
+                    fallback_token = max(wallet_balances.items(), key=lambda x: x[1] * self._price(x[0]))[0]
+                strategy["steps"] = [{
+                    "protocol": "AAVE",
+                    "action": "supply",
+                    "token": fallback_token,
+                    "amount": wallet_balances[fallback_token] * 0.9,
+                    "expected_apy": 2.0
+                }]
+                strategy["explanation"] = f"A simple strategy supplying {fallback_token} on AAVE for stable yield."
+                strategy["risk_factors"] = ["Minimal risk with single asset deposit"]
+            else:
+                strategy["steps"] = [step for step, keep in zip(strategy.get("steps", []), kept) if keep]
+            strategy["total_expected_apy"] = apy
+
+        return batch.strategies
+
+    def validate_strategies_logic(self, strategies: Sequence[Dict], wallet_balances: Dict[str, float]) -> List[Dict]:
+        """StrategyGenerator.validate_strategy_logic for every strategy
+
+        Args:
+            strategies: Strategy dicts (updated in place)
+            wallet_balances: Token balances shared by every strategy
+
+        Returns:
+            The validated strategies, in the same order
+        """
+        # Every strategy needs a name and steps, as validate_strategy_logic requires
+        for strategy in strategies:
+            strategy["name"], strategy["steps"]
+        batch = encode_steps(strategies, wallet_balances)
+        result = self.check_logic(batch, wallet_balances)
+        self._write_changes(batch, result)
+
+        removed = batch.exists & ~result.kept
+        for i in np.flatnonzero(removed.any(axis=1)):
+            steps = batch.strategies[i]["steps"]
+            steps[:] = [step for step, gone in zip(steps, removed[i].tolist()) if not gone]
+        for i in np.flatnonzero(result.adds_stability):
+            batch.strategies[i]["steps"].append({
+                "protocol": "Quill",
+                "action": "provide_stability",
+                "token": "USDQ",
+                "amount": float(result.added_usdq[i]),
+                "expected_apy": UNUSED_USDQ_STABILITY_APY
+            })
+        for strategy, apy in zip(batch.strategies, result.total_expected_apy.tolist()):
+            strategy["total_expected_apy"] = apy
+
+        return batch.strategies
@@ -0,0 +1,59 @@
+# ai/benchmark_validation.py
+"""Throughput of per-strategy and batch strategy validation
+
+Needs no API key or network: it validates the same randomly generated
+candidate strategies with StrategyGenerator's per-strategy methods and with
+BatchStrategyValidator, checks the results match, and reports strategies
+per second for each. "batch (dicts)" includes turning the dicts into arrays
+and writing the results back; "batch (arrays)" is the check alone, as for
+candidates generated straight into a StepBatch.
+
+    python ai/benchmark_validation.py [count]
+"""
+import copy
+import os
+import sys
+import time
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from ai.batch_validator import BatchStrategyValidator, encode_steps
+from ai.strategy_cache import StrategyCache
+from ai.strategy_generator import StrategyGenerator
+from ai.tests.test_batch_validator import WALLET, random_strategies
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+def main(count: int):
+    generator = StrategyGenerator(cache=StrategyCache(directory=None))
+    validator = BatchStrategyValidator.for_generator(generator)
+    strategies = random_strategies(0, count)
+    balances = generator._validation_balances(WALLET)
+    steps = sum(len(strategy["steps"]) for strategy in strategies)
+
+    print(f"{count} strategies, {steps} steps\n")
+    print(f"{'method':<26} {'per-strategy':>14} {'batch (dicts)':>14} {'batch (arrays)':>15} {'speedup':>8}")
+
+    runs = [
+        ("validate_strategy", generator.validate_strategy, validator.validate_strategies, validator.check_balances, dict(WALLET)),
+        ("validate_strategy_logic", generator.validate_strategy_logic, validator.validate_strategies_logic, validator.check_logic, balances),
+    ]
+    for name, single, batch, check, wallet in runs:
+        inputs = copy.deepcopy(strategies)
+        expected, single_seconds = timed(lambda: [single(strategy, wallet) for strategy in inputs])
+        inputs = copy.deepcopy(strategies)
+        actual, batch_seconds = timed(lambda: batch(inputs, wallet))
+        assert actual == expected, f"{name}: batch results differ"
+        step_batch = encode_steps(copy.deepcopy(strategies), wallet)
+        _, check_seconds = timed(lambda: check(step_batch, wallet))
+
+        print(f"{name:<26} {count / single_seconds:>12,.0f}/s {count / batch_seconds:>12,.0f}/s "
+              f"{count / check_seconds:>13,.0f}/s {single_seconds / check_seconds:>7.1f}x")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
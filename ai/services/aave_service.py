@@ -1,10 +1,10 @@
 # ai/services/aave_service.py
 from typing import Dict, List, Optional, Any
+import asyncio
 import os
 from decimal import Decimal
 import json
 import web3
-from web3 import Web3
 # Handle different versions of web3.py
 try:
     from web3.middleware import geth_poa_middleware
@@ -16,10 +16,26 @@ except:
     geth_poa_middleware = None
 
 # ABI imports (we'll create these files)
+from .abis.pool_abi import POOL_ABI
 from .abis.pool_data_provider_abi import POOL_DATA_PROVIDER_ABI
 from .abis.ui_pool_data_provider_abi import UI_POOL_DATA_PROVIDER_ABI
 from .abis.price_oracle_abi import PRICE_ORACLE_ABI
 from .abis.pool_addresses_provider_abi import POOL_ADDRESSES_PROVIDER_ABI
+from .multicall import AsyncMulticall, Multicall
+from .block_context import block_identifier
+from .web3_provider import AsyncOnce, rpc_provider_factory
+
+# Field names of the getReservesData output structs, so tuples can be read by name
+_RESERVES_DATA_OUTPUTS = next(
+    entry for entry in UI_POOL_DATA_PROVIDER_ABI if entry.get("name") == "getReservesData"
+)["outputs"]
+RESERVE_DATA_FIELDS = [component["name"] for component in _RESERVES_DATA_OUTPUTS[0]["components"]]
+BASE_CURRENCY_FIELDS = [component["name"] for component in _RESERVES_DATA_OUTPUTS[1]["components"]]
+
+RAY = Decimal(10**27)
+
+# UiPoolDataProvider isn't registered in the addresses provider, so it has a fixed address
+UI_POOL_DATA_PROVIDER = "0x8C595Eec8822C205BC1C355e3Ab7BDED93C3bfdA"
 
 class AaveService:
     """Service for interacting with AAVE protocol on Scroll network"""
@@ -32,12 +48,14 @@ class AaveService:
     ASSETS = {
         "USDC": "0x06eFdBFf2a14a7c8E15944D1F4A48F9F95F663A4",  # Actual USDC address on Scroll
         "ETH": "0x5300000000000000000000000000000000000004",   # WETH underlying on Scroll
-        "SRC": "0xd29687c813D741E2F938F4aC377128810E217b1b"    # SCR token address on Scroll
+        "SRC": "0xd29687c813D741E2F938F4aC377128810E217b1b",   # SCR token address on Scroll
+        "wstETH": "0xf610A9dfB7C89644979b4A0f27063E9e7d7Cda32",
+        "weETH": "0x01f0a31698C4d065659b9bdC21B3610292a1c506"
     }
     
     def __init__(self):
         # Initialize Web3 connection
-        self.w3 = Web3(Web3.HTTPProvider(self.SCROLL_RPC_URL))
+        self.w3 = rpc_provider_factory.web3(self.SCROLL_RPC_URL)
     
         # Only inject middleware if available
         if geth_poa_middleware is not None:
@@ -53,6 +71,9 @@ class AaveService:
         else:
             print(f"Connected to {self.SCROLL_RPC_URL}")
             
+        # Batches per-reserve reads into a single eth_call where Multicall3 is deployed
+        self.multicall = Multicall(self.w3)
+            
         # Initialize contract interfaces
         self.addresses_provider = self.w3.eth.contract(
             address=self.w3.to_checksum_address(self.POOL_ADDRESSES_PROVIDER),
@@ -70,106 +91,188 @@ class AaveService:
             oracle_address = self.addresses_provider.functions.getPriceOracle().call()
             data_provider_address = self.addresses_provider.functions.getPoolDataProvider().call()
             
-            # Initialize contract interfaces
-            self.pool = self.w3.eth.contract(
-                address=self.w3.to_checksum_address(pool_address),
-                abi=[]  # We'll add Pool ABI if needed
-            )
-            
-            self.price_oracle = self.w3.eth.contract(
-                address=self.w3.to_checksum_address(oracle_address),
-                abi=PRICE_ORACLE_ABI
-            )
-            
-            self.data_provider = self.w3.eth.contract(
-                address=self.w3.to_checksum_address(data_provider_address),
-                abi=POOL_DATA_PROVIDER_ABI
-            )
-            
-            # For UI data provider we might need a separate address
-            # This is just a placeholder - you'll need to set the correct address
-            ui_pool_data_provider_address = "0x8C595Eec8822C205BC1C355e3Ab7BDED93C3bfdA"
-            self.ui_data_provider = self.w3.eth.contract(
-                address=self.w3.to_checksum_address(ui_pool_data_provider_address),
-                abi=UI_POOL_DATA_PROVIDER_ABI
-            )
-            
+            self._bind_contracts(pool_address, oracle_address, data_provider_address)
             print("All AAVE contracts initialized successfully")
             
         except Exception as e:
             print(f"Error initializing AAVE contracts: {e}")
             raise
 
+    def _bind_contracts(self, pool_address: str, oracle_address: str, data_provider_address: str):
+        """Create the contract interfaces from the addresses provider's answers"""
+        self.pool = self.w3.eth.contract(
+            address=self.w3.to_checksum_address(pool_address),
+            abi=POOL_ABI
+        )
+        
+        self.price_oracle = self.w3.eth.contract(
+            address=self.w3.to_checksum_address(oracle_address),
+            abi=PRICE_ORACLE_ABI
+        )
+        
+        self.data_provider = self.w3.eth.contract(
+            address=self.w3.to_checksum_address(data_provider_address),
+            abi=POOL_DATA_PROVIDER_ABI
+        )
+        
+        self.ui_data_provider = self.w3.eth.contract(
+            address=self.w3.to_checksum_address(UI_POOL_DATA_PROVIDER),
+            abi=UI_POOL_DATA_PROVIDER_ABI
+        )
+
     def get_reserve_data(self) -> Dict[str, Any]:
         """Get data for all reserves in the AAVE pool"""
         try:
             # Get list of reserves
-            reserves_list = self.data_provider.functions.getAllReservesTokens().call()
+            reserves_list = self.data_provider.functions.getAllReservesTokens().call(block_identifier=block_identifier())
             
-            # Initialize result dictionary
-            reserves_data = {}
+            # Queue configuration and current data reads for every reserve
+            calls = self._reserve_data_calls(reserves_list)
             
-            # Fetch data for each reserve
-            for reserve in reserves_list:
-                token_symbol = reserve[0]
-                token_address = reserve[1]
-                
-                # Get configuration data
-                config_data = self.data_provider.functions.getReserveConfigurationData(token_address).call()
-                
-                # Get current reserve data
-                current_data = self.data_provider.functions.getReserveData(token_address).call()
-                
-                # Format results
-                reserves_data[token_symbol] = {
-                    "address": token_address,
-                    "decimals": config_data[0],
-                    "ltv": config_data[1] / 10000,  # Convert from basis points to percentage
-                    "liquidation_threshold": config_data[2] / 10000,
-                    "liquidation_bonus": config_data[3] / 10000,
-                    "reserve_factor": config_data[4] / 10000,
-                    "usage_as_collateral_enabled": config_data[5],
-                    "borrowing_enabled": config_data[6],
-                    "is_active": config_data[8],
-                    "is_frozen": config_data[9],
-                    "liquidity_rate": current_data[5] / 1e27,  # Convert from ray to percentage
-                    "variable_borrow_rate": current_data[6] / 1e27,
-                }
+            # One aggregate3 round trip (or per-call reads if Multicall3 isn't deployed)
+            results = self.multicall.aggregate(calls)
             
-            return reserves_data
+            return self._format_reserve_data(reserves_list, results)
             
         except Exception as e:
             print(f"Error fetching reserve data: {e}")
             return {}
 
+    def _reserve_data_calls(self, reserves_list: List[Any]) -> List[Any]:
+        """Configuration and current data reads for every reserve, in pairs"""
+        calls = []
+        for reserve in reserves_list:
+            token_address = reserve[1]
+            calls.append(self.data_provider.functions.getReserveConfigurationData(token_address))
+            calls.append(self.data_provider.functions.getReserveData(token_address))
+        return calls
+
+    def _format_reserve_data(self, reserves_list: List[Any], results: List[Any]) -> Dict[str, Any]:
+        """Shape the paired reserve reads from _reserve_data_calls"""
+        reserves_data = {}
+        
+        for i, reserve in enumerate(reserves_list):
+            token_symbol = reserve[0]
+            token_address = reserve[1]
+            config_data = results[2 * i]
+            current_data = results[2 * i + 1]
+            
+            # Skip reserves whose reads failed rather than dropping the whole market
+            if config_data is None or current_data is None:
+                print(f"Skipping reserve {token_symbol}: could not fetch reserve data")
+                continue
+            
+            # Format results
+            reserves_data[token_symbol] = {
+                "address": token_address,
+                "decimals": config_data[0],
+                "ltv": config_data[1] / 10000,  # Convert from basis points to percentage
+                "liquidation_threshold": config_data[2] / 10000,
+                "liquidation_bonus": config_data[3] / 10000,
+                "reserve_factor": config_data[4] / 10000,
+                "usage_as_collateral_enabled": config_data[5],
+                "borrowing_enabled": config_data[6],
+                "is_active": config_data[8],
+                "is_frozen": config_data[9],
+                "liquidity_rate": current_data[5] / 1e27,  # Convert from ray to percentage
+                "variable_borrow_rate": current_data[6] / 1e27,
+            }
+        
+        return reserves_data
+
+    def get_reserves_snapshot(self) -> Dict[str, Any]:
+        """Get rates, configuration, supply/debt and prices for all reserves in one call
+        
+        Uses UiPoolDataProvider.getReservesData, which returns every reserve's
+        aggregated data plus the oracle price in a single round trip.
+        
+        Returns:
+            Dictionary keyed by reserve symbol with the same fields as
+            get_reserve_data plus price and TVL, or an empty dict on failure
+        """
+        try:
+            reserves, base_currency = self.ui_data_provider.functions.getReservesData(
+                self.w3.to_checksum_address(self.POOL_ADDRESSES_PROVIDER)
+            ).call(block_identifier=block_identifier())
+        except Exception as e:
+            print(f"Error fetching reserves snapshot: {e}")
+            return {}
+        
+        return self._format_reserves_snapshot(reserves, base_currency)
+
+    def _format_reserves_snapshot(self, reserves: List[Any], base_currency: Any) -> Dict[str, Any]:
+        """Shape getReservesData output into per-reserve rates, prices and TVL"""
+        base = dict(zip(BASE_CURRENCY_FIELDS, base_currency))
+        # Prices are quoted in the market reference currency (USD with 8 decimals on AAVE V3)
+        reference_unit = Decimal(base["marketReferenceCurrencyUnit"] or 10**8)
+        reference_price_usd = Decimal(base["marketReferenceCurrencyPriceInUsd"] or 10**8) / Decimal(10**8)
+        
+        reserves_data = {}
+        for raw_reserve in reserves:
+            reserve = dict(zip(RESERVE_DATA_FIELDS, raw_reserve))
+            try:
+                unit = Decimal(10 ** reserve["decimals"])
+                price_usd = Decimal(reserve["priceInMarketReferenceCurrency"]) / reference_unit * reference_price_usd
+                
+                # Debt accrues through the index, so scale it up to current units
+                total_debt = Decimal(reserve["totalScaledVariableDebt"]) * Decimal(reserve["variableBorrowIndex"]) / RAY / unit
+                available_liquidity = Decimal(reserve["availableLiquidity"]) / unit
+                total_supply = available_liquidity + total_debt
+                
+                reserves_data[reserve["symbol"]] = {
+                    "address": reserve["underlyingAsset"],
+                    "decimals": reserve["decimals"],
+                    "ltv": reserve["baseLTVasCollateral"] / 10000,  # Convert from basis points to percentage
+                    "liquidation_threshold": reserve["reserveLiquidationThreshold"] / 10000,
+                    "liquidation_bonus": reserve["reserveLiquidationBonus"] / 10000,
+                    "reserve_factor": reserve["reserveFactor"] / 10000,
+                    "usage_as_collateral_enabled": reserve["usageAsCollateralEnabled"],
+                    "borrowing_enabled": reserve["borrowingEnabled"],
+                    "is_active": reserve["isActive"],
+                    "is_frozen": reserve["isFrozen"],
+                    "liquidity_rate": reserve["liquidityRate"] / 1e27,  # Convert from ray to percentage
+                    "variable_borrow_rate": reserve["variableBorrowRate"] / 1e27,
+                    "price_usd": float(price_usd),
+                    "available_liquidity": float(available_liquidity),
+                    "total_debt": float(total_debt),
+                    "total_supply": float(total_supply),
+                    "tvl_usd": float(total_supply * price_usd),
+                }
+            except Exception as e:
+                print(f"Error decoding reserve {reserve.get('symbol')}: {e}")
+        
+        return reserves_data
+
     def get_user_account_data(self, wallet_address: str) -> Dict[str, Any]:
         """Get user account data from AAVE"""
         try:
             # Get user account data
             account_data = self.pool.functions.getUserAccountData(
                 self.w3.to_checksum_address(wallet_address)
-            ).call()
+            ).call(block_identifier=block_identifier())
             
-            # Format results
-            return {
-                "total_collateral_base": account_data[0],
-                "total_debt_base": account_data[1],
-                "available_borrows_base": account_data[2],
-                "current_liquidation_threshold": account_data[3] / 10000,  # Convert from basis points
-                "ltv": account_data[4] / 10000,
-                "health_factor": account_data[5] / 1e18 if account_data[5] > 0 else 0
-            }
+            return self._format_account_data(account_data)
             
         except Exception as e:
             print(f"Error fetching user account data: {e}")
             return {}
 
+    def _format_account_data(self, account_data: Any) -> Dict[str, Any]:
+        return {
+            "total_collateral_base": account_data[0],
+            "total_debt_base": account_data[1],
+            "available_borrows_base": account_data[2],
+            "current_liquidation_threshold": account_data[3] / 10000,  # Convert from basis points
+            "ltv": account_data[4] / 10000,
+            "health_factor": account_data[5] / 1e18 if account_data[5] > 0 else 0
+        }
+
     def get_asset_price(self, asset_address: str) -> Decimal:
         """Get asset price from AAVE oracle"""
         try:
             price = self.price_oracle.functions.getAssetPrice(
                 self.w3.to_checksum_address(asset_address)
-            ).call()
+            ).call(block_identifier=block_identifier())
             
             return Decimal(price) / Decimal(1e8)  # Adjust decimals as needed
             
@@ -177,65 +280,267 @@ class AaveService:
             print(f"Error fetching asset price: {e}")
             return Decimal(0)
 
+    def get_asset_prices(self, asset_addresses: List[str]) -> Dict[str, Decimal]:
+        """Get many asset prices from the AAVE oracle in one getAssetsPrices call
+        
+        Returns:
+            Price by asset address (as given), or an empty dict on failure
+        """
+        try:
+            prices = self.price_oracle.functions.getAssetsPrices(
+                [self.w3.to_checksum_address(address) for address in asset_addresses]
+            ).call(block_identifier=block_identifier())
+            return {address: Decimal(price) / Decimal(1e8) for address, price in zip(asset_addresses, prices)}
+        except Exception as e:
+            print(f"Error fetching asset prices: {e}")
+            return {}
+
     def get_market_data(self) -> Dict[str, Any]:
         """Get comprehensive market data from AAVE on Scroll"""
         try:
-            # Get reserve data
-            reserves = self.get_reserve_data()
-            
-            # Format into the structure expected by the strategy generator
-            market_data = {
-                "rates": {
-                    "AAVE": {
-                        "supply_apy": {},
-                        "borrow_apy": {}
-                    }
-                },
-                "tvl": {
-                    "AAVE": 0  # Will be calculated below
-                },
-                "conditions": "stable"  # Default value, could be dynamic
-            }
+            # One getReservesData call covers rates, supply/debt and prices;
+            # fall back to the data provider reads (without TVL) if it fails
+            reserves = self.get_reserves_snapshot()
+            if not reserves:
+                reserves = self.get_reserve_data()
             
-            total_tvl = 0
-            
-            # Process each reserve
-            for symbol, data in reserves.items():
-                # Add supply and borrow rates
-                market_data["rates"]["AAVE"]["supply_apy"][symbol] = data["liquidity_rate"] * 100
-                market_data["rates"]["AAVE"]["borrow_apy"][symbol] = data["variable_borrow_rate"] * 100
-                
-                # We could calculate TVL if we had total supply data
-                # For now, we'll leave it as 0
-                
-            # Set TVL - for a real implementation, we'd calculate this from totalSupply * price
-            market_data["tvl"]["AAVE"] = total_tvl
-            
-            return market_data
+            return self._build_market_data(reserves)
             
         except Exception as e:
             print(f"Error building market data: {e}")
-            return {
-                "rates": {"AAVE": {"supply_apy": {}, "borrow_apy": {}}},
-                "tvl": {"AAVE": 0},
-                "conditions": "unknown"
-            }
+            return self._empty_market_data()
+
+    def _build_market_data(self, reserves: Dict[str, Any]) -> Dict[str, Any]:
+        """Format reserves into the structure expected by the strategy generator"""
+        market_data = {
+            "rates": {
+                "AAVE": {
+                    "supply_apy": {},
+                    "borrow_apy": {}
+                }
+            },
+            "tvl": {
+                "AAVE": 0  # Will be calculated below
+            },
+            "reserves": {},
+            "conditions": "stable"  # Default value, could be dynamic
+        }
+        
+        total_tvl = 0
+        
+        # Process each reserve
+        for symbol, data in reserves.items():
+            # Add supply and borrow rates
+            market_data["rates"]["AAVE"]["supply_apy"][symbol] = data["liquidity_rate"] * 100
+            market_data["rates"]["AAVE"]["borrow_apy"][symbol] = data["variable_borrow_rate"] * 100
+            
+            # TVL is only known when the snapshot (with prices) was available
+            if "tvl_usd" in data:
+                total_tvl += data["tvl_usd"]
+                market_data["reserves"][symbol] = {
+                    "price_usd": data["price_usd"],
+                    "total_supply": data["total_supply"],
+                    "total_debt": data["total_debt"],
+                    "available_liquidity": data["available_liquidity"],
+                    "tvl_usd": data["tvl_usd"]
+                }
+            
+        market_data["tvl"]["AAVE"] = total_tvl
+        
+        return market_data
+
+    def _empty_market_data(self) -> Dict[str, Any]:
+        return {
+            "rates": {"AAVE": {"supply_apy": {}, "borrow_apy": {}}},
+            "tvl": {"AAVE": 0},
+            "reserves": {},
+            "conditions": "unknown"
+        }
 
     def get_user_risk_metrics(self, wallet_address: str) -> Dict[str, Any]:
         """Get risk metrics for a user"""
         try:
             account_data = self.get_user_account_data(wallet_address)
             
-            return {
-                "health_factor": float(account_data.get("health_factor", 1.8)),
-                "liquidation_threshold": float(account_data.get("current_liquidation_threshold", 0.85)),
-                "current_ratio": float(account_data.get("ltv", 1.5))
-            }
+            return self._format_risk_metrics(account_data)
             
         except Exception as e:
             print(f"Error calculating risk metrics: {e}")
-            return {
-                "health_factor": 1.8,
-                "liquidation_threshold": 0.85,
-                "current_ratio": 1.5
-            }
\ No newline at end of file
+            return self._format_risk_metrics({})
+
+    def get_user_risk_metrics_batch(self, wallet_addresses: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get risk metrics for many wallets with a single batched read
+        
+        Args:
+            wallet_addresses: Wallets to look up
+            
+        Returns:
+            Dictionary keyed by wallet address (as given) with the same
+            structure as get_user_risk_metrics. A wallet whose read fails, or
+            whose address is malformed, gets the default metrics.
+        """
+        try:
+            wallets, calls = self._account_data_calls(wallet_addresses)
+            results = self.multicall.aggregate(calls)
+        except Exception as e:
+            print(f"Error fetching batched user account data: {e}")
+            wallets, results = [], []
+        return self._format_risk_metrics_batch(wallet_addresses, wallets, results)
+
+    def _account_data_calls(self, wallet_addresses: List[str]) -> Any:
+        """One getUserAccountData call per well-formed address, with the addresses they belong to"""
+        wallets, calls = [], []
+        for wallet_address in wallet_addresses:
+            try:
+                checksum_address = self.w3.to_checksum_address(wallet_address)
+            except Exception as e:
+                print(f"Invalid wallet address {wallet_address}: {e}")
+                continue
+            wallets.append(wallet_address)
+            calls.append(self.pool.functions.getUserAccountData(checksum_address))
+        return wallets, calls
+
+    def _format_risk_metrics_batch(
+        self,
+        wallet_addresses: List[str],
+        wallets: List[str],
+        results: List[Optional[Any]]
+    ) -> Dict[str, Dict[str, Any]]:
+        metrics = {wallet_address: self._format_risk_metrics({}) for wallet_address in wallet_addresses}
+        for wallet_address, account_data in zip(wallets, results):
+            if account_data is not None:
+                metrics[wallet_address] = self._format_risk_metrics(self._format_account_data(account_data))
+        return metrics
+
+    def _format_risk_metrics(self, account_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Risk metrics from account data, with defaults for anything missing"""
+        return {
+            "health_factor": float(account_data.get("health_factor", 1.8)),
+            "liquidation_threshold": float(account_data.get("current_liquidation_threshold", 0.85)),
+            "current_ratio": float(account_data.get("ltv", 1.5))
+        }
+
+class AsyncAaveService(AaveService):
+    """AaveService on AsyncWeb3: the same public methods and return shapes, as coroutines
+
+    Construction does no I/O. The addresses provider is read on first use, so
+    the service can be built at startup without blocking the event loop.
+    """
+
+    def __init__(self):
+        self.w3 = rpc_provider_factory.async_web3(self.SCROLL_RPC_URL)
+        self.multicall = AsyncMulticall(self.w3)
+        self.addresses_provider = self.w3.eth.contract(
+            address=self.w3.to_checksum_address(self.POOL_ADDRESSES_PROVIDER),
+            abi=POOL_ADDRESSES_PROVIDER_ABI
+        )
+        self._initialization = AsyncOnce()
+
+    async def initialize_contracts(self):
+        """Read the contract addresses (in parallel) and bind the contract interfaces, once"""
+        await self._initialization.run(self._initialize_contracts)
+
+    async def _initialize_contracts(self):
+        try:
+            functions = self.addresses_provider.functions
+            pool_address, oracle_address, data_provider_address = await asyncio.gather(
+                functions.getPool().call(),
+                functions.getPriceOracle().call(),
+                functions.getPoolDataProvider().call()
+            )
+            self._bind_contracts(pool_address, oracle_address, data_provider_address)
+            print("All AAVE contracts initialized successfully")
+        except Exception as e:
+            print(f"Error initializing AAVE contracts: {e}")
+            raise
+
+    async def get_reserve_data(self) -> Dict[str, Any]:
+        """Get data for all reserves in the AAVE pool"""
+        try:
+            await self.initialize_contracts()
+            reserves_list = await self.data_provider.functions.getAllReservesTokens().call(block_identifier=block_identifier())
+            results = await self.multicall.aggregate(self._reserve_data_calls(reserves_list))
+            return self._format_reserve_data(reserves_list, results)
+        except Exception as e:
+            print(f"Error fetching reserve data: {e}")
+            return {}
+
+    async def get_reserves_snapshot(self) -> Dict[str, Any]:
+        """Get rates, configuration, supply/debt and prices for all reserves in one call"""
+        try:
+            await self.initialize_contracts()
+            reserves, base_currency = await self.ui_data_provider.functions.getReservesData(
+                self.w3.to_checksum_address(self.POOL_ADDRESSES_PROVIDER)
+            ).call(block_identifier=block_identifier())
+        except Exception as e:
+            print(f"Error fetching reserves snapshot: {e}")
+            return {}
+        
+        return self._format_reserves_snapshot(reserves, base_currency)
+
+    async def get_user_account_data(self, wallet_address: str) -> Dict[str, Any]:
+        """Get user account data from AAVE"""
+        try:
+            await self.initialize_contracts()
+            account_data = await self.pool.functions.getUserAccountData(
+                self.w3.to_checksum_address(wallet_address)
+            ).call(block_identifier=block_identifier())
+            return self._format_account_data(account_data)
+        except Exception as e:
+            print(f"Error fetching user account data: {e}")
+            return {}
+
+    async def get_asset_price(self, asset_address: str) -> Decimal:
+        """Get asset price from AAVE oracle"""
+        try:
+            await self.initialize_contracts()
+            price = await self.price_oracle.functions.getAssetPrice(
+                self.w3.to_checksum_address(asset_address)
+            ).call(block_identifier=block_identifier())
+            return Decimal(price) / Decimal(1e8)  # Adjust decimals as needed
+        except Exception as e:
+            print(f"Error fetching asset price: {e}")
+            return Decimal(0)
+
+    async def get_asset_prices(self, asset_addresses: List[str]) -> Dict[str, Decimal]:
+        """Get many asset prices from the AAVE oracle in one getAssetsPrices call"""
+        try:
+            await self.initialize_contracts()
+            prices = await self.price_oracle.functions.getAssetsPrices(
+                [self.w3.to_checksum_address(address) for address in asset_addresses]
+            ).call(block_identifier=block_identifier())
+            return {address: Decimal(price) / Decimal(1e8) for address, price in zip(asset_addresses, prices)}
+        except Exception as e:
+            print(f"Error fetching asset prices: {e}")
+            return {}
+
+    async def get_market_data(self) -> Dict[str, Any]:
+        """Get comprehensive market data from AAVE on Scroll"""
+        try:
+            reserves = await self.get_reserves_snapshot()
+            if not reserves:
+                reserves = await self.get_reserve_data()
+            return self._build_market_data(reserves)
+        except Exception as e:
+            print(f"Error building market data: {e}")
+            return self._empty_market_data()
+
+    async def get_user_risk_metrics(self, wallet_address: str) -> Dict[str, Any]:
+        """Get risk metrics for a user"""
+        try:
+            account_data = await self.get_user_account_data(wallet_address)
+            return self._format_risk_metrics(account_data)
+        except Exception as e:
+            print(f"Error calculating risk metrics: {e}")
+            return self._format_risk_metrics({})
+
+    async def get_user_risk_metrics_batch(self, wallet_addresses: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get risk metrics for many wallets with a single batched read"""
+        try:
+            await self.initialize_contracts()
+            wallets, calls = self._account_data_calls(wallet_addresses)
+            results = await self.multicall.aggregate(calls)
+        except Exception as e:
+            print(f"Error fetching batched user account data: {e}")
+            wallets, results = [], []
+        return self._format_risk_metrics_batch(wallet_addresses, wallets, results)
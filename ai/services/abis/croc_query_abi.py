@@ -49,5 +49,20 @@ CROC_QUERY_ABI = [
         ],
         "stateMutability": "view",
         "type": "function"
+    },
+    {
+        "inputs": [
+            {"internalType": "address", "name": "base", "type": "address"},
+            {"internalType": "address", "name": "quote", "type": "address"},
+            {"internalType": "uint256", "name": "poolIdx", "type": "uint256"},
+            {"internalType": "int24", "name": "tick", "type": "int24"}
+        ],
+        "name": "queryLevel",
+        "outputs": [
+            {"internalType": "uint96", "name": "bidLots", "type": "uint96"},
+            {"internalType": "uint96", "name": "askLots", "type": "uint96"}
+        ],
+        "stateMutability": "view",
+        "type": "function"
     }
-]
\ No newline at end of file
+]
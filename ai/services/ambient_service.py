@@ -1,10 +1,11 @@
 # ai/services/ambient_service.py
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Sequence, Tuple
+import asyncio
 import os
 from decimal import Decimal
 import json
+import numpy as np
 import web3
-from web3 import Web3
 
 # Handle different versions of web3.py with comprehensive fallbacks
 geth_poa_middleware = None
@@ -28,6 +29,41 @@ except ImportError:
 from .abis.croc_swap_router_abi import CROC_SWAP_ROUTER_ABI
 from .abis.croc_query_abi import CROC_QUERY_ABI
 from .abis.croc_impact_abi import CROC_IMPACT_ABI
+from .block_context import block_identifier, pinned_block
+from .curve_simulator import CurveSimulator, CurveState, level_ticks
+from .multicall import AsyncMulticall, Multicall
+from .swap_router import SwapRouter
+from .price_service import FALLBACK_TOKEN_PRICES, PriceService
+from .web3_provider import AsyncOnce, rpc_provider_factory
+
+# Pairs get_market_data reports, as comma-separated TOKEN1-TOKEN2 (symbols from AmbientService.TOKENS)
+AMBIENT_MARKET_PAIRS = os.getenv("AMBIENT_MARKET_PAIRS", "ETH-USDC,ETH-SRC,USDC-SRC")
+
+# Quote swap impact with the local curve simulator instead of a calcImpact call
+AMBIENT_LOCAL_IMPACT = os.getenv("AMBIENT_LOCAL_IMPACT", "true").lower() == "true"
+
+# Pool fee the simulator charges on the input, as a fraction
+AMBIENT_SWAP_FEE_RATE = float(os.getenv("AMBIENT_SWAP_FEE_RATE", "0.003"))
+
+# Tick levels read into the simulator: every AMBIENT_LEVEL_TICK_SPACING ticks,
+# AMBIENT_LEVEL_WINDOW levels each side of the current tick
+AMBIENT_LEVEL_TICK_SPACING = int(os.getenv("AMBIENT_LEVEL_TICK_SPACING", "16"))
+AMBIENT_LEVEL_WINDOW = int(os.getenv("AMBIENT_LEVEL_WINDOW", "64"))
+
+# Longest multi-hop route find_swap_route considers, in pools
+AMBIENT_ROUTE_MAX_HOPS = int(os.getenv("AMBIENT_ROUTE_MAX_HOPS", "3"))
+
+# Seconds an unpinned curve is reused (about one Scroll block); pinned reads reuse it for the whole block
+AMBIENT_CURVE_TTL_SECONDS = float(os.getenv("AMBIENT_CURVE_TTL_SECONDS", "3"))
+
+def parse_market_pairs(value: str) -> List[Tuple[str, str]]:
+    """Token pairs from a "ETH-USDC,ETH-SRC" style list"""
+    pairs = []
+    for pair in value.split(","):
+        if pair.strip():
+            token1, token2 = pair.strip().split("-")
+            pairs.append((token1.strip(), token2.strip()))
+    return pairs
 
 class AmbientService:
     """Service for interacting with Ambient (CrocSwap) protocol on Scroll network"""
@@ -58,9 +94,21 @@ class AmbientService:
     # Default pool index for Ambient
     DEFAULT_POOL_IDX = 420
     
-    def __init__(self):
+    # Key token pairs reported by get_market_data (AMBIENT_MARKET_PAIRS)
+    MARKET_PAIRS = parse_market_pairs(AMBIENT_MARKET_PAIRS)
+    
+    # Reads per pool in the get_market_data batch
+    POOL_READS = ("queryPrice", "queryLiquidity", "queryCurveTick")
+    
+    def __init__(self, price_service: Optional[PriceService] = None):
+        # Curve states for the swap simulator, by (base, quote)
+        self._curves: Dict[Tuple[str, str], CurveState] = {}
+        
+        # Last on-chain USD prices for the fallback paths; the fallback prices without one
+        self.price_service = price_service
+        
         # Initialize Web3 connection
-        self.w3 = Web3(Web3.HTTPProvider(self.SCROLL_RPC_URL))
+        self.w3 = rpc_provider_factory.web3(self.SCROLL_RPC_URL)
         
         # Only inject middleware if available
         if geth_poa_middleware is not None:
@@ -77,27 +125,34 @@ class AmbientService:
         else:
             print(f"Connected to {self.SCROLL_RPC_URL}")
             
+            # Batches every pool's reads in get_market_data into one eth_call
+            self.multicall = Multicall(self.w3)
+            
             # Initialize contract interfaces
-            try:
-                self.router = self.w3.eth.contract(
-                    address=self.w3.to_checksum_address(self.CROC_SWAP_ROUTER),
-                    abi=CROC_SWAP_ROUTER_ABI
-                )
-                
-                self.query = self.w3.eth.contract(
-                    address=self.w3.to_checksum_address(self.CROC_QUERY),
-                    abi=CROC_QUERY_ABI
-                )
-                
-                self.impact = self.w3.eth.contract(
-                    address=self.w3.to_checksum_address(self.CROC_IMPACT),
-                    abi=CROC_IMPACT_ABI
-                )
-                
-                print("Ambient contracts initialized successfully")
-            except Exception as e:
-                print(f"Error initializing Ambient contracts: {e}")
-                self.w3 = None
+            self._bind_contracts()
+
+    def _bind_contracts(self):
+        """Create the router, query and impact contract interfaces"""
+        try:
+            self.router = self.w3.eth.contract(
+                address=self.w3.to_checksum_address(self.CROC_SWAP_ROUTER),
+                abi=CROC_SWAP_ROUTER_ABI
+            )
+            
+            self.query = self.w3.eth.contract(
+                address=self.w3.to_checksum_address(self.CROC_QUERY),
+                abi=CROC_QUERY_ABI
+            )
+            
+            self.impact = self.w3.eth.contract(
+                address=self.w3.to_checksum_address(self.CROC_IMPACT),
+                abi=CROC_IMPACT_ABI
+            )
+            
+            print("Ambient contracts initialized successfully")
+        except Exception as e:
+            print(f"Error initializing Ambient contracts: {e}")
+            self.w3 = None
 
     def safely_call_contract(self, contract_method, fallback_value=None, *args, **kwargs):
         """Safely call a contract method with fallback value on error"""
@@ -126,17 +181,41 @@ class AmbientService:
         else:
             return token2_addr, token1_addr, True
 
+    def _fallback_price(self, token1: str, token2: str) -> Decimal:
+        """Price of token1 in token2 from the last known USD prices, used when the pool can't be read"""
+        usd1 = self._fallback_usd_price(token1)
+        usd2 = self._fallback_usd_price(token2)
+        if not usd1 or not usd2:
+            return Decimal("1.0")
+        return Decimal(str(usd1)) / Decimal(str(usd2))
+
+    def _fallback_usd_price(self, token: str) -> Optional[float]:
+        """The price service's last read USD price, else the fallback price"""
+        if self.price_service is not None:
+            return self.price_service.last_price(token)
+        return FALLBACK_TOKEN_PRICES.get(token)
+
+    def _price_from_sqrt(self, raw_price: int, is_reversed: bool) -> Decimal:
+        """Price from a queryPrice result, in the caller's token order"""
+        # Convert the Q64.64 fixed point representation to a decimal
+        # In Ambient, prices are represented as square roots, so we need to square it
+        price_sqrt = Decimal(raw_price) / Decimal(2**64)
+        price = price_sqrt * price_sqrt
+        
+        # If the tokens were reversed from the input order, invert the price
+        if is_reversed:
+            # Check if price is non-zero before inverting
+            if price == 0:
+                return Decimal("0")
+            price = Decimal("1") / price
+            
+        return price
+
     def get_pool_price(self, token1: str, token2: str) -> Decimal:
         """Get the current price between two tokens from Ambient"""
         if not self.w3:
             # Fallback prices if we can't connect
-            if (token1 == "ETH" and token2 == "USDC") or (token1 == "USDC" and token2 == "ETH"):
-                return Decimal("2000.0")  # ETH/USDC price
-            elif (token1 == "ETH" and token2 == "SRC") or (token1 == "SRC" and token2 == "ETH"):
-                return Decimal("0.005")  # SRC/ETH price
-            elif (token1 == "USDC" and token2 == "SRC") or (token1 == "SRC" and token2 == "USDC"):
-                return Decimal("0.01")  # SRC/USDC price
-            return Decimal("1.0")
+            return self._fallback_price(token1, token2)
             
         try:
             # Get the base and quote tokens in correct order
@@ -149,32 +228,15 @@ class AmbientService:
                     quote_addr, 
                     self.DEFAULT_POOL_IDX
                 ).call,
-                0
+                0,
+                block_identifier=block_identifier()
             )
             
-            # Convert the Q64.64 fixed point representation to a decimal
-            # In Ambient, prices are represented as square roots, so we need to square it
-            price_sqrt = Decimal(raw_price) / Decimal(2**64)
-            price = price_sqrt * price_sqrt
-            
-            # If the tokens were reversed from the input order, invert the price
-            if is_reversed:
-                # Check if price is non-zero before inverting
-                if price == 0:
-                    return Decimal("0")
-                price = Decimal("1") / price
-                
-            return price
+            return self._price_from_sqrt(raw_price, is_reversed)
         except Exception as e:
             print(f"Error getting pool price: {e}")
             # Return fallback prices
-            if (token1 == "ETH" and token2 == "USDC") or (token1 == "USDC" and token2 == "ETH"):
-                return Decimal("2000.0")  # ETH/USDC price
-            elif (token1 == "ETH" and token2 == "SRC") or (token1 == "SRC" and token2 == "ETH"):
-                return Decimal("0.005")  # SRC/ETH price
-            elif (token1 == "USDC" and token2 == "SRC") or (token1 == "SRC" and token2 == "USDC"):
-                return Decimal("0.01")  # SRC/USDC price
-            return Decimal("1.0")
+            return self._fallback_price(token1, token2)
 
     def calculate_swap_impact(self, from_token: str, to_token: str, amount: Decimal) -> Dict[str, Any]:
         """
@@ -190,102 +252,360 @@ class AmbientService:
         """
         if not self.w3:
             # Return fallback values
-            return {
-                "input_amount": float(amount),
-                "output_amount": float(amount) * float(self.get_pool_price(from_token, to_token)),
-                "price_impact": 0.01,  # 1% fallback slippage
-                "from_token": from_token,
-                "to_token": to_token
-            }
+            return self._fallback_swap_impact(from_token, to_token, amount, self.get_pool_price(from_token, to_token))
+        
+        if AMBIENT_LOCAL_IMPACT:
+            try:
+                return self.simulate_swap_impact(from_token, to_token, amount)
+            except Exception as e:
+                print(f"Error simulating swap impact, asking CrocImpact: {e}")
             
         try:
             # Get the base and quote tokens in correct order
             base_addr, quote_addr, is_reversed = self.get_token_pair(from_token, to_token)
             
-            # Convert amount to the correct unit based on token decimals
-            amount_in_wei = int(amount * (10 ** self.DECIMALS.get(from_token, 18)))
-            
-            # Determine if this is a buy or sell
-            # In Ambient:
-            # - isBuy=true means pay base, receive quote
-            # - isBuy=false means pay quote, receive base
-            is_buy = False
-            in_base_qty = True
-            
-            if is_reversed:
-                # If tokens are reversed, we need to adjust buy/sell parameters
-                if from_token == base_addr:
-                    is_buy = False  # Sell base for quote
-                    in_base_qty = True  # Input is base
-                else:
-                    is_buy = True  # Buy base with quote
-                    in_base_qty = False  # Input is quote
-            else:
-                if from_token == base_addr:
-                    is_buy = True  # Buy quote with base
-                    in_base_qty = True  # Input is base
-                else:
-                    is_buy = False  # Sell quote for base
-                    in_base_qty = False  # Input is quote
-            
-            # Set a reasonable limit price (very high/low to ensure the swap completes)
-            limit_price = 2**128 - 1 if is_buy else 1
+            impact_call = self._impact_call(from_token, to_token, amount, base_addr, quote_addr, is_reversed)
             
             # Calculate impact using the CrocImpact contract
-            result = self.safely_call_contract(
-                self.impact.functions.calcImpact(
-                    base_addr,
-                    quote_addr,
-                    self.DEFAULT_POOL_IDX,
-                    is_buy,
-                    in_base_qty,
-                    amount_in_wei,
-                    0,  # tip
-                    limit_price
-                ).call,
-                (0, 0, 0)  # fallback
-            )
-            
-            base_flow, quote_flow, final_price = result
+            result = self.safely_call_contract(impact_call.call, (0, 0, 0), block_identifier=block_identifier())
             
-            # Determine the output amount (negative flow means received by user)
-            if from_token == base_addr:
-                output_amount = abs(quote_flow) / (10 ** self.DECIMALS.get(to_token, 18))
-            else:
-                output_amount = abs(base_flow) / (10 ** self.DECIMALS.get(to_token, 18))
-                
-            # Calculate price impact
+            # Calculate price impact against the current pool price
             current_price = self.get_pool_price(from_token, to_token)
-            final_sqrt_price = Decimal(final_price) / Decimal(2**64)
-            final_actual_price = final_sqrt_price * final_sqrt_price
-            
-            if is_reversed:
-                if final_actual_price == 0:
-                    price_impact = 0
-                else:
-                    final_actual_price = Decimal("1") / final_actual_price
-                    
-            price_impact = abs((final_actual_price - current_price) / current_price)
             
-            return {
-                "input_amount": float(amount),
-                "output_amount": float(output_amount),
-                "price_impact": float(price_impact),
-                "from_token": from_token,
-                "to_token": to_token
-            }
+            return self._format_swap_impact(from_token, to_token, amount, base_addr, is_reversed, result, current_price)
             
         except Exception as e:
             print(f"Error calculating swap impact: {e}")
             # Return fallback values
-            price = self.get_pool_price(from_token, to_token)
-            return {
-                "input_amount": float(amount),
-                "output_amount": float(amount) * float(price),
-                "price_impact": 0.01,  # 1% fallback slippage
-                "from_token": from_token,
-                "to_token": to_token
-            }
+            return self._fallback_swap_impact(from_token, to_token, amount, self.get_pool_price(from_token, to_token))
+
+    def simulate_swap_impact(self, from_token: str, to_token: str, amount: Decimal) -> Dict[str, Any]:
+        """calculate_swap_impact computed locally from the pool's curve
+        
+        The curve is read once per block (see get_curve_state); every quote
+        after that needs no RPC.
+        
+        Raises:
+            ValueError: For unknown tokens, or a swap the curve can't fill
+        """
+        return self._simulate(self.get_curve_state(from_token, to_token), from_token, to_token, amount)
+    
+    def calculate_swap_impact_ladder(self, from_token: str, to_token: str, amounts: Sequence[Decimal]) -> Dict[str, Any]:
+        """
+        Output amount and price impact for many sizes of the same swap.
+        
+        Every size is quoted in one vectorized pass over the pool's curve
+        (see CurveSimulator.calc_impact_ladder). Without the simulator, each
+        size is quoted with calculate_swap_impact.
+        
+        Args:
+            from_token: Token to swap from
+            to_token: Token to swap to
+            amounts: Amounts of from_token to swap
+            
+        Returns:
+            Dictionary with input_amounts, output_amounts and price_impacts
+            lists in the order of amounts; sizes the pool can't fill are None
+        """
+        if self.w3 and AMBIENT_LOCAL_IMPACT:
+            try:
+                return self.simulate_swap_impact_ladder(from_token, to_token, amounts)
+            except Exception as e:
+                print(f"Error simulating swap impact ladder, quoting each amount: {e}")
+        
+        quotes = [self.calculate_swap_impact(from_token, to_token, amount) for amount in amounts]
+        return self._ladder_from_quotes(from_token, to_token, amounts, quotes)
+    
+    def simulate_swap_impact_ladder(self, from_token: str, to_token: str, amounts: Sequence[Decimal]) -> Dict[str, Any]:
+        """calculate_swap_impact_ladder computed locally from the pool's curve"""
+        return self._simulate_ladder(self.get_curve_state(from_token, to_token), from_token, to_token, amounts)
+    
+    def get_curve_state(self, token1: str, token2: str) -> CurveState:
+        """The pool's curve at the pinned block (or within AMBIENT_CURVE_TTL_SECONDS), read in two batches"""
+        return self._one_curve(self.get_curve_states([(token1, token2)]), token1, token2)
+    
+    def get_curve_states(self, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], CurveState]:
+        """Curves for several pools by (base, quote) address, seeding every missing one in the same two batches
+        
+        Pools that can't be read are left out.
+        """
+        states, pools = self._cached_curves(pairs)
+        if pools:
+            results = self.multicall.aggregate(self._seed_calls(pools))
+            seeds, calls = self._level_seed_calls(pools, results)
+            levels = self.multicall.aggregate(calls) if calls else []
+            states.update(self._store_curves(seeds, levels))
+        return states
+    
+    def find_swap_route(self, from_token: str, to_token: str, amount: Decimal, max_hops: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Find the best way to swap through the known pools (MARKET_PAIRS).
+        
+        Every route of up to max_hops pools is quoted on the local curves,
+        all seeded in the same two batched reads, and the route returning the
+        most to_token wins. Without the curves, the direct pair is quoted
+        with calculate_swap_impact.
+        
+        Args:
+            from_token: Token to swap from
+            to_token: Token to swap to
+            amount: Amount of from_token to swap
+            max_hops: Longest route considered (AMBIENT_ROUTE_MAX_HOPS by default)
+            
+        Returns:
+            The calculate_swap_impact fields for the whole route, plus the
+            route's tokens, each hop's amounts and price impact, and the
+            other routes' outputs
+        """
+        router = self._router(max_hops)
+        if self.w3:
+            try:
+                routes = router.routes(from_token, to_token)
+                states = self.get_curve_states(router.pairs_on(routes))
+                return router.best_route(from_token, to_token, amount, states, routes)
+            except Exception as e:
+                print(f"Error finding a swap route, quoting the direct pair: {e}")
+        
+        return self._direct_route(self.calculate_swap_impact(from_token, to_token, amount))
+    
+    def _router(self, max_hops: Optional[int]) -> SwapRouter:
+        return SwapRouter(
+            self,
+            self.MARKET_PAIRS,
+            max_hops=max_hops or AMBIENT_ROUTE_MAX_HOPS,
+            fee_rate=AMBIENT_SWAP_FEE_RATE
+        )
+    
+    def _direct_route(self, impact: Dict[str, Any]) -> Dict[str, Any]:
+        """A calculate_swap_impact result as a one-hop route"""
+        hop = {key: impact[key] for key in ("from_token", "to_token", "input_amount", "output_amount", "price_impact")}
+        return {
+            **{key: impact[key] for key in ("input_amount", "output_amount", "from_token", "to_token")},
+            "route": [impact["from_token"], impact["to_token"]],
+            "hops": [hop],
+            "alternatives": []
+        }
+    
+    def _one_curve(self, states: Dict[Tuple[str, str], CurveState], token1: str, token2: str) -> CurveState:
+        base_addr, quote_addr, _ = self.get_token_pair(token1, token2)
+        if (base_addr, quote_addr) not in states:
+            raise ValueError(f"Couldn't read the {token1}-{token2} pool")
+        return states[(base_addr, quote_addr)]
+    
+    def _cached_curves(self, pairs: List[Tuple[str, str]]) -> Tuple[Dict[Tuple[str, str], CurveState], List[Tuple[str, str]]]:
+        """Curves already seeded, and the (base, quote) pools still to seed, each once"""
+        states, pools = {}, []
+        for token1, token2 in pairs:
+            base_addr, quote_addr, _ = self.get_token_pair(token1, token2)
+            pool = (base_addr, quote_addr)
+            cached = self._cached_curve(base_addr, quote_addr)
+            if cached is not None:
+                states[pool] = cached
+            elif pool not in pools:
+                pools.append(pool)
+        return states, pools
+    
+    def _cached_curve(self, base_addr: str, quote_addr: str) -> Optional[CurveState]:
+        state = self._curves.get((base_addr, quote_addr))
+        if state is None:
+            return None
+        pinned = pinned_block()
+        if pinned is not None:
+            return state if state.block_number == pinned else None
+        return state if state.age < AMBIENT_CURVE_TTL_SECONDS else None
+    
+    def _curve_calls(self, base_addr: str, quote_addr: str) -> List[Any]:
+        return [
+            getattr(self.query.functions, read)(base_addr, quote_addr, self.DEFAULT_POOL_IDX)
+            for read in self.POOL_READS
+        ]
+    
+    def _level_calls(self, base_addr: str, quote_addr: str, raw_price: int, curve_tick: Optional[int]) -> Tuple[List[int], List[Any]]:
+        """queryLevel calls for the ticks around the current one"""
+        if curve_tick is None:
+            curve_tick = CurveState.from_pool(raw_price, 0, None, {}).tick
+        ticks = level_ticks(curve_tick, AMBIENT_LEVEL_TICK_SPACING, AMBIENT_LEVEL_WINDOW)
+        return ticks, [
+            self.query.functions.queryLevel(base_addr, quote_addr, self.DEFAULT_POOL_IDX, tick)
+            for tick in ticks
+        ]
+    
+    def _seed_calls(self, pools: List[Tuple[str, str]]) -> List[Any]:
+        return [call for base_addr, quote_addr in pools for call in self._curve_calls(base_addr, quote_addr)]
+    
+    def _level_seed_calls(self, pools: List[Tuple[str, str]], results: List[Any]) -> Tuple[List[Tuple], List[Any]]:
+        """queryLevel calls for every pool whose price was read, and what each seed needs to be stored"""
+        seeds, calls = [], []
+        reads = len(self.POOL_READS)
+        for i, (base_addr, quote_addr) in enumerate(pools):
+            raw_price, liquidity, curve_tick = results[reads * i:reads * (i + 1)]
+            if raw_price is None:
+                print(f"Couldn't read the price of pool {base_addr}-{quote_addr}")
+                continue
+            ticks, pool_calls = self._level_calls(base_addr, quote_addr, raw_price, curve_tick)
+            seeds.append((base_addr, quote_addr, raw_price, liquidity, curve_tick, ticks))
+            calls.extend(pool_calls)
+        return seeds, calls
+    
+    def _store_curves(self, seeds: List[Tuple], levels: List[Any]) -> Dict[Tuple[str, str], CurveState]:
+        states, offset = {}, 0
+        for base_addr, quote_addr, raw_price, liquidity, curve_tick, ticks in seeds:
+            pool_levels = levels[offset:offset + len(ticks)]
+            offset += len(ticks)
+            try:
+                states[(base_addr, quote_addr)] = self._store_curve(base_addr, quote_addr, raw_price, liquidity, curve_tick, ticks, pool_levels)
+            except ValueError as e:
+                print(f"Couldn't seed pool {base_addr}-{quote_addr}: {e}")
+        return states
+    
+    def _store_curve(self, base_addr, quote_addr, raw_price, liquidity, curve_tick, ticks, levels) -> CurveState:
+        if ticks and all(level is None for level in levels):
+            # Without any tick levels every quote would assume constant liquidity
+            raise ValueError("Couldn't read the pool's tick levels")
+        state = CurveState.from_pool(
+            raw_price,
+            liquidity or 0,
+            curve_tick,
+            {tick: level for tick, level in zip(ticks, levels) if level is not None},
+            block_number=pinned_block()
+        )
+        self._curves[(base_addr, quote_addr)] = state
+        return state
+    
+    def _simulate(self, state: CurveState, from_token: str, to_token: str, amount: Decimal) -> Dict[str, Any]:
+        """Run the swap on the curve and format it like a calcImpact result"""
+        base_addr, quote_addr, is_reversed = self.get_token_pair(from_token, to_token)
+        is_buy, in_base_qty, qty, _ = self._impact_args(from_token, amount, base_addr, is_reversed)
+        result = CurveSimulator(state, AMBIENT_SWAP_FEE_RATE).calc_impact(is_buy, in_base_qty, qty)
+        current_price = self._price_from_sqrt(int(state.sqrt_price * 2**64), is_reversed)
+        return self._format_swap_impact(from_token, to_token, amount, base_addr, is_reversed, result, current_price)
+    
+    def _simulate_ladder(self, state: CurveState, from_token: str, to_token: str, amounts: Sequence[Decimal]) -> Dict[str, Any]:
+        """Run every swap size on the curve at once and format the results like _format_swap_impact"""
+        base_addr, quote_addr, is_reversed = self.get_token_pair(from_token, to_token)
+        is_buy, in_base_qty, _, _ = self._impact_args(from_token, Decimal(0), base_addr, is_reversed)
+        qtys = [self._raw_amount(from_token, amount) for amount in amounts]
+        base_flows, quote_flows, final_prices = CurveSimulator(state, AMBIENT_SWAP_FEE_RATE).calc_impact_ladder(is_buy, in_base_qty, qtys)
+        
+        flows = quote_flows if self._pays_base(from_token, base_addr) else base_flows
+        output_amounts = np.abs(flows) / 10 ** self.DECIMALS.get(to_token, 18)
+        
+        final_actual_prices = (final_prices / 2**64) ** 2
+        if is_reversed:
+            with np.errstate(divide="ignore"):
+                final_actual_prices = 1 / final_actual_prices
+        current_price = float(self._price_from_sqrt(int(state.sqrt_price * 2**64), is_reversed))
+        price_impacts = np.abs((final_actual_prices - current_price) / current_price)
+        
+        return {
+            "input_amounts": [float(amount) for amount in amounts],
+            "output_amounts": [None if np.isnan(value) else float(value) for value in output_amounts],
+            "price_impacts": [None if np.isnan(value) else float(value) for value in price_impacts],
+            "from_token": from_token,
+            "to_token": to_token
+        }
+    
+    def _ladder_from_quotes(self, from_token: str, to_token: str, amounts: Sequence[Decimal], quotes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """A ladder made of separate calculate_swap_impact quotes"""
+        return {
+            "input_amounts": [float(amount) for amount in amounts],
+            "output_amounts": [quote["output_amount"] for quote in quotes],
+            "price_impacts": [quote["price_impact"] for quote in quotes],
+            "from_token": from_token,
+            "to_token": to_token
+        }
+    
+    def _impact_call(self, from_token: str, to_token: str, amount: Decimal, base_addr: str, quote_addr: str, is_reversed: bool):
+        """Bound CrocImpact.calcImpact call for swapping amount of from_token"""
+        is_buy, in_base_qty, amount_in_wei, limit_price = self._impact_args(from_token, amount, base_addr, is_reversed)
+        
+        return self.impact.functions.calcImpact(
+            base_addr,
+            quote_addr,
+            self.DEFAULT_POOL_IDX,
+            is_buy,
+            in_base_qty,
+            amount_in_wei,
+            0,  # tip
+            limit_price
+        )
+    
+    def _raw_amount(self, token: str, amount: Decimal) -> int:
+        """Amount in the token's smallest unit, based on its decimals"""
+        return int(amount * (10 ** self.DECIMALS.get(token, 18)))
+    
+    def _pays_base(self, from_token: str, base_addr: str) -> bool:
+        """Whether swapping from_token pays the pool's base token (else its quote token)"""
+        return self.TOKENS.get(from_token, "").lower() == base_addr.lower()
+    
+    def _swap_direction(self, from_token: str, base_addr: str) -> Tuple[bool, bool]:
+        """(isBuy, inBaseQty) for paying a fixed amount of from_token into the pool
+        
+        In Ambient:
+        - isBuy=true means pay base, receive quote
+        - isBuy=false means pay quote, receive base
+        The quantity is always the amount paid in, so inBaseQty follows isBuy.
+        """
+        is_buy = self._pays_base(from_token, base_addr)
+        return is_buy, is_buy
+    
+    def _impact_args(self, from_token: str, amount: Decimal, base_addr: str, is_reversed: bool) -> Tuple[bool, bool, int, int]:
+        """(isBuy, inBaseQty, qty, limitPrice) for calcImpact, shared with the simulator"""
+        amount_in_wei = self._raw_amount(from_token, amount)
+        
+        is_buy, in_base_qty = self._swap_direction(from_token, base_addr)
+        
+        # Set a reasonable limit price (very high/low to ensure the swap completes)
+        limit_price = 2**128 - 1 if is_buy else 1
+        
+        return is_buy, in_base_qty, amount_in_wei, limit_price
+
+    def _format_swap_impact(
+        self,
+        from_token: str,
+        to_token: str,
+        amount: Decimal,
+        base_addr: str,
+        is_reversed: bool,
+        result: Any,
+        current_price: Decimal
+    ) -> Dict[str, Any]:
+        """Output amount and price impact from a calcImpact result"""
+        base_flow, quote_flow, final_price = result
+        
+        # Determine the output amount (negative flow means received by user)
+        if self._pays_base(from_token, base_addr):
+            output_amount = abs(quote_flow) / (10 ** self.DECIMALS.get(to_token, 18))
+        else:
+            output_amount = abs(base_flow) / (10 ** self.DECIMALS.get(to_token, 18))
+            
+        final_sqrt_price = Decimal(final_price) / Decimal(2**64)
+        final_actual_price = final_sqrt_price * final_sqrt_price
+        
+        if is_reversed:
+            if final_actual_price == 0:
+                price_impact = 0
+            else:
+                final_actual_price = Decimal("1") / final_actual_price
+                
+        price_impact = abs((final_actual_price - current_price) / current_price)
+        
+        return {
+            "input_amount": float(amount),
+            "output_amount": float(output_amount),
+            "price_impact": float(price_impact),
+            "from_token": from_token,
+            "to_token": to_token
+        }
+
+    def _fallback_swap_impact(self, from_token: str, to_token: str, amount: Decimal, price: Decimal) -> Dict[str, Any]:
+        return {
+            "input_amount": float(amount),
+            "output_amount": float(amount) * float(price),
+            "price_impact": 0.01,  # 1% fallback slippage
+            "from_token": from_token,
+            "to_token": to_token
+        }
 
     def get_pool_liquidity(self, token1: str, token2: str) -> Dict[str, Any]:
         """Get liquidity information for a pool"""
@@ -307,7 +627,8 @@ class AmbientService:
                     quote_addr,
                     self.DEFAULT_POOL_IDX
                 ).call,
-                0
+                0,
+                block_identifier=block_identifier()
             )
             
             # Get the current price
@@ -326,50 +647,264 @@ class AmbientService:
                 "price": float(self.get_pool_price(token1, token2))
             }
 
-    def get_market_data(self) -> Dict[str, Any]:
-        """Get comprehensive market data from Ambient on Scroll"""
+    def get_market_data(self, pairs: Optional[List[Tuple[str, str]]] = None) -> Dict[str, Any]:
+        """Get comprehensive market data from Ambient on Scroll
+        
+        Every pool's price, liquidity and curve tick are read in one batch, and
+        a pool listed twice (e.g. ETH-USDC and USDC-ETH) is read once.
+        
+        Args:
+            pairs: Token pairs to report (defaults to MARKET_PAIRS)
+        """
+        pairs = self.MARKET_PAIRS if pairs is None else pairs
+        if not self.w3:
+            return self._build_market_data(pairs, {}, [])
+        
+        try:
+            pools, calls = self._market_data_calls(pairs)
+            results = self.multicall.aggregate(calls)
+        except Exception as e:
+            print(f"Error reading Ambient pools: {e}")
+            pools, results = {}, []
+        return self._build_market_data(pairs, pools, results)
+
+    def _market_data_calls(self, pairs: List[Tuple[str, str]]) -> Tuple[Dict[Tuple[str, str], int], List[Any]]:
+        """POOL_READS for each distinct pool, with each pool's position in the batch"""
+        pools, calls = {}, []
+        for token1, token2 in pairs:
+            try:
+                base_addr, quote_addr, _ = self.get_token_pair(token1, token2)
+            except ValueError as e:
+                print(f"Skipping Ambient pair {token1}-{token2}: {e}")
+                continue
+            if (base_addr, quote_addr) in pools:
+                continue
+            pools[(base_addr, quote_addr)] = len(pools)
+            calls.extend(
+                getattr(self.query.functions, read)(base_addr, quote_addr, self.DEFAULT_POOL_IDX)
+                for read in self.POOL_READS
+            )
+        return pools, calls
+
+    def _build_market_data(
+        self,
+        pairs: List[Tuple[str, str]],
+        pools: Dict[Tuple[str, str], int],
+        results: List[Optional[Any]]
+    ) -> Dict[str, Any]:
+        """Market data from the batched pool reads; pairs without them get fallback entries"""
         market_data = {
             "dex": "Ambient",
             "pools": {},
             "swap_fees": 0.003  # 0.3% standard fee
         }
         
-        # Get data for key token pairs
-        pairs = [
-            ("ETH", "USDC"),
-            ("ETH", "SRC"),
-            ("USDC", "SRC")
-        ]
-        
         for token1, token2 in pairs:
+            pair_key = f"{token1}-{token2}"
             try:
-                price = self.get_pool_price(token1, token2)
-                liquidity_data = self.get_pool_liquidity(token1, token2)
-                
-                pair_key = f"{token1}-{token2}"
-                market_data["pools"][pair_key] = {
-                    "price": float(price),
-                    "total_liquidity": float(liquidity_data["total_liquidity"]),
-                    "volume_24h": 1000000,  # Placeholder - would need external API for this
-                    "fee": 0.003,  # 0.3% standard fee
-                }
+                base_addr, quote_addr, is_reversed = self.get_token_pair(token1, token2)
+                start = pools[(base_addr, quote_addr)] * len(self.POOL_READS)
+                raw_price, liquidity, curve_tick = results[start:start + len(self.POOL_READS)]
+                if raw_price is None:
+                    raise ValueError("queryPrice failed")
+                price = self._price_from_sqrt(raw_price, is_reversed)
+                market_data["pools"][pair_key] = self._pool_entry(price, {"total_liquidity": liquidity or 0}, curve_tick)
             except Exception as e:
                 print(f"Error getting market data for {token1}-{token2}: {e}")
                 # Add fallback data
-                pair_key = f"{token1}-{token2}"
-                fallback_price = 1.0
-                if token1 == "ETH" and token2 == "USDC":
-                    fallback_price = 2000.0
-                elif token1 == "ETH" and token2 == "SRC":
-                    fallback_price = 0.005
-                elif token1 == "USDC" and token2 == "SRC":
-                    fallback_price = 0.01
-                    
-                market_data["pools"][pair_key] = {
-                    "price": fallback_price,
-                    "total_liquidity": 1000000,
-                    "volume_24h": 1000000,
-                    "fee": 0.003
-                }
-        
-        return market_data
\ No newline at end of file
+                market_data["pools"][pair_key] = self._fallback_pool_entry(token1, token2)
+        
+        return market_data
+
+    def _pool_entry(self, price: Decimal, liquidity_data: Dict[str, Any], curve_tick: Optional[int] = None) -> Dict[str, Any]:
+        return {
+            "price": float(price),
+            "total_liquidity": float(liquidity_data["total_liquidity"]),
+            "curve_tick": curve_tick,
+            "volume_24h": 1000000,  # Placeholder - would need external API for this
+            "fee": 0.003,  # 0.3% standard fee
+        }
+
+    def _fallback_pool_entry(self, token1: str, token2: str) -> Dict[str, Any]:
+        return {
+            "price": float(self._fallback_price(token1, token2)),
+            "total_liquidity": 1000000,
+            "curve_tick": None,
+            "volume_24h": 1000000,
+            "fee": 0.003
+        }
+
+class AsyncAmbientService(AmbientService):
+    """AmbientService on AsyncWeb3: the same public methods and return shapes, as coroutines
+
+    Construction does no I/O; the connection is checked on first use, and a
+    failed check drops w3 so reads fall back (and the registry rebuilds it)
+    exactly as when the sync service can't connect. Independent reads, such as
+    the impact simulation and pool price, are awaited concurrently.
+    """
+
+    def __init__(self, price_service: Optional[PriceService] = None):
+        self._curves: Dict[Tuple[str, str], CurveState] = {}
+        self.price_service = price_service
+        self.w3 = rpc_provider_factory.async_web3(self.SCROLL_RPC_URL)
+        self.multicall = AsyncMulticall(self.w3)
+        self._bind_contracts()
+        self._connection_check = AsyncOnce()
+
+    async def _ensure_connected(self):
+        """Check the connection on first use, dropping w3 if the node is unreachable"""
+        if self.w3 is not None:
+            await self._connection_check.run(self._check_connection)
+
+    async def _check_connection(self):
+        if await self.w3.is_connected():
+            print(f"Connected to {self.SCROLL_RPC_URL}")
+        else:
+            print(f"Failed to connect to {self.SCROLL_RPC_URL}")
+            self.w3 = None
+
+    async def safely_call_contract(self, contract_method, fallback_value=None, *args, **kwargs):
+        """Safely await a contract method with fallback value on error"""
+        try:
+            return await contract_method(*args, **kwargs)
+        except Exception as e:
+            print(f"Error calling contract method {contract_method.__name__ if hasattr(contract_method, '__name__') else 'unknown'}: {e}")
+            return fallback_value
+
+    async def get_pool_price(self, token1: str, token2: str) -> Decimal:
+        """Get the current price between two tokens from Ambient"""
+        await self._ensure_connected()
+        if not self.w3:
+            return self._fallback_price(token1, token2)
+            
+        try:
+            base_addr, quote_addr, is_reversed = self.get_token_pair(token1, token2)
+            raw_price = await self.safely_call_contract(
+                self.query.functions.queryPrice(base_addr, quote_addr, self.DEFAULT_POOL_IDX).call,
+                0,
+                block_identifier=block_identifier()
+            )
+            return self._price_from_sqrt(raw_price, is_reversed)
+        except Exception as e:
+            print(f"Error getting pool price: {e}")
+            return self._fallback_price(token1, token2)
+
+    async def calculate_swap_impact(self, from_token: str, to_token: str, amount: Decimal) -> Dict[str, Any]:
+        """Calculate the impact of swapping a certain amount of tokens"""
+        await self._ensure_connected()
+        if not self.w3:
+            return self._fallback_swap_impact(from_token, to_token, amount, await self.get_pool_price(from_token, to_token))
+        
+        if AMBIENT_LOCAL_IMPACT:
+            try:
+                return await self.simulate_swap_impact(from_token, to_token, amount)
+            except Exception as e:
+                print(f"Error simulating swap impact, asking CrocImpact: {e}")
+            
+        try:
+            base_addr, quote_addr, is_reversed = self.get_token_pair(from_token, to_token)
+            impact_call = self._impact_call(from_token, to_token, amount, base_addr, quote_addr, is_reversed)
+            
+            # The impact simulation and the current price don't depend on each other
+            result, current_price = await asyncio.gather(
+                self.safely_call_contract(impact_call.call, (0, 0, 0), block_identifier=block_identifier()),
+                self.get_pool_price(from_token, to_token)
+            )
+            
+            return self._format_swap_impact(from_token, to_token, amount, base_addr, is_reversed, result, current_price)
+        except Exception as e:
+            print(f"Error calculating swap impact: {e}")
+            return self._fallback_swap_impact(from_token, to_token, amount, await self.get_pool_price(from_token, to_token))
+
+    async def simulate_swap_impact(self, from_token: str, to_token: str, amount: Decimal) -> Dict[str, Any]:
+        """calculate_swap_impact computed locally from the pool's curve"""
+        return self._simulate(await self.get_curve_state(from_token, to_token), from_token, to_token, amount)
+
+    async def calculate_swap_impact_ladder(self, from_token: str, to_token: str, amounts: Sequence[Decimal]) -> Dict[str, Any]:
+        """Output amount and price impact for many sizes of the same swap, in one pass over the curve"""
+        await self._ensure_connected()
+        if self.w3 and AMBIENT_LOCAL_IMPACT:
+            try:
+                return await self.simulate_swap_impact_ladder(from_token, to_token, amounts)
+            except Exception as e:
+                print(f"Error simulating swap impact ladder, quoting each amount: {e}")
+        
+        quotes = await asyncio.gather(*(self.calculate_swap_impact(from_token, to_token, amount) for amount in amounts))
+        return self._ladder_from_quotes(from_token, to_token, amounts, list(quotes))
+
+    async def simulate_swap_impact_ladder(self, from_token: str, to_token: str, amounts: Sequence[Decimal]) -> Dict[str, Any]:
+        """calculate_swap_impact_ladder computed locally from the pool's curve"""
+        return self._simulate_ladder(await self.get_curve_state(from_token, to_token), from_token, to_token, amounts)
+
+    async def get_curve_state(self, token1: str, token2: str) -> CurveState:
+        """The pool's curve at the pinned block (or within AMBIENT_CURVE_TTL_SECONDS), read in two batches"""
+        return self._one_curve(await self.get_curve_states([(token1, token2)]), token1, token2)
+
+    async def get_curve_states(self, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], CurveState]:
+        """Curves for several pools by (base, quote) address, seeding every missing one in the same two batches"""
+        states, pools = self._cached_curves(pairs)
+        if pools:
+            results = await self.multicall.aggregate(self._seed_calls(pools))
+            seeds, calls = self._level_seed_calls(pools, results)
+            levels = await self.multicall.aggregate(calls) if calls else []
+            states.update(self._store_curves(seeds, levels))
+        return states
+
+    async def find_swap_route(self, from_token: str, to_token: str, amount: Decimal, max_hops: Optional[int] = None) -> Dict[str, Any]:
+        """Find the best way to swap through the known pools, quoted on the local curves"""
+        await self._ensure_connected()
+        router = self._router(max_hops)
+        if self.w3:
+            try:
+                routes = router.routes(from_token, to_token)
+                states = await self.get_curve_states(router.pairs_on(routes))
+                return router.best_route(from_token, to_token, amount, states, routes)
+            except Exception as e:
+                print(f"Error finding a swap route, quoting the direct pair: {e}")
+        
+        return self._direct_route(await self.calculate_swap_impact(from_token, to_token, amount))
+
+    async def get_pool_liquidity(self, token1: str, token2: str) -> Dict[str, Any]:
+        """Get liquidity information for a pool"""
+        await self._ensure_connected()
+        if not self.w3:
+            return {
+                "total_liquidity": 1000000,
+                "price": float(await self.get_pool_price(token1, token2))
+            }
+            
+        try:
+            base_addr, quote_addr, is_reversed = self.get_token_pair(token1, token2)
+            liquidity, price = await asyncio.gather(
+                self.safely_call_contract(
+                    self.query.functions.queryLiquidity(base_addr, quote_addr, self.DEFAULT_POOL_IDX).call,
+                    0,
+                    block_identifier=block_identifier()
+                ),
+                self.get_pool_price(token1, token2)
+            )
+            return {
+                "total_liquidity": liquidity,
+                "price": float(price)
+            }
+        except Exception as e:
+            print(f"Error getting pool liquidity: {e}")
+            return {
+                "total_liquidity": 1000000,
+                "price": float(await self.get_pool_price(token1, token2))
+            }
+
+    async def get_market_data(self, pairs: Optional[List[Tuple[str, str]]] = None) -> Dict[str, Any]:
+        """Get comprehensive market data from Ambient on Scroll, every pool in one batch"""
+        pairs = self.MARKET_PAIRS if pairs is None else pairs
+        await self._ensure_connected()
+        if not self.w3:
+            return self._build_market_data(pairs, {}, [])
+        
+        try:
+            pools, calls = self._market_data_calls(pairs)
+            results = await self.multicall.aggregate(calls)
+        except Exception as e:
+            print(f"Error reading Ambient pools: {e}")
+            pools, results = {}, []
+        return self._build_market_data(pairs, pools, results)
@@ -0,0 +1,30 @@
+# ai/services/block_context.py
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, Union
+
+# Block every contract read in the current request is pinned to (None reads "latest")
+_pinned_block: ContextVar[Optional[int]] = ContextVar("pinned_block", default=None)
+
+def pinned_block() -> Optional[int]:
+    """The block reads are pinned to, or None when they follow the chain head"""
+    return _pinned_block.get()
+
+def block_identifier() -> Union[int, str]:
+    """block_identifier for eth_call: the pinned block, else "latest" """
+    block = _pinned_block.get()
+    return block if block is not None else "latest"
+
+@contextmanager
+def read_at_block(block_number: Optional[int]) -> Iterator[Optional[int]]:
+    """Pin every service read inside the block to block_number
+
+    The pin is a context variable, so it follows the request into asyncio
+    tasks it starts. Worker threads need the context copied in explicitly
+    (contextvars.copy_context().run). A None block_number leaves reads unpinned.
+    """
+    token = _pinned_block.set(block_number)
+    try:
+        yield block_number
+    finally:
+        _pinned_block.reset(token)
@@ -0,0 +1,183 @@
+# ai/services/circuit_breaker.py
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Wrap every RPC provider in a circuit breaker (set to "false" to always wait on the node)
+RPC_BREAKER_ENABLED = os.getenv("RPC_BREAKER_ENABLED", "true").lower() == "true"
+
+# Consecutive failed (or slow) requests that open the circuit
+RPC_BREAKER_FAILURES = int(os.getenv("RPC_BREAKER_FAILURES", "5"))
+
+# Seconds after which a request that did succeed still counts as a failure
+RPC_BREAKER_SLOW_SECONDS = float(os.getenv("RPC_BREAKER_SLOW_SECONDS", "5"))
+
+# Seconds the circuit stays open before a background probe checks the node
+RPC_BREAKER_COOLDOWN_SECONDS = float(os.getenv("RPC_BREAKER_COOLDOWN_SECONDS", "10"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of sending a request while the circuit is open
+
+    A ConnectionError, so web3's is_connected() reports False and the
+    services' existing except blocks fall back as if the node were down.
+    """
+
+class CircuitBreaker:
+    """Fails requests to an RPC endpoint fast once it stops answering
+
+    Closed, requests go through. After failure_threshold consecutive
+    failures, counting requests slower than slow_call_seconds, the circuit
+    opens: every request raises CircuitOpenError at once instead of waiting
+    out the HTTP timeout. After cooldown the circuit is half-open and probe
+    runs in a background thread (requests keep failing fast meanwhile); if it
+    succeeds the circuit closes, otherwise it opens for another cooldown.
+    Without a probe, the first request after the cooldown is let through as
+    the probe.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        probe: Optional[Callable[[], Any]] = None,
+        failure_threshold: int = RPC_BREAKER_FAILURES,
+        slow_call_seconds: float = RPC_BREAKER_SLOW_SECONDS,
+        cooldown: float = RPC_BREAKER_COOLDOWN_SECONDS
+    ):
+        """
+        Args:
+            name: What the breaker guards, for logs and stats (the endpoint URI)
+            probe: Sends one cheap request straight to the endpoint, raising on failure
+            failure_threshold: Consecutive failures that open the circuit
+            slow_call_seconds: Latency past which a request counts as failed
+            cooldown: Seconds between opening and probing
+        """
+        self.name = name
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """True while requests are being failed fast"""
+        return self.state != CLOSED
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a request may be sent now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                if self.probe is None:
+                    # This request is the probe
+                    self._probing = True
+                    return
+                self._start_probe()
+            self.rejected += 1
+        raise CircuitOpenError(f"RPC circuit for {self.name} is open, not sending request")
+
+    def record_success(self, latency: float = 0.0):
+        """A request came back; slow ones still count toward opening the circuit"""
+        if latency >= self.slow_call_seconds:
+            self.record_failure(f"took {latency:.2f}s")
+            return
+        with self._lock:
+            self.failures = 0
+            if self.state != CLOSED:
+                self._close()
+
+    def record_failure(self, reason: Any = None):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN and self._probing and self.probe is None:
+                self._probing = False
+                self._open(reason)
+            elif self.state == CLOSED and self.failures >= self.failure_threshold:
+                self._open(reason)
+
+    def call(self, func: Callable[[], Any]) -> Any:
+        """Run func through the breaker"""
+        self.before_call()
+        started = time.monotonic()
+        try:
+            result = func()
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success(time.monotonic() - started)
+        return result
+
+    async def acall(self, func: Callable[[], Any]) -> Any:
+        """call for a coroutine function"""
+        self.before_call()
+        started = time.monotonic()
+        try:
+            result = await func()
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success(time.monotonic() - started)
+        return result
+
+    def describe(self) -> Dict[str, Any]:
+        """State and counters, for the RPC stats endpoint"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected_requests": self.rejected,
+            "open_for_seconds": round(time.monotonic() - self.opened_at, 3) if self.is_open else None
+        }
+
+    def _open(self, reason: Any):
+        # Called with the lock held
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        print(f"Opening RPC circuit for {self.name} after {self.failures} failures ({reason})")
+
+    def _close(self):
+        # Called with the lock held
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        print(f"RPC circuit for {self.name} closed")
+
+    def _start_probe(self):
+        # Called with the lock held
+        if self._probing:
+            return
+        self._probing = True
+        threading.Thread(target=self._run_probe, name="rpc-breaker-probe", daemon=True).start()
+
+    def _run_probe(self):
+        started = time.monotonic()
+        try:
+            self.probe()
+        except Exception as e:
+            latency = None
+            reason = e
+        else:
+            latency = time.monotonic() - started
+            reason = f"probe took {latency:.2f}s"
+
+        with self._lock:
+            self._probing = False
+            if latency is not None and latency < self.slow_call_seconds:
+                self._close()
+            else:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                print(f"RPC circuit for {self.name} stays open ({reason})")
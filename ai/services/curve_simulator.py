@@ -0,0 +1,271 @@
+# ai/services/curve_simulator.py
+import bisect
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# CrocSwap range orders are counted in lots of 1024 units of liquidity
+LOT_SIZE = 1024
+
+# Each tick moves the price (base per quote) by one basis point
+TICK_BASE = 1.0001
+
+def tick_sqrt_price(tick: int) -> float:
+    """Square root of the price at a tick"""
+    return TICK_BASE ** (tick / 2)
+
+def sqrt_price_tick(sqrt_price: float) -> int:
+    """The tick a square root price falls in"""
+    return math.floor(math.log(sqrt_price * sqrt_price) / math.log(TICK_BASE))
+
+@dataclass(frozen=True)
+class CurveState:
+    """One pool's curve at one block, in raw token units
+
+    Follows CrocSwap's curve: with liquidity L and sqrt_price s = sqrt(base /
+    quote), the virtual reserves are L * s of base and L / s of quote. Each
+    entry in ticks/net_liquidity is a tick with range orders on it, and the
+    liquidity added to the curve when the price crosses it going up (taken
+    off going down).
+    """
+    sqrt_price: float
+    liquidity: float
+    tick: int
+    ticks: Tuple[int, ...] = ()
+    net_liquidity: Tuple[float, ...] = ()
+    block_number: Optional[int] = None
+    seeded_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_pool(
+        cls,
+        raw_sqrt_price: int,
+        liquidity: int,
+        curve_tick: Optional[int],
+        levels: Dict[int, Tuple[int, int]],
+        block_number: Optional[int] = None
+    ) -> "CurveState":
+        """Build from queryPrice (Q64.64), queryLiquidity, queryCurveTick and queryLevel (bidLots, askLots) reads"""
+        sqrt_price = raw_sqrt_price / 2**64
+        ticks = tuple(sorted(tick for tick, (bid_lots, ask_lots) in levels.items() if bid_lots or ask_lots))
+        return cls(
+            sqrt_price=sqrt_price,
+            liquidity=float(liquidity),
+            tick=curve_tick if curve_tick is not None else sqrt_price_tick(sqrt_price),
+            ticks=ticks,
+            net_liquidity=tuple(float((levels[tick][0] - levels[tick][1]) * LOT_SIZE) for tick in ticks),
+            block_number=block_number
+        )
+
+    @property
+    def age(self) -> float:
+        return max(0.0, time.time() - self.seeded_at)
+
+class CurveSimulator:
+    """Quotes swaps against a CurveState with CrocImpact.calcImpact's inputs and outputs
+
+    A quote walks the curve between the ticks with range orders on them,
+    solving each constant-liquidity segment in closed form, so it costs a few
+    float operations per crossed tick and no RPC. Beyond the outermost tick
+    levels read into the state, liquidity is assumed constant. The limit
+    price is not enforced; every quote runs to the full quantity, like the
+    unlimited limit prices the service passes to calcImpact.
+    """
+
+    def __init__(self, state: CurveState, fee_rate: float = 0.0):
+        """
+        Args:
+            state: The pool's curve
+            fee_rate: Fraction of the input kept by the pool as its fee
+        """
+        self.state = state
+        self.fee_rate = fee_rate
+
+    def calc_impact(self, is_buy: bool, in_base_qty: bool, qty: int) -> Tuple[int, int, int]:
+        """Simulate a swap like CrocImpact.calcImpact
+
+        Args:
+            is_buy: True to pay base and receive quote (the price rises)
+            in_base_qty: Whether qty is denominated in base (else quote)
+            qty: Raw amount of the input token, or of the output token when
+                qty is denominated in the token received
+
+        Returns:
+            (base_flow, quote_flow, final sqrt price in Q64.64); flows are
+            positive when paid by the user and negative when received
+
+        Raises:
+            ValueError: If the curve runs out of liquidity before the swap is filled
+        """
+        fixed_input = in_base_qty == is_buy
+        remaining = float(qty) * (1 - self.fee_rate) if fixed_input else float(qty)
+        paid, received, sqrt_price = self._walk(is_buy, fixed_input, remaining)
+        if not fixed_input:
+            paid /= 1 - self.fee_rate
+        else:
+            paid = float(qty)
+
+        paid_flow, received_flow = int(round(paid)), -int(round(received))
+        base_flow, quote_flow = (paid_flow, received_flow) if is_buy else (received_flow, paid_flow)
+        return base_flow, quote_flow, int(sqrt_price * 2**64)
+
+    def calc_impact_ladder(self, is_buy: bool, in_base_qty: bool, qtys: Sequence[float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """calc_impact for many quantities in one vectorized pass
+
+        The curve in the swap's direction is laid out once as segments of
+        constant liquidity; each quantity is located on it with a
+        searchsorted and solved in closed form, all as array operations.
+
+        Args:
+            is_buy: True to pay base and receive quote (the price rises)
+            in_base_qty: Whether the quantities are denominated in base (else quote)
+            qtys: Raw amounts, as for calc_impact
+
+        Returns:
+            (base_flows, quote_flows, final sqrt prices in Q64.64) as float
+            arrays, signed like calc_impact. Quantities the curve can't fill
+            are NaN in all three.
+        """
+        fixed_input = in_base_qty == is_buy
+        qtys = np.asarray(qtys, dtype=float)
+        remaining = qtys * (1 - self.fee_rate) if fixed_input else qtys
+        starts, ends, liquidity = self._segments(is_buy)
+
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            # Empty stretches move the price for free
+            seg_base = np.where(liquidity > 0, liquidity * np.abs(ends - starts), 0.0)
+            seg_quote = np.where(liquidity > 0, liquidity * np.abs(1 / ends - 1 / starts), 0.0)
+            seg_paid, seg_received = (seg_base, seg_quote) if is_buy else (seg_quote, seg_base)
+            budget = seg_paid if fixed_input else seg_received
+
+            # Totals at the start of each segment (the last one's can be infinite)
+            budget_start = np.concatenate(([0.0], np.cumsum(budget)[:-1]))
+            paid_start = np.concatenate(([0.0], np.cumsum(seg_paid)[:-1]))
+            received_start = np.concatenate(([0.0], np.cumsum(seg_received)[:-1]))
+            budget_end = budget_start + budget
+
+            index = np.searchsorted(budget_end, remaining, side="left")
+            fillable = (index < len(budget)) & (remaining >= 0)
+            index = np.minimum(index, len(budget) - 1)
+
+            s0, seg_liquidity = starts[index], liquidity[index]
+            left = remaining - budget_start[index]
+            if is_buy:
+                end = s0 + left / seg_liquidity if fixed_input else 1 / (1 / s0 - left / seg_liquidity)
+            else:
+                end = 1 / (1 / s0 + left / seg_liquidity) if fixed_input else s0 - left / seg_liquidity
+            # Nothing left to move once the quantity is used up at a segment's start
+            end = np.where(left > 0, end, s0)
+
+            base = seg_liquidity * np.abs(end - s0)
+            quote = seg_liquidity * np.abs(1 / end - 1 / s0)
+            base, quote = np.where(left > 0, base, 0.0), np.where(left > 0, quote, 0.0)
+            paid = paid_start[index] + (base if is_buy else quote)
+            received = received_start[index] + (quote if is_buy else base)
+
+        paid = qtys if fixed_input else paid / (1 - self.fee_rate)
+        paid = np.where(fillable, np.round(paid), np.nan)
+        received = np.where(fillable, -np.round(received), np.nan)
+        final = np.where(fillable, end * 2**64, np.nan)
+        return (paid, received, final) if is_buy else (received, paid, final)
+
+    def _segments(self, upward: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(start, end, liquidity) of each constant-liquidity stretch from the current price
+
+        The last stretch runs to an infinite price going up, or zero going down.
+        """
+        state = self.state
+        if upward:
+            index = bisect.bisect_right(state.ticks, state.tick)
+            crossings = range(index, len(state.ticks))
+        else:
+            index = bisect.bisect_right(state.ticks, state.tick) - 1
+            crossings = range(index, -1, -1)
+        step = 1 if upward else -1
+
+        starts, ends, liquidity = [state.sqrt_price], [], [state.liquidity]
+        for i in crossings:
+            boundary = tick_sqrt_price(state.ticks[i])
+            ends.append(boundary)
+            starts.append(boundary)
+            liquidity.append(liquidity[-1] + state.net_liquidity[i] * step)
+        ends.append(math.inf if upward else 0.0)
+
+        liquidity = np.maximum(np.array(liquidity), 0.0)
+        return np.array(starts), np.array(ends), liquidity
+
+    def _walk(self, upward: bool, fixed_input: bool, remaining: float) -> Tuple[float, float, float]:
+        """Move the price until remaining input is spent (or output received)
+
+        Going up base is paid in and quote comes out; going down, the reverse.
+        """
+        state = self.state
+        s, liquidity = state.sqrt_price, state.liquidity
+        paid = received = 0.0
+
+        if upward:
+            index = bisect.bisect_right(state.ticks, state.tick)
+            step = 1
+        else:
+            index = bisect.bisect_right(state.ticks, state.tick) - 1
+            step = -1
+
+        while remaining > 0:
+            boundary = None
+            if 0 <= index < len(state.ticks):
+                boundary = tick_sqrt_price(state.ticks[index])
+
+            if liquidity <= 0:
+                # Empty stretch of the curve: jump to where liquidity starts again
+                if boundary is None:
+                    raise ValueError("Not enough liquidity on the curve for the swap")
+                s = boundary
+                liquidity += state.net_liquidity[index] * step
+                index += step
+                continue
+
+            target = self._segment_end(s, liquidity, upward, fixed_input, remaining)
+            if boundary is not None and (target >= boundary if upward else target <= boundary):
+                target = boundary
+                crossed = True
+            elif target in (0.0, math.inf):
+                raise ValueError("Not enough liquidity on the curve for the requested output")
+            else:
+                crossed = False
+
+            segment_paid, segment_received = self._segment_flows(s, target, liquidity, upward)
+            paid += segment_paid
+            received += segment_received
+            remaining = 0.0 if not crossed else remaining - (segment_paid if fixed_input else segment_received)
+            s = target
+
+            if crossed:
+                liquidity += state.net_liquidity[index] * step
+                index += step
+
+        return paid, received, s
+
+    def _segment_end(self, s: float, liquidity: float, upward: bool, fixed_input: bool, remaining: float) -> float:
+        """Sqrt price where remaining is used up at constant liquidity"""
+        if upward:
+            if fixed_input:
+                return s + remaining / liquidity  # base paid = L * (s1 - s0)
+            inverse = 1 / s - remaining / liquidity  # quote out = L * (1/s0 - 1/s1)
+            return 1 / inverse if inverse > 0 else math.inf
+        if fixed_input:
+            return 1 / (1 / s + remaining / liquidity)  # quote paid = L * (1/s1 - 1/s0)
+        return max(s - remaining / liquidity, 0.0)  # base out = L * (s0 - s1)
+
+    def _segment_flows(self, s0: float, s1: float, liquidity: float, upward: bool) -> Tuple[float, float]:
+        """(paid, received) moving the sqrt price from s0 to s1"""
+        base = liquidity * abs(s1 - s0)
+        quote = liquidity * abs(1 / s1 - 1 / s0) if s1 > 0 else math.inf
+        return (base, quote) if upward else (quote, base)
+
+def level_ticks(curve_tick: int, spacing: int, window: int) -> List[int]:
+    """Tick levels to read around the current tick: window grid points each side"""
+    center = curve_tick - curve_tick % spacing
+    return [center + spacing * offset for offset in range(-window, window + 1)]
@@ -0,0 +1,207 @@
+# ai/services/market_refresher.py
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from web3 import AsyncWeb3, WebSocketProvider
+
+from .block_context import pinned_block, read_at_block
+from .snapshot_cache import Snapshot, SnapshotCache
+
+# Set to "false" to keep fetching market data lazily inside requests
+MARKET_REFRESH_ENABLED = os.getenv("MARKET_REFRESH_ENABLED", "true").lower() == "true"
+
+# Seconds between eth_blockNumber polls when not following new heads over a websocket
+MARKET_REFRESH_POLL_SECONDS = float(os.getenv("MARKET_REFRESH_POLL_SECONDS", "1"))
+
+# Websocket endpoint to subscribe to new heads on instead of polling (optional)
+MARKET_REFRESH_WS_URI = os.getenv("WEB3_WS_PROVIDER_URI")
+
+# Seconds without a successful head check after which published data isn't served
+MARKET_REFRESH_MAX_LAG_SECONDS = float(os.getenv("MARKET_REFRESH_MAX_LAG_SECONDS", "15"))
+
+# Seconds to wait before retrying after the head check or subscription fails
+MARKET_REFRESH_RETRY_SECONDS = 5.0
+
+@dataclass(frozen=True)
+class MarketState:
+    """Every provider's snapshot at one block, published as a unit"""
+    block_number: Optional[int]
+    snapshots: Dict[str, Snapshot]
+    checked_at: float = field(default_factory=time.time)
+
+class MarketRefresher:
+    """Refreshes provider market snapshots in the background as new blocks arrive
+
+    Polls the head (or follows newHeads when a websocket URI is given) and,
+    whenever the block advances, reads every provider at that block in
+    parallel. The results go into the snapshot cache and are published
+    together as one MarketState by swapping a single reference, so a reader
+    never sees providers from different refreshes.
+
+    A provider whose read fails or fails validation keeps its previous
+    snapshot. If the refresher stops checking the head for longer than
+    max_lag, snapshot() returns None and callers fall back to the cache.
+    """
+
+    def __init__(
+        self,
+        cache: SnapshotCache,
+        services: Callable[[str], Any],
+        providers: Iterable[str] = ("aave", "ambient", "quill"),
+        validators: Optional[Dict[str, Callable[[Dict[str, Any]], bool]]] = None,
+        poll_interval: float = MARKET_REFRESH_POLL_SECONDS,
+        ws_uri: Optional[str] = MARKET_REFRESH_WS_URI,
+        max_lag: float = MARKET_REFRESH_MAX_LAG_SECONDS,
+        on_failure: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Args:
+            cache: Snapshot cache the refreshed data is also stored in
+            services: Returns the async service for a provider name
+            providers: Providers to refresh; the first one's w3 is polled for the head
+            validators: Per-provider checks for degraded data, as for SnapshotCache.get
+            poll_interval: Seconds between head polls
+            ws_uri: Websocket endpoint to follow newHeads on instead of polling
+            max_lag: Seconds after the last head check that published data is still served
+            on_failure: Called with the provider name when its refresh fails
+        """
+        self.cache = cache
+        self.services = services
+        self.providers = tuple(providers)
+        self.validators = validators or {}
+        self.poll_interval = poll_interval
+        self.ws_uri = ws_uri
+        self.max_lag = max_lag
+        self.on_failure = on_failure
+        self._state: Optional[MarketState] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def state(self) -> Optional[MarketState]:
+        return self._state
+
+    def is_current(self) -> bool:
+        """Whether the head was checked recently enough to serve the published state"""
+        state = self._state
+        return state is not None and time.time() - state.checked_at < self.max_lag
+
+    def current_block(self) -> Optional[int]:
+        """Block of the published state, or None if there is none or it's lagging"""
+        return self._state.block_number if self.is_current() else None
+
+    def snapshot(self, provider: str) -> Optional[Snapshot]:
+        """The provider's published snapshot, with no RPC
+
+        None if nothing is published, the refresher is lagging, or the caller
+        has pinned a block the snapshot wasn't read at (a provider whose last
+        refresh failed keeps its snapshot from an earlier block).
+        """
+        state = self._state
+        if state is None or not self.is_current():
+            return None
+        snapshot = state.snapshots.get(provider)
+        pinned = pinned_block()
+        if snapshot is not None and pinned is not None and pinned != snapshot.block_number:
+            return None
+        return snapshot
+
+    def start(self):
+        """Start refreshing on the running event loop (called from the app lifespan hook)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run(), name="market-refresher")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self):
+        """Follow the chain until cancelled, recovering from RPC errors"""
+        while True:
+            try:
+                if self.ws_uri:
+                    await self._follow_new_heads()
+                else:
+                    await self._poll_head()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Market refresher error, retrying in {MARKET_REFRESH_RETRY_SECONDS}s: {e}")
+                await asyncio.sleep(MARKET_REFRESH_RETRY_SECONDS)
+
+    async def _poll_head(self):
+        while True:
+            await self.on_block(await self._head())
+            await asyncio.sleep(self.poll_interval)
+
+    async def _follow_new_heads(self):
+        async with AsyncWeb3(WebSocketProvider(self.ws_uri)) as w3:
+            await w3.eth.subscribe("newHeads")
+            print(f"Following new heads on {self.ws_uri}")
+            # Catch up before the first head arrives
+            await self.on_block(await self._head())
+            async for message in w3.socket.process_subscriptions():
+                await self.on_block(int(message["result"]["number"]))
+
+    async def _head(self) -> int:
+        service = self.services(self.providers[0])
+        if service is None or service.w3 is None:
+            raise ConnectionError(f"{self.providers[0]} service is not connected")
+        return await service.w3.eth.block_number
+
+    async def on_block(self, block_number: int):
+        """Refresh if the block advanced, otherwise just record that the state is still current"""
+        state = self._state
+        if state is not None and state.block_number is not None and block_number <= state.block_number:
+            self._state = replace(state, checked_at=time.time())
+            return
+        await self.refresh(block_number)
+
+    async def refresh(self, block_number: Optional[int]) -> MarketState:
+        """Read every provider at block_number and publish the results together"""
+        results = await asyncio.gather(
+            *(self._fetch(provider, block_number) for provider in self.providers),
+            return_exceptions=True
+        )
+
+        previous = self._state.snapshots if self._state is not None else {}
+        snapshots = {}
+        for provider, result in zip(self.providers, results):
+            if isinstance(result, BaseException):
+                print(f"Error refreshing {provider} at block {block_number}: {result}")
+                if self.on_failure:
+                    self.on_failure(provider)
+                result = None
+            if result is not None:
+                snapshots[provider] = self.cache.put(provider, result, block_number)
+            elif provider in previous:
+                snapshots[provider] = previous[provider]
+            else:
+                # Nothing better published yet: the cache's last good snapshot, if any
+                latest = self.cache.latest(provider)
+                if latest is not None:
+                    snapshots[provider] = latest
+
+        state = MarketState(block_number=block_number, snapshots=snapshots)
+        self._state = state
+        return state
+
+    async def _fetch(self, provider: str, block_number: Optional[int]) -> Optional[Dict[str, Any]]:
+        """Provider market data at block_number, or None if it failed validation"""
+        service = self.services(provider)
+        if service is None:
+            raise ConnectionError(f"{provider} service is not available")
+        with read_at_block(block_number):
+            data = await service.get_market_data()
+        validate = self.validators.get(provider)
+        if validate is not None and not validate(data):
+            print(f"Degraded {provider} data at block {block_number}, keeping previous snapshot")
+            return None
+        return data
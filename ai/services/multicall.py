@@ -0,0 +1,188 @@
+# ai/services/multicall.py
+import asyncio
+import os
+from typing import Any, Dict, List, Optional
+
+from eth_utils.abi import collapse_if_tuple
+from web3 import Web3
+
+from .abis.multicall3_abi import MULTICALL3_ABI
+from .block_context import block_identifier
+
+# Multicall3 is deployed at the same address on Scroll and most EVM chains
+MULTICALL3_ADDRESS = os.getenv("MULTICALL3_ADDRESS", "0xcA11bde05977b3631167028862bE2a173976CA11")
+
+# Largest number of calls sent in one aggregate3, to stay under node eth_call gas limits
+MULTICALL_MAX_BATCH = int(os.getenv("MULTICALL_MAX_BATCH", "500"))
+
+class Multicall:
+    """Batches many read-only contract calls into a single Multicall3 aggregate3 eth_call
+
+    Every call is sent with allowFailure=True, so one reverting call comes back
+    as None instead of failing the whole batch. When no Multicall3 contract is
+    deployed (or the aggregate call itself fails) the calls are made one by one
+    with the same per-call failure tolerance.
+    """
+
+    def __init__(self, w3, address: str = MULTICALL3_ADDRESS, max_batch: int = MULTICALL_MAX_BATCH):
+        self.w3 = w3
+        self.max_batch = max_batch
+        self.address = w3.to_checksum_address(address)
+        self.contract = w3.eth.contract(address=self.address, abi=MULTICALL3_ABI)
+        self._available: Optional[bool] = None
+
+    def is_available(self) -> bool:
+        """Check (once) whether a Multicall3 contract is deployed"""
+        if self._available is None:
+            try:
+                self._available = len(self.w3.eth.get_code(self.address)) > 0
+            except Exception as e:
+                print(f"Error checking for Multicall3 at {self.address}: {e}")
+                return False
+            if not self._available:
+                print(f"No Multicall3 contract at {self.address}, using per-call reads")
+        return self._available
+
+    def aggregate(self, calls: List[Any]) -> List[Optional[Any]]:
+        """Execute contract function calls, batched when possible
+
+        Args:
+            calls: Bound contract functions, e.g. contract.functions.getReserveData(asset)
+
+        Returns:
+            Decoded results in the same order as calls, shaped like .call() results
+            (a single value for one output, a tuple for several), with None for
+            any call that failed
+        """
+        if not calls:
+            return []
+
+        if self.is_available():
+            try:
+                results = []
+                for start in range(0, len(calls), self.max_batch):
+                    results.extend(self._aggregate3(calls[start:start + self.max_batch]))
+                return results
+            except Exception as e:
+                print(f"Error in Multicall3 aggregate3, falling back to per-call reads: {e}")
+
+        return [self._call_single(call) for call in calls]
+
+    def _aggregate3(self, calls: List[Any]) -> List[Optional[Any]]:
+        """Send all calls in one aggregate3 round trip and decode each result"""
+        raw_results = self.contract.functions.aggregate3(self._encode_calls(calls)).call(block_identifier=block_identifier())
+        return self._decode_results(calls, raw_results)
+
+    def _encode_calls(self, calls: List[Any]) -> List[Any]:
+        """aggregate3 (target, allowFailure, callData) entries for the calls"""
+        return [
+            (call.address, True, call._encode_transaction_data())
+            for call in calls
+        ]
+
+    def _decode_results(self, calls: List[Any], raw_results: List[Any]) -> List[Optional[Any]]:
+        """Decode each aggregate3 (success, returnData) pair, None for failures"""
+        results = []
+        for call, (success, return_data) in zip(calls, raw_results):
+            if not success or not return_data:
+                results.append(None)
+                continue
+            try:
+                results.append(self._decode(call, return_data))
+            except Exception as e:
+                print(f"Error decoding multicall result for {call.fn_name}: {e}")
+                results.append(None)
+        return results
+
+    def _call_single(self, call: Any) -> Optional[Any]:
+        """Per-call fallback with the same failure semantics as aggregate3"""
+        try:
+            return call.call(block_identifier=block_identifier())
+        except Exception as e:
+            print(f"Error calling contract method {call.fn_name}: {e}")
+            return None
+
+    def _decode(self, call: Any, return_data: bytes) -> Any:
+        """Decode raw return data the way ContractFunction.call() would"""
+        outputs = call.abi.get("outputs", [])
+        decoded = self.w3.codec.decode(
+            [collapse_if_tuple(output) for output in outputs],
+            return_data
+        )
+        normalized = [
+            _normalize_output(output, value)
+            for output, value in zip(outputs, decoded)
+        ]
+        if len(normalized) == 1:
+            return normalized[0]
+        return tuple(normalized)
+
+class AsyncMulticall(Multicall):
+    """Multicall for AsyncWeb3 contracts
+
+    Same batching and failure semantics as Multicall, but every method is a
+    coroutine. Batches beyond max_batch (and the per-call fallback reads) are
+    sent concurrently instead of one after another.
+    """
+
+    async def is_available(self) -> bool:
+        """Check (once) whether a Multicall3 contract is deployed"""
+        if self._available is None:
+            try:
+                self._available = len(await self.w3.eth.get_code(self.address)) > 0
+            except Exception as e:
+                print(f"Error checking for Multicall3 at {self.address}: {e}")
+                return False
+            if not self._available:
+                print(f"No Multicall3 contract at {self.address}, using per-call reads")
+        return self._available
+
+    async def aggregate(self, calls: List[Any]) -> List[Optional[Any]]:
+        """Execute contract function calls, batched when possible
+
+        Args:
+            calls: Bound async contract functions
+
+        Returns:
+            Decoded results in the same order as calls, with None for any call that failed
+        """
+        if not calls:
+            return []
+
+        if await self.is_available():
+            try:
+                batches = await asyncio.gather(*[
+                    self._aggregate3(calls[start:start + self.max_batch])
+                    for start in range(0, len(calls), self.max_batch)
+                ])
+                return [result for batch in batches for result in batch]
+            except Exception as e:
+                print(f"Error in Multicall3 aggregate3, falling back to per-call reads: {e}")
+
+        return list(await asyncio.gather(*[self._call_single(call) for call in calls]))
+
+    async def _aggregate3(self, calls: List[Any]) -> List[Optional[Any]]:
+        raw_results = await self.contract.functions.aggregate3(self._encode_calls(calls)).call(block_identifier=block_identifier())
+        return self._decode_results(calls, raw_results)
+
+    async def _call_single(self, call: Any) -> Optional[Any]:
+        try:
+            return await call.call(block_identifier=block_identifier())
+        except Exception as e:
+            print(f"Error calling contract method {call.fn_name}: {e}")
+            return None
+
+def _normalize_output(abi_output: Dict[str, Any], value: Any) -> Any:
+    """Checksum decoded addresses (including inside tuples and arrays) to match web3"""
+    abi_type = abi_output["type"]
+    if abi_type.endswith("]"):
+        element = dict(abi_output, type=abi_type[:abi_type.rindex("[")])
+        return [_normalize_output(element, item) for item in value]
+    if abi_type == "tuple":
+        return tuple(
+            _normalize_output(component, item)
+            for component, item in zip(abi_output["components"], value)
+        )
+    if abi_type == "address":
+        return Web3.to_checksum_address(value)
+    return value
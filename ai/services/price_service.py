@@ -0,0 +1,161 @@
+# ai/services/price_service.py
+from typing import Any, Callable, Dict, List, Optional
+
+from .snapshot_cache import Snapshot, SnapshotCache
+
+# USD prices used when no on-chain price is available
+FALLBACK_TOKEN_PRICES = {
+    "ETH": 2000.0,
+    "WETH": 2000.0,
+    "USDC": 1.0,
+    "SRC": 10.0,
+    "SCR": 10.0,
+    "USDQ": 1.0,
+    "wstETH": 2100.0,
+    "weETH": 2080.0
+}
+
+# Names a token is also known by; each gets the same price
+PRICE_ALIASES = {
+    "ETH": "WETH",
+    "SRC": "SCR"
+}
+
+# Tokens priced at their peg, with no feed to read
+PEGGED_PRICES = {
+    "USDQ": 1.0
+}
+
+# The AAVE oracle reports prices in USD with 8 decimals; Quill feeds use 18
+AAVE_ORACLE_DECIMALS = 8
+QUILL_FEED_DECIMALS = 18
+
+class PriceService:
+    """USD prices for every tracked token, read in one batch per block
+
+    The AAVE oracle's getAssetsPrices (one call for all reserves) and every
+    Quill price feed go out in a single multicall. AAVE prices win, Quill
+    feeds fill in tokens AAVE doesn't price, and FALLBACK_TOKEN_PRICES
+    covers whatever is left. Each price records where it came from.
+
+    Prices are a snapshot in the shared SnapshotCache under "prices", so
+    they are keyed by block, served stale while one refresh runs, and
+    follow read_at_block like the market data.
+    """
+
+    PROVIDER = "prices"
+
+    def __init__(self, services: Callable[[str], Any], cache: Optional[SnapshotCache] = None):
+        """
+        Args:
+            services: Returns the sync service for a provider name ("aave", "quill")
+            cache: Snapshot cache to keep prices in (a private one by default)
+        """
+        self.services = services
+        self.cache = cache if cache is not None else SnapshotCache()
+
+    def get_prices(self) -> Snapshot:
+        """The current price snapshot; the fallback prices if nothing could be read"""
+        try:
+            return self.cache.get(
+                self.PROVIDER,
+                self.fetch_prices,
+                block_number=self._block_number,
+                validate=self._has_chain_prices
+            )
+        except Exception as e:
+            print(f"Error fetching prices, using fallback prices: {e}")
+            return Snapshot(provider=self.PROVIDER, data=self._fallback_data(), block_number=None)
+
+    def prices(self) -> Dict[str, float]:
+        """Token symbol to USD price"""
+        return dict(self.get_prices().data["prices"])
+
+    def get_price(self, token: str) -> float:
+        """USD price of one token (1.0 for tokens nobody prices)"""
+        return self.get_prices().data["prices"].get(token, FALLBACK_TOKEN_PRICES.get(token, 1.0))
+
+    def last_price(self, token: str) -> Optional[float]:
+        """USD price from the latest cached snapshot, without reading the chain
+
+        For the services' fallback paths, which run because a read just
+        failed. The fallback price if no prices were read yet, None for
+        tokens nobody prices.
+        """
+        latest = self.cache.latest(self.PROVIDER)
+        prices = latest.data["prices"] if latest is not None else {}
+        return prices.get(token, FALLBACK_TOKEN_PRICES.get(token))
+
+    def describe(self) -> Dict[str, Any]:
+        """Prices with their sources, block number and age"""
+        snapshot = self.get_prices()
+        return {**snapshot.data, **snapshot.metadata(self.cache.ttl)}
+
+    def fetch_prices(self) -> Dict[str, Any]:
+        """Read every tracked price in one multicall"""
+        aave = self.services("aave")
+        quill = self.services("quill")
+        if aave is None or aave.w3 is None:
+            raise ConnectionError("AAVE service is not connected")
+
+        calls, aave_symbols = [], list(aave.ASSETS)
+        calls.append(aave.price_oracle.functions.getAssetsPrices(
+            [aave.w3.to_checksum_address(aave.ASSETS[symbol]) for symbol in aave_symbols]
+        ))
+        collaterals = self._quill_collaterals(quill)
+        for collateral in collaterals:
+            calls.extend(quill._price_calls(collateral))
+
+        results = aave.multicall.aggregate(calls)
+
+        prices, sources = {}, {}
+        quill_results = results[1:]
+        for i, collateral in enumerate(collaterals):
+            fetched_price, last_good_price = quill_results[2 * i], quill_results[2 * i + 1]
+            price = fetched_price if fetched_price is not None else last_good_price
+            if price:
+                prices[collateral] = price / 10**QUILL_FEED_DECIMALS
+                sources[collateral] = "quill_feed"
+
+        # AAVE's oracle takes precedence over the Quill feeds
+        for symbol, price in zip(aave_symbols, results[0] or []):
+            if price:
+                prices[symbol] = price / 10**AAVE_ORACLE_DECIMALS
+                sources[symbol] = "aave_oracle"
+
+        return self._complete(prices, sources)
+
+    def _quill_collaterals(self, quill: Any) -> List[str]:
+        """Quill collaterals with a bound price feed"""
+        if quill is None or getattr(quill, "w3", None) is None:
+            return []
+        return [
+            collateral for collateral, addresses in quill.COLLATERAL_TYPES.items()
+            if "price_feed_contract" in addresses
+        ]
+
+    def _complete(self, prices: Dict[str, float], sources: Dict[str, str]) -> Dict[str, Any]:
+        """Add aliases, pegs and fallbacks for every token without a read price"""
+        for token, alias in PRICE_ALIASES.items():
+            for known, missing in ((token, alias), (alias, token)):
+                if known in prices and missing not in prices:
+                    prices[missing] = prices[known]
+                    sources[missing] = sources[known]
+        for token, price in PEGGED_PRICES.items():
+            if token not in prices:
+                prices[token], sources[token] = price, "peg"
+        for token, price in FALLBACK_TOKEN_PRICES.items():
+            if token not in prices:
+                prices[token], sources[token] = price, "fallback"
+        return {"prices": prices, "sources": sources}
+
+    def _fallback_data(self) -> Dict[str, Any]:
+        return self._complete({}, {})
+
+    def _block_number(self) -> Optional[int]:
+        aave = self.services("aave")
+        return aave.w3.eth.block_number if aave is not None and aave.w3 is not None else None
+
+    def _has_chain_prices(self, data: Dict[str, Any]) -> bool:
+        """Degraded reads (every price a fallback) shouldn't replace a good snapshot"""
+        return any(source in ("aave_oracle", "quill_feed") for source in data.get("sources", {}).values())
@@ -1,25 +1,22 @@
 # ai/services/quill_service.py
+import asyncio
 import os
 from decimal import Decimal
 from typing import Dict, List, Optional, Any
 
 # Try different imports for Web3 middleware based on version
 try:
-    from web3 import Web3
     from web3.middleware import geth_poa_middleware
     has_geth_middleware = True
 except ImportError:
     try:
-        from web3 import Web3
         from web3.middleware.geth import geth_poa_middleware
         has_geth_middleware = True
     except ImportError:
         try:
-            from web3 import Web3
             from web3.geth import geth_poa_middleware
             has_geth_middleware = True
         except ImportError:
-            from web3 import Web3
             has_geth_middleware = False
             print("Couldn't import geth_poa_middleware, continuing without it")
 
@@ -29,6 +26,10 @@ from .abis.quill_trove_manager_abi import QUILL_TROVE_MANAGER_ABI
 from .abis.quill_stability_pool_abi import QUILL_STABILITY_POOL_ABI
 from .abis.quill_price_feed_abi import QUILL_PRICE_FEED_ABI
 from .abis.quill_usdq_token_abi import USDQ_TOKEN_ABI
+from .multicall import AsyncMulticall, Multicall
+from .block_context import block_identifier
+from .price_service import FALLBACK_TOKEN_PRICES, PriceService
+from .web3_provider import AsyncOnce, rpc_provider_factory
 
 class QuillService:
     """Service for interacting with Quill Finance on Scroll network"""
@@ -88,12 +89,14 @@ class QuillService:
     # RPC URL
     SCROLL_RPC_URL = os.environ.get("WEB3_PROVIDER_URI", "https://rpc.scroll.io/")
     
-    def __init__(self):
+    def __init__(self, price_service: Optional[PriceService] = None):
         """Initialize the Quill service with Web3 connection"""
         print("Initializing Quill service...")
+        # Last on-chain USD prices for the fallback paths; the fallback prices without one
+        self.price_service = price_service
         try:
             # Initialize Web3 connection
-            self.w3 = Web3(Web3.HTTPProvider(self.SCROLL_RPC_URL))
+            self.w3 = rpc_provider_factory.web3(self.SCROLL_RPC_URL)
             
             # Add middleware for POA chains
             if has_geth_middleware:
@@ -106,6 +109,9 @@ class QuillService:
             else:
                 print(f"Connected to {self.SCROLL_RPC_URL}")
                 
+                # Batches reads across all collateral branches into one eth_call
+                self.multicall = Multicall(self.w3)
+                
                 # Initialize contracts
                 self.initialize_contracts()
                 print("Quill contracts initialized successfully")
@@ -152,7 +158,7 @@ class QuillService:
         """Safely call a contract method with error handling"""
         try:
             method = getattr(contract.functions, method_name)
-            result = method(*args, **kwargs).call()
+            result = method(*args, **kwargs).call(block_identifier=block_identifier())
             return result
         except Exception as e:
             print(f"Error calling contract method {method_name}: {e}")
@@ -179,27 +185,13 @@ class QuillService:
                 price = self.safely_call_contract(price_feed, "lastGoodPrice")
             
             if price is None:
-                # Use fallback prices for testing
-                fallback_prices = {
-                    "ETH": Decimal("2000"),
-                    "SRC": Decimal("10"),
-                    "wstETH": Decimal("2100"),
-                    "weETH": Decimal("2080")
-                }
-                return fallback_prices.get(collateral, Decimal("0"))
+                return self._fallback_price(collateral)
             
             # Convert to human-readable decimal (Quill prices are in 1e18 format)
             return Decimal(price) / Decimal(10**18)
         except Exception as e:
             print(f"Error getting price for {collateral}: {e}")
-            # Use fallback prices for testing
-            fallback_prices = {
-                "ETH": Decimal("2000"),
-                "SRC": Decimal("10"),
-                "wstETH": Decimal("2100"),
-                "weETH": Decimal("2080")
-            }
-            return fallback_prices.get(collateral, Decimal("0"))
+            return self._fallback_price(collateral)
     
     def get_trove_data(self, wallet_address: str, collateral: str) -> Optional[Dict[str, Any]]:
         """Get data for a specific trove owned by the wallet"""
@@ -224,34 +216,38 @@ class QuillService:
             if debt is None or coll is None or status is None or status == 0:
                 return None
             
-            # Convert values to human-readable format
-            debt_decimal = Decimal(debt) / Decimal(10**18)  # USDQ has 18 decimals
-            coll_decimal = Decimal(coll) / Decimal(10**self.COLLATERAL_TYPES[collateral]["decimals"])
-            
             # Get current price to calculate collateral ratio
             price = self.get_collateral_price(collateral)
-            if price is None:
-                return {
-                    "debt": debt_decimal,
-                    "collateral": coll_decimal,
-                    "status": status,
-                    "collateral_value_usd": None,
-                    "collateral_ratio": None
-                }
-            
-            collateral_value_usd = coll_decimal * price
-            collateral_ratio = collateral_value_usd / debt_decimal if debt_decimal > 0 else Decimal("999")
-            
+            return self._format_trove_data(collateral, debt, coll, status, price)
+        except Exception as e:
+            print(f"Error getting trove data for {wallet_address} with {collateral}: {e}")
+            return None
+
+    def _format_trove_data(self, collateral: str, debt: int, coll: int, status: int, price: Optional[Decimal]) -> Dict[str, Any]:
+        """Human-readable trove amounts, with value and ratio when the price is known"""
+        # Convert values to human-readable format
+        debt_decimal = Decimal(debt) / Decimal(10**18)  # USDQ has 18 decimals
+        coll_decimal = Decimal(coll) / Decimal(10**self.COLLATERAL_TYPES[collateral]["decimals"])
+        
+        if price is None:
             return {
                 "debt": debt_decimal,
                 "collateral": coll_decimal,
                 "status": status,
-                "collateral_value_usd": collateral_value_usd,
-                "collateral_ratio": collateral_ratio
+                "collateral_value_usd": None,
+                "collateral_ratio": None
             }
-        except Exception as e:
-            print(f"Error getting trove data for {wallet_address} with {collateral}: {e}")
-            return None
+        
+        collateral_value_usd = coll_decimal * price
+        collateral_ratio = collateral_value_usd / debt_decimal if debt_decimal > 0 else Decimal("999")
+        
+        return {
+            "debt": debt_decimal,
+            "collateral": coll_decimal,
+            "status": status,
+            "collateral_value_usd": collateral_value_usd,
+            "collateral_ratio": collateral_ratio
+        }
     
     def get_max_borrowable_amount(self, collateral: str, amount: Decimal) -> Optional[Decimal]:
         """Calculate the maximum USDQ that can be borrowed for a given collateral amount"""
@@ -265,43 +261,41 @@ class QuillService:
             price = self.get_collateral_price(collateral)
             if price is None:
                 # Fallback to hardcoded prices for testing
-                fallback_prices = {
-                    "ETH": Decimal("2000"),
-                    "SRC": Decimal("10"),
-                    "wstETH": Decimal("2100"),
-                    "weETH": Decimal("2080")
-                }
-                price = fallback_prices.get(collateral, Decimal("0"))
+                price = self._fallback_price(collateral)
                 if price == Decimal("0"):
                     return Decimal("0")
             
-            # Calculate the total value of the collateral
-            collateral_value_usd = amount * price
-            
-            # Calculate max borrowable amount based on minimum collateral ratio
-            min_ratio = self.COLLATERAL_TYPES[collateral]["min_collateral_ratio"]
-            liquidation_reserve = self.COLLATERAL_TYPES[collateral]["liquidation_reserve"]
-            
-            # Maximum borrowable is (collateral_value / min_ratio) - liquidation_reserve
-            max_borrowable = (collateral_value_usd / min_ratio) - liquidation_reserve
-            
-            # For smaller amounts, we need to be more conservative to avoid negative values
-            if max_borrowable <= 0:
-                # For smaller amounts, just set a small proportion of the collateral value
-                max_borrowable = collateral_value_usd * Decimal("0.7")  # 70% of collateral value
-            
-            # Apply additional scaling for SRC due to higher volatility
-            if collateral == "SRC":
-                max_borrowable = max_borrowable * Decimal("0.5")  # More conservative with SRC
-            
-            # For hackathon testing, cap the maximum USDQ at 50 to avoid unreasonable values
-            max_borrowable = min(max_borrowable, Decimal("50"))
-            
-            # Ensure we don't return a negative value
-            return max(Decimal("0"), max_borrowable)
+            return self._max_borrowable(collateral, amount, price)
         except Exception as e:
             print(f"Error calculating max borrowable amount: {e}")
             return Decimal("0")
+
+    def _max_borrowable(self, collateral: str, amount: Decimal, price: Decimal) -> Decimal:
+        """Maximum USDQ borrowable against amount of collateral at price"""
+        # Calculate the total value of the collateral
+        collateral_value_usd = amount * price
+        
+        # Calculate max borrowable amount based on minimum collateral ratio
+        min_ratio = self.COLLATERAL_TYPES[collateral]["min_collateral_ratio"]
+        liquidation_reserve = self.COLLATERAL_TYPES[collateral]["liquidation_reserve"]
+        
+        # Maximum borrowable is (collateral_value / min_ratio) - liquidation_reserve
+        max_borrowable = (collateral_value_usd / min_ratio) - liquidation_reserve
+        
+        # For smaller amounts, we need to be more conservative to avoid negative values
+        if max_borrowable <= 0:
+            # For smaller amounts, just set a small proportion of the collateral value
+            max_borrowable = collateral_value_usd * Decimal("0.7")  # 70% of collateral value
+        
+        # Apply additional scaling for SRC due to higher volatility
+        if collateral == "SRC":
+            max_borrowable = max_borrowable * Decimal("0.5")  # More conservative with SRC
+        
+        # For hackathon testing, cap the maximum USDQ at 50 to avoid unreasonable values
+        max_borrowable = min(max_borrowable, Decimal("50"))
+        
+        # Ensure we don't return a negative value
+        return max(Decimal("0"), max_borrowable)
     
     def get_stability_pool_data(self, collateral: str) -> Optional[Dict[str, Any]]:
         """Get data about the stability pool for a specific collateral"""
@@ -323,39 +317,25 @@ class QuillService:
             pool_eth = self.safely_call_contract(stability_pool, "getETH")
             
             if total_deposits is None or pool_eth is None:
-                return {
-                    "total_deposits_usdq": Decimal("0"),
-                    "pool_collateral": Decimal("0"),
-                    "pool_collateral_value_usd": Decimal("0")
-                }
-            
-            # Convert to human-readable format
-            total_deposits_decimal = Decimal(total_deposits) / Decimal(10**18)
-            pool_eth_decimal = Decimal(pool_eth) / Decimal(10**18)
+                return self._format_stability_pool_data(0, 0, None)
             
             # Get collateral price for USD value
             price = self.get_collateral_price(collateral)
-            if price is None:
-                return {
-                    "total_deposits_usdq": total_deposits_decimal,
-                    "pool_collateral": pool_eth_decimal,
-                    "pool_collateral_value_usd": Decimal("0")
-                }
-            
-            pool_value_usd = pool_eth_decimal * price
-            
-            return {
-                "total_deposits_usdq": total_deposits_decimal,
-                "pool_collateral": pool_eth_decimal,
-                "pool_collateral_value_usd": pool_value_usd
-            }
+            return self._format_stability_pool_data(total_deposits, pool_eth, price)
         except Exception as e:
             print(f"Error getting stability pool data for {collateral}: {e}")
-            return {
-                "total_deposits_usdq": Decimal("0"),
-                "pool_collateral": Decimal("0"),
-                "pool_collateral_value_usd": Decimal("0")
-            }
+            return self._format_stability_pool_data(0, 0, None)
+
+    def _format_stability_pool_data(self, total_deposits: int, pool_eth: int, price: Optional[Decimal]) -> Dict[str, Any]:
+        # Convert to human-readable format
+        total_deposits_decimal = Decimal(total_deposits) / Decimal(10**18)
+        pool_eth_decimal = Decimal(pool_eth) / Decimal(10**18)
+        
+        return {
+            "total_deposits_usdq": total_deposits_decimal,
+            "pool_collateral": pool_eth_decimal,
+            "pool_collateral_value_usd": pool_eth_decimal * price if price is not None else Decimal("0")
+        }
     
     def get_user_stability_pool_data(self, wallet_address: str, collateral: str) -> Optional[Dict[str, Any]]:
         """Get data about a user's deposits in the stability pool"""
@@ -381,44 +361,27 @@ class QuillService:
             usdq_gain = self.safely_call_contract(stability_pool, "getDepositorUSDQGain", wallet_address)
             
             if deposit is None or collateral_gain is None or usdq_gain is None:
-                return {
-                    "deposit_usdq": Decimal("0"),
-                    "collateral_gain": Decimal("0"),
-                    "usdq_gain": Decimal("0"),
-                    "collateral_gain_value_usd": Decimal("0")
-                }
-            
-            # Convert to human-readable format
-            deposit_decimal = Decimal(deposit) / Decimal(10**18)
-            collateral_gain_decimal = Decimal(collateral_gain) / Decimal(10**18)
-            usdq_gain_decimal = Decimal(usdq_gain) / Decimal(10**18)
+                return self._format_user_stability_pool_data(0, 0, 0, None)
             
             # Get collateral price for USD value
             price = self.get_collateral_price(collateral)
-            if price is None:
-                return {
-                    "deposit_usdq": deposit_decimal,
-                    "collateral_gain": collateral_gain_decimal,
-                    "usdq_gain": usdq_gain_decimal,
-                    "collateral_gain_value_usd": Decimal("0")
-                }
-            
-            collateral_gain_value_usd = collateral_gain_decimal * price
-            
-            return {
-                "deposit_usdq": deposit_decimal,
-                "collateral_gain": collateral_gain_decimal,
-                "usdq_gain": usdq_gain_decimal,
-                "collateral_gain_value_usd": collateral_gain_value_usd
-            }
+            return self._format_user_stability_pool_data(deposit, collateral_gain, usdq_gain, price)
         except Exception as e:
             print(f"Error getting user stability pool data for {wallet_address} with {collateral}: {e}")
-            return {
-                "deposit_usdq": Decimal("0"),
-                "collateral_gain": Decimal("0"),
-                "usdq_gain": Decimal("0"),
-                "collateral_gain_value_usd": Decimal("0")
-            }
+            return self._format_user_stability_pool_data(0, 0, 0, None)
+
+    def _format_user_stability_pool_data(self, deposit: int, collateral_gain: int, usdq_gain: int, price: Optional[Decimal]) -> Dict[str, Any]:
+        # Convert to human-readable format
+        deposit_decimal = Decimal(deposit) / Decimal(10**18)
+        collateral_gain_decimal = Decimal(collateral_gain) / Decimal(10**18)
+        usdq_gain_decimal = Decimal(usdq_gain) / Decimal(10**18)
+        
+        return {
+            "deposit_usdq": deposit_decimal,
+            "collateral_gain": collateral_gain_decimal,
+            "usdq_gain": usdq_gain_decimal,
+            "collateral_gain_value_usd": collateral_gain_decimal * price if price is not None else Decimal("0")
+        }
     
     def calculate_borrow_apr(self, interest_rate: int) -> Decimal:
         """Calculate the APR for a given interest rate setting (6% to 350%)"""
@@ -442,8 +405,90 @@ class QuillService:
         
         return default_aprs.get(collateral, Decimal("5.0"))
     
+    def _fallback_price(self, collateral: str) -> Decimal:
+        """Fallback USD price used when neither price feed read succeeds
+        
+        The price service's last read price if there is one, else the fallback price.
+        """
+        if self.price_service is not None:
+            price = self.price_service.last_price(collateral)
+        else:
+            price = FALLBACK_TOKEN_PRICES.get(collateral)
+        return Decimal(str(price or 0))
+    
+    def _price_calls(self, collateral: str) -> List[Any]:
+        """Price feed reads for one branch, in the order _resolve_price expects"""
+        price_feed = self.COLLATERAL_TYPES[collateral]["price_feed_contract"]
+        return [price_feed.functions.fetchPrice(), price_feed.functions.lastGoodPrice()]
+    
+    def _resolve_price(self, collateral: str, fetched_price: Optional[int], last_good_price: Optional[int]) -> Decimal:
+        """Pick fetchPrice, then lastGoodPrice, then the hardcoded fallback price"""
+        price = fetched_price if fetched_price is not None else last_good_price
+        if price is None:
+            return self._fallback_price(collateral)
+        
+        # Quill prices are in 1e18 format
+        return Decimal(price) / Decimal(10**18)
+    
+    def get_branch_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Read every collateral branch's price and stability pool totals in one batch
+        
+        Queues fetchPrice, lastGoodPrice, getTotalUSDQDeposits and getETH for all
+        branches into a single multicall. Each call falls back on its own: a failed
+        fetchPrice uses lastGoodPrice, then the hardcoded fallback price, and failed
+        pool reads count as zero.
+        
+        Returns:
+            Dictionary keyed by collateral with price_usd, total_deposits_usdq
+            and pool_collateral (Decimals, price_usd may be None if not connected)
+        """
+        if self.w3 is None:
+            return self._disconnected_branch_snapshot()
+        
+        results = self.multicall.aggregate(self._branch_snapshot_calls())
+        return self._format_branch_snapshot(results)
+
+    def _disconnected_branch_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            collateral: {
+                "price_usd": None,
+                "total_deposits_usdq": Decimal("0"),
+                "pool_collateral": Decimal("0")
+            }
+            for collateral in self.COLLATERAL_TYPES
+        }
+
+    def _branch_snapshot_calls(self) -> List[Any]:
+        """Four reads per branch, in a fixed order so results can be sliced back out"""
+        calls = []
+        for collateral, addresses in self.COLLATERAL_TYPES.items():
+            stability_pool = addresses["stability_pool_contract"]
+            calls.extend(self._price_calls(collateral))
+            calls.extend([
+                stability_pool.functions.getTotalUSDQDeposits(),
+                stability_pool.functions.getETH()
+            ])
+        return calls
+
+    def _format_branch_snapshot(self, results: List[Any]) -> Dict[str, Dict[str, Any]]:
+        snapshot = {}
+        for i, collateral in enumerate(self.COLLATERAL_TYPES):
+            fetched_price, last_good_price, total_deposits, pool_eth = results[4 * i:4 * i + 4]
+            
+            snapshot[collateral] = {
+                "price_usd": self._resolve_price(collateral, fetched_price, last_good_price),
+                "total_deposits_usdq": Decimal(total_deposits or 0) / Decimal(10**18),
+                "pool_collateral": Decimal(pool_eth or 0) / Decimal(10**18)
+            }
+        
+        return snapshot
+    
     def get_market_data(self) -> Dict[str, Any]:
         """Get market data for Quill Finance"""
+        # Prices and stability pool totals for every branch in one round trip
+        return self._format_market_data(self.get_branch_snapshot())
+
+    def _format_market_data(self, snapshot: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
         market_data = {
             "protocol": "Quill",
             "collaterals": {},
@@ -454,18 +499,8 @@ class QuillService:
             }
         }
         
-        # Get data for each collateral type
-        for collateral in self.COLLATERAL_TYPES.keys():
-            # Get collateral price
-            price = self.get_collateral_price(collateral)
-            
-            # Get stability pool data
-            stability_pool_data = self.get_stability_pool_data(collateral)
-            
-            # Calculate APRs
-            borrow_apr_low = self.calculate_borrow_apr(6)  # Lowest rate
-            borrow_apr_med = self.calculate_borrow_apr(50) # Medium rate
-            borrow_apr_high = self.calculate_borrow_apr(100) # Higher rate
+        for collateral, branch in snapshot.items():
+            price = branch["price_usd"]
             stability_apr = self.calculate_stability_pool_apr(collateral)
             
             # Add to market data
@@ -476,47 +511,111 @@ class QuillService:
             }
             
             # Add stability pool data
-            if stability_pool_data:
-                market_data["stability_pools"][collateral] = {
-                    "total_deposits_usdq": float(stability_pool_data["total_deposits_usdq"]),
-                    "pool_collateral": float(stability_pool_data["pool_collateral"]),
-                    "estimated_apr": float(stability_apr)
-                }
-            else:
-                market_data["stability_pools"][collateral] = {
-                    "total_deposits_usdq": 0,
-                    "pool_collateral": 0,
-                    "estimated_apr": float(stability_apr)
-                }
+            market_data["stability_pools"][collateral] = {
+                "total_deposits_usdq": float(branch["total_deposits_usdq"]),
+                "pool_collateral": float(branch["pool_collateral"]),
+                "estimated_apr": float(stability_apr)
+            }
         
         return market_data
     
     def get_user_positions(self, wallet_address: str) -> Dict[str, Any]:
         """Get all Quill positions for a user across all collateral types"""
+        return self.get_user_positions_batch([wallet_address])[wallet_address]
+    
+    def get_user_positions_batch(self, wallet_addresses: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get Quill positions for many wallets with a single batched read
+        
+        Branch prices are read once and shared by every wallet. Each wallet adds
+        three trove reads and three stability pool reads per collateral branch.
+        
+        Args:
+            wallet_addresses: Wallets to look up
+            
+        Returns:
+            Dictionary keyed by wallet address (as given) with the same
+            troves/stability_deposits structure as get_user_positions
+        """
         positions = {
-            "troves": {},
-            "stability_deposits": {}
+            wallet_address: {"troves": {}, "stability_deposits": {}}
+            for wallet_address in wallet_addresses
         }
+        if self.w3 is None:
+            return positions
         
-        # Get trove data for each collateral type
-        for collateral in self.COLLATERAL_TYPES.keys():
-            trove_data = self.get_trove_data(wallet_address, collateral)
-            if trove_data and trove_data.get("status", 0) > 0:  # If trove exists
-                positions["troves"][collateral] = {
-                    "debt_usdq": float(trove_data["debt"]),
-                    "collateral_amount": float(trove_data["collateral"]),
-                    "collateral_value_usd": float(trove_data["collateral_value_usd"]) if trove_data["collateral_value_usd"] else None,
-                    "collateral_ratio": float(trove_data["collateral_ratio"]) if trove_data["collateral_ratio"] else None
-                }
-            
-            # Get stability pool deposits
-            sp_data = self.get_user_stability_pool_data(wallet_address, collateral)
-            if sp_data and sp_data.get("deposit_usdq", 0) > 0:
-                positions["stability_deposits"][collateral] = {
-                    "deposit_usdq": float(sp_data["deposit_usdq"]),
-                    "collateral_gain": float(sp_data["collateral_gain"]),
-                    "usdq_gain": float(sp_data["usdq_gain"])
-                }
+        wallets = self._checksum_wallets(positions)
+        results = self.multicall.aggregate(self._positions_calls(wallets))
+        return self._format_positions(positions, wallets, results)
+
+    def _checksum_wallets(self, wallet_addresses) -> List[Any]:
+        """(address as given, checksum address) pairs, skipping malformed addresses
+        rather than failing the whole batch"""
+        wallets = []
+        for wallet_address in wallet_addresses:
+            try:
+                wallets.append((wallet_address, self.w3.to_checksum_address(wallet_address)))
+            except Exception as e:
+                print(f"Invalid wallet address {wallet_address}: {e}")
+        return wallets
+
+    def _positions_calls(self, wallets: List[Any]) -> List[Any]:
+        """Branch prices, then six trove and stability pool reads per wallet and branch"""
+        collaterals = list(self.COLLATERAL_TYPES.keys())
+        calls = []
+        for collateral in collaterals:
+            calls.extend(self._price_calls(collateral))
+        for _, checksum_address in wallets:
+            for collateral in collaterals:
+                trove_manager = self.COLLATERAL_TYPES[collateral]["trove_manager_contract"]
+                stability_pool = self.COLLATERAL_TYPES[collateral]["stability_pool_contract"]
+                calls.extend([
+                    trove_manager.functions.getTroveDebt(checksum_address),
+                    trove_manager.functions.getTroveColl(checksum_address),
+                    trove_manager.functions.getTroveStatus(checksum_address),
+                    stability_pool.functions.getCompoundedUSDQDeposit(checksum_address),
+                    stability_pool.functions.getDepositorCollateralGain(checksum_address),
+                    stability_pool.functions.getDepositorUSDQGain(checksum_address)
+                ])
+        return calls
+
+    def _format_positions(
+        self,
+        positions: Dict[str, Dict[str, Any]],
+        wallets: List[Any],
+        results: List[Any]
+    ) -> Dict[str, Dict[str, Any]]:
+        collaterals = list(self.COLLATERAL_TYPES.keys())
+        prices = {
+            collateral: self._resolve_price(collateral, results[2 * i], results[2 * i + 1])
+            for i, collateral in enumerate(collaterals)
+        }
+        
+        offset = 2 * len(collaterals)
+        for wallet_address, _ in wallets:
+            for collateral in collaterals:
+                debt, coll, status, deposit, collateral_gain, usdq_gain = results[offset:offset + 6]
+                offset += 6
+                price = prices[collateral]
+                
+                # Status 0 means the wallet has no trove on this branch
+                if debt is not None and coll is not None and status:
+                    debt_decimal = Decimal(debt) / Decimal(10**18)  # USDQ has 18 decimals
+                    coll_decimal = Decimal(coll) / Decimal(10**self.COLLATERAL_TYPES[collateral]["decimals"])
+                    collateral_value_usd = coll_decimal * price
+                    collateral_ratio = collateral_value_usd / debt_decimal if debt_decimal > 0 else Decimal("999")
+                    positions[wallet_address]["troves"][collateral] = {
+                        "debt_usdq": float(debt_decimal),
+                        "collateral_amount": float(coll_decimal),
+                        "collateral_value_usd": float(collateral_value_usd) if collateral_value_usd else None,
+                        "collateral_ratio": float(collateral_ratio) if collateral_ratio else None
+                    }
+                
+                if deposit:
+                    positions[wallet_address]["stability_deposits"][collateral] = {
+                        "deposit_usdq": float(Decimal(deposit) / Decimal(10**18)),
+                        "collateral_gain": float(Decimal(collateral_gain or 0) / Decimal(10**18)),
+                        "usdq_gain": float(Decimal(usdq_gain or 0) / Decimal(10**18))
+                    }
         
         return positions
     
@@ -530,39 +629,264 @@ class QuillService:
                 amount_decimal = Decimal(str(amount))
                 max_borrowable = self.get_max_borrowable_amount(collateral, amount_decimal)
                 
-                if max_borrowable and max_borrowable > 0:
-                    # Borrowing strategy
-                    strategies.append({
-                        "name": f"{collateral} Borrowing Strategy",
-                        "steps": [
-                            {
-                                "protocol": "Quill",
-                                "action": "borrow_usdq",
-                                "token": collateral,
-                                "amount": float(amount_decimal),
-                                "usdq_amount": float(max_borrowable),
-                                "interest_rate": 30,  # Medium interest rate
-                                "expected_apy": -30   # Negative APY since this is cost to borrow
-                            }
-                        ],
-                        "expected_outcome": f"Borrow {float(max_borrowable):.2f} USDQ at 30% interest using {collateral} as collateral",
-                        "risk_level": 3  # Medium risk
-                    })
-                    
-                    # Stability pool strategy
-                    strategies.append({
-                        "name": f"USDQ Stability Pool Strategy",
-                        "steps": [
-                            {
-                                "protocol": "Quill",
-                                "action": "provide_stability",
-                                "token": "USDQ",
-                                "amount": float(max_borrowable),
-                                "expected_apy": 5.0   # Typical stability pool APR
-                            }
-                        ],
-                        "expected_outcome": f"Earn approximately 5% APR by providing {float(max_borrowable):.2f} USDQ to the stability pool",
-                        "risk_level": 2  # Lower risk
-                    })
-        
-        return strategies
\ No newline at end of file
+                strategies.extend(self._collateral_strategies(collateral, amount_decimal, max_borrowable))
+        
+        return strategies
+
+    def _collateral_strategies(self, collateral: str, amount_decimal: Decimal, max_borrowable: Optional[Decimal]) -> List[Dict[str, Any]]:
+        """Borrowing and stability pool strategies for one collateral balance"""
+        strategies = []
+        if max_borrowable and max_borrowable > 0:
+            # Borrowing strategy
+            strategies.append({
+                "name": f"{collateral} Borrowing Strategy",
+                "steps": [
+                    {
+                        "protocol": "Quill",
+                        "action": "borrow_usdq",
+                        "token": collateral,
+                        "amount": float(amount_decimal),
+                        "usdq_amount": float(max_borrowable),
+                        "interest_rate": 30,  # Medium interest rate
+                        "expected_apy": -30   # Negative APY since this is cost to borrow
+                    }
+                ],
+                "expected_outcome": f"Borrow {float(max_borrowable):.2f} USDQ at 30% interest using {collateral} as collateral",
+                "risk_level": 3  # Medium risk
+            })
+            
+            # Stability pool strategy
+            strategies.append({
+                "name": f"USDQ Stability Pool Strategy",
+                "steps": [
+                    {
+                        "protocol": "Quill",
+                        "action": "provide_stability",
+                        "token": "USDQ",
+                        "amount": float(max_borrowable),
+                        "expected_apy": 5.0   # Typical stability pool APR
+                    }
+                ],
+                "expected_outcome": f"Earn approximately 5% APR by providing {float(max_borrowable):.2f} USDQ to the stability pool",
+                "risk_level": 2  # Lower risk
+            })
+        
+        return strategies
+
+class AsyncQuillService(QuillService):
+    """QuillService on AsyncWeb3: the same public methods and return shapes, as coroutines
+
+    Construction does no I/O; the connection is checked on first use. The
+    pure calculations (calculate_borrow_apr, calculate_stability_pool_apr)
+    are inherited unchanged since they never touch the chain.
+    """
+
+    def __init__(self, price_service: Optional[PriceService] = None):
+        print("Initializing async Quill service...")
+        self.price_service = price_service
+        # initialize_contracts stores contracts on the branch entries, so this
+        # instance gets its own copies rather than replacing the sync service's
+        self.COLLATERAL_TYPES = {
+            collateral: dict(addresses)
+            for collateral, addresses in type(self).COLLATERAL_TYPES.items()
+        }
+        self.w3 = rpc_provider_factory.async_web3(self.SCROLL_RPC_URL)
+        self.multicall = AsyncMulticall(self.w3)
+        self.initialize_contracts()
+        self._connection_check = AsyncOnce()
+
+    async def _ensure_connected(self):
+        """Check the connection on first use, dropping w3 if the node is unreachable"""
+        if self.w3 is not None:
+            await self._connection_check.run(self._check_connection)
+
+    async def _check_connection(self):
+        if await self.w3.is_connected():
+            print(f"Connected to {self.SCROLL_RPC_URL}")
+        else:
+            print(f"Failed to connect to {self.SCROLL_RPC_URL}")
+            self.w3 = None
+
+    async def safely_call_contract(self, contract, method_name, *args, **kwargs):
+        """Safely await a contract method with error handling"""
+        try:
+            method = getattr(contract.functions, method_name)
+            return await method(*args, **kwargs).call(block_identifier=block_identifier())
+        except Exception as e:
+            print(f"Error calling contract method {method_name}: {e}")
+            return None
+
+    async def get_collateral_price(self, collateral: str) -> Optional[Decimal]:
+        """Get the current price of a collateral asset in USD"""
+        await self._ensure_connected()
+        if self.w3 is None:
+            return None
+        
+        collateral = collateral.upper()
+        if collateral not in self.COLLATERAL_TYPES:
+            print(f"Unsupported collateral type: {collateral}")
+            return None
+        
+        try:
+            price_feed = self.COLLATERAL_TYPES[collateral]["price_feed_contract"]
+            # lastGoodPrice is only read when fetchPrice fails
+            fetched_price = await self.safely_call_contract(price_feed, "fetchPrice")
+            last_good_price = None
+            if fetched_price is None:
+                last_good_price = await self.safely_call_contract(price_feed, "lastGoodPrice")
+            return self._resolve_price(collateral, fetched_price, last_good_price)
+        except Exception as e:
+            print(f"Error getting price for {collateral}: {e}")
+            return self._fallback_price(collateral)
+
+    async def get_trove_data(self, wallet_address: str, collateral: str) -> Optional[Dict[str, Any]]:
+        """Get data for a specific trove owned by the wallet"""
+        await self._ensure_connected()
+        if self.w3 is None:
+            return None
+        
+        collateral = collateral.upper()
+        if collateral not in self.COLLATERAL_TYPES:
+            print(f"Unsupported collateral type: {collateral}")
+            return None
+        
+        try:
+            wallet_address = self.w3.to_checksum_address(wallet_address)
+            trove_manager = self.COLLATERAL_TYPES[collateral]["trove_manager_contract"]
+            
+            debt, coll, status = await asyncio.gather(
+                self.safely_call_contract(trove_manager, "getTroveDebt", wallet_address),
+                self.safely_call_contract(trove_manager, "getTroveColl", wallet_address),
+                self.safely_call_contract(trove_manager, "getTroveStatus", wallet_address)
+            )
+            
+            # If we couldn't get data or trove doesn't exist (status 0)
+            if debt is None or coll is None or status is None or status == 0:
+                return None
+            
+            price = await self.get_collateral_price(collateral)
+            return self._format_trove_data(collateral, debt, coll, status, price)
+        except Exception as e:
+            print(f"Error getting trove data for {wallet_address} with {collateral}: {e}")
+            return None
+
+    async def get_max_borrowable_amount(self, collateral: str, amount: Decimal) -> Optional[Decimal]:
+        """Calculate the maximum USDQ that can be borrowed for a given collateral amount"""
+        collateral = collateral.upper()
+        if collateral not in self.COLLATERAL_TYPES:
+            print(f"Unsupported collateral type: {collateral}")
+            return Decimal("0")
+        
+        try:
+            price = await self.get_collateral_price(collateral)
+            if price is None:
+                price = self._fallback_price(collateral)
+                if price == Decimal("0"):
+                    return Decimal("0")
+            
+            return self._max_borrowable(collateral, amount, price)
+        except Exception as e:
+            print(f"Error calculating max borrowable amount: {e}")
+            return Decimal("0")
+
+    async def get_stability_pool_data(self, collateral: str) -> Optional[Dict[str, Any]]:
+        """Get data about the stability pool for a specific collateral"""
+        await self._ensure_connected()
+        if self.w3 is None:
+            return None
+        
+        collateral = collateral.upper()
+        if collateral not in self.COLLATERAL_TYPES:
+            print(f"Unsupported collateral type: {collateral}")
+            return None
+        
+        try:
+            stability_pool = self.COLLATERAL_TYPES[collateral]["stability_pool_contract"]
+            total_deposits, pool_eth, price = await asyncio.gather(
+                self.safely_call_contract(stability_pool, "getTotalUSDQDeposits"),
+                self.safely_call_contract(stability_pool, "getETH"),
+                self.get_collateral_price(collateral)
+            )
+            
+            if total_deposits is None or pool_eth is None:
+                return self._format_stability_pool_data(0, 0, None)
+            return self._format_stability_pool_data(total_deposits, pool_eth, price)
+        except Exception as e:
+            print(f"Error getting stability pool data for {collateral}: {e}")
+            return self._format_stability_pool_data(0, 0, None)
+
+    async def get_user_stability_pool_data(self, wallet_address: str, collateral: str) -> Optional[Dict[str, Any]]:
+        """Get data about a user's deposits in the stability pool"""
+        await self._ensure_connected()
+        if self.w3 is None:
+            return None
+        
+        collateral = collateral.upper()
+        if collateral not in self.COLLATERAL_TYPES:
+            print(f"Unsupported collateral type: {collateral}")
+            return None
+        
+        try:
+            wallet_address = self.w3.to_checksum_address(wallet_address)
+            stability_pool = self.COLLATERAL_TYPES[collateral]["stability_pool_contract"]
+            deposit, collateral_gain, usdq_gain, price = await asyncio.gather(
+                self.safely_call_contract(stability_pool, "getCompoundedUSDQDeposit", wallet_address),
+                self.safely_call_contract(stability_pool, "getDepositorCollateralGain", wallet_address),
+                self.safely_call_contract(stability_pool, "getDepositorUSDQGain", wallet_address),
+                self.get_collateral_price(collateral)
+            )
+            
+            if deposit is None or collateral_gain is None or usdq_gain is None:
+                return self._format_user_stability_pool_data(0, 0, 0, None)
+            return self._format_user_stability_pool_data(deposit, collateral_gain, usdq_gain, price)
+        except Exception as e:
+            print(f"Error getting user stability pool data for {wallet_address} with {collateral}: {e}")
+            return self._format_user_stability_pool_data(0, 0, 0, None)
+
+    async def get_branch_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Read every collateral branch's price and stability pool totals in one batch"""
+        await self._ensure_connected()
+        if self.w3 is None:
+            return self._disconnected_branch_snapshot()
+        
+        results = await self.multicall.aggregate(self._branch_snapshot_calls())
+        return self._format_branch_snapshot(results)
+
+    async def get_market_data(self) -> Dict[str, Any]:
+        """Get market data for Quill Finance"""
+        return self._format_market_data(await self.get_branch_snapshot())
+
+    async def get_user_positions(self, wallet_address: str) -> Dict[str, Any]:
+        """Get all Quill positions for a user across all collateral types"""
+        return (await self.get_user_positions_batch([wallet_address]))[wallet_address]
+
+    async def get_user_positions_batch(self, wallet_addresses: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get Quill positions for many wallets with a single batched read"""
+        positions = {
+            wallet_address: {"troves": {}, "stability_deposits": {}}
+            for wallet_address in wallet_addresses
+        }
+        await self._ensure_connected()
+        if self.w3 is None:
+            return positions
+        
+        wallets = self._checksum_wallets(positions)
+        results = await self.multicall.aggregate(self._positions_calls(wallets))
+        return self._format_positions(positions, wallets, results)
+
+    async def get_recommended_strategies(self, wallet_balances: Dict[str, float]) -> List[Dict[str, Any]]:
+        """Get recommended Quill strategies based on user's wallet balances"""
+        balances = [
+            (collateral, Decimal(str(amount)))
+            for collateral, amount in wallet_balances.items()
+            if collateral.upper() in self.COLLATERAL_TYPES and amount > 0
+        ]
+        max_borrowables = await asyncio.gather(*[
+            self.get_max_borrowable_amount(collateral, amount_decimal)
+            for collateral, amount_decimal in balances
+        ])
+        
+        strategies = []
+        for (collateral, amount_decimal), max_borrowable in zip(balances, max_borrowables):
+            strategies.extend(self._collateral_strategies(collateral, amount_decimal, max_borrowable))
+        return strategies
@@ -0,0 +1,90 @@
+# ai/services/service_registry.py
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+class ServiceRegistry:
+    """Holds one shared instance of each service for the lifetime of the process
+
+    Services are built once at startup (or lazily on first use) and handed out
+    to every request. When an instance loses its RPC connection, or a caller
+    reports it as unhealthy, it is rebuilt - at most once per RECONNECT_INTERVAL
+    so a flapping endpoint doesn't turn into a reconnect storm.
+    """
+
+    # Minimum seconds between rebuild attempts for the same service
+    RECONNECT_INTERVAL = float(os.getenv("SERVICE_RECONNECT_INTERVAL", "30"))
+
+    def __init__(self, factories: Dict[str, Callable[[], Any]]):
+        self.factories = factories
+        self._instances: Dict[str, Any] = {}
+        self._last_attempt: Dict[str, float] = {}
+        self._refreshing = set()
+        self._locks = {name: threading.Lock() for name in factories}
+
+    def start(self):
+        """Build every registered service (called from the app lifespan hook)"""
+        for name in self.factories:
+            self.refresh(name, force=True)
+
+    def shutdown(self):
+        """Drop all shared instances"""
+        self._instances.clear()
+        self._last_attempt.clear()
+
+    def get(self, name: str) -> Optional[Any]:
+        """Get the shared instance of a service, reconnecting it if it has dropped"""
+        instance = self._instances.get(name)
+        if instance is None or not self.is_connected(instance):
+            self.refresh(name)
+            instance = self._instances.get(name)
+        return instance
+
+    def is_connected(self, instance: Any) -> bool:
+        """Cheap, RPC-free check: services null out w3 when their connection fails"""
+        return not hasattr(instance, "w3") or instance.w3 is not None
+
+    def refresh(self, name: str, force: bool = False) -> bool:
+        """Rebuild a service, keeping the previous instance if the rebuild fails
+
+        Returns:
+            True if a new instance was installed
+        """
+        if name not in self.factories:
+            raise ValueError(f"Unknown service: {name}")
+
+        with self._locks[name]:
+            last_attempt = self._last_attempt.get(name)
+            if not force and last_attempt is not None and time.monotonic() - last_attempt < self.RECONNECT_INTERVAL:
+                return False
+            self._last_attempt[name] = time.monotonic()
+
+            try:
+                instance = self.factories[name]()
+            except Exception as e:
+                print(f"Error initializing {name} service: {e}")
+                return False
+
+            if self._instances.get(name) is not None and not self.is_connected(instance):
+                # Don't swap a working-but-degraded instance for one that never connected
+                print(f"Reconnect of {name} service failed, keeping previous instance")
+                return False
+
+            self._instances[name] = instance
+            print(f"{name} service ready")
+            return True
+
+    def mark_unhealthy(self, name: str):
+        """Schedule a background rebuild after a caller saw the service fail"""
+        if name not in self.factories or name in self._refreshing:
+            return
+
+        def run():
+            try:
+                self.refresh(name)
+            finally:
+                self._refreshing.discard(name)
+
+        self._refreshing.add(name)
+        threading.Thread(target=run, name=f"refresh-{name}", daemon=True).start()
@@ -0,0 +1,303 @@
+# ai/services/snapshot_cache.py
+import asyncio
+import copy
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .block_context import pinned_block, read_at_block
+
+# Seconds a snapshot is served as fresh (about one Scroll block by default)
+SNAPSHOT_TTL_SECONDS = float(os.getenv("SNAPSHOT_TTL_SECONDS", "3"))
+
+# Seconds past which a stale snapshot is no longer served while refreshing
+SNAPSHOT_MAX_STALE_SECONDS = float(os.getenv("SNAPSHOT_MAX_STALE_SECONDS", "300"))
+
+# Snapshots kept per provider (one per block)
+SNAPSHOT_BLOCKS_KEPT = 8
+
+@dataclass
+class Snapshot:
+    provider: str
+    data: Dict[str, Any]
+    block_number: Optional[int]
+    fetched_at: float = field(default_factory=time.time)
+
+    @property
+    def age(self) -> float:
+        return max(0.0, time.time() - self.fetched_at)
+
+    def metadata(self, ttl: float) -> Dict[str, Any]:
+        """Block number and age of the snapshot, for API responses"""
+        return {
+            "block_number": self.block_number,
+            "age_seconds": round(self.age, 3),
+            "stale": self.age >= ttl
+        }
+
+class SnapshotCache:
+    """In-process cache of provider market snapshots keyed by (provider, block number)
+
+    Fresh snapshots (younger than ttl) are served directly. Stale ones are still
+    served - up to max_stale - while a single background refresh runs. Only a
+    missing or expired snapshot makes the caller wait on the chain, and
+    concurrent callers share that one fetch. Failed fetches never evict the
+    last good snapshot, so it is what callers fall back to before anything else.
+
+    Every fetch reads the chain at the block its snapshot is keyed by. Inside
+    read_at_block(n) the snapshot for block n is served (or fetched) instead
+    of the latest one.
+
+    aget is the same for coroutine fetchers: the shared fetch and background
+    refresh run as tasks on the event loop instead of threads.
+    """
+
+    def __init__(
+        self,
+        ttl: float = SNAPSHOT_TTL_SECONDS,
+        max_stale: float = SNAPSHOT_MAX_STALE_SECONDS,
+        blocks_kept: int = SNAPSHOT_BLOCKS_KEPT
+    ):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.blocks_kept = blocks_kept
+        self._snapshots: Dict[Tuple[str, Optional[int]], Snapshot] = {}
+        self._latest: Dict[str, Snapshot] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._refreshing = set()
+        self._guard = threading.Lock()
+        self._inflight: Dict[Any, asyncio.Task] = {}
+
+    def get(
+        self,
+        provider: str,
+        fetch: Callable[[], Dict[str, Any]],
+        block_number: Optional[Callable[[], Optional[int]]] = None,
+        validate: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> Snapshot:
+        """Get a provider's snapshot, fetching or refreshing it as needed
+
+        Args:
+            provider: Cache key for the provider, e.g. "aave"
+            fetch: Reads the provider's market data from the chain
+            block_number: Returns the current block number to key the snapshot by
+            validate: Returns False for degraded data that shouldn't replace a good snapshot
+
+        Returns:
+            The cached or newly fetched Snapshot
+
+        Raises:
+            Whatever fetch raised, if there is no snapshot to fall back to or
+            the read is pinned to a block (another block's snapshot won't do)
+        """
+        pinned = pinned_block()
+        if pinned is not None:
+            return self._get_pinned(provider, pinned, fetch, validate)
+
+        latest = self._latest.get(provider)
+        if latest is not None and latest.age < self.ttl:
+            return latest
+
+        if latest is not None and latest.age < self.max_stale:
+            self._refresh_in_background(provider, fetch, block_number, validate)
+            return latest
+
+        # Missing or too old to serve: wait for the fetch (shared by concurrent callers)
+        with self._lock_for(provider):
+            latest = self._latest.get(provider)
+            if latest is not None and latest.age < self.ttl:
+                return latest
+            return self._fetch(provider, fetch, block_number, validate)
+
+    async def aget(
+        self,
+        provider: str,
+        fetch: Callable[[], Awaitable[Dict[str, Any]]],
+        block_number: Optional[Callable[[], Awaitable[Optional[int]]]] = None,
+        validate: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> Snapshot:
+        """Async get: fetch and block_number are coroutine functions
+
+        Shares snapshots with get, so sync and async callers see the same cache.
+        """
+        pinned = pinned_block()
+        if pinned is not None:
+            snapshot = self._snapshots.get((provider, pinned))
+            if snapshot is not None:
+                return snapshot
+            return await asyncio.shield(self._refresh_task(provider, fetch, None, validate, block=pinned))
+
+        latest = self._latest.get(provider)
+        if latest is not None and latest.age < self.ttl:
+            return latest
+
+        if latest is not None and latest.age < self.max_stale:
+            self._refresh_task(provider, fetch, block_number, validate)
+            return latest
+
+        # Missing or too old to serve: concurrent callers await the same fetch
+        return await asyncio.shield(self._refresh_task(provider, fetch, block_number, validate))
+
+    def _get_pinned(self, provider, block, fetch, validate) -> Snapshot:
+        """The provider's snapshot at block, fetched at that block if not cached"""
+        snapshot = self._snapshots.get((provider, block))
+        if snapshot is not None:
+            return snapshot
+
+        with self._lock_for(provider):
+            snapshot = self._snapshots.get((provider, block))
+            if snapshot is not None:
+                return snapshot
+            return self._fetch(provider, fetch, lambda: block, validate, pinned=True)
+
+    def get_at(self, provider: str, block_number: int) -> Optional[Snapshot]:
+        """Get the snapshot a provider had at a specific block, if still cached"""
+        return self._snapshots.get((provider, block_number))
+
+    def latest(self, provider: str) -> Optional[Snapshot]:
+        """Most recent snapshot for a provider regardless of age"""
+        return self._latest.get(provider)
+
+    def last_good(self, provider: str, default: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of the latest snapshot's data, or of default if there is none"""
+        latest = self._latest.get(provider)
+        return copy.deepcopy(latest.data if latest is not None else default)
+
+    def describe(self, provider: str) -> Optional[Dict[str, Any]]:
+        """Metadata of the latest snapshot, or None if nothing is cached"""
+        latest = self._latest.get(provider)
+        return latest.metadata(self.ttl) if latest is not None else None
+
+    def put(self, provider: str, data: Dict[str, Any], block_number: Optional[int] = None) -> Snapshot:
+        """Store a snapshot and make it the provider's latest, unless it is for an older block"""
+        snapshot = Snapshot(provider=provider, data=data, block_number=block_number)
+        with self._guard:
+            self._snapshots[(provider, block_number)] = snapshot
+            latest = self._latest.get(provider)
+            if (
+                latest is None
+                or block_number is None
+                or latest.block_number is None
+                or block_number >= latest.block_number
+            ):
+                self._latest[provider] = snapshot
+
+            # Drop the oldest blocks beyond blocks_kept
+            keys = sorted(
+                (key for key in self._snapshots if key[0] == provider),
+                key=lambda key: self._snapshots[key].fetched_at
+            )
+            for key in keys[:-self.blocks_kept]:
+                del self._snapshots[key]
+        return snapshot
+
+    def clear(self):
+        with self._guard:
+            self._snapshots.clear()
+            self._latest.clear()
+
+    def _lock_for(self, provider: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(provider, threading.Lock())
+
+    def _fetch(self, provider, fetch, block_number, validate, pinned=False) -> Snapshot:
+        """Read the chain and store the result, keeping the old snapshot on failure
+
+        A pinned read re-raises instead: the latest snapshot is from another block.
+        """
+        try:
+            block = block_number() if block_number else None
+        except Exception as e:
+            print(f"Error fetching block number for {provider} snapshot: {e}")
+            block = None
+
+        try:
+            # Read at the block the snapshot is keyed by
+            with read_at_block(block):
+                data = fetch()
+        except Exception:
+            latest = self._latest.get(provider)
+            if latest is not None and not pinned:
+                print(f"Error refreshing {provider} snapshot, serving block {latest.block_number}")
+                return latest
+            raise
+
+        return self._store(provider, data, block, validate, pinned)
+
+    async def _afetch(self, provider, fetch, block_number, validate, block=None) -> Snapshot:
+        """_fetch for coroutine fetchers; a given block is a pinned read"""
+        pinned = block is not None
+        try:
+            if block is None and block_number:
+                block = await block_number()
+        except Exception as e:
+            print(f"Error fetching block number for {provider} snapshot: {e}")
+            block = None
+
+        try:
+            with read_at_block(block):
+                data = await fetch()
+        except Exception:
+            latest = self._latest.get(provider)
+            if latest is not None and not pinned:
+                print(f"Error refreshing {provider} snapshot, serving block {latest.block_number}")
+                return latest
+            raise
+
+        return self._store(provider, data, block, validate, pinned)
+
+    def _store(self, provider, data, block, validate, pinned=False) -> Snapshot:
+        """Cache fetched data unless it fails validation with a good snapshot to serve instead"""
+        if validate is not None and not validate(data):
+            latest = self._latest.get(provider)
+            if latest is not None and not pinned:
+                print(f"Degraded {provider} data, serving snapshot from block {latest.block_number}")
+                return latest
+            # Nothing better to serve, but don't cache it
+            return Snapshot(provider=provider, data=data, block_number=block)
+
+        return self.put(provider, data, block)
+
+    def _refresh_in_background(self, provider, fetch, block_number, validate):
+        """Start one refresh for the provider unless one is already running"""
+        with self._guard:
+            if provider in self._refreshing:
+                return
+            self._refreshing.add(provider)
+
+        def run():
+            try:
+                with self._lock_for(provider):
+                    self._fetch(provider, fetch, block_number, validate)
+            except Exception as e:
+                print(f"Error refreshing {provider} snapshot in background: {e}")
+            finally:
+                with self._guard:
+                    self._refreshing.discard(provider)
+
+        threading.Thread(target=run, name=f"snapshot-{provider}", daemon=True).start()
+
+    def _refresh_task(self, provider, fetch, block_number, validate, block=None) -> asyncio.Task:
+        """The in-flight async fetch for the provider (at block, if given), starting one if none is running"""
+        key = provider if block is None else (provider, block)
+        task = self._inflight.get(key)
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            return task
+
+        task = asyncio.get_running_loop().create_task(
+            self._afetch(provider, fetch, block_number, validate, block),
+            name=f"snapshot-{provider}"
+        )
+
+        def finished(task):
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+            # Background refreshes have no awaiter, so their failures are reported here
+            if not task.cancelled() and task.exception() is not None:
+                print(f"Error refreshing {provider} snapshot: {task.exception()}")
+
+        task.add_done_callback(finished)
+        self._inflight[key] = task
+        return task
@@ -0,0 +1,166 @@
+# ai/services/swap_router.py
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .curve_simulator import CurveSimulator, CurveState
+
+@dataclass
+class RouteHop:
+    """One swap along a route, in raw token units"""
+    from_token: str
+    to_token: str
+    amount_in: int
+    amount_out: int
+    price_impact: float
+
+@dataclass
+class SwapRoute:
+    """A path through the pools and, once quoted, what each hop returns"""
+    tokens: List[str]
+    hops: List[RouteHop] = field(default_factory=list)
+    # Why the route couldn't be quoted, if it couldn't
+    error: Optional[str] = None
+
+    @property
+    def amount_out(self) -> int:
+        return self.hops[-1].amount_out if self.hops and self.error is None else 0
+
+class SwapRouter:
+    """Finds the best multi-hop swap through a set of Ambient pools
+
+    The pools form an undirected graph of tokens; every simple path of up to
+    max_hops pools between two tokens is a candidate route. Routes are
+    quoted on the pools' local curve states (see CurveSimulator), each hop
+    paying the previous hop's output, and the route returning the most of
+    the target token wins.
+    """
+
+    def __init__(self, service: Any, pairs: Sequence[Tuple[str, str]], max_hops: int = 3, fee_rate: float = 0.0):
+        """
+        Args:
+            service: AmbientService (or async), for token ordering and decimals
+            pairs: The pools to route through, as token symbol pairs
+            max_hops: Longest route considered, in pools
+            fee_rate: Pool fee charged on each hop's input
+        """
+        self.service = service
+        self.max_hops = max_hops
+        self.fee_rate = fee_rate
+        self.graph: Dict[str, List[str]] = {}
+        for token1, token2 in pairs:
+            for a, b in ((token1, token2), (token2, token1)):
+                neighbours = self.graph.setdefault(a, [])
+                if b not in neighbours:
+                    neighbours.append(b)
+
+    def routes(self, from_token: str, to_token: str) -> List[List[str]]:
+        """Every simple token path from from_token to to_token, shortest first"""
+        found = []
+
+        def extend(path: List[str]):
+            if path[-1] == to_token:
+                found.append(path)
+                return
+            if len(path) > self.max_hops:
+                return
+            for token in self.graph.get(path[-1], []):
+                if token not in path:
+                    extend(path + [token])
+
+        if from_token != to_token:
+            extend([from_token])
+        return sorted(found, key=len)
+
+    def pairs_on(self, routes: List[List[str]]) -> List[Tuple[str, str]]:
+        """The pools the routes go through, each once"""
+        pairs, seen = [], set()
+        for route in routes:
+            for hop in zip(route, route[1:]):
+                pool = self.service.get_token_pair(*hop)[:2]
+                if pool not in seen:
+                    seen.add(pool)
+                    pairs.append(hop)
+        return pairs
+
+    def quote(self, route: List[str], amount_in: int, states: Dict[Tuple[str, str], CurveState]) -> SwapRoute:
+        """Swap amount_in (raw) along route on the given curves"""
+        quoted = SwapRoute(tokens=list(route))
+        for from_token, to_token in zip(route, route[1:]):
+            base_addr, quote_addr, is_reversed = self.service.get_token_pair(from_token, to_token)
+            state = states.get((base_addr, quote_addr))
+            if state is None:
+                quoted.error = f"No curve for the {from_token}-{to_token} pool"
+                return quoted
+
+            # Same direction as the service's single-pair quotes; paying base pushes the price up
+            pays_base, in_base_qty = self.service._swap_direction(from_token, base_addr)
+            try:
+                base_flow, quote_flow, final_price = CurveSimulator(state, self.fee_rate).calc_impact(pays_base, in_base_qty, amount_in)
+            except ValueError as e:
+                quoted.error = f"{from_token}-{to_token}: {e}"
+                return quoted
+
+            amount_out = -quote_flow if pays_base else -base_flow
+            price_ratio = (final_price / 2**64 / state.sqrt_price) ** 2
+            quoted.hops.append(RouteHop(
+                from_token=from_token,
+                to_token=to_token,
+                amount_in=amount_in,
+                amount_out=amount_out,
+                price_impact=abs(price_ratio - 1) if pays_base else abs(1 / price_ratio - 1)
+            ))
+            amount_in = amount_out
+        return quoted
+
+    def best_route(
+        self,
+        from_token: str,
+        to_token: str,
+        amount: Decimal,
+        states: Dict[Tuple[str, str], CurveState],
+        routes: Optional[List[List[str]]] = None
+    ) -> Dict[str, Any]:
+        """Quote every route and report the one returning the most
+
+        Raises:
+            ValueError: If no route between the tokens can be quoted
+        """
+        routes = self.routes(from_token, to_token) if routes is None else routes
+        amount_in = self.service._raw_amount(from_token, amount)
+        quoted = [self.quote(route, amount_in, states) for route in routes]
+        filled = sorted((route for route in quoted if route.error is None), key=lambda route: route.amount_out, reverse=True)
+        if not filled:
+            reasons = "; ".join(route.error for route in quoted) or "no pools connect them"
+            raise ValueError(f"No route from {from_token} to {to_token}: {reasons}")
+
+        return {
+            **self.describe(filled[0], amount),
+            "alternatives": [
+                {"route": route.tokens, "output_amount": self._amount(route.tokens[-1], route.amount_out)}
+                for route in filled[1:]
+            ]
+        }
+
+    def describe(self, route: SwapRoute, amount: Decimal) -> Dict[str, Any]:
+        """A quoted route in token units, shaped like calculate_swap_impact"""
+        return {
+            "input_amount": float(amount),
+            "output_amount": self._amount(route.tokens[-1], route.amount_out),
+            "from_token": route.tokens[0],
+            "to_token": route.tokens[-1],
+            "route": route.tokens,
+            "hops": [
+                {
+                    "from_token": hop.from_token,
+                    "to_token": hop.to_token,
+                    "input_amount": self._amount(hop.from_token, hop.amount_in),
+                    "output_amount": self._amount(hop.to_token, hop.amount_out),
+                    "price_impact": hop.price_impact
+                }
+                for hop in route.hops
+            ]
+        }
+
+    def _amount(self, token: str, raw_amount: int) -> float:
+        return raw_amount / 10 ** self.service.DECIMALS.get(token, 18)
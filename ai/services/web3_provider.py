@@ -0,0 +1,414 @@
+# ai/services/web3_provider.py
+import asyncio
+import os
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from web3 import AsyncWeb3, Web3
+from web3._utils.http_session_manager import HTTPSessionManager
+
+from .circuit_breaker import RPC_BREAKER_ENABLED, CircuitBreaker
+
+# httpx with h2 is only needed for RPC_HTTP2=true
+try:
+    import httpx
+    import h2  # noqa: F401
+    has_http2 = True
+except ImportError:
+    has_http2 = False
+
+# Connections kept open per RPC host; size it to the worker threads issuing reads
+RPC_POOL_SIZE = int(os.getenv("RPC_POOL_SIZE", "32"))
+
+# Reuse connections across requests (set to "false" to close after each one)
+RPC_KEEPALIVE = os.getenv("RPC_KEEPALIVE", "true").lower() == "true"
+
+# Seconds before an RPC request is abandoned
+RPC_TIMEOUT_SECONDS = float(os.getenv("RPC_TIMEOUT_SECONDS", "10"))
+
+# Multiplex requests over one HTTP/2 connection (needs httpx[http2])
+RPC_HTTP2 = os.getenv("RPC_HTTP2", "false").lower() == "true"
+
+# Answers that never change for an endpoint, cached by the provider instead of
+# being re-sent before every call
+CACHED_RPC_METHODS = {"eth_chainId", "net_version"}
+
+class _CountingPoolMixin:
+    """Counts the sockets a connection pool actually opens
+
+    urllib3 reconnects a closed connection in place, so its own num_connections
+    undercounts; wrapping connect() sees every new socket.
+    """
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        connect = conn.connect
+
+        def counting_connect():
+            with self._sockets_lock:
+                self.sockets_opened += 1
+            return connect()
+
+        conn.connect = counting_connect
+        return conn
+
+    def _init_counters(self):
+        self.sockets_opened = 0
+        self._sockets_lock = threading.Lock()
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_counters()
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._init_counters()
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools report how many sockets they opened"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool
+        }
+
+class _Http2Response:
+    """Gives an httpx response the parts of requests.Response web3 uses"""
+
+    def __init__(self, response):
+        self._response = response
+        self.content = response.content
+
+    def raise_for_status(self):
+        if self._response.status_code >= 400:
+            raise requests.HTTPError(f"{self._response.status_code} from {self._response.url}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._response.close()
+
+class Http2Session:
+    """requests-compatible session backed by an HTTP/2 httpx client
+
+    Concurrent reads share multiplexed streams on one connection per host
+    instead of each taking a pooled HTTP/1.1 connection.
+    """
+
+    def __init__(self, pool_size: int, keepalive: bool, timeout: float):
+        self.client = httpx.Client(
+            http2=True,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size if keepalive else 0
+            )
+        )
+        self.requests = 0
+        self.http2_requests = 0
+        self._lock = threading.Lock()
+
+    def post(self, url, data=None, headers=None, timeout=None, stream=False, **kwargs):
+        response = self.client.post(url, content=data, headers=headers, timeout=timeout)
+        with self._lock:
+            self.requests += 1
+            if response.http_version == "HTTP/2":
+                self.http2_requests += 1
+        return _Http2Response(response)
+
+    def close(self):
+        self.client.close()
+
+class _SharedAsyncSessionManager(HTTPSessionManager):
+    """Hands web3 the factory's aiohttp session instead of caching its own"""
+
+    def __init__(self, factory: "RpcProviderFactory"):
+        super().__init__()
+        self._factory = factory
+
+    async def async_cache_and_return_session(self, endpoint_uri, session=None, request_timeout=None):
+        return self._factory.async_session()
+
+class GuardedHTTPProvider(Web3.HTTPProvider):
+    """HTTPProvider whose requests go through the endpoint's circuit breaker"""
+
+    def __init__(self, endpoint_uri: str, breaker: Optional[CircuitBreaker] = None, **kwargs):
+        super().__init__(endpoint_uri, **kwargs)
+        self.breaker = breaker
+
+    def make_request(self, method, params):
+        if self.breaker is None:
+            return super().make_request(method, params)
+        return self.breaker.call(lambda: super(GuardedHTTPProvider, self).make_request(method, params))
+
+    def make_batch_request(self, batch_requests):
+        if self.breaker is None:
+            return super().make_batch_request(batch_requests)
+        return self.breaker.call(lambda: super(GuardedHTTPProvider, self).make_batch_request(batch_requests))
+
+class PooledAsyncHTTPProvider(AsyncWeb3.AsyncHTTPProvider):
+    """AsyncHTTPProvider that sends requests through the factory's shared aiohttp session
+
+    web3's default async session closes the connection after every request;
+    this one keeps them open and shares one pool per event loop across services.
+    Requests go through the endpoint's circuit breaker, shared with the sync
+    providers.
+    """
+
+    def __init__(self, endpoint_uri: str, factory: "RpcProviderFactory", breaker: Optional[CircuitBreaker] = None, **kwargs):
+        super().__init__(endpoint_uri, **kwargs)
+        self._request_session_manager = _SharedAsyncSessionManager(factory)
+        self.breaker = breaker
+
+    async def make_request(self, method, params):
+        if self.breaker is None:
+            return await super().make_request(method, params)
+        return await self.breaker.acall(lambda: super(PooledAsyncHTTPProvider, self).make_request(method, params))
+
+    async def make_batch_request(self, batch_requests):
+        if self.breaker is None:
+            return await super().make_batch_request(batch_requests)
+        return await self.breaker.acall(lambda: super(PooledAsyncHTTPProvider, self).make_batch_request(batch_requests))
+
+class AsyncOnce:
+    """Runs a coroutine function to completion once
+
+    Concurrent callers on the same event loop wait on the same run instead of
+    repeating it. A run that raises isn't remembered, so the next call retries.
+    """
+
+    def __init__(self):
+        self.done = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self, func):
+        if self.done:
+            return
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.get_loop() is not loop:
+            self._task = loop.create_task(func())
+        task = self._task
+        try:
+            await asyncio.shield(task)
+            self.done = True
+        finally:
+            if self._task is task and task.done():
+                self._task = None
+
+class RpcProviderFactory:
+    """Hands every service a Web3 provider backed by one shared, pooled session
+
+    By default web3 keeps a separate requests.Session per thread, so
+    concurrent reads from the provider and strategy executors each open their
+    own connections. Here all services and threads share one keep-alive pool per
+    RPC host, sized by RPC_POOL_SIZE. Async providers get the same treatment
+    with one aiohttp session per event loop.
+
+    Every provider for an endpoint, sync or async, shares one CircuitBreaker,
+    so once the node stops answering all services fail fast together instead
+    of each waiting out RPC_TIMEOUT_SECONDS.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = RPC_POOL_SIZE,
+        keepalive: bool = RPC_KEEPALIVE,
+        timeout: float = RPC_TIMEOUT_SECONDS,
+        http2: bool = RPC_HTTP2,
+        breakers: bool = RPC_BREAKER_ENABLED
+    ):
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.http2 = http2
+        self.breakers = breakers
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        if http2 and not has_http2:
+            print("Warning: RPC_HTTP2 needs httpx with h2 installed, continuing with HTTP/1.1")
+            self.http2 = False
+        self._session = None
+        self._lock = threading.Lock()
+        self._async_sessions: Dict[int, aiohttp.ClientSession] = {}
+        self._async_stats: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def session(self):
+        """The shared session, built on first use"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self):
+        if self.http2:
+            return Http2Session(self.pool_size, self.keepalive, self.timeout)
+
+        session = requests.Session()
+        adapter = PooledHTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def breaker(self, endpoint_uri: str) -> Optional[CircuitBreaker]:
+        """The endpoint's circuit breaker, built on first use (None if breakers are off)"""
+        if not self.breakers:
+            return None
+        with self._lock:
+            breaker = self._breakers.get(endpoint_uri)
+            if breaker is None:
+                breaker = CircuitBreaker(endpoint_uri, probe=lambda: self._probe(endpoint_uri))
+                self._breakers[endpoint_uri] = breaker
+        return breaker
+
+    def circuit_open(self, endpoint_uri: str) -> bool:
+        """Whether requests to endpoint_uri are currently being failed fast"""
+        breaker = self._breakers.get(endpoint_uri)
+        return breaker is not None and breaker.is_open
+
+    def _probe(self, endpoint_uri: str):
+        """One eth_blockNumber sent past the breaker, raising unless the node answers"""
+        response = Web3.HTTPProvider(
+            endpoint_uri,
+            request_kwargs={"timeout": self.timeout},
+            session=self.session
+        ).make_request("eth_blockNumber", [])
+        if "error" in response:
+            raise ConnectionError(f"Probe of {endpoint_uri} failed: {response['error']}")
+
+    def provider(self, endpoint_uri: str) -> Web3.HTTPProvider:
+        """HTTP provider for endpoint_uri using the shared session"""
+        headers = dict(Web3.HTTPProvider.get_request_headers())
+        if not self.keepalive:
+            headers["Connection"] = "close"
+        return GuardedHTTPProvider(
+            endpoint_uri,
+            breaker=self.breaker(endpoint_uri),
+            request_kwargs={"timeout": self.timeout, "headers": headers},
+            session=self.session,
+            cache_allowed_requests=True,
+            cacheable_requests=CACHED_RPC_METHODS
+        )
+
+    def web3(self, endpoint_uri: str) -> Web3:
+        return Web3(self.provider(endpoint_uri))
+
+    def async_session(self) -> aiohttp.ClientSession:
+        """The shared aiohttp session for the running event loop, built on first use"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            session = self._async_sessions.get(id(loop))
+            if session is None or session.closed:
+                session = self._build_async_session()
+                self._async_sessions[id(loop)] = session
+        return session
+
+    def _build_async_session(self) -> aiohttp.ClientSession:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._on_async_request)
+        trace_config.on_connection_create_end.append(self._on_async_connection)
+        return aiohttp.ClientSession(
+            raise_for_status=True,
+            connector=aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size,
+                force_close=not self.keepalive,
+                enable_cleanup_closed=True
+            ),
+            trace_configs=[trace_config]
+        )
+
+    def _async_host_stats(self, url) -> Dict[str, int]:
+        parts = urlsplit(str(url))
+        host = f"{parts.scheme}://{parts.hostname}:{parts.port or (443 if parts.scheme == 'https' else 80)}"
+        return self._async_stats.setdefault(host, {"requests": 0, "connections_opened": 0})
+
+    async def _on_async_request(self, session, context, params):
+        context.url = params.url
+        self._async_host_stats(params.url)["requests"] += 1
+
+    async def _on_async_connection(self, session, context, params):
+        self._async_host_stats(getattr(context, "url", ""))["connections_opened"] += 1
+
+    def async_provider(self, endpoint_uri: str) -> PooledAsyncHTTPProvider:
+        """Async HTTP provider for endpoint_uri using the shared aiohttp session"""
+        headers = dict(Web3.HTTPProvider.get_request_headers())
+        if not self.keepalive:
+            headers["Connection"] = "close"
+        return PooledAsyncHTTPProvider(
+            endpoint_uri,
+            self,
+            breaker=self.breaker(endpoint_uri),
+            request_kwargs={"timeout": aiohttp.ClientTimeout(total=self.timeout), "headers": headers},
+            cache_allowed_requests=True,
+            cacheable_requests=CACHED_RPC_METHODS
+        )
+
+    def async_web3(self, endpoint_uri: str) -> AsyncWeb3:
+        return AsyncWeb3(self.async_provider(endpoint_uri))
+
+    def stats(self) -> Dict[str, Any]:
+        """Connection reuse per RPC host, for sizing the pool against the worker count"""
+        stats: Dict[str, Any] = {
+            "pool_size": self.pool_size,
+            "keepalive": self.keepalive,
+            "timeout_seconds": self.timeout,
+            "http2": self.http2,
+            "hosts": {},
+            "async_hosts": {},
+            "breakers": {uri: breaker.describe() for uri, breaker in list(self._breakers.items())}
+        }
+        for host, counts in list(self._async_stats.items()):
+            stats["async_hosts"][host] = _reuse_stats(counts["requests"], counts["connections_opened"])
+
+        session = self._session
+        if session is None:
+            return stats
+
+        if isinstance(session, Http2Session):
+            stats["requests"] = session.requests
+            stats["http2_requests"] = session.http2_requests
+            return stats
+
+        adapter = session.get_adapter("http://")
+        for pool_key, pool in list(adapter.poolmanager.pools._container.items()):
+            requests_made = pool.num_requests
+            connections = getattr(pool, "sockets_opened", pool.num_connections)
+            stats["hosts"][f"{pool_key.key_scheme}://{pool_key.key_host}:{pool_key.key_port}"] = _reuse_stats(
+                requests_made, connections
+            )
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    async def aclose(self):
+        """Close the running loop's aiohttp session (sessions can't be closed from another loop)"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            session = self._async_sessions.pop(id(loop), None)
+        if session is not None and not session.closed:
+            await session.close()
+
+def _reuse_stats(requests_made: int, connections: int) -> Dict[str, Any]:
+    return {
+        "requests": requests_made,
+        "connections_opened": connections,
+        "reuse_ratio": round(1 - connections / requests_made, 3) if requests_made else None
+    }
+
+# Shared by every service in the process
+rpc_provider_factory = RpcProviderFactory()
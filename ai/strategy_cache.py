@@ -0,0 +1,207 @@
+# ai/strategy_cache.py
+import copy
+import hashlib
+import json
+import math
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Set to "false" to always call the LLM
+STRATEGY_CACHE_ENABLED = os.getenv("STRATEGY_CACHE_ENABLED", "true").lower() == "true"
+
+# Parsed strategies kept in memory
+STRATEGY_CACHE_SIZE = int(os.getenv("STRATEGY_CACHE_SIZE", "256"))
+
+# On-disk store shared across restarts and workers; empty disables it
+STRATEGY_CACHE_DIR = os.getenv(
+    "STRATEGY_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "bulwark-strategy-cache")
+)
+
+# Size bound of the on-disk store, oldest entries evicted first
+STRATEGY_CACHE_MAX_BYTES = int(os.getenv("STRATEGY_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# Relative width of a balance bucket (0.1 = balances within ~10% share a key)
+STRATEGY_CACHE_BALANCE_BUCKET = float(os.getenv("STRATEGY_CACHE_BALANCE_BUCKET", "0.1"))
+
+# APYs are rounded to this many percentage points
+STRATEGY_CACHE_APY_STEP = float(os.getenv("STRATEGY_CACHE_APY_STEP", "0.25"))
+
+# Bump when the prompt or the Strategy format changes to orphan old entries
+STRATEGY_CACHE_VERSION = 1
+
+# Context sections whose numbers are rates, rounded to STRATEGY_CACHE_APY_STEP
+RATE_KEYS = {"apy_rates", "rates", "interest_rates", "stability_pool_apy"}
+
+def bucket_amount(value: float, ratio: float = STRATEGY_CACHE_BALANCE_BUCKET) -> Optional[str]:
+    """Logarithmic bucket of an amount: values within a factor of (1 + ratio) share one"""
+    if value != value:
+        return None
+    if abs(value) < 1e-12:
+        return "zero"
+    index = math.floor(math.log(abs(value)) / math.log1p(ratio))
+    return f"{'-' if value < 0 else '+'}{index}"
+
+def round_rate(value: float, step: float = STRATEGY_CACHE_APY_STEP) -> int:
+    """Index of the nearest multiple of step"""
+    return int(round(value / step))
+
+def quantize(value: Any, rate: bool = False) -> Any:
+    """Replace the numbers in a context with their buckets so near-identical inputs match
+
+    Numbers under a rate section are rounded to STRATEGY_CACHE_APY_STEP; every
+    other number (balances, TVL, risk metrics) is bucketed logarithmically.
+    """
+    if isinstance(value, dict):
+        return {str(k): quantize(v, rate or k in RATE_KEYS) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [quantize(v, rate) for v in value]
+    if isinstance(value, bool) or value is None:
+        return value
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return value
+    return round_rate(number) if rate else bucket_amount(number)
+
+def strategy_cache_key(context: Dict[str, Any], strategy_type: str) -> str:
+    """Canonical hash of the quantized context and strategy type"""
+    canonical = json.dumps(
+        {
+            "version": STRATEGY_CACHE_VERSION,
+            "strategy_type": strategy_type,
+            "context": quantize(context)
+        },
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+class StrategyCache:
+    """Two-tier cache of generated strategies: an in-memory LRU backed by a directory
+
+    Entries are JSON-serializable strategy dicts keyed by strategy_cache_key. A
+    memory miss falls through to disk and promotes the entry. The disk store
+    evicts least recently used files once it grows past max_bytes.
+    """
+
+    def __init__(
+        self,
+        size: int = STRATEGY_CACHE_SIZE,
+        directory: Optional[str] = STRATEGY_CACHE_DIR,
+        max_bytes: int = STRATEGY_CACHE_MAX_BYTES
+    ):
+        self.size = size
+        self.directory = directory or None
+        self.max_bytes = max_bytes
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.directory:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+            except OSError as e:
+                print(f"Warning: Strategy cache directory unavailable, using memory only: {e}")
+                self.directory = None
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Copy of the cached strategy for key, or None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return copy.deepcopy(entry)
+
+        entry = self._read(key)
+        if entry is not None:
+            self._remember(key, entry)
+            return copy.deepcopy(entry)
+        return None
+
+    def put(self, key: str, strategy: Dict) -> None:
+        """Store a strategy in memory and on disk"""
+        entry = copy.deepcopy(strategy)
+        self._remember(key, entry)
+        self._write(key, entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+
+    def _remember(self, key: str, entry: Dict) -> None:
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.size:
+                self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read(self, key: str) -> Optional[Dict]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            # Touch so eviction sees it as recently used
+            os.utime(path, None)
+            return entry
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Warning: Dropping unreadable strategy cache entry {key}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def _write(self, key: str, entry: Dict) -> None:
+        if not self.directory:
+            return
+        try:
+            # Write then rename so concurrent readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"Warning: Could not write strategy cache entry: {e}")
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        """Remove least recently used files until the store fits in max_bytes"""
+        files = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
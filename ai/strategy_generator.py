@@ -1,15 +1,184 @@
 # ai/strategy_generator.py
-from typing import Dict, List, Optional
-from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from dataclasses import dataclass, field
 from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+import contextvars
 import os
 import json
+import time
+import threading
 from dotenv import load_dotenv
 from openai import OpenAI
 
+from ai.strategy_cache import StrategyCache, strategy_cache_key, STRATEGY_CACHE_ENABLED
+from ai.strategy_optimizer import StrategyOptimizer
+from ai.services.price_service import FALLBACK_TOKEN_PRICES, PriceService
+
 # Load environment variables
 load_dotenv()
 
+# Strategy types, from most conservative to most aggressive
+STRATEGY_TYPES = ["Anchor", "Zenith", "Wildcard"]
+
+# Per-strategy deadline (seconds) for LLM generation
+STRATEGY_TIMEOUT_SECONDS = float(os.getenv("STRATEGY_TIMEOUT_SECONDS", "60"))
+
+# Bounded pool shared by all requests for concurrent LLM calls
+STRATEGY_MAX_WORKERS = int(os.getenv("STRATEGY_MAX_WORKERS", "12"))
+
+# Wallets generated at once in a batch request; each one can itself hold up to
+# three tier calls in the pool above, so keep this at a third of it or less
+STRATEGY_BATCH_CONCURRENCY = int(os.getenv("STRATEGY_BATCH_CONCURRENCY", "4"))
+
+# Generation modes: one LLM call per tier, one call returning all tiers, or the
+# local optimizer with no LLM call for the steps
+PER_TIER_MODE = "per_tier"
+COMBINED_MODE = "combined"
+OPTIMIZER_MODE = "optimizer"
+STRATEGY_GENERATION_MODE = os.getenv("STRATEGY_GENERATION_MODE", PER_TIER_MODE)
+
+# In optimizer mode, have the LLM rewrite the explanations (one call for all tiers)
+OPTIMIZER_LLM_EXPLANATIONS = os.getenv("OPTIMIZER_LLM_EXPLANATIONS", "false").lower() == "true"
+
+# Strategy descriptions and risk levels based on frontend
+STRATEGY_DESCRIPTIONS = {
+    "Anchor": {
+        "description": "Conservative strategy focused on steady growth over time. Should prioritize low-risk activities with minimal volatility.",
+        "risk_level": 1,
+        "apy_range": "2-5%"
+    },
+    "Zenith": {
+        "description": "Balanced performance strategy that creates moderate leverage while maintaining reasonable risk levels.",
+        "risk_level": 3,
+        "apy_range": "5-15%"
+    },
+    "Wildcard": {
+        "description": "Aggressive strategy for risk-takers that maximizes yield through leveraging and higher-risk positions.",
+        "risk_level": 5,
+        "apy_range": "15-30%"
+    }
+}
+
+# Protocol guidance shared by the per-tier and combined prompts
+PROTOCOL_GUIDELINES = """    Protocol-Specific Guidelines:
+    - AAVE: 
+    * Supply APYs typically range from 1-4%
+    * Borrow rates are typically negative 2-5%
+    * Example: { "protocol": "AAVE", "action": "supply", "token": "USDC", "amount": 5.0, "expected_apy": 2.2 }
+
+    - Ambient DEX:
+    * Swaps have 0% APY (they're conversions, not yield-generating)
+    * Liquidity provision typically yields 2-7% APY
+    * Example: { "protocol": "Ambient", "action": "add_liquidity", "pair": "ETH-USDC", "amount": 2.5, "expected_apy": 4.0 }
+
+    - Quill Finance:
+    * Borrowing USDQ has negative APY (cost of borrowing)
+    * Interest rates range from 6% to 15%
+    * Stability pool deposits yield 5-15% APY
+    * When borrowing USDQ, ALWAYS specify what you'll do with it in a following step
+    * Example: { "protocol": "Quill", "action": "borrow_usdq", "token": "ETH", "amount": 0.005, "usdq_amount": 5.0, "interest_rate": 10, "expected_apy": -10.0 }
+
+"""
+
+_STEP_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "protocol": {"type": "string", "enum": ["AAVE", "Ambient", "Quill"]},
+        "action": {"type": "string"},
+        "token": {"type": "string"},
+        "amount": {"type": "number"},
+        "expected_apy": {"type": "number"},
+        "pair": {"type": "string", "description": "Only required for Ambient liquidity"},
+        "token_to": {"type": "string", "description": "Only required for Ambient swaps"},
+        "interest_rate": {"type": "number", "description": "Only required for Quill borrowing"},
+        "usdq_amount": {"type": "number", "description": "Only required for Quill borrowing"}
+    },
+    "required": ["protocol", "action", "token", "amount", "expected_apy"]
+}
+
+# Token names validate_strategy treats as the same balance
+VALIDATION_TOKEN_MAPPING = {
+    "WETH": "ETH",  # Map WETH to ETH
+    "ETH": "ETH",
+    "USDC": "USDC",
+    "SRC": "SRC",
+    "SCR": "SRC"   # Map SCR to SRC if needed
+}
+
+# JSON schema for the single-call response holding all three tiers
+COMBINED_STRATEGIES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "strategies": {
+            "type": "array",
+            "minItems": 3,
+            "maxItems": 3,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string", "enum": list(STRATEGY_DESCRIPTIONS)},
+                    "risk_level": {"type": "integer"},
+                    "steps": {"type": "array", "items": _STEP_SCHEMA},
+                    "explanation": {"type": "string"},
+                    "total_expected_apy": {"type": "number"},
+                    "risk_factors": {"type": "array", "items": {"type": "string"}}
+                },
+                "required": ["name", "risk_level", "steps", "explanation", "total_expected_apy", "risk_factors"]
+            }
+        }
+    },
+    "required": ["strategies"]
+}
+
+# JSON schema for the explanations the LLM writes for optimizer strategies
+EXPLANATIONS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "explanations": {
+            "type": "object",
+            "properties": {name: {"type": "string"} for name in STRATEGY_TYPES}
+        }
+    },
+    "required": ["explanations"]
+}
+
+@dataclass
+class GenerationStats:
+    """Token usage and latency of one strategy generation run"""
+    mode: str = PER_TIER_MODE
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cache_hits: int = 0
+    latency_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record_usage(self, usage) -> None:
+        """Add one LLM response's usage (safe to call from concurrent tiers)"""
+        with self._lock:
+            self.llm_calls += 1
+            if usage is not None:
+                self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+                self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+                self.total_tokens += getattr(usage, "total_tokens", 0) or 0
+
+    def record_cache_hit(self) -> None:
+        with self._lock:
+            self.cache_hits += 1
+
+    def to_dict(self) -> Dict:
+        return {
+            "mode": self.mode,
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "cache_hits": self.cache_hits,
+            "latency_seconds": round(self.latency_seconds, 3)
+        }
+
 @dataclass
 class StrategyStep:
     protocol: str
@@ -32,8 +201,34 @@ class Strategy:
     risk_factors: List[str]
 
 class StrategyGenerator:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def __init__(
+        self,
+        generation_mode: str = STRATEGY_GENERATION_MODE,
+        cache: Optional[StrategyCache] = None,
+        llm_explanations: bool = OPTIMIZER_LLM_EXPLANATIONS,
+        price_service: Optional[PriceService] = None,
+        client: Optional[OpenAI] = None
+    ):
+        # LLM client; one built from OPENAI_API_KEY unless given
+        self.client = client if client is not None else OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        
+        # Parsed strategies for near-identical inputs, reused instead of calling the LLM
+        if cache is None and STRATEGY_CACHE_ENABLED:
+            cache = StrategyCache()
+        self.cache = cache
+        
+        # "per_tier" (one LLM call per strategy), "combined" (one call for all
+        # three) or "optimizer" (computed locally)
+        if generation_mode not in (PER_TIER_MODE, COMBINED_MODE, OPTIMIZER_MODE):
+            raise ValueError(f"Unknown strategy generation mode: {generation_mode}")
+        self.generation_mode = generation_mode
+        
+        # Computes the steps in optimizer mode; the LLM only writes explanations if enabled
+        self.optimizer = StrategyOptimizer()
+        self.llm_explanations = llm_explanations
+        
+        # On-chain token prices for validation; the fallback prices without one
+        self.price_service = price_service
         
         # Token name mapping (from service to frontend display)
         self.token_mapping = {
@@ -45,6 +240,19 @@ class StrategyGenerator:
         # Reverse mapping for converting back
         self.reverse_token_mapping = {v: k for k, v in self.token_mapping.items()}
         
+        # Runs the per-tier LLM calls concurrently
+        self.executor = ThreadPoolExecutor(
+            max_workers=STRATEGY_MAX_WORKERS,
+            thread_name_prefix="strategy"
+        )
+        
+        # Runs whole wallets in batch requests; separate from the tier pool so a
+        # wallet waiting on its tiers can never starve them of workers
+        self.batch_executor = ThreadPoolExecutor(
+            max_workers=STRATEGY_BATCH_CONCURRENCY,
+            thread_name_prefix="strategy-batch"
+        )
+        
     def prepare_context(
         self,
         wallet_data: Dict,
@@ -101,13 +309,8 @@ class StrategyGenerator:
         }
         return json.dumps(context, indent=2)
 
-    def _build_prompt(self, context: str, strategy_type: str) -> str:
-        """Build the prompt for strategy generation
-        
-        Args:
-            context: JSON string with wallet and market data
-            strategy_type: "Anchor" (conservative), "Zenith" (balanced), or "Wildcard" (aggressive)
-        """
+    def _context_balances(self, context: str) -> Tuple:
+        """Extract the ETH, USDC and SRC balances quoted in the prompts"""
         # Parse the context string to extract wallet balances
         try:
             context_dict = json.loads(context)
@@ -120,28 +323,19 @@ class StrategyGenerator:
             eth_balance = "unknown"
             usdc_balance = "unknown"
             src_balance = "unknown"
+        return eth_balance, usdc_balance, src_balance
+
+    def _build_prompt(self, context: str, strategy_type: str) -> str:
+        """Build the prompt for strategy generation
         
-        # Strategy descriptions and risk levels based on frontend
-        strategy_descriptions = {
-            "Anchor": {
-                "description": "Conservative strategy focused on steady growth over time. Should prioritize low-risk activities with minimal volatility.",
-                "risk_level": 1,
-                "apy_range": "2-5%"
-            },
-            "Zenith": {
-                "description": "Balanced performance strategy that creates moderate leverage while maintaining reasonable risk levels.",
-                "risk_level": 3,
-                "apy_range": "5-15%"
-            },
-            "Wildcard": {
-                "description": "Aggressive strategy for risk-takers that maximizes yield through leveraging and higher-risk positions.",
-                "risk_level": 5,
-                "apy_range": "15-30%"
-            }
-        }
+        Args:
+            context: JSON string with wallet and market data
+            strategy_type: "Anchor" (conservative), "Zenith" (balanced), or "Wildcard" (aggressive)
+        """
+        eth_balance, usdc_balance, src_balance = self._context_balances(context)
         
         # Get the specific strategy details
-        strategy_info = strategy_descriptions.get(strategy_type, strategy_descriptions["Anchor"])
+        strategy_info = STRATEGY_DESCRIPTIONS.get(strategy_type, STRATEGY_DESCRIPTIONS["Anchor"])
         
         return f"""You are an AI-powered DeFi strategy generator for the Scroll network. Based on the following wallet and market data:
     {context}
@@ -159,25 +353,7 @@ class StrategyGenerator:
     5. DETAILED EXPLANATIONS: Provide clear, informative explanations that educate users on the strategy's logic.
     6. REALISTIC APYs: For {strategy_type}, total APY should be in the {strategy_info["apy_range"]} range.
 
-    Protocol-Specific Guidelines:
-    - AAVE: 
-    * Supply APYs typically range from 1-4%
-    * Borrow rates are typically negative 2-5%
-    * Example: {{ "protocol": "AAVE", "action": "supply", "token": "USDC", "amount": 5.0, "expected_apy": 2.2 }}
-
-    - Ambient DEX:
-    * Swaps have 0% APY (they're conversions, not yield-generating)
-    * Liquidity provision typically yields 2-7% APY
-    * Example: {{ "protocol": "Ambient", "action": "add_liquidity", "pair": "ETH-USDC", "amount": 2.5, "expected_apy": 4.0 }}
-
-    - Quill Finance:
-    * Borrowing USDQ has negative APY (cost of borrowing)
-    * Interest rates range from 6% to 15%
-    * Stability pool deposits yield 5-15% APY
-    * When borrowing USDQ, ALWAYS specify what you'll do with it in a following step
-    * Example: {{ "protocol": "Quill", "action": "borrow_usdq", "token": "ETH", "amount": 0.005, "usdq_amount": 5.0, "interest_rate": 10, "expected_apy": -10.0 }}
-
-    Available Balances: ETH: {eth_balance}, USDC: {usdc_balance}, SRC: {src_balance}
+{PROTOCOL_GUIDELINES}    Available Balances: ETH: {eth_balance}, USDC: {usdc_balance}, SRC: {src_balance}
 
     Examples of valid strategy structures:
     1. Simple conservative (Anchor):
@@ -215,27 +391,8 @@ class StrategyGenerator:
     }}
     """
         
-    def generate_strategy(
-        self,
-        wallet_data: Dict,
-        market_data: Dict,
-        risk_metrics: Dict,
-        strategy_type: str
-    ) -> Strategy:
-        """Generate a strategy based on the provided data
-        
-        Args:
-            wallet_data: Dictionary with token balances
-            market_data: Dictionary with protocol rates and TVL
-            risk_metrics: Dictionary with risk assessment metrics
-            strategy_type: "Anchor" (conservative), "Zenith" (balanced), or "Wildcard" (aggressive)
-            
-        Returns:
-            Strategy object with the generated strategy
-        """
-        context = self.prepare_context(wallet_data, market_data, risk_metrics)
-        prompt = self._build_prompt(context, strategy_type)
-        
+    def _complete(self, prompt: str, stats: Optional["GenerationStats"] = None) -> str:
+        """Send a prompt to the LLM and return the response text, recording usage in stats"""
         response = self.client.chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[
@@ -243,55 +400,310 @@ class StrategyGenerator:
                 {"role": "user", "content": prompt + "\n\nEnsure your response is valid JSON."}
             ],
             temperature=0.2,
-            response_format={ "type": "json_object" }
+            response_format={ "type": "json_object" },
+            timeout=STRATEGY_TIMEOUT_SECONDS
         )
-        
+        if stats is not None:
+            stats.record_usage(getattr(response, "usage", None))
+        return response.choices[0].message.content
+    
+    def _load_json_response(self, content: str) -> Dict:
+        """Parse an LLM response as JSON, extracting it from surrounding text if needed"""
         try:
             # Try to parse response as JSON
-            strategy_data = json.loads(response.choices[0].message.content)
-            return self._parse_strategy(strategy_data)
+            return json.loads(content)
         except json.JSONDecodeError as e:
             # If parsing fails, try to extract JSON from the response text
-            content = response.choices[0].message.content
             print(f"Warning: Failed to parse response as JSON. Response content: {content[:200]}...")
             # Try fallback parsing (if the model outputs explanatory text before/after JSON)
             import re
             json_match = re.search(r'\{.*\}', content, re.DOTALL)
             if json_match:
                 try:
-                    strategy_data = json.loads(json_match.group(0))
-                    return self._parse_strategy(strategy_data)
+                    return json.loads(json_match.group(0))
                 except json.JSONDecodeError:
                     raise ValueError(f"Could not extract valid JSON from response: {e}")
             else:
                 raise ValueError(f"Response is not in JSON format: {e}")
         
+    def generate_strategy(
+        self,
+        wallet_data: Dict,
+        market_data: Dict,
+        risk_metrics: Dict,
+        strategy_type: str,
+        stats: Optional["GenerationStats"] = None
+    ) -> Strategy:
+        """Generate a strategy based on the provided data
+        
+        Args:
+            wallet_data: Dictionary with token balances
+            market_data: Dictionary with protocol rates and TVL
+            risk_metrics: Dictionary with risk assessment metrics
+            strategy_type: "Anchor" (conservative), "Zenith" (balanced), or "Wildcard" (aggressive)
+            stats: Optional GenerationStats to record token usage in
+            
+        Returns:
+            Strategy object with the generated strategy
+        """
+        context = self.prepare_context(wallet_data, market_data, risk_metrics)
+        
+        cache_key = None
+        if self.cache is not None:
+            cache_key = strategy_cache_key(json.loads(context), strategy_type)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                if stats is not None:
+                    stats.record_cache_hit()
+                # Cached for a similar wallet, so fit it to this one's exact balances
+                validated = self.validate_strategy_logic(cached, self._validation_balances(wallet_data))
+                return self._parse_strategy(validated)
+        
+        prompt = self._build_prompt(context, strategy_type)
+        content = self._complete(prompt, stats)
+        strategy = self._parse_strategy(self._load_json_response(content))
+        
+        if cache_key is not None:
+            self.cache.put(cache_key, self._strategy_to_dict(strategy))
+        return strategy
+        
     def generate_all_strategies(
         self,
         wallet_data: Dict,
         market_data: Dict,
-        risk_metrics: Dict
+        risk_metrics: Dict,
+        timeout: Optional[float] = None,
+        stats: Optional["GenerationStats"] = None
     ) -> List[Strategy]:
         """Generate all three strategies (Anchor, Zenith, Wildcard)
         
+        In the default per-tier mode each strategy is its own LLM call, run
+        concurrently. In combined mode (generation_mode="combined") one call
+        returns all three tiers. In optimizer mode (generation_mode="optimizer")
+        they are computed locally.
+        
         Args:
             wallet_data: Dictionary with token balances
             market_data: Dictionary with protocol rates and TVL
             risk_metrics: Dictionary with risk assessment metrics
+            timeout: Per-strategy deadline in seconds (defaults to STRATEGY_TIMEOUT_SECONDS)
+            stats: Optional GenerationStats to record token usage and latency in
             
         Returns:
-            List of 3 Strategy objects, one for each strategy type
+            List of Strategy objects in Anchor, Zenith, Wildcard order. A strategy
+            that fails or misses its deadline is left out.
+            
+        Raises:
+            ValueError: If no strategy could be generated
         """
-        strategies = []
-        for strategy_type in ["Anchor", "Zenith", "Wildcard"]:
-            strategy = self.generate_strategy(
-                wallet_data, 
-                market_data, 
-                risk_metrics, 
-                strategy_type
+        if self.generation_mode == COMBINED_MODE:
+            return self.generate_combined_strategies(wallet_data, market_data, risk_metrics, stats)
+        if self.generation_mode == OPTIMIZER_MODE:
+            return self.generate_optimized_strategies(wallet_data, market_data, risk_metrics, stats)
+        
+        timeout = STRATEGY_TIMEOUT_SECONDS if timeout is None else timeout
+        started = time.monotonic()
+        if stats is not None:
+            stats.mode = PER_TIER_MODE
+        futures = {
+            strategy_type: self.executor.submit(
+                self.generate_strategy,
+                wallet_data,
+                market_data,
+                risk_metrics,
+                strategy_type,
+                stats
             )
-            strategies.append(strategy)
+            for strategy_type in STRATEGY_TYPES
+        }
+        
+        strategies = []
+        errors = []
+        for strategy_type, future in futures.items():
+            # All calls started together, so each waits only for what's left of its deadline
+            remaining = max(0.0, started + timeout - time.monotonic())
+            try:
+                strategies.append(future.result(timeout=remaining))
+            except FuturesTimeoutError:
+                print(f"Warning: {strategy_type} strategy timed out after {timeout}s")
+                future.cancel()
+                errors.append(f"{strategy_type}: timed out")
+            except Exception as e:
+                print(f"Warning: Failed to generate {strategy_type} strategy: {e}")
+                errors.append(f"{strategy_type}: {e}")
+        
+        if stats is not None:
+            stats.latency_seconds = time.monotonic() - started
+        
+        if not strategies:
+            raise ValueError(f"Could not generate any strategy ({'; '.join(errors)})")
+            
+        return strategies
+    
+    def _build_combined_prompt(self, context: str) -> str:
+        """Build one prompt asking for all three risk tiers, sharing the context once"""
+        eth_balance, usdc_balance, src_balance = self._context_balances(context)
+        
+        tiers = "\n".join(
+            f"    - {strategy_type} (risk level {info['risk_level']}, APY range {info['apy_range']}): {info['description']}"
+            for strategy_type, info in STRATEGY_DESCRIPTIONS.items()
+        )
+        
+        return f"""You are an AI-powered DeFi strategy generator for the Scroll network. Based on the following wallet and market data:
+    {context}
+
+    Generate three strategies, one for each of these risk tiers:
+{tiers}
+
+    You can use AAVE for lending/borrowing, Ambient DEX for swapping tokens or providing liquidity, and Quill Finance for borrowing USDQ stablecoin against collateral.
+
+    IMPORTANT RULES:
+    1. CREATE UNIQUE STRATEGIES: Each tier should be a distinct, insightful strategy - not a scaled copy of another.
+    2. TRACK TOKEN BALANCES: Each strategy starts from the full wallet; carefully track available balances through its steps.
+    3. LOGICAL FLOW: Ensure each step builds upon previous ones in a logical way.
+    4. FOLLOW-THROUGH: If borrowing tokens (especially USDQ), always use them productively in later steps.
+    5. DETAILED EXPLANATIONS: Provide clear, informative explanations that educate users on each strategy's logic.
+    6. REALISTIC APYs: Each strategy's total APY should be in its tier's range.
+
+{PROTOCOL_GUIDELINES}    Available Balances: ETH: {eth_balance}, USDC: {usdc_balance}, SRC: {src_balance}
+
+    Return all three strategies as JSON matching this schema:
+    {json.dumps(COMBINED_STRATEGIES_SCHEMA)}
+    """
+    
+    def generate_combined_strategies(
+        self,
+        wallet_data: Dict,
+        market_data: Dict,
+        risk_metrics: Dict,
+        stats: Optional["GenerationStats"] = None
+    ) -> List[Strategy]:
+        """Generate all three strategies with a single LLM call
+        
+        Sends the market/wallet context once instead of three times, trading
+        some per-tier focus for roughly a third of the input tokens.
+        
+        Args:
+            wallet_data: Dictionary with token balances
+            market_data: Dictionary with protocol rates and TVL
+            risk_metrics: Dictionary with risk assessment metrics
+            stats: Optional GenerationStats to record token usage and latency in
+            
+        Returns:
+            List of Strategy objects in Anchor, Zenith, Wildcard order
+        """
+        started = time.monotonic()
+        if stats is not None:
+            stats.mode = COMBINED_MODE
+        
+        context = self.prepare_context(wallet_data, market_data, risk_metrics)
+        prompt = self._build_combined_prompt(context)
+        
+        try:
+            content = self._complete(prompt, stats)
+            return self._parse_combined_strategies(self._load_json_response(content))
+        finally:
+            if stats is not None:
+                stats.latency_seconds = time.monotonic() - started
+    
+    def generate_optimized_strategies(
+        self,
+        wallet_data: Dict,
+        market_data: Dict,
+        risk_metrics: Dict,
+        stats: Optional["GenerationStats"] = None
+    ) -> List[Strategy]:
+        """Compute all three strategies with the local optimizer
+        
+        The steps and APYs come from StrategyOptimizer in milliseconds. With
+        llm_explanations on, one LLM call rewrites the explanations; if it
+        fails, the optimizer's own explanations are kept.
+        
+        Args:
+            wallet_data: Dictionary with token balances
+            market_data: Dictionary with protocol rates and TVL
+            risk_metrics: Dictionary with risk assessment metrics
+            stats: Optional GenerationStats to record token usage and latency in
             
+        Returns:
+            List of Strategy objects in Anchor, Zenith, Wildcard order
+        """
+        started = time.monotonic()
+        if stats is not None:
+            stats.mode = OPTIMIZER_MODE
+        
+        try:
+            strategies = self.optimizer.optimize_all(wallet_data, market_data, risk_metrics, STRATEGY_TYPES)
+            if self.llm_explanations:
+                try:
+                    explanations = self._explain_strategies(strategies, wallet_data, stats)
+                    for strategy in strategies:
+                        strategy["explanation"] = explanations.get(strategy["name"]) or strategy["explanation"]
+                except Exception as e:
+                    print(f"Warning: Failed to generate strategy explanations, using the optimizer's: {e}")
+            return [self._parse_strategy(strategy) for strategy in strategies]
+        finally:
+            if stats is not None:
+                stats.latency_seconds = time.monotonic() - started
+    
+    def _explain_strategies(
+        self,
+        strategies: List[Dict],
+        wallet_data: Dict,
+        stats: Optional["GenerationStats"] = None
+    ) -> Dict[str, str]:
+        """Ask the LLM for an explanation of each computed strategy, keyed by tier"""
+        summary = [
+            {key: strategy[key] for key in ("name", "risk_level", "steps", "total_expected_apy", "risk_factors")}
+            for strategy in strategies
+        ]
+        prompt = f"""You are an AI-powered DeFi strategy advisor for the Scroll network. A wallet holding {json.dumps(wallet_data)} has been given these strategies:
+    {json.dumps(summary)}
+
+    The steps and APYs are final. For each strategy, write a clear, educational explanation of why its steps work together and the risks involved.
+
+    Return JSON matching this schema:
+    {json.dumps(EXPLANATIONS_SCHEMA)}
+    """
+        data = self._load_json_response(self._complete(prompt, stats))
+        explanations = data.get("explanations") if isinstance(data, dict) else None
+        if not isinstance(explanations, dict):
+            raise ValueError("Response has no 'explanations' object")
+        return {name: text for name, text in explanations.items() if isinstance(text, str)}
+    
+    def _parse_combined_strategies(self, data: Dict) -> List[Strategy]:
+        """Parse a combined all-tiers response into Strategy objects
+        
+        Tiers are matched by name; a tier that is missing or fails to parse
+        is left out, as in per-tier mode.
+        
+        Raises:
+            ValueError: If the response holds no usable strategy
+        """
+        entries = data.get("strategies") if isinstance(data, dict) else None
+        if not isinstance(entries, list):
+            raise ValueError("Combined response has no 'strategies' list")
+        
+        by_name = {}
+        for entry in entries:
+            if isinstance(entry, dict) and entry.get("name") in STRATEGY_DESCRIPTIONS:
+                by_name.setdefault(entry["name"], entry)
+        
+        strategies = []
+        for strategy_type in STRATEGY_TYPES:
+            entry = by_name.get(strategy_type)
+            if entry is None:
+                print(f"Warning: Combined response is missing the {strategy_type} strategy")
+                continue
+            # Fill in the tier's risk level if the model left it out
+            entry.setdefault("risk_level", STRATEGY_DESCRIPTIONS[strategy_type]["risk_level"])
+            try:
+                strategies.append(self._parse_strategy(entry))
+            except Exception as e:
+                print(f"Warning: Failed to parse {strategy_type} strategy: {e}")
+        
+        if not strategies:
+            raise ValueError("Combined response contained no valid strategies")
         return strategies
         
     def _parse_strategy(self, data: Dict) -> Strategy:
@@ -404,39 +816,15 @@ class StrategyGenerator:
         
         This is useful for API responses
         """
-        strategies = self.generate_all_strategies(wallet_data, market_data, risk_metrics)
+        stats = GenerationStats(mode=self.generation_mode)
+        strategies = self.generate_all_strategies(wallet_data, market_data, risk_metrics, stats=stats)
         
-        # Get wallet balances for validation
-        wallet_balances = {k: float(v) for k, v in wallet_data.items()}
-        
-        # Add WETH to wallet balances if ETH exists (to handle token mapping)
-        if "ETH" in wallet_balances and "WETH" not in wallet_balances:
-            wallet_balances["WETH"] = wallet_balances["ETH"]
+        wallet_balances = self._validation_balances(wallet_data)
         
         # Convert to JSON-serializable format with validation
         result = {
             "strategies": [
-                self.validate_strategy_logic({
-                    "name": strategy.name,
-                    "risk_level": strategy.risk_level,
-                    "steps": [
-                        {
-                            "protocol": step.protocol,
-                            "action": step.action,
-                            "token": step.token,
-                            "amount": float(step.amount),
-                            "expected_apy": float(step.expected_apy),
-                            **({"token_to": step.token_to} if hasattr(step, "token_to") and step.token_to else {}),
-                            **({"pair": step.pair} if hasattr(step, "pair") and step.pair else {}),
-                            **({"interest_rate": step.interest_rate} if hasattr(step, "interest_rate") and step.interest_rate is not None else {}),
-                            **({"usdq_amount": float(step.usdq_amount)} if hasattr(step, "usdq_amount") and step.usdq_amount is not None else {})
-                        }
-                        for step in strategy.steps
-                    ],
-                    "explanation": strategy.explanation,
-                    "total_expected_apy": float(strategy.total_expected_apy),
-                    "risk_factors": strategy.risk_factors
-                }, wallet_balances)
+                self.validate_strategy_logic(self._strategy_to_dict(strategy), wallet_balances)
                 for strategy in strategies
             ],
             "wallet": {
@@ -444,25 +832,188 @@ class StrategyGenerator:
             },
             "market_data": {
                 "conditions": market_data.get("conditions", "stable")
-            }
+            },
+            "generation": stats.to_dict()
         }
         
         return result
 
+    def stream_strategies_json(
+        self,
+        wallet_data: Dict,
+        market_data: Dict,
+        risk_metrics: Dict,
+        timeout: Optional[float] = None,
+        stats: Optional["GenerationStats"] = None
+    ) -> Iterator[Tuple[str, Dict]]:
+        """Yield each validated strategy as soon as it is ready
+        
+        Per-tier mode starts all tiers at once and yields them in completion
+        order, so the first strategy costs a single LLM call. Combined and
+        optimizer modes yield all tiers at once.
+        
+        Args:
+            wallet_data: Dictionary with token balances
+            market_data: Dictionary with protocol rates and TVL
+            risk_metrics: Dictionary with risk assessment metrics
+            timeout: Overall deadline in seconds (defaults to STRATEGY_TIMEOUT_SECONDS)
+            stats: Optional GenerationStats to record token usage and latency in
+            
+        Yields:
+            ("strategy", validated strategy dict) for each generated tier, and
+            ("error", {"strategy_type", "error"}) for each tier that failed
+        """
+        timeout = STRATEGY_TIMEOUT_SECONDS if timeout is None else timeout
+        started = time.monotonic()
+        wallet_balances = self._validation_balances(wallet_data)
+        
+        if self.generation_mode in (COMBINED_MODE, OPTIMIZER_MODE):
+            try:
+                strategies = self.generate_all_strategies(wallet_data, market_data, risk_metrics, stats=stats)
+            except Exception as e:
+                print(f"Warning: Failed to generate {self.generation_mode} strategies: {e}")
+                yield "error", {"strategy_type": None, "error": str(e)}
+                return
+            for strategy in strategies:
+                yield "strategy", self.validate_strategy_logic(self._strategy_to_dict(strategy), wallet_balances)
+            return
+        
+        if stats is not None:
+            stats.mode = PER_TIER_MODE
+        futures = {
+            self.executor.submit(
+                self.generate_strategy,
+                wallet_data,
+                market_data,
+                risk_metrics,
+                strategy_type,
+                stats
+            ): strategy_type
+            for strategy_type in STRATEGY_TYPES
+        }
+        
+        pending = set(futures)
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                pending.discard(future)
+                strategy_type = futures[future]
+                try:
+                    strategy = future.result()
+                except Exception as e:
+                    print(f"Warning: Failed to generate {strategy_type} strategy: {e}")
+                    yield "error", {"strategy_type": strategy_type, "error": str(e)}
+                    continue
+                yield "strategy", self.validate_strategy_logic(self._strategy_to_dict(strategy), wallet_balances)
+        except FuturesTimeoutError:
+            for future in sorted(pending, key=lambda f: STRATEGY_TYPES.index(futures[f])):
+                future.cancel()
+                print(f"Warning: {futures[future]} strategy timed out after {timeout}s")
+                yield "error", {"strategy_type": futures[future], "error": "timed out"}
+        finally:
+            if stats is not None:
+                stats.latency_seconds = time.monotonic() - started
+    
+    def stream_batch_strategies_json(
+        self,
+        wallets: Dict[str, Optional[Dict]],
+        market_data: Dict,
+        risk_metrics_by_wallet: Dict[str, Dict],
+        load_balances: Optional[Callable[[str], Dict]] = None
+    ) -> Iterator[Tuple[str, Dict]]:
+        """Generate strategies for many wallets against one market snapshot
+        
+        Up to STRATEGY_BATCH_CONCURRENCY wallets are generated at once and
+        each is yielded as soon as it finishes, so one slow wallet doesn't
+        hold back the rest. Closing the iterator cancels wallets not started.
+        
+        Args:
+            wallets: Token balances by wallet address; None to load them with load_balances
+            market_data: Dictionary with protocol rates and TVL, shared by every wallet
+            risk_metrics_by_wallet: Risk assessment metrics by wallet address
+            load_balances: Fetches a wallet's balances, called on the worker
+            
+        Yields:
+            ("wallet", {"address", **generate_strategies_json result}) for each
+            wallet, and ("error", {"address", "error"}) for each that failed
+        """
+        futures = {
+            # Workers run in the caller's context, so a pinned block carries over
+            self.batch_executor.submit(
+                contextvars.copy_context().run,
+                self._generate_wallet_strategies,
+                address,
+                balances,
+                market_data,
+                risk_metrics_by_wallet.get(address, {}),
+                load_balances
+            ): address
+            for address, balances in wallets.items()
+        }
+        
+        try:
+            for future in as_completed(futures):
+                address = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Warning: Failed to generate strategies for {address}: {e}")
+                    yield "error", {"address": address, "error": str(e)}
+                    continue
+                yield "wallet", {"address": address, **result}
+        finally:
+            for future in futures:
+                future.cancel()
+    
+    def _generate_wallet_strategies(
+        self,
+        address: str,
+        balances: Optional[Dict],
+        market_data: Dict,
+        risk_metrics: Dict,
+        load_balances: Optional[Callable[[str], Dict]]
+    ) -> Dict:
+        if balances is None:
+            balances = load_balances(address) if load_balances else {}
+        return self.generate_strategies_json(balances, market_data, risk_metrics)
+    
+    def _validation_balances(self, wallet_data: Dict) -> Dict[str, float]:
+        """Wallet balances as floats, in the form validate_strategy_logic expects"""
+        wallet_balances = {k: float(v) for k, v in wallet_data.items()}
+        
+        # Add WETH to wallet balances if ETH exists (to handle token mapping)
+        if "ETH" in wallet_balances and "WETH" not in wallet_balances:
+            wallet_balances["WETH"] = wallet_balances["ETH"]
+        return wallet_balances
+    
+    def _strategy_to_dict(self, strategy: Strategy) -> Dict:
+        """Convert a Strategy to a JSON-serializable dict"""
+        return {
+            "name": strategy.name,
+            "risk_level": strategy.risk_level,
+            "steps": [
+                {
+                    "protocol": step.protocol,
+                    "action": step.action,
+                    "token": step.token,
+                    "amount": float(step.amount),
+                    "expected_apy": float(step.expected_apy),
+                    **({"token_to": step.token_to} if hasattr(step, "token_to") and step.token_to else {}),
+                    **({"pair": step.pair} if hasattr(step, "pair") and step.pair else {}),
+                    **({"interest_rate": step.interest_rate} if hasattr(step, "interest_rate") and step.interest_rate is not None else {}),
+                    **({"usdq_amount": float(step.usdq_amount)} if hasattr(step, "usdq_amount") and step.usdq_amount is not None else {})
+                }
+                for step in strategy.steps
+            ],
+            "explanation": strategy.explanation,
+            "total_expected_apy": float(strategy.total_expected_apy),
+            "risk_factors": strategy.risk_factors
+        }
+
     def validate_strategy(self, strategy_data: Dict, wallet_balances: Dict[str, float]) -> Dict:
         """Validate a strategy to ensure it doesn't exceed wallet balances"""
         # Create a copy of wallet balances that we'll update as we process steps
         available_balances = wallet_balances.copy()
         
-        # Define token mappings for normalization
-        token_mapping = {
-            "WETH": "ETH",  # Map WETH to ETH
-            "ETH": "ETH",
-            "USDC": "USDC",
-            "SRC": "SRC",
-            "SCR": "SRC"   # Map SCR to SRC if needed
-        }
-        
         # Make sure "WETH" is in available_balances if "ETH" is
         if "ETH" in available_balances and "WETH" not in available_balances:
             available_balances["WETH"] = available_balances["ETH"]
@@ -482,7 +1033,7 @@ class StrategyGenerator:
             amount = float(step.get("amount", 0))
             
             # Normalize token name
-            normalized_token = token_mapping.get(token, token)
+            normalized_token = VALIDATION_TOKEN_MAPPING.get(token, token)
             
             # Skip steps with invalid or missing fields
             if not all([protocol, action, token, amount > 0]):
@@ -607,17 +1158,10 @@ class StrategyGenerator:
         return strategy_data
 
     def get_token_price(self, token: str) -> float:
-        """Get estimated price for a token (simplified version)"""
-        # Simplified token prices for validation purposes
-        prices = {
-            "ETH": 2000.0,
-            "WETH": 2000.0,
-            "USDC": 1.0,
-            "SRC": 10.0,
-            "SCR": 10.0,
-            "USDQ": 1.0
-        }
-        return prices.get(token, 1.0)
+        """Get the USD price of a token, from the price service when there is one"""
+        if self.price_service is not None:
+            return self.price_service.get_price(token)
+        return FALLBACK_TOKEN_PRICES.get(token, 1.0)
     
     def validate_strategy_logic(self, strategy_data: Dict, wallet_balances: Dict[str, float]) -> Dict:
         """Validate key logical aspects of the strategy without completely changing it"""
@@ -0,0 +1,321 @@
+# ai/strategy_optimizer.py
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from ai.services.price_service import FALLBACK_TOKEN_PRICES
+
+# Ambient pools report fees and volume but no APY; the fee estimate is kept in this range (%)
+AMBIENT_LP_APY_MIN = float(os.getenv("AMBIENT_LP_APY_MIN", "2.0"))
+AMBIENT_LP_APY_MAX = float(os.getenv("AMBIENT_LP_APY_MAX", "7.0"))
+
+# No tier borrows on Quill while the wallet's AAVE health factor is below this
+LEVERAGE_MIN_HEALTH_FACTOR = float(os.getenv("LEVERAGE_MIN_HEALTH_FACTOR", "1.5"))
+
+# Wallet token names differ from the AAVE reserve symbols for these
+TOKEN_ALIASES = {"WETH": "ETH", "SCR": "SRC"}
+
+
+# Quill figures used when its market data leaves them out
+DEFAULT_STABILITY_POOL_APR = 5.0
+DEFAULT_INTEREST_RATES = {"low_risk": 6.0, "medium_risk": 10.0, "high_risk": 15.0}
+
+@dataclass(frozen=True)
+class TierConstraints:
+    """How far a risk tier may go when allocating a wallet"""
+    risk_level: int
+    # Share of each balance left in the wallet
+    reserve: float
+    # Largest share of each balance put into Ambient liquidity
+    max_lp_share: float
+    # Largest share of each balance locked as Quill collateral
+    max_quill_share: float
+    # Collateral ratio Quill troves are opened at (None: no borrowing)
+    quill_collateral_ratio: Optional[float]
+    # interest_rates["recommended"] entry used for Quill borrowing
+    quill_rate_key: str
+
+TIER_CONSTRAINTS = {
+    "Anchor": TierConstraints(
+        risk_level=1, reserve=0.10, max_lp_share=0.0, max_quill_share=0.0,
+        quill_collateral_ratio=None, quill_rate_key="low_risk"
+    ),
+    "Zenith": TierConstraints(
+        risk_level=3, reserve=0.05, max_lp_share=0.25, max_quill_share=0.5,
+        quill_collateral_ratio=2.5, quill_rate_key="medium_risk"
+    ),
+    "Wildcard": TierConstraints(
+        risk_level=5, reserve=0.02, max_lp_share=0.5, max_quill_share=1.0,
+        quill_collateral_ratio=1.6, quill_rate_key="high_risk"
+    )
+}
+
+@dataclass
+class _Option:
+    """One way to put a token to work, and its net APY on the token's value"""
+    kind: str
+    apy: float
+    max_share: float
+    detail: Dict[str, Any]
+
+class StrategyOptimizer:
+    """Yield-maximizing allocation of a wallet within each tier's risk constraints
+
+    Takes the same wallet, market and risk inputs as the LLM generator and
+    returns strategies in the same JSON shape, in well under a millisecond per
+    tier. Every balance is allocated on its own: after the tier's reserve, it
+    goes to the best-yielding option first (AAVE supply, Ambient liquidity, or
+    a Quill trove whose USDQ goes into the stability pool), up to that
+    option's share cap, then the next best. Ties keep that order, so the same
+    inputs always give the same strategy.
+    """
+
+    def optimize(
+        self,
+        wallet_data: Dict,
+        market_data: Dict,
+        risk_metrics: Dict,
+        strategy_type: str
+    ) -> Dict[str, Any]:
+        """The optimal strategy for one tier, as the dict the LLM would return
+
+        Raises:
+            ValueError: If strategy_type is not a known tier
+        """
+        if strategy_type not in TIER_CONSTRAINTS:
+            raise ValueError(f"Unknown strategy type: {strategy_type}")
+        constraints = TIER_CONSTRAINTS[strategy_type]
+        balances = self._normalize_balances(wallet_data)
+
+        steps = []
+        risk_factors = []
+        yield_usd = 0.0
+        total_value = 0.0
+        for token, amount in balances.items():
+            price = self._price(token, market_data)
+            total_value += amount * price
+            remaining = 1.0 - constraints.reserve
+
+            for option in self._options(token, price, market_data, risk_metrics, constraints):
+                share = min(remaining, option.max_share)
+                if share <= 0 or option.apy <= 0:
+                    continue
+                remaining -= share
+                option_steps, option_yield, option_risk = self._steps(token, amount * share, price, option)
+                steps.extend(option_steps)
+                yield_usd += option_yield
+                risk_factors.extend(r for r in option_risk if r not in risk_factors)
+
+        total_expected_apy = round(yield_usd / total_value * 100, 2) if total_value > 0 else 0.0
+        return {
+            "name": strategy_type,
+            "risk_level": constraints.risk_level,
+            "steps": steps,
+            "explanation": self._explain(strategy_type, steps, constraints, total_expected_apy),
+            "total_expected_apy": total_expected_apy,
+            "risk_factors": risk_factors or ["Funds stay in the wallet; no yield is earned"]
+        }
+
+    def optimize_all(
+        self,
+        wallet_data: Dict,
+        market_data: Dict,
+        risk_metrics: Dict,
+        strategy_types: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """optimize() for each tier, in Anchor, Zenith, Wildcard order"""
+        return [
+            self.optimize(wallet_data, market_data, risk_metrics, strategy_type)
+            for strategy_type in strategy_types or list(TIER_CONSTRAINTS)
+        ]
+
+    def _normalize_balances(self, wallet_data: Dict) -> Dict[str, float]:
+        """Positive balances under their display names, with WETH/ETH counted once"""
+        balances: Dict[str, float] = {}
+        for token, amount in wallet_data.items():
+            try:
+                amount = float(amount)
+            except (TypeError, ValueError):
+                continue
+            if amount <= 0:
+                continue
+            token = TOKEN_ALIASES.get(token, token)
+            # ETH and WETH are the same holding in the wallet data, not two
+            balances[token] = max(balances.get(token, 0.0), amount)
+        return balances
+
+    def _price(self, token: str, market_data: Dict) -> float:
+        collateral = (market_data.get("quill") or {}).get("collaterals", {}).get(token, {})
+        if collateral.get("price_usd"):
+            return float(collateral["price_usd"])
+        for symbol in self._symbols(token):
+            reserve = market_data.get("reserves", {}).get(symbol, {})
+            if reserve.get("price_usd"):
+                return float(reserve["price_usd"])
+        # The price service's prices, then the fallback prices
+        price = market_data.get("prices", {}).get(token)
+        return float(price) if price else FALLBACK_TOKEN_PRICES.get(token, 1.0)
+
+    def _symbols(self, token: str) -> List[str]:
+        """The names a display token may be keyed by in market data"""
+        return [token] + [symbol for symbol, display in TOKEN_ALIASES.items() if display == token]
+
+    def _options(
+        self,
+        token: str,
+        price: float,
+        market_data: Dict,
+        risk_metrics: Dict,
+        constraints: TierConstraints
+    ) -> List[_Option]:
+        """Every use of token the tier allows, best net APY first"""
+        options = []
+
+        supply_apy = market_data.get("rates", {}).get("AAVE", {}).get("supply_apy", {})
+        for symbol in self._symbols(token):
+            if symbol in supply_apy:
+                options.append(_Option("aave_supply", float(supply_apy[symbol]), 1.0, {}))
+                break
+
+        if constraints.max_lp_share > 0:
+            pool = self._best_pool(token, market_data)
+            if pool is not None:
+                pair, apy = pool
+                options.append(_Option("ambient_lp", apy, constraints.max_lp_share, {"pair": pair}))
+
+        quill = market_data.get("quill") or {}
+        if (
+            constraints.quill_collateral_ratio is not None
+            and token in quill.get("collaterals", {})
+            and float(risk_metrics.get("health_factor", float("inf"))) >= LEVERAGE_MIN_HEALTH_FACTOR
+        ):
+            collateral = quill["collaterals"][token]
+            ratio = max(constraints.quill_collateral_ratio, float(collateral.get("min_collateral_ratio", 1.1)))
+            pool_apr = float(quill.get("stability_pools", {}).get(token, {}).get("estimated_apr", DEFAULT_STABILITY_POOL_APR))
+            rate = self._interest_rate(quill, constraints.quill_rate_key)
+            options.append(_Option(
+                "quill_stability",
+                # USDQ is borrowed against 1/ratio of the collateral's value
+                (pool_apr - rate) / ratio,
+                constraints.max_quill_share,
+                {
+                    "collateral_ratio": ratio,
+                    "min_collateral_ratio": float(collateral.get("min_collateral_ratio", 1.1)),
+                    "pool_apr": pool_apr,
+                    "interest_rate": rate
+                }
+            ))
+
+        # sorted() is stable, so equal APYs keep the order above
+        return sorted(options, key=lambda option: -option.apy)
+
+    def _best_pool(self, token: str, market_data: Dict) -> Optional[Tuple[str, float]]:
+        """The highest-yielding Ambient pool that takes token as its first side"""
+        best = None
+        for pair, pool in (market_data.get("dex") or {}).get("pools", {}).items():
+            if pair.split("-")[0] != token:
+                continue
+            apy = self._lp_apy(pool)
+            if best is None or apy > best[1]:
+                best = (pair, apy)
+        return best
+
+    def _lp_apy(self, pool: Dict) -> float:
+        """Fee APY of a pool from its 24h volume, kept within the configured range"""
+        try:
+            liquidity = float(pool.get("total_liquidity", 0))
+            fee_apy = float(pool.get("fee", 0)) * float(pool.get("volume_24h", 0)) * 365 / liquidity * 100
+        except (TypeError, ValueError, ZeroDivisionError):
+            return AMBIENT_LP_APY_MIN
+        return max(AMBIENT_LP_APY_MIN, min(AMBIENT_LP_APY_MAX, fee_apy))
+
+    def _interest_rate(self, quill: Dict, rate_key: str) -> float:
+        rates = quill.get("interest_rates", {})
+        recommended = rates.get("recommended", {})
+        rate = float(recommended.get(rate_key, DEFAULT_INTEREST_RATES[rate_key]))
+        return max(rate, float(rates.get("min", 0)))
+
+    def _steps(
+        self,
+        token: str,
+        amount: float,
+        price: float,
+        option: _Option
+    ) -> Tuple[List[Dict[str, Any]], float, List[str]]:
+        """Steps for putting amount of token into option, their yearly USD yield and risks"""
+        amount = round(amount, 8)
+        if option.kind == "aave_supply":
+            step = {
+                "protocol": "AAVE",
+                "action": "supply",
+                "token": token,
+                "amount": amount,
+                "expected_apy": round(option.apy, 2)
+            }
+            return [step], amount * price * option.apy / 100, ["AAVE smart contract risk"]
+
+        if option.kind == "ambient_lp":
+            pair = option.detail["pair"]
+            step = {
+                "protocol": "Ambient",
+                "action": "add_liquidity",
+                "token": token,
+                "pair": pair,
+                "amount": amount,
+                "expected_apy": round(option.apy, 2)
+            }
+            return [step], amount * price * option.apy / 100, [f"Impermanent loss on the {pair} pool"]
+
+        detail = option.detail
+        usdq_amount = round(amount * price / detail["collateral_ratio"], 2)
+        liquidation_price = price * detail["min_collateral_ratio"] / detail["collateral_ratio"]
+        steps = [
+            {
+                "protocol": "Quill",
+                "action": "borrow_usdq",
+                "token": token,
+                "amount": amount,
+                "usdq_amount": usdq_amount,
+                "interest_rate": detail["interest_rate"],
+                "expected_apy": -detail["interest_rate"]
+            },
+            {
+                "protocol": "Quill",
+                "action": "provide_stability",
+                "token": "USDQ",
+                "amount": usdq_amount,
+                "expected_apy": detail["pool_apr"]
+            }
+        ]
+        risks = [
+            f"Quill trove is liquidated if {token} falls below ${liquidation_price:,.2f}",
+            "Stability pool yield depends on liquidations"
+        ]
+        return steps, usdq_amount * (detail["pool_apr"] - detail["interest_rate"]) / 100, risks
+
+    def _explain(
+        self,
+        strategy_type: str,
+        steps: List[Dict[str, Any]],
+        constraints: TierConstraints,
+        total_expected_apy: float
+    ) -> str:
+        """Plain description of the allocation, used when no LLM writes one"""
+        if not steps:
+            return f"{strategy_type}: no position beats holding with the current rates, so balances stay in the wallet."
+
+        parts = []
+        for step in steps:
+            if step["action"] == "supply":
+                parts.append(f"supply {step['amount']:g} {step['token']} to AAVE at {step['expected_apy']:g}% APY")
+            elif step["action"] == "add_liquidity":
+                parts.append(f"add {step['amount']:g} {step['token']} of liquidity to the Ambient {step['pair']} pool at about {step['expected_apy']:g}% APY")
+            elif step["action"] == "borrow_usdq":
+                parts.append(f"borrow {step['usdq_amount']:g} USDQ on Quill against {step['amount']:g} {step['token']} at {step['interest_rate']:g}% interest")
+            elif step["action"] == "provide_stability":
+                parts.append(f"deposit it in the stability pool at {step['expected_apy']:g}% APR")
+        return (
+            f"{strategy_type} puts each balance into its highest-yielding option the tier allows: "
+            f"{'; '.join(parts)}. {constraints.reserve:.0%} of each balance stays in the wallet. "
+            f"Net expected APY is {total_expected_apy:g}%."
+        )
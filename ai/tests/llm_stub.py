@@ -0,0 +1,84 @@
+# ai/tests/llm_stub.py
+"""Stand-ins for the OpenAI client, for exercising strategy generation offline.
+
+make_generator builds a StrategyGenerator whose client answers every chat
+completion from a Python function of the prompt and records the prompts it
+was sent. FakeLLMGenerator skips the client altogether, answering each tier
+after a fixed delay, for timing and streaming tests.
+"""
+import json
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ai.strategy_cache import StrategyCache
+from ai.strategy_generator import Strategy, StrategyGenerator, StrategyStep
+
+def strategy_json(name: str, risk_level: int = 1) -> Dict[str, Any]:
+    """One strategy as the LLM would return it"""
+    return {
+        "name": name,
+        "risk_level": risk_level,
+        "steps": [{"protocol": "AAVE", "action": "supply", "token": "USDC", "amount": "10", "expected_apy": "3"}],
+        "explanation": f"{name} strategy",
+        "total_expected_apy": 3,
+        "risk_factors": []
+    }
+
+def per_tier_response(prompt: str) -> Optional[Dict[str, Any]]:
+    """Answers a per-tier prompt with a strategy for the tier it asks for"""
+    for name in ("Wildcard", "Zenith", "Anchor"):
+        if f"Generate a {name} strategy" in prompt:
+            return strategy_json(name)
+    return None
+
+class FakeCompletions:
+    """Stands in for client.chat.completions, returning canned JSON with usage"""
+
+    def __init__(self, respond: Callable[[str], Any]):
+        self.respond = respond
+        self.prompts: List[str] = []
+
+    def create(self, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        content = json.dumps(self.respond(prompt))
+        usage = SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=100, total_tokens=len(prompt) // 4 + 100)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+def make_generator(
+    mode: str,
+    respond: Callable[[str], Any] = per_tier_response,
+    cache: Optional[StrategyCache] = None
+) -> Tuple[StrategyGenerator, FakeCompletions]:
+    """A generator in mode whose LLM answers with respond(prompt), and its completions"""
+    completions = FakeCompletions(respond)
+    generator = StrategyGenerator(
+        generation_mode=mode,
+        cache=cache or StrategyCache(directory=None),
+        client=SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    )
+    return generator, completions
+
+class FakeLLMGenerator(StrategyGenerator):
+    """Replaces the LLM call with a fixed delay per strategy type"""
+
+    def __init__(self, delays: Dict[str, float], failures=()):
+        # generate_strategy is replaced, so the client is never called
+        super().__init__(cache=StrategyCache(directory=None), client=SimpleNamespace())
+        self.delays = delays
+        self.failures = set(failures)
+
+    def generate_strategy(self, wallet_data, market_data, risk_metrics, strategy_type, stats=None):
+        time.sleep(self.delays.get(strategy_type, 0))
+        if strategy_type in self.failures:
+            raise ValueError("Response is not in JSON format")
+        return Strategy(
+            name=strategy_type,
+            risk_level=1,
+            steps=[StrategyStep("AAVE", "supply", "USDC", Decimal("500"), Decimal("3"))],
+            explanation="test",
+            total_expected_apy=Decimal("3"),
+            risk_factors=[]
+        )
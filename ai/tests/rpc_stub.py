@@ -0,0 +1,469 @@
+# ai/tests/rpc_stub.py
+"""Local JSON-RPC stand-in for exercising the services without a Scroll node.
+
+Contracts are registered with their ABI and a dict of Python handlers keyed by
+function name. eth_call requests are routed by (to, selector), the handler's
+return value is ABI-encoded, and an exception in a handler becomes a revert.
+A Multicall3 contract can be enabled so aggregate3 batches are served from the
+same handlers. Every request is recorded so tests can assert round-trip counts.
+
+Below RpcStub are ready-made stubs of the protocols' contracts, shared by the
+service, endpoint and pinning tests.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional
+
+from eth_abi import decode, encode
+from eth_utils.abi import collapse_if_tuple
+from web3 import Web3
+
+from ai.services.aave_service import AaveService
+from ai.services.abis.croc_impact_abi import CROC_IMPACT_ABI
+from ai.services.abis.croc_query_abi import CROC_QUERY_ABI
+from ai.services.abis.multicall3_abi import MULTICALL3_ABI
+from ai.services.abis.pool_addresses_provider_abi import POOL_ADDRESSES_PROVIDER_ABI
+from ai.services.abis.pool_data_provider_abi import POOL_DATA_PROVIDER_ABI
+from ai.services.abis.quill_price_feed_abi import QUILL_PRICE_FEED_ABI
+from ai.services.abis.quill_stability_pool_abi import QUILL_STABILITY_POOL_ABI
+from ai.services.abis.quill_trove_manager_abi import QUILL_TROVE_MANAGER_ABI
+from ai.services.ambient_service import AmbientService
+from ai.services.curve_simulator import LOT_SIZE
+from ai.services.multicall import MULTICALL3_ADDRESS
+from ai.services.quill_service import QuillService
+
+# Runtime bytecode only needs to be non-empty for the services' deployment checks
+STUB_CODE = "0x6080604052"
+
+def _signature(abi_entry: Dict[str, Any]) -> str:
+    types = ",".join(collapse_if_tuple(i) for i in abi_entry.get("inputs", []))
+    return f"{abi_entry['name']}({types})"
+
+def _selector(abi_entry: Dict[str, Any]) -> str:
+    return Web3.keccak(text=_signature(abi_entry))[:4].hex().replace("0x", "")
+
+class RpcStub:
+    """Threaded HTTP JSON-RPC server answering eth_call from Python handlers"""
+
+    def __init__(self, chain_id: int = 534352, block_number: int = 1000):
+        self.chain_id = chain_id
+        self.block_number = block_number
+        self.contracts: Dict[str, Dict[str, Any]] = {}
+        self.requests: List[Dict[str, Any]] = []
+        self.calls: List[Dict[str, Any]] = []
+        self.latency = 0.0
+        self.down = False
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    # ------------------------------------------------------------------
+    # Setup
+    # ------------------------------------------------------------------
+
+    def register(self, address: str, abi: List[Dict[str, Any]], handlers: Dict[str, Callable]):
+        """Serve eth_calls to address using handlers keyed by ABI function name"""
+        by_selector = {}
+        for entry in abi:
+            if entry.get("type") == "function" and entry["name"] in handlers:
+                by_selector[_selector(entry)] = (entry, handlers[entry["name"]])
+        self.contracts.setdefault(address.lower(), {}).update(by_selector)
+
+    def enable_multicall(self, address: str = MULTICALL3_ADDRESS):
+        """Deploy a Multicall3 stand-in whose aggregate3 dispatches to the other handlers"""
+        def aggregate3(calls):
+            results = []
+            for target, allow_failure, call_data in calls:
+                try:
+                    results.append((True, self._execute(target, call_data, nested=True)))
+                except Exception:
+                    if not allow_failure:
+                        raise
+                    results.append((False, b""))
+            return results
+
+        self.register(address, MULTICALL3_ABI, {
+            "aggregate3": aggregate3,
+            "getBlockNumber": lambda: self.block_number,
+        })
+
+    def start(self) -> "RpcStub":
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep connections open so clients can pool them
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if isinstance(body, list):
+                    response = [stub._handle(item) for item in body]
+                else:
+                    response = stub._handle(body)
+                payload = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    # ------------------------------------------------------------------
+    # Inspection
+    # ------------------------------------------------------------------
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.calls.clear()
+
+    def count(self, method: Optional[str] = None) -> int:
+        """Number of JSON-RPC requests received, optionally for one method"""
+        return len([r for r in self.requests if method is None or r["method"] == method])
+
+    def called(self, fn_name: str) -> int:
+        """Number of times a contract function ran, including inside multicall batches"""
+        return len([c for c in self.calls if c["fn"] == fn_name])
+
+    # ------------------------------------------------------------------
+    # JSON-RPC handling
+    # ------------------------------------------------------------------
+
+    def _handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self.requests.append(request)
+        if self.latency:
+            time.sleep(self.latency)
+
+        reply = {"jsonrpc": "2.0", "id": request.get("id")}
+        if self.down:
+            reply["error"] = {"code": -32000, "message": "node unavailable"}
+            return reply
+
+        method = request["method"]
+        params = request.get("params", [])
+        try:
+            if method == "web3_clientVersion":
+                reply["result"] = "RpcStub/v1"
+            elif method == "eth_chainId":
+                reply["result"] = hex(self.chain_id)
+            elif method == "net_version":
+                reply["result"] = str(self.chain_id)
+            elif method == "eth_blockNumber":
+                reply["result"] = hex(self.block_number)
+            elif method == "eth_getCode":
+                reply["result"] = STUB_CODE if params[0].lower() in self.contracts else "0x"
+            elif method == "eth_call":
+                tx = params[0]
+                block = params[1] if len(params) > 1 else "latest"
+                data = tx.get("data") or tx.get("input")
+                result = self._execute(tx["to"], bytes.fromhex(data[2:]), block=block)
+                reply["result"] = "0x" + result.hex()
+            else:
+                reply["error"] = {"code": -32601, "message": f"Method {method} not supported"}
+        except Exception as e:
+            reply["error"] = {"code": 3, "message": f"execution reverted: {e}", "data": "0x"}
+        return reply
+
+    def _execute(self, to: str, call_data: bytes, block: Any = "latest", nested: bool = False) -> bytes:
+        functions = self.contracts.get(to.lower())
+        if functions is None:
+            # Calls to addresses without code succeed with empty return data
+            return b""
+
+        selector = call_data[:4].hex()
+        if selector not in functions:
+            raise ValueError(f"Unknown selector 0x{selector} for {to}")
+
+        entry, handler = functions[selector]
+        args = decode([collapse_if_tuple(i) for i in entry.get("inputs", [])], call_data[4:])
+        with self._lock:
+            self.calls.append({"to": to.lower(), "fn": entry["name"], "block": block, "nested": nested})
+
+        result = handler(*args)
+        output_types = [collapse_if_tuple(o) for o in entry.get("outputs", [])]
+        if len(output_types) == 1:
+            result = (result,)
+        return encode(output_types, list(result))
+
+# ----------------------------------------------------------------------
+# AAVE
+# ----------------------------------------------------------------------
+
+AAVE_POOL = "0x" + "01" * 20
+AAVE_ORACLE = "0x" + "02" * 20
+AAVE_DATA_PROVIDER = "0x" + "03" * 20
+
+AAVE_RESERVES = [
+    ("USDC", "0x06eFdBFf2a14a7c8E15944D1F4A48F9F95F663A4"),
+    ("WETH", "0x5300000000000000000000000000000000000004"),
+    ("SCR", "0xd29687c813D741E2F938F4aC377128810E217b1b"),
+    ("wstETH", "0xf610A9dfB7C89644979b4A0f27063E9e7d7Cda32"),
+    ("weETH", "0x01f0a31698C4d065659b9bdC21B3610292a1c506"),
+]
+
+def build_aave_stub(with_multicall: bool, failing_asset: str = None) -> RpcStub:
+    """The addresses provider and data provider over AAVE_RESERVES, started"""
+    stub = RpcStub()
+    stub.register(AaveService.POOL_ADDRESSES_PROVIDER, POOL_ADDRESSES_PROVIDER_ABI, {
+        "getPool": lambda: AAVE_POOL,
+        "getPriceOracle": lambda: AAVE_ORACLE,
+        "getPoolDataProvider": lambda: AAVE_DATA_PROVIDER,
+    })
+
+    def configuration(asset):
+        if failing_asset and asset.lower() == failing_asset.lower():
+            raise ValueError("reserve not initialized")
+        return (18, 8000, 8500, 10500, 1000, True, True, False, True, False)
+
+    def reserve_data(asset):
+        index = [a.lower() for _, a in AAVE_RESERVES].index(asset.lower())
+        liquidity_rate = (index + 1) * 10**25  # 1%, 2%, ... in ray
+        borrow_rate = (index + 2) * 10**25
+        return (0, 0, 10**24, 0, 5 * 10**23, liquidity_rate, borrow_rate, 0, 0, 10**27, 10**27, 1700000000)
+
+    stub.register(AAVE_DATA_PROVIDER, POOL_DATA_PROVIDER_ABI, {
+        "getAllReservesTokens": lambda: AAVE_RESERVES,
+        "getReserveConfigurationData": configuration,
+        "getReserveData": reserve_data,
+    })
+    if with_multicall:
+        stub.enable_multicall()
+    return stub.start()
+
+def make_aave_service(stub: RpcStub) -> AaveService:
+    class StubAaveService(AaveService):
+        SCROLL_RPC_URL = stub.url
+    return StubAaveService()
+
+# ----------------------------------------------------------------------
+# Quill
+# ----------------------------------------------------------------------
+
+QUILL_PRICES = {"ETH": 2500, "SRC": 12, "wstETH": 2900, "weETH": 2650}
+
+WALLET_WITH_TROVE = "0x" + "aa" * 20
+WALLET_WITH_DEPOSIT = "0x" + "bb" * 20
+EMPTY_WALLET = "0x" + "cc" * 20
+
+def _revert():
+    raise ValueError("oracle down")
+
+def build_quill_stub(with_multicall: bool = True) -> RpcStub:
+    """Every branch's price feed and stability pool totals, started"""
+    stub = RpcStub()
+    for collateral, addresses in QuillService.COLLATERAL_TYPES.items():
+        price = int(QUILL_PRICES[collateral] * 10**18)
+        handlers = {
+            "fetchPrice": (lambda price=price: price),
+            "lastGoodPrice": (lambda price=price: price - 10**18),
+        }
+        if collateral == "SRC":
+            handlers["fetchPrice"] = _revert  # Falls back to lastGoodPrice
+        if collateral == "weETH":
+            handlers = {"fetchPrice": _revert, "lastGoodPrice": _revert}  # Falls back to hardcoded price
+        stub.register(addresses["price_feed"], QUILL_PRICE_FEED_ABI, handlers)
+
+        stub.register(addresses["stability_pool"], QUILL_STABILITY_POOL_ABI, {
+            "getTotalUSDQDeposits": lambda: 1000 * 10**18,
+            "getETH": lambda: 2 * 10**18,
+        })
+    if with_multicall:
+        stub.enable_multicall()
+    return stub.start()
+
+def make_quill_service(stub: RpcStub) -> QuillService:
+    class StubQuillService(QuillService):
+        SCROLL_RPC_URL = stub.url
+    return StubQuillService()
+
+def register_quill_positions(stub: RpcStub):
+    """Give one wallet an ETH trove and another an SRC stability pool deposit"""
+    for collateral, addresses in QuillService.COLLATERAL_TYPES.items():
+        def has_trove(wallet, collateral=collateral):
+            return wallet.lower() == WALLET_WITH_TROVE and collateral == "ETH"
+
+        def has_deposit(wallet, collateral=collateral):
+            return wallet.lower() == WALLET_WITH_DEPOSIT and collateral == "SRC"
+
+        stub.register(addresses["trove_manager"], QUILL_TROVE_MANAGER_ABI, {
+            "getTroveDebt": lambda wallet, f=has_trove: 2000 * 10**18 if f(wallet) else 0,
+            "getTroveColl": lambda wallet, f=has_trove: 2 * 10**18 if f(wallet) else 0,
+            "getTroveStatus": lambda wallet, f=has_trove: 1 if f(wallet) else 0,
+        })
+        stub.register(addresses["stability_pool"], QUILL_STABILITY_POOL_ABI, {
+            "getCompoundedUSDQDeposit": lambda wallet, f=has_deposit: 300 * 10**18 if f(wallet) else 0,
+            "getDepositorCollateralGain": lambda wallet, f=has_deposit: 10**17 if f(wallet) else 0,
+            "getDepositorUSDQGain": lambda wallet, f=has_deposit: 5 * 10**18 if f(wallet) else 0,
+        })
+
+# ----------------------------------------------------------------------
+# Ambient
+# ----------------------------------------------------------------------
+
+def build_ambient_stub() -> RpcStub:
+    """CrocQuery and CrocImpact with one fixed answer for every pool, started"""
+    stub = RpcStub()
+    stub.register(AmbientService.CROC_QUERY, CROC_QUERY_ABI, {
+        "queryPrice": lambda base, quote, pool_idx: 3 * 2**63,  # sqrt price 1.5
+        "queryLiquidity": lambda base, quote, pool_idx: 10**21,
+    })
+    stub.register(AmbientService.CROC_IMPACT, CROC_IMPACT_ABI, {
+        "calcImpact": lambda *args: (10**18, -2 * 10**6, 3 * 2**63 - 2**58),
+    })
+    return stub.start()
+
+# Pool fee the reference curves charge; tests patch AMBIENT_SWAP_FEE_RATE to match
+AMBIENT_FEE_RATE = 0.003
+
+class ReferenceCurve:
+    """Stand-in for the CrocSwap pool, built from individual range positions
+
+    Answers the CrocQuery reads and calcImpact independently of the
+    simulator: it steps the price one tick at a time in Decimal, taking each
+    tick's liquidity straight from the positions covering it.
+    """
+
+    def __init__(self, sqrt_price: Decimal, ambient_liquidity: int, positions):
+        self.sqrt_price = sqrt_price
+        self.ambient_liquidity = ambient_liquidity
+        self.positions = positions  # (lower tick, upper tick, lots)
+        self.tick = self._tick_of(sqrt_price)
+
+    @staticmethod
+    def _tick_sqrt(tick: int) -> Decimal:
+        return Decimal("1.0001") ** (Decimal(tick) / 2)
+
+    def _tick_of(self, sqrt_price: Decimal) -> int:
+        tick = int((2 * sqrt_price.ln() / Decimal("1.0001").ln()).to_integral_value(rounding="ROUND_FLOOR"))
+        return tick
+
+    def liquidity_at(self, tick: int) -> int:
+        return self.ambient_liquidity + sum(
+            lots * LOT_SIZE for lower, upper, lots in self.positions if lower <= tick < upper
+        )
+
+    def query_level(self, tick: int):
+        bid = sum(lots for lower, _, lots in self.positions if lower == tick)
+        ask = sum(lots for _, upper, lots in self.positions if upper == tick)
+        return bid, ask
+
+    def calc_impact(self, is_buy: bool, in_base_qty: bool, qty: int):
+        fee = Decimal(str(AMBIENT_FEE_RATE))
+        fixed_input = in_base_qty == is_buy
+        remaining = Decimal(qty) * (1 - fee) if fixed_input else Decimal(qty)
+        s, tick = self.sqrt_price, self.tick
+        paid = received = Decimal(0)
+
+        while remaining > 0:
+            liquidity = Decimal(self.liquidity_at(tick))
+            edge = self._tick_sqrt(tick + 1) if is_buy else self._tick_sqrt(tick)
+            if is_buy:
+                # Base in, quote out, price up to the tick's upper edge
+                base_to_edge = liquidity * (edge - s)
+                quote_to_edge = liquidity * (1 / s - 1 / edge)
+                budget = base_to_edge if fixed_input else quote_to_edge
+                if remaining < budget:
+                    end = s + remaining / liquidity if fixed_input else 1 / (1 / s - remaining / liquidity)
+                    paid += liquidity * (end - s)
+                    received += liquidity * (1 / s - 1 / end)
+                    s = end
+                    break
+                paid, received, s, tick = paid + base_to_edge, received + quote_to_edge, edge, tick + 1
+            else:
+                # Quote in, base out, price down to the tick's lower edge
+                quote_to_edge = liquidity * (1 / edge - 1 / s)
+                base_to_edge = liquidity * (s - edge)
+                budget = quote_to_edge if fixed_input else base_to_edge
+                if remaining < budget:
+                    end = 1 / (1 / s + remaining / liquidity) if fixed_input else s - remaining / liquidity
+                    paid += liquidity * (1 / end - 1 / s)
+                    received += liquidity * (s - end)
+                    s = end
+                    break
+                paid, received, s, tick = paid + quote_to_edge, received + base_to_edge, edge, tick - 1
+            remaining -= budget
+
+        paid = Decimal(qty) if fixed_input else paid / (1 - fee)
+        paid_flow, received_flow = int(paid.to_integral_value()), -int(received.to_integral_value())
+        base_flow, quote_flow = (paid_flow, received_flow) if is_buy else (received_flow, paid_flow)
+        return base_flow, quote_flow, int(s * 2**64)
+
+def usdc_eth_pool() -> ReferenceCurve:
+    """USDC (base, 6 decimals) / ETH (quote, 18 decimals) around 2000 USDC per ETH"""
+    sqrt_price = (Decimal(2000 * 10**6) / Decimal(10**18)).sqrt()
+    tick = int((2 * sqrt_price.ln() / Decimal("1.0001").ln()).to_integral_value(rounding="ROUND_FLOOR"))
+    grid = tick - tick % 16
+    lots = 10**13
+    positions = [
+        (grid - 160, grid + 160, lots),           # Tight range around the price
+        (grid - 480, grid + 64, lots // 2),       # Wider, skewed below
+        (grid + 32, grid + 800, 3 * lots),        # Only above the price
+        (grid - 1024, grid - 320, lots * 2),      # Only well below
+    ]
+    return ReferenceCurve(sqrt_price, 2 * 10**16, positions)
+
+def build_curve_stub(pool: ReferenceCurve) -> RpcStub:
+    """CrocQuery and CrocImpact over the one pool, started"""
+    stub = RpcStub()
+    stub.register(AmbientService.CROC_QUERY, CROC_QUERY_ABI, {
+        "queryPrice": lambda base, quote, pool_idx: int(pool.sqrt_price * 2**64),
+        "queryLiquidity": lambda base, quote, pool_idx: pool.liquidity_at(pool.tick),
+        "queryCurveTick": lambda base, quote, pool_idx: pool.tick,
+        "queryLevel": lambda base, quote, pool_idx, tick: pool.query_level(tick),
+    })
+    stub.register(AmbientService.CROC_IMPACT, CROC_IMPACT_ABI, {
+        "calcImpact": lambda base, quote, pool_idx, is_buy, in_base_qty, qty, tip, limit: pool.calc_impact(is_buy, in_base_qty, qty),
+    })
+    stub.enable_multicall()
+    return stub.start()
+
+def full_range_pool(price: Decimal, base_reserves: int) -> ReferenceCurve:
+    """A pool at price (raw base per raw quote) holding base_reserves of base"""
+    sqrt_price = price.sqrt()
+    return ReferenceCurve(sqrt_price, int(Decimal(base_reserves) / sqrt_price), [])
+
+# Pools by (base, quote): USDC < ETH < SRC by address. USD prices: ETH 2000, SRC 10
+ROUTER_POOLS = {
+    # Deep: 10M USDC
+    (AmbientService.TOKENS["USDC"], AmbientService.TOKENS["ETH"]): full_range_pool(Decimal(2000 * 10**6) / 10**18, 10**13),
+    # Deep: 5,000 ETH
+    (AmbientService.TOKENS["ETH"], AmbientService.TOKENS["SRC"]): full_range_pool(Decimal("0.005"), 5000 * 10**18),
+    # Shallow: 20,000 USDC
+    (AmbientService.TOKENS["USDC"], AmbientService.TOKENS["SRC"]): full_range_pool(Decimal(10 * 10**6) / 10**18, 2 * 10**10),
+}
+
+def router_pool(base, quote) -> ReferenceCurve:
+    return {(b.lower(), q.lower()): p for (b, q), p in ROUTER_POOLS.items()}[(base.lower(), quote.lower())]
+
+def build_router_stub() -> RpcStub:
+    """CrocQuery and CrocImpact over all three ROUTER_POOLS, started"""
+    stub = RpcStub()
+    stub.register(AmbientService.CROC_QUERY, CROC_QUERY_ABI, {
+        "queryPrice": lambda base, quote, pool_idx: int(router_pool(base, quote).sqrt_price * 2**64),
+        "queryLiquidity": lambda base, quote, pool_idx: router_pool(base, quote).liquidity_at(router_pool(base, quote).tick),
+        "queryCurveTick": lambda base, quote, pool_idx: router_pool(base, quote).tick,
+        "queryLevel": lambda base, quote, pool_idx, tick: router_pool(base, quote).query_level(tick),
+    })
+    stub.register(AmbientService.CROC_IMPACT, CROC_IMPACT_ABI, {
+        "calcImpact": lambda base, quote, pool_idx, is_buy, in_base_qty, qty, tip, limit: router_pool(base, quote).calc_impact(is_buy, in_base_qty, qty),
+    })
+    stub.enable_multicall()
+    return stub.start()
@@ -0,0 +1,164 @@
+# ai/tests/test_aave_multicall.py
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import pytest
+
+from ai.services.abis.pool_abi import POOL_ABI
+from ai.services.abis.ui_pool_data_provider_abi import UI_POOL_DATA_PROVIDER_ABI
+from ai.services.aave_service import RESERVE_DATA_FIELDS
+from ai.tests.rpc_stub import AAVE_POOL, AAVE_RESERVES, build_aave_stub, make_aave_service
+
+@pytest.fixture
+def multicall_stub():
+    stub = build_aave_stub(with_multicall=True)
+    yield stub
+    stub.stop()
+
+def test_reserve_reads_batched_into_one_aggregate3(multicall_stub):
+    """All per-reserve reads go out in a single aggregate3 round trip"""
+    service = make_aave_service(multicall_stub)
+    multicall_stub.reset()
+
+    reserves = service.get_reserve_data()
+
+    assert set(reserves) == {symbol for symbol, _ in AAVE_RESERVES}
+    assert reserves["USDC"]["liquidity_rate"] == pytest.approx(0.01)
+    assert reserves["WETH"]["variable_borrow_rate"] == pytest.approx(0.03)
+    assert reserves["SCR"]["ltv"] == pytest.approx(0.8)
+
+    # getAllReservesTokens + one aggregate3, versus 2N+1 before
+    assert multicall_stub.count("eth_call") == 2
+    assert multicall_stub.called("getReserveData") == len(AAVE_RESERVES)
+
+    # The deployment check is cached, so later snapshots cost the same
+    multicall_stub.reset()
+    service.get_reserve_data()
+    assert multicall_stub.count("eth_getCode") == 0
+    assert multicall_stub.count("eth_call") == 2
+
+def test_falls_back_to_per_call_without_multicall():
+    """Without Multicall3 deployed, reads go out one by one with the same output"""
+    stub = build_aave_stub(with_multicall=False)
+    try:
+        service = make_aave_service(stub)
+        stub.reset()
+
+        reserves = service.get_reserve_data()
+
+        assert set(reserves) == {symbol for symbol, _ in AAVE_RESERVES}
+        assert stub.count("eth_call") == 2 * len(AAVE_RESERVES) + 1
+    finally:
+        stub.stop()
+
+def test_failed_reserve_call_is_tolerated():
+    """One reverting reserve read doesn't drop the rest of the market"""
+    stub = build_aave_stub(with_multicall=True, failing_asset=AAVE_RESERVES[2][1])
+    try:
+        service = make_aave_service(stub)
+
+        reserves = service.get_reserve_data()
+
+        assert "SCR" not in reserves
+        assert len(reserves) == len(AAVE_RESERVES) - 1
+    finally:
+        stub.stop()
+
+def ui_reserve(symbol, asset, decimals, price, available, scaled_debt):
+    """Build an AggregatedReserveData tuple from the interesting fields"""
+    fields = {name: 0 for name in RESERVE_DATA_FIELDS}
+    fields.update({
+        "underlyingAsset": asset,
+        "name": symbol,
+        "symbol": symbol,
+        "decimals": decimals,
+        "baseLTVasCollateral": 7500,
+        "reserveLiquidationThreshold": 8000,
+        "reserveLiquidationBonus": 10500,
+        "reserveFactor": 1000,
+        "usageAsCollateralEnabled": True,
+        "borrowingEnabled": True,
+        "isActive": True,
+        "isFrozen": False,
+        "liquidityIndex": 10**27,
+        "variableBorrowIndex": 11 * 10**26,  # Debt has accrued 10% interest
+        "liquidityRate": 3 * 10**25,
+        "variableBorrowRate": 5 * 10**25,
+        "aTokenAddress": "0x" + "00" * 20,
+        "variableDebtTokenAddress": "0x" + "00" * 20,
+        "interestRateStrategyAddress": "0x" + "00" * 20,
+        "priceOracle": "0x" + "00" * 20,
+        "availableLiquidity": available * 10**decimals,
+        "totalScaledVariableDebt": scaled_debt * 10**decimals,
+        "priceInMarketReferenceCurrency": price * 10**8,
+        "isPaused": False,
+        "isSiloedBorrowing": False,
+        "flashLoanEnabled": True,
+        "borrowableInIsolation": False,
+    })
+    return tuple(fields[name] for name in RESERVE_DATA_FIELDS)
+
+def test_market_snapshot_from_single_ui_provider_call():
+    """getReservesData yields rates, prices and real TVL in one round trip"""
+    stub = build_aave_stub(with_multicall=True)
+    try:
+        ui_reserves = [
+            ui_reserve("USDC", AAVE_RESERVES[0][1], 6, 1, 1000000, 500000),
+            ui_reserve("WETH", AAVE_RESERVES[1][1], 18, 2000, 300, 100),
+        ]
+        service = make_aave_service(stub)
+        stub.register(service.ui_data_provider.address, UI_POOL_DATA_PROVIDER_ABI, {
+            "getReservesData": lambda provider: (ui_reserves, (10**8, 10**8, 2000 * 10**8, 8)),
+        })
+        stub.reset()
+
+        market_data = service.get_market_data()
+
+        assert stub.count("eth_call") == 1
+        assert market_data["rates"]["AAVE"]["supply_apy"]["USDC"] == pytest.approx(3.0)
+        assert market_data["rates"]["AAVE"]["borrow_apy"]["WETH"] == pytest.approx(5.0)
+
+        usdc = market_data["reserves"]["USDC"]
+        assert usdc["total_debt"] == pytest.approx(550000)
+        assert usdc["tvl_usd"] == pytest.approx(1550000)
+        weth = market_data["reserves"]["WETH"]
+        assert weth["price_usd"] == pytest.approx(2000)
+        assert weth["tvl_usd"] == pytest.approx((300 + 110) * 2000)
+        assert market_data["tvl"]["AAVE"] == pytest.approx(1550000 + 410 * 2000)
+    finally:
+        stub.stop()
+
+def test_market_snapshot_falls_back_to_data_provider(multicall_stub):
+    """Without a working UI provider, rates still come from the batched reserve reads"""
+    service = make_aave_service(multicall_stub)
+
+    market_data = service.get_market_data()
+
+    assert set(market_data["rates"]["AAVE"]["supply_apy"]) == {symbol for symbol, _ in AAVE_RESERVES}
+    assert market_data["tvl"]["AAVE"] == 0
+
+def test_risk_metrics_for_many_wallets_in_one_aggregate3(multicall_stub):
+    """Every wallet's account data comes from a single batched read"""
+    healthy, leveraged, empty = "0x" + "aa" * 20, "0x" + "bb" * 20, "0x" + "cc" * 20
+
+    def account_data(user):
+        if user.lower() == empty:
+            raise ValueError("no position")
+        health_factor = 3 * 10**18 if user.lower() == healthy else 12 * 10**17
+        return (10**10, 5 * 10**9, 10**9, 8250, 7500, health_factor)
+
+    multicall_stub.register(AAVE_POOL, POOL_ABI, {"getUserAccountData": account_data})
+    service = make_aave_service(multicall_stub)
+    multicall_stub.reset()
+
+    metrics = service.get_user_risk_metrics_batch([healthy, leveraged, empty, "not-an-address"])
+
+    assert multicall_stub.count("eth_call") == 1
+    assert multicall_stub.called("getUserAccountData") == 3
+    assert metrics[healthy] == {"health_factor": 3.0, "liquidation_threshold": 0.825, "current_ratio": 0.75}
+    assert metrics[leveraged]["health_factor"] == pytest.approx(1.2)
+    # A failed read or a malformed address gets the same defaults as get_user_risk_metrics
+    assert metrics[empty] == metrics["not-an-address"] == service._format_risk_metrics({})
@@ -0,0 +1,82 @@
+# ai/tests/test_ambient_batching.py
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import pytest
+
+from ai.services.ambient_service import AmbientService, parse_market_pairs
+from ai.services.abis.croc_query_abi import CROC_QUERY_ABI
+from ai.tests.rpc_stub import RpcStub
+
+def build_stub(with_multicall: bool = True, failing_base: str = None) -> RpcStub:
+    stub = RpcStub()
+
+    def query_price(base, quote, pool_idx):
+        if failing_base and base.lower() == failing_base.lower():
+            raise ValueError("pool not initialized")
+        return 3 * 2**63  # sqrt price 1.5
+
+    stub.register(AmbientService.CROC_QUERY, CROC_QUERY_ABI, {
+        "queryPrice": query_price,
+        "queryLiquidity": lambda base, quote, pool_idx: 10**21,
+        "queryCurveTick": lambda base, quote, pool_idx: -201234,
+    })
+    if with_multicall:
+        stub.enable_multicall()
+    return stub.start()
+
+def make_service(stub: RpcStub) -> AmbientService:
+    class StubAmbientService(AmbientService):
+        SCROLL_RPC_URL = stub.url
+    return StubAmbientService()
+
+@pytest.fixture
+def stub():
+    stub = build_stub()
+    yield stub
+    stub.stop()
+
+def test_every_pool_read_once_in_one_round_trip(stub):
+    service = make_service(stub)
+    stub.reset()
+
+    market_data = service.get_market_data([("ETH", "USDC"), ("USDC", "ETH"), ("ETH", "SRC")])
+
+    # Two distinct pools: one aggregate3 carrying price, liquidity and tick for each
+    assert stub.count("eth_call") == 1
+    assert stub.called("queryPrice") == 2
+    assert stub.called("queryLiquidity") == 2
+    pools = market_data["pools"]
+    assert set(pools) == {"ETH-USDC", "USDC-ETH", "ETH-SRC"}
+    # Both orders come from the same read, each in its own direction
+    assert pools["ETH-USDC"]["price"] == pytest.approx(1 / pools["USDC-ETH"]["price"])
+    assert pools["ETH-USDC"]["total_liquidity"] == 10**21
+    assert pools["ETH-USDC"]["curve_tick"] == -201234
+
+def test_same_output_without_multicall():
+    batched, unbatched = build_stub(), build_stub(with_multicall=False)
+    try:
+        assert make_service(batched).get_market_data() == make_service(unbatched).get_market_data()
+    finally:
+        batched.stop()
+        unbatched.stop()
+
+def test_failed_pool_and_unknown_tokens_fall_back():
+    stub = build_stub(failing_base=AmbientService.TOKENS["USDC"])
+    try:
+        service = make_service(stub)
+
+        pools = service.get_market_data([("ETH", "USDC"), ("ETH", "DAI")])["pools"]
+
+        # USDC has the lower address, so it's the failing pool's base
+        assert pools["ETH-USDC"] == service._fallback_pool_entry("ETH", "USDC")
+        assert pools["ETH-DAI"] == service._fallback_pool_entry("ETH", "DAI")
+    finally:
+        stub.stop()
+
+def test_pairs_parsed_from_config():
+    assert parse_market_pairs("ETH-USDC, wstETH-ETH,") == [("ETH", "USDC"), ("wstETH", "ETH")]
+    assert AmbientService.MARKET_PAIRS == parse_market_pairs(os.getenv("AMBIENT_MARKET_PAIRS", "ETH-USDC,ETH-SRC,USDC-SRC"))
@@ -0,0 +1,130 @@
+# ai/tests/test_async_services.py
+import asyncio
+import sys
+import os
+import time
+from decimal import Decimal
+
+# Add the project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import pytest
+
+from ai.services.aave_service import AaveService, AsyncAaveService
+from ai.services.ambient_service import AmbientService, AsyncAmbientService
+from ai.services.quill_service import QuillService, AsyncQuillService
+from ai.services.web3_provider import rpc_provider_factory
+from ai.tests.rpc_stub import RpcStub, WALLET_WITH_DEPOSIT, WALLET_WITH_TROVE, build_aave_stub, build_ambient_stub, build_quill_stub, register_quill_positions
+
+def run(coroutine):
+    """Run a coroutine and close the loop's pooled session afterwards"""
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await rpc_provider_factory.aclose()
+    return asyncio.run(main())
+
+def make_services(sync_cls, async_cls, stub: RpcStub):
+    class StubSync(sync_cls):
+        SCROLL_RPC_URL = stub.url
+
+    class StubAsync(async_cls):
+        SCROLL_RPC_URL = stub.url
+
+    return StubSync(), StubAsync()
+
+def test_aave_matches_sync_service():
+    stub = build_aave_stub(with_multicall=True)
+    try:
+        sync_service, async_service = make_services(AaveService, AsyncAaveService, stub)
+
+        assert run(async_service.get_market_data()) == sync_service.get_market_data()
+        assert run(async_service.get_user_risk_metrics("0x" + "aa" * 20)) == sync_service.get_user_risk_metrics("0x" + "aa" * 20)
+    finally:
+        stub.stop()
+
+def test_ambient_matches_sync_service():
+    stub = build_ambient_stub()
+    try:
+        sync_service, async_service = make_services(AmbientService, AsyncAmbientService, stub)
+
+        async def reads():
+            return await asyncio.gather(
+                async_service.get_market_data(),
+                async_service.calculate_swap_impact("ETH", "USDC", Decimal("1"))
+            )
+
+        market_data, impact = run(reads())
+
+        assert market_data == sync_service.get_market_data()
+        # ETH has the higher address, so the pool price (1.5 squared) is inverted
+        assert market_data["pools"]["ETH-USDC"]["price"] == pytest.approx(1 / 2.25)
+        assert impact == sync_service.calculate_swap_impact("ETH", "USDC", Decimal("1"))
+    finally:
+        stub.stop()
+
+def test_quill_matches_sync_service():
+    stub = build_quill_stub()
+    register_quill_positions(stub)
+    try:
+        sync_service, async_service = make_services(QuillService, AsyncQuillService, stub)
+        wallets = [WALLET_WITH_TROVE, WALLET_WITH_DEPOSIT]
+
+        async def reads():
+            return await asyncio.gather(
+                async_service.get_market_data(),
+                async_service.get_user_positions_batch(wallets),
+                async_service.get_recommended_strategies({"ETH": 1.0, "SRC": 100.0})
+            )
+
+        market_data, positions, strategies = run(reads())
+
+        assert market_data == sync_service.get_market_data()
+        assert positions == sync_service.get_user_positions_batch(wallets)
+        assert strategies == sync_service.get_recommended_strategies({"ETH": 1.0, "SRC": 100.0})
+        # The async service's contracts don't replace the sync service's
+        assert QuillService.COLLATERAL_TYPES["ETH"]["price_feed_contract"] is sync_service.COLLATERAL_TYPES["ETH"]["price_feed_contract"]
+    finally:
+        stub.stop()
+
+def test_reads_stay_in_flight_together():
+    """One event loop overlaps many slow RPC reads instead of running them in turn"""
+    stub = build_quill_stub()
+    register_quill_positions(stub)
+    try:
+        class StubAsync(AsyncQuillService):
+            SCROLL_RPC_URL = stub.url
+        service = StubAsync()
+        run(service.get_market_data())  # connection check and Multicall3 probe
+        stub.latency = 0.3
+
+        async def reads():
+            return await asyncio.gather(*[
+                service.get_user_positions(WALLET_WITH_TROVE)
+                for _ in range(20)
+            ])
+
+        started = time.perf_counter()
+        positions = run(reads())
+        elapsed = time.perf_counter() - started
+
+        assert all(p == positions[0] for p in positions)
+        assert set(positions[0]["troves"]) == {"ETH"}
+        # 20 sequential reads would take at least 6 seconds
+        assert elapsed < 3.0
+    finally:
+        stub.stop()
+
+def test_unreachable_node_falls_back():
+    stub = build_ambient_stub()
+    url = stub.url
+    stub.stop()
+
+    class StubAsync(AsyncAmbientService):
+        SCROLL_RPC_URL = url
+    service = StubAsync()
+
+    assert run(service.get_pool_price("ETH", "USDC")) == Decimal("2000.0")
+    # Dropped w3 lets the service registry rebuild the service
+    assert service.w3 is None
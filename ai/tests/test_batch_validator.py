@@ -0,0 +1,168 @@
+# ai/tests/test_batch_validator.py
+import sys
+import os
+import copy
+import random
+from types import SimpleNamespace
+
+# Add the project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import numpy as np
+import pytest
+
+from ai.batch_validator import ACTION_CODES, OTHER, BatchStrategyValidator, StepBatch, encode_steps
+from ai.services.price_service import FALLBACK_TOKEN_PRICES
+from ai.strategy_cache import StrategyCache
+from ai.strategy_generator import StrategyGenerator
+
+WALLET = {"ETH": 0.5, "USDC": 250.0, "SRC": 40.0}
+
+ACTIONS = ["supply", "add_liquidity", "swap", "borrow", "borrow_usdq", "provide_stability", "withdraw", ""]
+TOKENS = ["ETH", "WETH", "USDC", "SRC", "SCR", "USDQ", "DAI", ""]
+# validate_strategy raises KeyError when borrowing a token the wallet doesn't hold
+BORROWABLE = ["ETH", "WETH", "USDC", "SRC", "SCR", "USDQ"]
+
+@pytest.fixture(scope="module")
+def generator():
+    # Only the validators are used, never the LLM
+    return StrategyGenerator(cache=StrategyCache(directory=None), client=SimpleNamespace())
+
+def random_strategy(rng: random.Random) -> dict:
+    steps = []
+    for _ in range(rng.randint(0, 7)):
+        action = rng.choice(ACTIONS)
+        step = {
+            "protocol": rng.choice(["AAVE", "Ambient", "Quill", ""]),
+            "action": action,
+            "token": rng.choice(BORROWABLE if action == "borrow" else TOKENS),
+            # Often more than the wallet holds, sometimes zero or negative
+            "amount": rng.choice([0, -1, round(rng.uniform(0, 2), 4), round(rng.uniform(0, 500), 2)]),
+            "expected_apy": rng.choice([round(rng.uniform(-15, 30), 2), "4.5", 0])
+        }
+        if action == "borrow_usdq" and rng.random() < 0.8:
+            step["usdq_amount"] = round(rng.uniform(0, 2000), 2)
+        if rng.random() < 0.1:
+            del step["expected_apy"]
+        steps.append(step)
+    return {
+        "name": rng.choice(["Anchor", "Zenith", "Wildcard", "Custom"]),
+        "risk_level": 1,
+        "steps": steps,
+        "explanation": "",
+        "total_expected_apy": 0,
+        "risk_factors": []
+    }
+
+def random_strategies(seed: int, count: int):
+    rng = random.Random(seed)
+    return [random_strategy(rng) for _ in range(count)]
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_validate_strategy_logic(generator, seed):
+    strategies = random_strategies(seed, 400)
+    balances = generator._validation_balances(WALLET)
+
+    expected = [generator.validate_strategy_logic(s, balances) for s in copy.deepcopy(strategies)]
+    actual = BatchStrategyValidator().validate_strategies_logic(copy.deepcopy(strategies), balances)
+
+    assert actual == expected
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_validate_strategy(generator, seed):
+    strategies = random_strategies(seed, 400)
+
+    expected = [generator.validate_strategy(s, dict(WALLET)) for s in copy.deepcopy(strategies)]
+    actual = BatchStrategyValidator().validate_strategies(copy.deepcopy(strategies), dict(WALLET))
+
+    assert actual == expected
+
+def test_prices_come_from_the_generators_price_service():
+    """With on-chain prices the batch results still match the generator's, which prices through the service"""
+    class FixedPrices:
+        PRICES = {"ETH": 100.0, "WETH": 100.0, "USDC": 1.0, "SRC": 0.5, "SCR": 0.5, "USDQ": 1.0}
+
+        def prices(self):
+            return dict(self.PRICES)
+
+        def get_price(self, token):
+            return self.PRICES.get(token, 1.0)
+
+    generator = StrategyGenerator(cache=StrategyCache(directory=None), price_service=FixedPrices(), client=SimpleNamespace())
+    strategies = random_strategies(7, 400)
+
+    expected = [generator.validate_strategy(s, dict(WALLET)) for s in copy.deepcopy(strategies)]
+    validator = BatchStrategyValidator.for_generator(generator)
+    actual = validator.validate_strategies(copy.deepcopy(strategies), dict(WALLET))
+
+    assert validator.prices == FixedPrices.PRICES
+    assert actual == expected
+    without_service = StrategyGenerator(cache=StrategyCache(directory=None), client=SimpleNamespace())
+    assert BatchStrategyValidator.for_generator(without_service).prices is FALLBACK_TOKEN_PRICES
+
+def test_overspending_is_cut_and_unused_usdq_deposited():
+    strategy = {
+        "name": "Zenith",
+        "steps": [
+            {"protocol": "AAVE", "action": "supply", "token": "USDC", "amount": 400, "expected_apy": 3},
+            {"protocol": "AAVE", "action": "supply", "token": "DAI", "amount": 10, "expected_apy": 3},
+            {"protocol": "Quill", "action": "borrow_usdq", "token": "ETH", "amount": 0.2, "usdq_amount": 100, "interest_rate": 10, "expected_apy": -10}
+        ]
+    }
+
+    [validated] = BatchStrategyValidator().validate_strategies_logic([strategy], dict(WALLET))
+
+    assert validated is strategy
+    # 95% of the 250 USDC held; DAI isn't held at all
+    assert [step["amount"] for step in validated["steps"]] == [pytest.approx(237.5), 0.2, 100.0]
+    assert validated["steps"][-1]["action"] == "provide_stability"
+    assert validated["total_expected_apy"] == pytest.approx(20 / 3)
+
+def test_empty_strategy_falls_back_to_supplying_the_largest_holding():
+    strategy = {"name": "Anchor", "steps": [{"protocol": "AAVE", "action": "withdraw", "token": "USDC", "amount": 1, "expected_apy": 1}]}
+
+    [validated] = BatchStrategyValidator().validate_strategies([strategy], dict(WALLET))
+
+    # 0.5 ETH is worth more than 250 USDC or 40 SRC at the validation prices
+    assert validated["steps"] == [{"protocol": "AAVE", "action": "supply", "token": "ETH", "amount": 0.45, "expected_apy": 2.0}]
+    assert validated["total_expected_apy"] == 2.0
+
+def test_bad_apy_raises_like_the_scalar_validator(generator):
+    strategy = {"name": "Anchor", "steps": [{"protocol": "AAVE", "action": "supply", "token": "USDC", "amount": 1, "expected_apy": "n/a"}]}
+
+    with pytest.raises(ValueError):
+        generator.validate_strategy_logic(copy.deepcopy(strategy), dict(WALLET))
+    with pytest.raises(ValueError):
+        BatchStrategyValidator().validate_strategies_logic([strategy], dict(WALLET))
+
+def test_array_batches_match_encoded_dicts():
+    """Candidates built straight into arrays get the same result as the same strategies as dicts"""
+    rng = random.Random(7)
+    strategies = [random_strategy(rng) for _ in range(300)]
+    for strategy in strategies:
+        for step in strategy["steps"]:
+            step["protocol"] = "AAVE"
+            step["expected_apy"] = float(step.get("expected_apy", 0))
+    width = max(len(s["steps"]) for s in strategies)
+    shape = (len(strategies), width)
+    token, action, amount, apy, usdq = (np.zeros(shape, dtype=int), np.zeros(shape, dtype=int),
+                                        np.zeros(shape), np.zeros(shape), np.zeros(shape))
+    exists = np.zeros(shape, dtype=bool)
+    for i, strategy in enumerate(strategies):
+        for j, step in enumerate(strategy["steps"]):
+            exists[i, j] = True
+            token[i, j] = TOKENS.index(step["token"])
+            action[i, j] = ACTION_CODES.get(step["action"], OTHER)
+            amount[i, j] = step["amount"]
+            apy[i, j] = step["expected_apy"]
+            usdq[i, j] = step.get("usdq_amount", 0)
+
+    validator = BatchStrategyValidator()
+    arrays = StepBatch.from_arrays(WALLET, TOKENS, token, action, amount, apy, usdq, exists, [s["name"] for s in strategies])
+    encoded = encode_steps(strategies, WALLET)
+
+    for check in (validator.check_balances, validator.check_logic):
+        expected, actual = check(encoded, WALLET), check(arrays, WALLET)
+        np.testing.assert_array_equal(actual.kept, expected.kept)
+        np.testing.assert_array_equal(actual.amount[actual.kept], expected.amount[expected.kept])
+        np.testing.assert_array_equal(actual.total_expected_apy, expected.total_expected_apy)
@@ -0,0 +1,107 @@
+# ai/tests/test_block_pinning.py
+import asyncio
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from decimal import Decimal
+
+# Add the project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from ai.services.aave_service import AsyncAaveService
+from ai.services.ambient_service import AmbientService
+from ai.services.block_context import block_identifier, pinned_block, read_at_block
+from ai.services.snapshot_cache import SnapshotCache
+from ai.services.web3_provider import rpc_provider_factory
+from ai.tests.rpc_stub import WALLET_WITH_TROVE, build_aave_stub, build_ambient_stub, build_quill_stub, make_quill_service, register_quill_positions
+
+def eth_call_blocks(stub):
+    """Block parameter of every top-level eth_call the stub received"""
+    return {call["block"] for call in stub.calls if not call["nested"]}
+
+def test_pin_is_scoped_and_follows_copied_contexts():
+    assert block_identifier() == "latest"
+    with read_at_block(990):
+        assert block_identifier() == 990
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(contextvars.copy_context().run, pinned_block).result() == 990
+    assert pinned_block() is None
+
+def test_quill_reads_at_pinned_block():
+    stub = build_quill_stub()
+    register_quill_positions(stub)
+    try:
+        service = make_quill_service(stub)
+        stub.reset()
+
+        with read_at_block(990):
+            service.get_market_data()
+            service.get_trove_data(WALLET_WITH_TROVE, "ETH")
+        assert eth_call_blocks(stub) == {hex(990)}
+
+        stub.reset()
+        service.get_market_data()
+        assert eth_call_blocks(stub) == {"latest"}
+    finally:
+        stub.stop()
+
+def test_ambient_swap_impact_reads_at_pinned_block():
+    stub = build_ambient_stub()
+    try:
+        class StubAmbientService(AmbientService):
+            SCROLL_RPC_URL = stub.url
+        service = StubAmbientService()
+        stub.reset()
+
+        with read_at_block(990):
+            service.calculate_swap_impact("ETH", "USDC", Decimal("1"))
+
+        assert stub.called("calcImpact") == 1
+        assert eth_call_blocks(stub) == {hex(990)}
+    finally:
+        stub.stop()
+
+def test_async_reads_at_pinned_block():
+    stub = build_aave_stub(with_multicall=True)
+    try:
+        class StubAaveService(AsyncAaveService):
+            SCROLL_RPC_URL = stub.url
+        service = StubAaveService()
+
+        async def read():
+            try:
+                await service.initialize_contracts()
+                stub.reset()
+                # Tasks started inside the pin inherit it
+                with read_at_block(990):
+                    return await asyncio.gather(service.get_market_data(), service.get_reserve_data())
+            finally:
+                await rpc_provider_factory.aclose()
+
+        market_data, reserves = asyncio.run(read())
+
+        assert reserves
+        assert eth_call_blocks(stub) == {hex(990)}
+    finally:
+        stub.stop()
+
+def test_snapshot_cache_keys_pinned_reads_by_block():
+    cache = SnapshotCache(ttl=10)
+    reads = []
+
+    def fetch():
+        reads.append(block_identifier())
+        return {"block": block_identifier()}
+
+    latest = cache.get("aave", fetch, block_number=lambda: 1000)
+    with read_at_block(990):
+        pinned = cache.get("aave", fetch, block_number=lambda: 1000)
+        again = cache.get("aave", fetch, block_number=lambda: 1000)
+
+    # Each snapshot was read at the block it is keyed by
+    assert reads == [1000, 990]
+    assert (pinned.block_number, pinned.data) == (990, {"block": 990})
+    assert again is pinned
+    # An older block doesn't replace the latest snapshot
+    assert cache.latest("aave") is latest
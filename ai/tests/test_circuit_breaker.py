@@ -0,0 +1,137 @@
+# ai/tests/test_circuit_breaker.py
+import sys
+import os
+import asyncio
+import time
+
+# Add the project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import pytest
+
+from ai.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from ai.services.web3_provider import RpcProviderFactory
+from ai.tests.rpc_stub import RpcStub
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def failing():
+    raise ConnectionError("node down")
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    breaker = CircuitBreaker("rpc", failure_threshold=3, cooldown=60)
+    calls = []
+
+    breaker.call(lambda: calls.append(1))
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            breaker.call(failing)
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: calls.append(2))
+
+    assert breaker.is_open
+    assert calls == [1]
+    assert breaker.describe()["rejected_requests"] == 1
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker("rpc", failure_threshold=2)
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            breaker.call(failing)
+        breaker.call(lambda: None)
+
+    assert not breaker.is_open
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker("rpc", failure_threshold=2, slow_call_seconds=0.05)
+
+    assert breaker.call(lambda: time.sleep(0.06) or "late") == "late"
+    breaker.call(lambda: time.sleep(0.06))
+
+    assert breaker.is_open
+
+def test_background_probe_closes_the_circuit():
+    node_up = False
+
+    def probe():
+        if not node_up:
+            raise ConnectionError("still down")
+
+    breaker = CircuitBreaker("rpc", probe=probe, failure_threshold=1, cooldown=0.05)
+    with pytest.raises(ConnectionError):
+        breaker.call(failing)
+
+    # After the cooldown a request starts the probe but is still failed fast
+    time.sleep(0.06)
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: None)
+    assert wait_for(lambda: breaker.state == "open" and not breaker._probing)
+
+    node_up = True
+    time.sleep(0.06)
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: None)
+    assert wait_for(lambda: not breaker.is_open)
+    assert breaker.call(lambda: "ok") == "ok"
+
+def test_without_a_probe_one_request_is_let_through():
+    breaker = CircuitBreaker("rpc", failure_threshold=1, cooldown=0.05)
+    with pytest.raises(ConnectionError):
+        breaker.call(failing)
+    time.sleep(0.06)
+
+    with pytest.raises(ConnectionError):
+        breaker.call(failing)
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    assert breaker.call(lambda: "ok") == "ok"
+    assert not breaker.is_open
+
+def test_providers_for_an_endpoint_share_one_breaker():
+    """A slow node opens the circuit for sync and async providers alike, then a probe closes it"""
+    stub = RpcStub().start()
+    factory = RpcProviderFactory()
+    breaker = factory.breaker(stub.url)
+    breaker.failure_threshold, breaker.slow_call_seconds, breaker.cooldown = 2, 0.1, 0.1
+    try:
+        w3 = factory.web3(stub.url)
+        async_w3 = factory.async_web3(stub.url)
+        stub.latency = 0.15
+        w3.eth.block_number
+        w3.eth.block_number
+        sent = stub.count()
+
+        started = time.monotonic()
+        assert not w3.is_connected()
+        with pytest.raises(CircuitOpenError):
+            w3.eth.block_number
+
+        async def async_read():
+            try:
+                return await async_w3.eth.block_number
+            finally:
+                await factory.aclose()
+
+        with pytest.raises(CircuitOpenError):
+            asyncio.run(async_read())
+        assert time.monotonic() - started < 0.1
+        assert stub.count() == sent
+        assert factory.circuit_open(stub.url)
+        assert factory.stats()["breakers"][stub.url]["state"] == "open"
+
+        # The node recovers; the first request after the cooldown starts the probe
+        stub.latency = 0
+        time.sleep(0.12)
+        with pytest.raises(CircuitOpenError):
+            w3.eth.block_number
+        assert wait_for(lambda: not factory.circuit_open(stub.url))
+        assert w3.eth.block_number == stub.block_number
+    finally:
+        factory.close()
+        stub.stop()
@@ -0,0 +1,65 @@
+# ai/tests/test_combined_generation.py
+import sys
+import os
+from types import SimpleNamespace
+
+# Add the project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import pytest
+
+from ai.strategy_generator import StrategyGenerator, GenerationStats, COMBINED_MODE, PER_TIER_MODE
+from ai.tests.llm_stub import make_generator, strategy_json
+
+WALLET = {"ETH": 1, "USDC": 100}
+MARKET = {"rates": {"AAVE": {"supply_apy": {"USDC": 3.0}}}}
+
+def test_combined_mode_makes_one_call():
+    """All three tiers come back from a single LLM call, in tier order"""
+    response = {"strategies": [strategy_json("Wildcard", 5), strategy_json("Anchor"), strategy_json("Zenith", 3)]}
+    generator, completions = make_generator(COMBINED_MODE, lambda prompt: response)
+    stats = GenerationStats()
+
+    strategies = generator.generate_all_strategies(WALLET, MARKET, {}, stats=stats)
+
+    assert [s.name for s in strategies] == ["Anchor", "Zenith", "Wildcard"]
+    assert len(completions.prompts) == 1
+    assert stats.mode == COMBINED_MODE
+    assert stats.llm_calls == 1
+    assert stats.total_tokens == stats.prompt_tokens + stats.completion_tokens
+
+def test_combined_mode_tolerates_missing_tier():
+    """A tier left out of the combined response is dropped, like a failed per-tier call"""
+    response = {"strategies": [strategy_json("Anchor"), {"name": "Zenith"}, strategy_json("Unknown")]}
+    generator, _ = make_generator(COMBINED_MODE, lambda prompt: response)
+
+    strategies = generator.generate_all_strategies(WALLET, MARKET, {})
+
+    assert [s.name for s in strategies] == ["Anchor"]
+
+def test_combined_mode_without_strategies_raises():
+    generator, _ = make_generator(COMBINED_MODE, lambda prompt: {"strategies": []})
+
+    with pytest.raises(ValueError):
+        generator.generate_all_strategies(WALLET, MARKET, {})
+
+def test_combined_prompt_uses_fewer_tokens_than_per_tier():
+    """The shared context is sent once, so the combined prompt costs less input"""
+    per_tier, _ = make_generator(PER_TIER_MODE)
+    combined, _ = make_generator(
+        COMBINED_MODE,
+        lambda prompt: {"strategies": [strategy_json(name) for name in ("Anchor", "Zenith", "Wildcard")]}
+    )
+
+    per_tier_result = per_tier.generate_strategies_json(WALLET, MARKET, {})
+    combined_result = combined.generate_strategies_json(WALLET, MARKET, {})
+
+    assert per_tier_result["generation"]["mode"] == PER_TIER_MODE
+    assert per_tier_result["generation"]["llm_calls"] == 3
+    assert combined_result["generation"]["llm_calls"] == 1
+    assert combined_result["generation"]["prompt_tokens"] < per_tier_result["generation"]["prompt_tokens"]
+    assert [s["name"] for s in combined_result["strategies"]] == ["Anchor", "Zenith", "Wildcard"]
+
+def test_unknown_mode_rejected():
+    with pytest.raises(ValueError):
+        StrategyGenerator(generation_mode="all_at_once", client=SimpleNamespace())
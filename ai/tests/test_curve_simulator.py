@@ -0,0 +1,190 @@
+# ai/tests/test_curve_simulator.py
+import sys
+import os
+import time
+from decimal import Decimal, getcontext
+
+# Add the project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import numpy as np
+import pytest
+
+import ai.services.ambient_service as ambient_module
+from ai.services.ambient_service import AmbientService
+from ai.services.block_context import read_at_block
+from ai.services.curve_simulator import CurveSimulator, CurveState
+from ai.tests.rpc_stub import AMBIENT_FEE_RATE, ReferenceCurve, build_curve_stub, usdc_eth_pool
+
+getcontext().prec = 60
+
+def seeded_state(pool: ReferenceCurve) -> CurveState:
+    ticks = ambient_module.level_ticks(pool.tick, 16, 64)
+    return CurveState.from_pool(
+        int(pool.sqrt_price * 2**64),
+        pool.liquidity_at(pool.tick),
+        pool.tick,
+        {tick: pool.query_level(tick) for tick in ticks}
+    )
+
+# (is_buy, in_base_qty, qty): every direction, fixed input and fixed output,
+# from a sliver of the tick to swaps crossing several levels
+SWAPS = [
+    (True, True, 10**9),            # Pay 1,000 USDC
+    (True, True, 3 * 10**12),       # Pay 3M USDC
+    (True, False, 10**18),          # Receive 1 ETH
+    (True, False, 400 * 10**18),    # Receive 400 ETH
+    (False, False, 10**18),         # Pay 1 ETH
+    (False, False, 1500 * 10**18),  # Pay 1,500 ETH
+    (False, True, 2 * 10**9),       # Receive 2,000 USDC
+    (False, True, 2 * 10**11),      # Receive 200,000 USDC
+]
+
+@pytest.mark.parametrize("is_buy, in_base_qty, qty", SWAPS)
+def test_matches_the_reference_curve(is_buy, in_base_qty, qty):
+    pool = usdc_eth_pool()
+    simulator = CurveSimulator(seeded_state(pool), AMBIENT_FEE_RATE)
+
+    base_flow, quote_flow, final_price = simulator.calc_impact(is_buy, in_base_qty, qty)
+    expected = pool.calc_impact(is_buy, in_base_qty, qty)
+
+    assert base_flow == pytest.approx(expected[0], rel=1e-9)
+    assert quote_flow == pytest.approx(expected[1], rel=1e-9)
+    assert final_price == pytest.approx(expected[2], rel=1e-9)
+
+def test_large_swaps_cross_levels():
+    """The big swaps above really do leave the starting liquidity behind"""
+    pool = usdc_eth_pool()
+    state = seeded_state(pool)
+    _, _, final_price = CurveSimulator(state).calc_impact(True, True, 3 * 10**12)
+
+    final_tick = ReferenceCurve(Decimal(final_price) / 2**64, 0, []).tick
+    assert sum(1 for tick in state.ticks if state.tick < tick <= final_tick) >= 2
+
+def test_output_beyond_the_reserves_is_refused():
+    simulator = CurveSimulator(seeded_state(usdc_eth_pool()), AMBIENT_FEE_RATE)
+
+    # The whole curve holds well under 10M USDC
+    with pytest.raises(ValueError):
+        simulator.calc_impact(False, True, 10**13)
+
+def test_quotes_take_microseconds():
+    simulator = CurveSimulator(seeded_state(usdc_eth_pool()), AMBIENT_FEE_RATE)
+    count = 2000
+
+    started = time.perf_counter()
+    for i in range(count):
+        simulator.calc_impact(True, True, (i + 1) * 10**9)
+    per_quote = (time.perf_counter() - started) / count
+
+    assert per_quote < 200e-6, f"{per_quote * 1e6:.0f}us per quote"
+
+def test_service_quotes_locally_once_seeded(monkeypatch):
+    """After one seed per block, quotes cost no RPC and match the calcImpact path"""
+    monkeypatch.setattr(ambient_module, "AMBIENT_SWAP_FEE_RATE", AMBIENT_FEE_RATE)
+    stub = build_curve_stub(usdc_eth_pool())
+    try:
+        class StubAmbientService(AmbientService):
+            SCROLL_RPC_URL = stub.url
+        service = StubAmbientService()
+        stub.reset()
+
+        with read_at_block(stub.block_number):
+            local = [service.calculate_swap_impact("ETH", "USDC", Decimal(amount)) for amount in ("0.5", "1", "250")]
+        seed_calls = stub.count("eth_call")
+
+        monkeypatch.setattr(ambient_module, "AMBIENT_LOCAL_IMPACT", False)
+        remote = [service.calculate_swap_impact("ETH", "USDC", Decimal(amount)) for amount in ("0.5", "1", "250")]
+
+        # One batch for price, liquidity and tick, one for the tick levels; no calcImpact
+        assert seed_calls == 2
+        assert stub.called("calcImpact") == 3
+        for simulated, on_chain in zip(local, remote):
+            assert simulated["output_amount"] == pytest.approx(on_chain["output_amount"], rel=1e-9)
+            assert simulated["price_impact"] == pytest.approx(on_chain["price_impact"], rel=1e-6, abs=1e-12)
+    finally:
+        stub.stop()
+
+def expected_output(pool: ReferenceCurve, pays_base: bool, amount_in: int) -> Decimal:
+    """Raw output of a small fixed-input swap that stays on the current tick's liquidity"""
+    liquidity, s0 = Decimal(pool.liquidity_at(pool.tick)), pool.sqrt_price
+    net = Decimal(amount_in) * (1 - Decimal(str(AMBIENT_FEE_RATE)))
+    if pays_base:
+        # Base in raises the price; quote out = L * (1/s0 - 1/s1)
+        return liquidity * (1 / s0 - 1 / (s0 + net / liquidity))
+    # Quote in lowers the price; base out = L * (s0 - s1)
+    return liquidity * (s0 - 1 / (1 / s0 + net / liquidity))
+
+@pytest.mark.parametrize("local_impact", [True, False])
+def test_service_quotes_both_pair_orders(monkeypatch, local_impact):
+    """USDC is the pool's base: selling ETH pays quote, selling USDC pays base"""
+    monkeypatch.setattr(ambient_module, "AMBIENT_SWAP_FEE_RATE", AMBIENT_FEE_RATE)
+    monkeypatch.setattr(ambient_module, "AMBIENT_LOCAL_IMPACT", local_impact)
+    pool = usdc_eth_pool()
+    stub = build_curve_stub(pool)
+    try:
+        class StubAmbientService(AmbientService):
+            SCROLL_RPC_URL = stub.url
+        service = StubAmbientService()
+
+        eth_to_usdc = service.calculate_swap_impact("ETH", "USDC", Decimal("1"))
+        usdc_to_eth = service.calculate_swap_impact("USDC", "ETH", Decimal("1000"))
+    finally:
+        stub.stop()
+
+    assert eth_to_usdc["output_amount"] == pytest.approx(float(expected_output(pool, False, 10**18) / 10**6), rel=1e-9)
+    assert usdc_to_eth["output_amount"] == pytest.approx(float(expected_output(pool, True, 1000 * 10**6) / 10**18), rel=1e-9)
+    # About 2000 USDC per ETH, less the fee and a little impact
+    assert 1990 < eth_to_usdc["output_amount"] < 1994
+    assert 0.4975 < usdc_to_eth["output_amount"] < 0.4985
+    assert 0 < eth_to_usdc["price_impact"] < 0.01
+    assert 0 < usdc_to_eth["price_impact"] < 0.01
+
+@pytest.mark.parametrize("is_buy, in_base_qty, qty", SWAPS)
+def test_ladder_matches_single_quotes(is_buy, in_base_qty, qty):
+    simulator = CurveSimulator(seeded_state(usdc_eth_pool()), AMBIENT_FEE_RATE)
+    qtys = [qty * step // 20 for step in range(31)]
+
+    base_flows, quote_flows, final_prices = simulator.calc_impact_ladder(is_buy, in_base_qty, qtys)
+
+    for i, rung in enumerate(qtys):
+        try:
+            expected = simulator.calc_impact(is_buy, in_base_qty, rung)
+        except ValueError:
+            # Sizes the curve can't fill are NaN rather than an error for the whole ladder
+            assert np.isnan([base_flows[i], quote_flows[i], final_prices[i]]).all()
+            continue
+        assert base_flows[i] == pytest.approx(expected[0], rel=1e-7, abs=1)
+        assert quote_flows[i] == pytest.approx(expected[1], rel=1e-7, abs=1)
+        assert final_prices[i] == pytest.approx(expected[2], rel=1e-9)
+
+@pytest.mark.parametrize("from_token, to_token, step", [("ETH", "USDC", "0.25"), ("USDC", "ETH", "500")])
+def test_service_ladder_from_one_seed(monkeypatch, from_token, to_token, step):
+    monkeypatch.setattr(ambient_module, "AMBIENT_SWAP_FEE_RATE", AMBIENT_FEE_RATE)
+    pool = usdc_eth_pool()
+    stub = build_curve_stub(pool)
+    try:
+        class StubAmbientService(AmbientService):
+            SCROLL_RPC_URL = stub.url
+        service = StubAmbientService()
+        amounts = [Decimal(step) * i for i in range(1, 101)]
+        stub.reset()
+
+        with read_at_block(stub.block_number):
+            ladder = service.calculate_swap_impact_ladder(from_token, to_token, amounts)
+            singles = [service.calculate_swap_impact(from_token, to_token, amount) for amount in amounts[::10]]
+
+        # 100 sizes for the same two batched reads as a single quote
+        assert stub.count("eth_call") == 2
+        assert stub.called("calcImpact") == 0
+        assert ladder["input_amounts"] == [float(amount) for amount in amounts]
+        assert ladder["output_amounts"][::10] == pytest.approx([quote["output_amount"] for quote in singles], rel=1e-9)
+        assert ladder["price_impacts"][::10] == pytest.approx([quote["price_impact"] for quote in singles], rel=1e-6)
+        assert ladder["price_impacts"] == sorted(ladder["price_impacts"])
+    finally:
+        stub.stop()
+
+    # The first rung, in the token received, against the pool's own liquidity
+    first = service._raw_amount(from_token, amounts[0])
+    expected = expected_output(pool, from_token == "USDC", first) / 10 ** AmbientService.DECIMALS[to_token]
+    assert ladder["output_amounts"][0] == pytest.approx(float(expected), rel=1e-9)
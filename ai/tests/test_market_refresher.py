@@ -0,0 +1,140 @@
+# ai/tests/test_market_refresher.py
+import sys
+import os
+import asyncio
+
+# Add the project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from ai.services.block_context import pinned_block, read_at_block
+from ai.services.market_refresher import MarketRefresher
+from ai.services.snapshot_cache import SnapshotCache
+
+class FakeEth:
+    def __init__(self, chain):
+        self.chain = chain
+
+    @property
+    async def block_number(self):
+        self.chain.head_reads += 1
+        return self.chain.block
+
+class FakeW3:
+    def __init__(self, chain):
+        self.eth = FakeEth(chain)
+
+class Chain:
+    """Async services for every provider over one fake chain"""
+
+    def __init__(self):
+        self.block = 100
+        self.head_reads = 0
+        self.reads = []
+        self.failing = set()
+        self.w3 = FakeW3(self)
+
+    def service(self, provider):
+        chain = self
+
+        class Service:
+            w3 = chain.w3
+
+            async def get_market_data(self):
+                if provider in chain.failing:
+                    raise ConnectionError("RPC down")
+                chain.reads.append((provider, pinned_block()))
+                return {"provider": provider, "block": pinned_block()}
+
+        return Service()
+
+def make_refresher(chain, **kwargs):
+    return MarketRefresher(SnapshotCache(ttl=0), chain.service, poll_interval=0.01, **kwargs)
+
+def test_refreshes_every_provider_at_each_new_block():
+    chain = Chain()
+    refresher = make_refresher(chain)
+
+    async def main():
+        await refresher.on_block(100)
+        await refresher.on_block(100)
+        chain.block = 101
+        await refresher.on_block(101)
+
+    asyncio.run(main())
+
+    # The repeated block costs no market reads
+    assert sorted(chain.reads) == sorted((p, b) for b in (100, 101) for p in ("aave", "ambient", "quill"))
+    state = refresher.state
+    assert state.block_number == 101
+    assert {s.block_number for s in state.snapshots.values()} == {101}
+    # The cache gets the same snapshots, for pinned reads and fallbacks
+    assert refresher.cache.get_at("aave", 101) is state.snapshots["aave"]
+
+def test_failed_provider_keeps_its_previous_snapshot():
+    failures = []
+    chain = Chain()
+    refresher = make_refresher(chain, on_failure=failures.append)
+
+    async def main():
+        await refresher.refresh(100)
+        chain.failing.add("ambient")
+        await refresher.refresh(101)
+
+    asyncio.run(main())
+
+    snapshots = refresher.state.snapshots
+    assert snapshots["aave"].block_number == 101
+    assert snapshots["ambient"].block_number == 100
+    assert failures == ["ambient"]
+    # Unpinned reads get the previous snapshot; reads pinned to 101 don't
+    assert refresher.snapshot("ambient").block_number == 100
+    with read_at_block(101):
+        assert refresher.snapshot("aave").block_number == 101
+        assert refresher.snapshot("ambient") is None
+
+def test_degraded_data_is_not_published():
+    chain = Chain()
+    refresher = make_refresher(chain, validators={"quill": lambda data: data["block"] == 100})
+
+    async def main():
+        await refresher.refresh(100)
+        await refresher.refresh(101)
+
+    asyncio.run(main())
+
+    assert refresher.state.snapshots["quill"].data["block"] == 100
+    assert refresher.cache.get_at("quill", 101) is None
+
+def test_snapshot_served_only_while_current_and_at_the_pinned_block():
+    chain = Chain()
+    refresher = make_refresher(chain, max_lag=60)
+    asyncio.run(refresher.refresh(100))
+
+    assert refresher.snapshot("aave").block_number == 100
+    assert refresher.current_block() == 100
+    with read_at_block(100):
+        assert refresher.snapshot("aave") is not None
+    with read_at_block(99):
+        assert refresher.snapshot("aave") is None
+
+    refresher.max_lag = 0
+    assert refresher.snapshot("aave") is None
+    assert refresher.current_block() is None
+
+def test_background_task_follows_the_head():
+    chain = Chain()
+    refresher = make_refresher(chain)
+
+    async def main():
+        refresher.start()
+        await asyncio.sleep(0.05)
+        chain.block = 102
+        await asyncio.sleep(0.05)
+        await refresher.stop()
+
+    asyncio.run(main())
+
+    assert chain.head_reads > 2
+    assert refresher.state.block_number == 102
+    # One refresh per block, however many polls
+    assert len(chain.reads) == 6
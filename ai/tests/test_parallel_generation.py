@@ -0,0 +1,39 @@
+# ai/tests/test_parallel_generation.py
+import sys
+import os
+import time
+
+# Add the project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import pytest
+
+from ai.tests.llm_stub import FakeLLMGenerator
+
+def test_strategies_generated_concurrently():
+    """Three tiers cost roughly one LLM call, not three"""
+    generator = FakeLLMGenerator({"Anchor": 0.3, "Zenith": 0.3, "Wildcard": 0.3})
+
+    started = time.monotonic()
+    strategies = generator.generate_all_strategies({"USDC": 100}, {}, {})
+    elapsed = time.monotonic() - started
+
+    assert [s.name for s in strategies] == ["Anchor", "Zenith", "Wildcard"]
+    assert elapsed < 0.8, f"Expected concurrent generation, took {elapsed:.2f}s"
+
+def test_finished_strategies_returned_when_one_times_out_or_fails():
+    """A slow or failing tier doesn't take the others down with it"""
+    generator = FakeLLMGenerator({"Wildcard": 2.0}, failures={"Zenith"})
+
+    started = time.monotonic()
+    strategies = generator.generate_all_strategies({"USDC": 100}, {}, {}, timeout=0.3)
+    elapsed = time.monotonic() - started
+
+    assert [s.name for s in strategies] == ["Anchor"]
+    assert elapsed < 1.0
+
+def test_no_strategies_raises():
+    generator = FakeLLMGenerator({}, failures={"Anchor", "Zenith", "Wildcard"})
+
+    with pytest.raises(ValueError):
+        generator.generate_all_strategies({"USDC": 100}, {}, {})
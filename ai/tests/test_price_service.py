@@ -0,0 +1,121 @@
+# ai/tests/test_price_service.py
+import sys
+import os
+from types import SimpleNamespace
+
+# Add the project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import pytest
+
+from ai.services.aave_service import AaveService
+from ai.services.abis.price_oracle_abi import PRICE_ORACLE_ABI
+from ai.services.abis.quill_price_feed_abi import QUILL_PRICE_FEED_ABI
+from ai.services.price_service import FALLBACK_TOKEN_PRICES, PriceService
+from ai.services.quill_service import QuillService
+from ai.services.snapshot_cache import SnapshotCache
+from ai.strategy_cache import StrategyCache
+from ai.strategy_generator import StrategyGenerator
+from ai.tests.rpc_stub import AAVE_ORACLE, QUILL_PRICES, build_aave_stub, make_aave_service, make_quill_service
+
+# AAVE oracle prices (8 decimals); SRC has no AAVE price so its Quill feed is used
+ORACLE_PRICES = {"USDC": 1.0, "ETH": 2400.0, "SRC": 0, "wstETH": 2950.0, "weETH": 2600.0}
+
+@pytest.fixture
+def stub():
+    stub = build_aave_stub(with_multicall=True)
+    addresses = {address.lower(): symbol for symbol, address in AaveService.ASSETS.items()}
+    stub.register(AAVE_ORACLE, PRICE_ORACLE_ABI, {
+        "getAssetsPrices": lambda assets: [int(ORACLE_PRICES[addresses[a.lower()]] * 10**8) for a in assets]
+    })
+    for collateral, contracts in QuillService.COLLATERAL_TYPES.items():
+        price = int(QUILL_PRICES[collateral] * 10**18)
+        stub.register(contracts["price_feed"], QUILL_PRICE_FEED_ABI, {
+            "fetchPrice": lambda price=price: price,
+            "lastGoodPrice": lambda price=price: price,
+        })
+    yield stub
+    stub.stop()
+
+def make_price_service(stub):
+    services = {
+        "aave": make_aave_service(stub),
+        "quill": make_quill_service(stub),
+    }
+    return PriceService(services.get, SnapshotCache(ttl=60))
+
+def test_every_price_in_one_batched_read(stub):
+    service = make_price_service(stub)
+    stub.reset()
+
+    prices = service.prices()
+    again = service.prices()
+
+    # getAssetsPrices and every Quill feed in one aggregate3, then served from the cache
+    assert stub.count("eth_call") == 1
+    assert stub.called("getAssetsPrices") == 1
+    assert again == prices
+    # AAVE's oracle wins, the Quill feed fills in SRC, aliases and the USDQ peg follow
+    assert prices["ETH"] == prices["WETH"] == pytest.approx(2400)
+    assert prices["wstETH"] == pytest.approx(2950)
+    assert prices["SRC"] == prices["SCR"] == pytest.approx(QUILL_PRICES["SRC"])
+    assert prices["USDQ"] == 1.0
+
+def test_prices_carry_sources_and_staleness(stub):
+    described = make_price_service(stub).describe()
+
+    assert described["sources"]["ETH"] == "aave_oracle"
+    assert described["sources"]["SRC"] == "quill_feed"
+    assert described["sources"]["USDQ"] == "peg"
+    assert described["block_number"] == stub.block_number
+    assert described["stale"] is False
+
+def test_fallback_prices_without_a_connection():
+    service = PriceService(lambda name: None, SnapshotCache(ttl=60))
+
+    described = service.describe()
+
+    assert described["prices"] == FALLBACK_TOKEN_PRICES
+    assert set(described["sources"].values()) == {"fallback", "peg"}
+    assert service.get_price("DAI") == 1.0
+
+def test_validation_uses_the_price_service():
+    """The fallback supply goes to the largest holding at on-chain prices, not the fallback table"""
+    class FixedPrices:
+        def get_price(self, token):
+            return {"ETH": 100.0, "USDC": 1.0}.get(token, 1.0)
+
+    generator = StrategyGenerator(cache=StrategyCache(directory=None), price_service=FixedPrices(), client=SimpleNamespace())
+    strategy = {"name": "Anchor", "steps": []}
+
+    validated = generator.validate_strategy(strategy, {"ETH": 1.0, "USDC": 250.0})
+
+    # 1 ETH is worth 2000 USDC at the fallback prices, but only 100 here
+    assert validated["steps"][0]["token"] == "USDC"
+
+def test_service_fallbacks_use_the_last_read_prices():
+    """Ambient and Quill fall back to the price service's cached prices, not the fallback table"""
+    from ai.services.ambient_service import AmbientService
+
+    cache = SnapshotCache(ttl=60)
+    prices = PriceService(lambda name: None, cache)
+
+    class OfflineAmbientService(AmbientService):
+        SCROLL_RPC_URL = "http://127.0.0.1:9"
+
+    class OfflineQuillService(QuillService):
+        SCROLL_RPC_URL = "http://127.0.0.1:9"
+
+    ambient = OfflineAmbientService(price_service=prices)
+    quill = OfflineQuillService(price_service=prices)
+
+    # Nothing read yet: the fallback prices
+    assert ambient.get_pool_price("ETH", "USDC") == 2000
+    assert quill._fallback_price("ETH") == 2000
+
+    cache.put(PriceService.PROVIDER, {"prices": {"ETH": 2400.0, "USDC": 1.0}, "sources": {}}, block_number=100)
+
+    assert ambient.get_pool_price("ETH", "USDC") == 2400
+    assert quill._fallback_price("ETH") == 2400
+    # No reads: the fallback paths run because the chain couldn't be read
+    assert prices.last_price("DAI") is None
@@ -0,0 +1,94 @@
+# ai/tests/test_quill_batching.py
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import pytest
+
+from ai.services.quill_service import QuillService
+from ai.tests.rpc_stub import EMPTY_WALLET, QUILL_PRICES, WALLET_WITH_DEPOSIT, WALLET_WITH_TROVE, build_quill_stub, make_quill_service, register_quill_positions
+
+@pytest.fixture
+def stub():
+    stub = build_quill_stub()
+    yield stub
+    stub.stop()
+
+def test_market_data_in_one_round_trip(stub):
+    """All branches' prices and stability pool totals come from a single eth_call"""
+    service = make_quill_service(stub)
+    stub.reset()
+
+    market_data = service.get_market_data()
+
+    assert stub.count("eth_call") == 1
+    assert set(market_data["collaterals"]) == set(QuillService.COLLATERAL_TYPES)
+    assert market_data["collaterals"]["ETH"]["price_usd"] == pytest.approx(2500)
+    assert market_data["stability_pools"]["wstETH"] == {
+        "total_deposits_usdq": 1000.0,
+        "pool_collateral": 2.0,
+        "estimated_apr": 5.5,
+    }
+
+def test_price_falls_back_per_call(stub):
+    """fetchPrice failures fall back to lastGoodPrice, then the hardcoded price"""
+    service = make_quill_service(stub)
+
+    collaterals = service.get_market_data()["collaterals"]
+
+    assert collaterals["SRC"]["price_usd"] == pytest.approx(QUILL_PRICES["SRC"] - 1)
+    assert collaterals["weETH"]["price_usd"] == pytest.approx(2080)
+
+def test_same_output_without_multicall(stub):
+    """Per-call reads produce the same snapshot as the batched path"""
+    batched = make_quill_service(stub).get_market_data()
+
+    plain_stub = build_quill_stub(with_multicall=False)
+    try:
+        service = make_quill_service(plain_stub)
+        plain_stub.reset()
+        assert service.get_market_data() == batched
+        assert plain_stub.count("eth_call") == 4 * len(QuillService.COLLATERAL_TYPES)
+    finally:
+        plain_stub.stop()
+
+def test_user_positions_in_one_round_trip(stub):
+    """A wallet lookup reads every branch's trove, deposit and price in one eth_call"""
+    register_quill_positions(stub)
+    service = make_quill_service(stub)
+    stub.reset()
+
+    positions = service.get_user_positions(WALLET_WITH_TROVE)
+
+    assert stub.count("eth_call") == 1
+    assert positions == {
+        "troves": {
+            "ETH": {
+                "debt_usdq": 2000.0,
+                "collateral_amount": 2.0,
+                "collateral_value_usd": 5000.0,
+                "collateral_ratio": 2.5,
+            }
+        },
+        "stability_deposits": {},
+    }
+
+def test_user_positions_batch_keyed_by_wallet(stub):
+    """Many wallets share one batched read and come back keyed by address"""
+    register_quill_positions(stub)
+    service = make_quill_service(stub)
+    stub.reset()
+
+    positions = service.get_user_positions_batch([WALLET_WITH_TROVE, WALLET_WITH_DEPOSIT, EMPTY_WALLET, "not-an-address"])
+
+    assert stub.count("eth_call") == 1
+    assert set(positions[WALLET_WITH_TROVE]["troves"]) == {"ETH"}
+    assert positions[WALLET_WITH_DEPOSIT]["stability_deposits"]["SRC"] == {
+        "deposit_usdq": 300.0,
+        "collateral_gain": 0.1,
+        "usdq_gain": 5.0,
+    }
+    assert positions[EMPTY_WALLET] == {"troves": {}, "stability_deposits": {}}
+    assert positions["not-an-address"] == {"troves": {}, "stability_deposits": {}}
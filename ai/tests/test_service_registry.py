@@ -0,0 +1,85 @@
+# ai/tests/test_service_registry.py
+import sys
+import os
+import time
+
+# Add the project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from ai.services.service_registry import ServiceRegistry
+
+class FakeService:
+    """Stand-in service that counts how often it was constructed"""
+    builds = 0
+
+    def __init__(self):
+        FakeService.builds += 1
+        self.w3 = object()
+
+def make_registry(factory=FakeService, interval=30.0):
+    FakeService.builds = 0
+    registry = ServiceRegistry({"fake": factory})
+    registry.RECONNECT_INTERVAL = interval
+    return registry
+
+def test_service_is_shared_across_requests():
+    """Repeated lookups hand out the same instance"""
+    registry = make_registry()
+    registry.start()
+
+    first = registry.get("fake")
+    second = registry.get("fake")
+
+    assert first is second
+    assert FakeService.builds == 1
+
+def test_lazy_build_without_lifespan():
+    """Lookups before start() still build the service once"""
+    registry = make_registry()
+
+    assert registry.get("fake") is registry.get("fake")
+    assert FakeService.builds == 1
+
+def test_dropped_connection_is_rebuilt_with_throttle():
+    """A service whose w3 dropped is rebuilt, but not more than once per interval"""
+    registry = make_registry(interval=0.2)
+    registry.start()
+
+    registry.get("fake").w3 = None
+    assert registry.get("fake").w3 is None  # Still inside the reconnect interval
+    assert FakeService.builds == 1
+
+    time.sleep(0.25)
+    rebuilt = registry.get("fake")
+    assert rebuilt.w3 is not None
+    assert FakeService.builds == 2
+
+def test_failed_rebuild_keeps_previous_instance():
+    """If the RPC is still down, the old instance keeps serving"""
+    attempts = {"count": 0}
+
+    def flaky():
+        attempts["count"] += 1
+        if attempts["count"] > 1:
+            raise ConnectionError("RPC down")
+        return FakeService()
+
+    registry = make_registry(factory=flaky, interval=0.0)
+    registry.start()
+    original = registry.get("fake")
+
+    assert registry.refresh("fake") is False
+    assert registry.get("fake") is original
+
+def test_mark_unhealthy_rebuilds_in_background():
+    """Callers that see a failure trigger a rebuild without waiting for it"""
+    registry = make_registry(interval=0.0)
+    registry.start()
+    original = registry.get("fake")
+
+    registry.mark_unhealthy("fake")
+    deadline = time.monotonic() + 2.0
+    while registry.get("fake") is original and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert registry.get("fake") is not original
@@ -0,0 +1,186 @@
+# ai/tests/test_snapshot_cache.py
+import sys
+import os
+import threading
+import time
+
+# Add the project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import pytest
+
+from ai.services.snapshot_cache import SnapshotCache
+
+class Chain:
+    """Counts market data reads and lets tests advance the block"""
+
+    def __init__(self):
+        self.block = 100
+        self.reads = 0
+        self.fail = False
+        self.delay = 0.0
+
+    def fetch(self):
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("RPC down")
+        self.reads += 1
+        return {"block": self.block, "rates": {"USDC": 3.0}}
+
+    def block_number(self):
+        return self.block
+
+def test_fresh_snapshot_served_without_reading_chain():
+    chain = Chain()
+    cache = SnapshotCache(ttl=10)
+
+    first = cache.get("aave", chain.fetch, chain.block_number)
+    second = cache.get("aave", chain.fetch, chain.block_number)
+
+    assert first is second
+    assert chain.reads == 1
+    assert first.block_number == 100
+    assert cache.describe("aave")["block_number"] == 100
+    assert cache.describe("aave")["stale"] is False
+
+def test_stale_snapshot_served_while_one_refresh_runs():
+    chain = Chain()
+    cache = SnapshotCache(ttl=0.05)
+    cache.get("aave", chain.fetch, chain.block_number)
+
+    time.sleep(0.1)
+    chain.block = 101
+    chain.delay = 0.2
+
+    # Many concurrent readers all get the stale block immediately
+    served = []
+    started = time.monotonic()
+    readers = [
+        threading.Thread(target=lambda: served.append(cache.get("aave", chain.fetch, chain.block_number)))
+        for _ in range(10)
+    ]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+
+    assert time.monotonic() - started < 0.15
+    assert {snapshot.block_number for snapshot in served} == {100}
+
+    # ... and exactly one refresh replaced it
+    time.sleep(0.3)
+    assert chain.reads == 2
+    assert cache.latest("aave").block_number == 101
+    assert cache.get_at("aave", 100) is not None
+
+def test_failed_refresh_keeps_last_good_snapshot():
+    chain = Chain()
+    cache = SnapshotCache(ttl=0, max_stale=0)
+    good = cache.get("aave", chain.fetch, chain.block_number)
+
+    chain.fail = True
+    assert cache.get("aave", chain.fetch, chain.block_number) is good
+    assert cache.last_good("aave", {"fallback": True}) == good.data
+    assert cache.last_good("quill", {"fallback": True}) == {"fallback": True}
+
+def test_missing_snapshot_with_failed_fetch_raises():
+    chain = Chain()
+    chain.fail = True
+    cache = SnapshotCache()
+
+    with pytest.raises(ConnectionError):
+        cache.get("aave", chain.fetch, chain.block_number)
+    assert cache.describe("aave") is None
+
+def test_degraded_data_does_not_replace_good_snapshot():
+    chain = Chain()
+    cache = SnapshotCache(ttl=0, max_stale=0)
+    good = cache.get("aave", chain.fetch, chain.block_number, validate=lambda data: bool(data["rates"]))
+
+    degraded = cache.get("aave", lambda: {"rates": {}}, chain.block_number, validate=lambda data: bool(data["rates"]))
+
+    assert degraded is good
+
+def test_async_callers_share_one_fetch():
+    """Concurrent aget calls on an empty cache wait on a single chain read"""
+    import asyncio
+
+    chain = Chain()
+    cache = SnapshotCache(ttl=10)
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return chain.fetch()
+
+    async def block_number():
+        return chain.block_number()
+
+    async def main():
+        return await asyncio.gather(*[cache.aget("aave", fetch, block_number) for _ in range(10)])
+
+    snapshots = asyncio.run(main())
+
+    assert chain.reads == 1
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+    # Sync callers see the snapshot the async ones stored
+    assert cache.get("aave", chain.fetch, chain.block_number) is snapshots[0]
+
+def test_pinned_and_unpinned_async_fetches_stay_apart():
+    """A pinned aget and a latest aget running together each get their own block"""
+    import asyncio
+    from ai.services.block_context import pinned_block, read_at_block
+
+    cache = SnapshotCache(ttl=10)
+    reads = []
+
+    async def fetch():
+        reads.append(pinned_block())
+        await asyncio.sleep(0.05)
+        return {"block": pinned_block(), "rates": {"USDC": 3.0}}
+
+    async def block_number():
+        return 100
+
+    async def pinned():
+        with read_at_block(90):
+            return await cache.aget("aave", fetch, block_number)
+
+    async def main():
+        return await asyncio.gather(pinned(), pinned(), cache.aget("aave", fetch, block_number))
+
+    at_90, again_at_90, latest = asyncio.run(main())
+
+    assert at_90 is again_at_90
+    assert at_90.block_number == 90 and at_90.data["block"] == 90
+    assert latest.block_number == 100 and latest.data["block"] == 100
+    # One read per block, and nothing left in flight
+    assert sorted(reads) == [90, 100]
+    assert cache._inflight == {}
+
+def test_failed_pinned_fetch_raises_instead_of_serving_another_block():
+    """A read pinned to a block never falls back to the latest snapshot"""
+    import asyncio
+    from ai.services.block_context import read_at_block
+
+    chain = Chain()
+    cache = SnapshotCache(ttl=0, max_stale=0)
+    latest = cache.get("aave", chain.fetch, chain.block_number)
+
+    chain.fail = True
+
+    async def afetch():
+        return chain.fetch()
+
+    async def apinned():
+        with read_at_block(990):
+            return await cache.aget("aave", afetch)
+
+    with read_at_block(990):
+        with pytest.raises(ConnectionError):
+            cache.get("aave", chain.fetch, chain.block_number)
+    with pytest.raises(ConnectionError):
+        asyncio.run(apinned())
+    # Unpinned callers still get the last good snapshot
+    assert cache.get("aave", chain.fetch, chain.block_number) is latest
+    assert cache.get_at("aave", 990) is None
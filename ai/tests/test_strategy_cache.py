@@ -0,0 +1,66 @@
+# ai/tests/test_strategy_cache.py
+import sys
+import os
+
+# Add the project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import pytest
+
+from ai.strategy_cache import StrategyCache, strategy_cache_key
+from ai.strategy_generator import GenerationStats, PER_TIER_MODE
+from ai.tests.llm_stub import make_generator
+
+def context(eth=1.0, usdc=100.0, usdc_apy=3.0):
+    return {
+        "wallet": {"balances": {"ETH": eth, "USDC": usdc}, "risk_metrics": {"health_factor": 1.8}},
+        "market": {"apy_rates": {"AAVE": {"supply_apy": {"USDC": usdc_apy}}}, "tvl": {"AAVE": 1500000}}
+    }
+
+def test_near_identical_contexts_share_a_key():
+    """Balances within a bucket and APYs within the rounding step hash the same"""
+    base = strategy_cache_key(context(), "Anchor")
+
+    assert strategy_cache_key(context(eth=1.03, usdc=102, usdc_apy=3.05), "Anchor") == base
+    assert strategy_cache_key(context(eth=1.5), "Anchor") != base
+    assert strategy_cache_key(context(eth=0), "Anchor") != base
+    assert strategy_cache_key(context(usdc_apy=3.6), "Anchor") != base
+    assert strategy_cache_key(context(), "Zenith") != base
+
+def test_disk_tier_survives_a_new_process(tmp_path):
+    """A fresh cache on the same directory serves what an earlier one stored"""
+    StrategyCache(directory=str(tmp_path)).put("abc", {"name": "Anchor"})
+
+    restarted = StrategyCache(directory=str(tmp_path))
+
+    assert restarted.get("abc") == {"name": "Anchor"}
+    assert restarted.get("missing") is None
+
+def test_memory_and_disk_are_bounded(tmp_path):
+    cache = StrategyCache(size=2, directory=str(tmp_path), max_bytes=300)
+    for i in range(10):
+        cache.put(f"key{i}", {"name": "Anchor", "explanation": "x" * 50})
+
+    assert len(cache._memory) == 2
+    stored = [name for name in os.listdir(tmp_path) if name.endswith(".json")]
+    assert 0 < len(stored) < 10
+    assert "key9.json" in stored
+    assert sum(os.path.getsize(tmp_path / name) for name in stored) <= 300
+
+def test_generator_reuses_strategy_for_similar_wallet():
+    """A similar wallet skips the LLM and gets the cached strategy fitted to its balances"""
+    generator, completions = make_generator(PER_TIER_MODE)
+    market = {"rates": {"AAVE": {"supply_apy": {"USDC": 3.0}}}}
+
+    first = generator.generate_strategy({"ETH": 1, "USDC": 10.8}, market, {}, "Anchor")
+    assert len(completions.prompts) == 1
+    assert first.steps[0].amount == 10
+
+    # Same bucket, but too little USDC for the cached 10 USDC supply step
+    stats = GenerationStats()
+    second = generator.generate_strategy({"ETH": 1.02, "USDC": 9.9}, market, {}, "Anchor", stats)
+
+    assert len(completions.prompts) == 1
+    assert stats.cache_hits == 1
+    assert second.name == "Anchor"
+    assert float(second.steps[0].amount) == pytest.approx(9.9 * 0.95)
@@ -0,0 +1,112 @@
+# ai/tests/test_strategy_optimizer.py
+import sys
+import os
+import copy
+
+# Add the project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import pytest
+
+from ai.strategy_generator import GenerationStats, OPTIMIZER_MODE
+from ai.strategy_optimizer import StrategyOptimizer
+from ai.tests.llm_stub import make_generator
+
+# Shaped like collect_strategy_inputs() output: ETH is also listed as WETH
+WALLET = {"ETH": 1.0, "WETH": 1.0, "USDC": 1000.0}
+RISK = {"health_factor": 2.0}
+
+def market(stability_apr=5.0):
+    return {
+        "rates": {"AAVE": {"supply_apy": {"WETH": 1.8, "USDC": 3.5}, "borrow_apy": {"WETH": 2.1, "USDC": 4.5}}},
+        "dex": {"pools": {"ETH-USDC": {"price": 2000.0, "total_liquidity": 1000000, "volume_24h": 1000000, "fee": 0.003}}},
+        "quill": {
+            "protocol": "Quill",
+            "collaterals": {"ETH": {"price_usd": 2000.0, "min_collateral_ratio": 1.1}},
+            "stability_pools": {"ETH": {"estimated_apr": stability_apr}},
+            "interest_rates": {"min": 6.0, "recommended": {"low_risk": 6.0, "medium_risk": 10.0, "high_risk": 15.0}}
+        }
+    }
+
+def steps_by_action(strategy):
+    return {(step["protocol"], step["action"], step["token"]): step for step in strategy["steps"]}
+
+def test_anchor_supplies_everything_but_the_reserve():
+    strategy = StrategyOptimizer().optimize(WALLET, market(), RISK, "Anchor")
+    steps = steps_by_action(strategy)
+
+    # WETH and ETH are one holding, so ETH is supplied once
+    assert set(steps) == {("AAVE", "supply", "ETH"), ("AAVE", "supply", "USDC")}
+    assert steps[("AAVE", "supply", "ETH")]["amount"] == pytest.approx(0.9)
+    assert steps[("AAVE", "supply", "USDC")]["expected_apy"] == 3.5
+    # Value-weighted: (1800 * 1.8% + 900 * 3.5%) / 3000
+    assert strategy["total_expected_apy"] == pytest.approx(2.13)
+
+def test_tiers_add_liquidity_up_to_their_caps():
+    optimizer = StrategyOptimizer()
+
+    zenith = steps_by_action(optimizer.optimize(WALLET, market(), RISK, "Zenith"))
+    wildcard = steps_by_action(optimizer.optimize(WALLET, market(), RISK, "Wildcard"))
+
+    # The pool's fee APY beats AAVE's 1.8% on ETH, so it takes its full share first
+    assert zenith[("Ambient", "add_liquidity", "ETH")]["amount"] == pytest.approx(0.25)
+    assert zenith[("AAVE", "supply", "ETH")]["amount"] == pytest.approx(0.7)
+    assert wildcard[("Ambient", "add_liquidity", "ETH")]["amount"] == pytest.approx(0.5)
+
+def test_quill_only_when_the_stability_pool_pays_for_the_loan():
+    optimizer = StrategyOptimizer()
+
+    unprofitable = optimizer.optimize(WALLET, market(stability_apr=5.0), RISK, "Wildcard")
+    profitable = optimizer.optimize(WALLET, market(stability_apr=30.0), RISK, "Wildcard")
+    steps = steps_by_action(profitable)
+
+    assert all(step["protocol"] != "Quill" for step in unprofitable["steps"])
+    borrow = steps[("Quill", "borrow_usdq", "ETH")]
+    # Borrowed at the tier's 160% collateral ratio and put straight into the pool
+    assert borrow["usdq_amount"] == pytest.approx(borrow["amount"] * 2000 / 1.6, abs=0.01)
+    assert borrow["interest_rate"] == 15.0
+    assert steps[("Quill", "provide_stability", "USDQ")]["amount"] == borrow["usdq_amount"]
+
+def test_no_borrowing_with_a_low_health_factor():
+    strategy = StrategyOptimizer().optimize(WALLET, market(stability_apr=30.0), {"health_factor": 1.2}, "Wildcard")
+
+    assert all(step["protocol"] != "Quill" for step in strategy["steps"])
+
+def test_same_inputs_give_the_same_strategies():
+    optimizer = StrategyOptimizer()
+
+    first = optimizer.optimize_all(WALLET, market(), RISK)
+    second = optimizer.optimize_all(copy.deepcopy(WALLET), market(), RISK)
+
+    assert [s["name"] for s in first] == ["Anchor", "Zenith", "Wildcard"]
+    assert first == second
+
+def test_optimizer_mode_skips_the_llm():
+    generator, completions = make_generator(OPTIMIZER_MODE, lambda prompt: {})
+    generator.llm_explanations = False
+    stats = GenerationStats()
+
+    result = generator.generate_strategies_json(WALLET, market(), RISK)
+    strategies = generator.generate_all_strategies(WALLET, market(), RISK, stats=stats)
+
+    assert completions.prompts == []
+    assert stats.mode == OPTIMIZER_MODE
+    assert stats.llm_calls == 0
+    assert [s["name"] for s in result["strategies"]] == ["Anchor", "Zenith", "Wildcard"]
+    # Same step JSON as LLM strategies: ETH maps back to the WETH reserve
+    assert strategies[0].steps[0].token == "WETH"
+
+def test_llm_only_writes_the_explanations():
+    explanations = {"explanations": {"Anchor": "Steady lending.", "Zenith": "Balanced yield."}}
+    generator, completions = make_generator(OPTIMIZER_MODE, lambda prompt: explanations)
+    generator.llm_explanations = True
+    stats = GenerationStats()
+
+    strategies = generator.generate_all_strategies(WALLET, market(), RISK, stats=stats)
+    computed = StrategyOptimizer().optimize_all(WALLET, market(), RISK)
+
+    assert stats.llm_calls == 1
+    assert [s.explanation for s in strategies[:2]] == ["Steady lending.", "Balanced yield."]
+    # A tier the LLM skipped keeps the optimizer's explanation
+    assert strategies[2].explanation == computed[2]["explanation"]
+    assert [len(s.steps) for s in strategies] == [len(s["steps"]) for s in computed]
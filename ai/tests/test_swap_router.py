@@ -0,0 +1,94 @@
+# ai/tests/test_swap_router.py
+import sys
+import os
+from decimal import Decimal
+
+# Add the project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import pytest
+
+import ai.services.ambient_service as ambient_module
+from ai.services.ambient_service import AmbientService
+from ai.services.swap_router import SwapRouter
+from ai.tests.rpc_stub import AMBIENT_FEE_RATE, build_router_stub, router_pool
+
+TOKENS = AmbientService.TOKENS
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(ambient_module, "AMBIENT_SWAP_FEE_RATE", AMBIENT_FEE_RATE)
+    stub = build_router_stub()
+
+    class StubAmbientService(AmbientService):
+        SCROLL_RPC_URL = stub.url
+    service = StubAmbientService()
+    service.stub = stub
+    stub.reset()
+    yield service
+    stub.stop()
+
+def test_routes_are_simple_paths_up_to_max_hops():
+    pairs = [("ETH", "USDC"), ("ETH", "SRC"), ("USDC", "SRC")]
+
+    assert SwapRouter(None, pairs).routes("SRC", "USDC") == [["SRC", "USDC"], ["SRC", "ETH", "USDC"]]
+    assert SwapRouter(None, pairs, max_hops=1).routes("SRC", "USDC") == [["SRC", "USDC"]]
+    assert SwapRouter(None, pairs).routes("SRC", "SRC") == []
+
+def test_large_swap_routes_through_the_deeper_pools(service):
+    route = service.find_swap_route("SRC", "USDC", Decimal("1000"))
+
+    # Every pool on any route seeded in the same two batches, no calcImpact
+    assert service.stub.count("eth_call") == 2
+    assert service.stub.called("calcImpact") == 0
+    assert route["route"] == ["SRC", "ETH", "USDC"]
+    first, second = route["hops"]
+    assert second["input_amount"] == first["output_amount"]
+    assert route["output_amount"] == second["output_amount"]
+    [direct] = route["alternatives"]
+    assert direct["route"] == ["SRC", "USDC"]
+    assert route["output_amount"] > direct["output_amount"]
+
+def test_small_swap_takes_the_direct_pair(service):
+    # One pool fee beats two when the price impact is negligible
+    route = service.find_swap_route("SRC", "USDC", Decimal("0.01"))
+
+    assert route["route"] == ["SRC", "USDC"]
+
+def test_hops_match_calc_impact_in_either_pair_order(service):
+    """USDC is the base of the first hop's pool and ETH the base of the second's"""
+    route = service.find_swap_route("USDC", "SRC", Decimal("50000"), max_hops=2)
+
+    assert route["route"] == ["USDC", "ETH", "SRC"]
+    amount_in = 50000 * 10**6
+    for hop in route["hops"]:
+        base_addr, quote_addr, is_reversed = service.get_token_pair(hop["from_token"], hop["to_token"])
+        # Paying base is a fixed-input buy; paying quote a fixed-input sell
+        base_flow, quote_flow, _ = router_pool(base_addr, quote_addr).calc_impact(not is_reversed, not is_reversed, amount_in)
+        amount_out = -quote_flow if not is_reversed else -base_flow
+        decimals = AmbientService.DECIMALS[hop["to_token"]]
+        assert hop["output_amount"] == pytest.approx(amount_out / 10**decimals, rel=1e-9)
+        amount_in = round(hop["output_amount"] * 10**decimals)
+
+def test_falls_back_to_the_direct_quote_without_curves():
+    class OfflineAmbientService(AmbientService):
+        SCROLL_RPC_URL = "http://127.0.0.1:9"
+
+    route = OfflineAmbientService().find_swap_route("SRC", "USDC", Decimal("10"))
+
+    assert route["route"] == ["SRC", "USDC"]
+    assert route["output_amount"] == route["hops"][0]["output_amount"] > 0
+    assert route["alternatives"] == []
+
+@pytest.mark.parametrize("from_token, to_token, amount", [("ETH", "SRC", "1"), ("SRC", "ETH", "200")])
+def test_one_hop_route_matches_calculate_swap_impact(service, from_token, to_token, amount):
+    """The router and the single-pair quote agree on direction in either pair order"""
+    route = service.find_swap_route(from_token, to_token, Decimal(amount), max_hops=1)
+    impact = service.calculate_swap_impact(from_token, to_token, Decimal(amount))
+
+    [hop] = route["hops"]
+    assert route["output_amount"] == pytest.approx(impact["output_amount"], rel=1e-9)
+    assert hop["price_impact"] == pytest.approx(impact["price_impact"], rel=1e-6)
+    # 200 SRC per ETH, less the fee
+    spot = 200 if from_token == "ETH" else 1 / 200
+    assert impact["output_amount"] == pytest.approx(float(amount) * spot * (1 - AMBIENT_FEE_RATE), rel=2e-3)
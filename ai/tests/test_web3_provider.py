@@ -0,0 +1,87 @@
+# ai/tests/test_web3_provider.py
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project root to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import pytest
+
+from ai.services.web3_provider import RpcProviderFactory
+from ai.tests.rpc_stub import RpcStub
+
+@pytest.fixture
+def stub():
+    stub = RpcStub().start()
+    yield stub
+    stub.stop()
+
+def test_threads_share_pooled_connections(stub):
+    """Concurrent reads from many threads reuse a handful of keep-alive connections"""
+    factory = RpcProviderFactory(pool_size=4)
+    w3 = factory.web3(stub.url)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        blocks = list(executor.map(lambda _: w3.eth.block_number, range(40)))
+
+    assert set(blocks) == {stub.block_number}
+    host = factory.stats()["hosts"][stub.url]
+    assert host["requests"] >= 40
+    assert host["connections_opened"] <= 4
+    assert host["reuse_ratio"] > 0.8
+    factory.close()
+
+def test_services_share_one_session(stub):
+    factory = RpcProviderFactory()
+
+    first = factory.provider(stub.url)
+    second = factory.provider(stub.url)
+
+    assert first._request_session_manager.cache_and_return_session(stub.url) is factory.session
+    assert second._request_session_manager.cache_and_return_session(stub.url) is factory.session
+    factory.close()
+
+def test_chain_id_sent_once(stub):
+    """eth_chainId never changes, so it isn't re-sent before every call"""
+    factory = RpcProviderFactory()
+    w3 = factory.web3(stub.url)
+
+    w3.eth.chain_id
+    sent = stub.count("eth_chainId")
+    for _ in range(5):
+        w3.eth.chain_id
+
+    assert stub.count("eth_chainId") == sent
+    factory.close()
+
+def test_keepalive_disabled_closes_connections(stub):
+    factory = RpcProviderFactory(keepalive=False)
+    w3 = factory.web3(stub.url)
+
+    for _ in range(5):
+        w3.eth.block_number
+
+    host = next(iter(factory.stats()["hosts"].values()))
+    assert host["connections_opened"] == host["requests"]
+    factory.close()
+
+def test_async_reads_share_pooled_connections(stub):
+    """AsyncWeb3 reads reuse one aiohttp pool instead of a connection per request"""
+    import asyncio
+
+    factory = RpcProviderFactory(pool_size=4)
+
+    async def reads():
+        w3 = factory.async_web3(stub.url)
+        try:
+            return await asyncio.gather(*[w3.eth.block_number for _ in range(40)])
+        finally:
+            await factory.aclose()
+
+    blocks = asyncio.run(reads())
+
+    assert set(blocks) == {stub.block_number}
+    host = factory.stats()["async_hosts"][stub.url]
+    assert host["requests"] >= 40
+    assert host["connections_opened"] <= 4
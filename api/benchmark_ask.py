@@ -0,0 +1,60 @@
+# api/benchmark_ask.py
+"""Offline comparison of full-context and retrieval-trimmed prompts for /api/ask
+
+Needs no API key or network: it builds the prompts both ways for a set of
+sample questions and reports their size and the retrieval overhead.
+
+    python api/benchmark_ask.py [top_k]
+"""
+import os
+import sys
+import time
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from api.context_index import ContextIndex
+from api.main import BULWARK_CONTEXT, ASK_CONTEXT_TOP_K, build_ask_messages
+
+SAMPLE_QUESTIONS = [
+    "What is Bulwark?",
+    "How do I borrow USDQ against my ETH on Quill?",
+    "What does the Anchor strategy do?",
+    "How is the AAVE health factor used for risk management?",
+    "Which API endpoints does the backend expose?",
+    "Can I swap tokens on Ambient and what about price impact?",
+    "Is there a governance chatbot?",
+    "What is on the roadmap?",
+]
+
+def estimate_tokens(messages) -> int:
+    """Rough token count (about 4 characters per token for English text)"""
+    return sum(len(message["content"]) for message in messages) // 4
+
+def main(top_k: int):
+    started = time.perf_counter()
+    ContextIndex.from_text(BULWARK_CONTEXT)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    print(f"Context: {len(BULWARK_CONTEXT)} chars, index built in {build_ms:.2f} ms, top_k={top_k}\n")
+    print(f"{'question':<60} {'full':>6} {'top-k':>6} {'saved':>6} {'retrieval':>10}")
+
+    full_total = trimmed_total = 0
+    for question in SAMPLE_QUESTIONS:
+        full = estimate_tokens(build_ask_messages(question, top_k=0))
+
+        started = time.perf_counter()
+        trimmed_messages = build_ask_messages(question, top_k=top_k)
+        retrieval_ms = (time.perf_counter() - started) * 1000
+        trimmed = estimate_tokens(trimmed_messages)
+
+        full_total += full
+        trimmed_total += trimmed
+        print(f"{question[:60]:<60} {full:>6} {trimmed:>6} {1 - trimmed / full:>6.0%} {retrieval_ms:>8.2f}ms")
+
+    print(f"\nAverage input tokens: full {full_total / len(SAMPLE_QUESTIONS):.0f}, "
+          f"retrieval {trimmed_total / len(SAMPLE_QUESTIONS):.0f} "
+          f"({1 - trimmed_total / full_total:.0%} fewer)")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else ASK_CONTEXT_TOP_K)
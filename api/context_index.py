@@ -0,0 +1,111 @@
+# api/context_index.py
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+# Lines that start a new section of the context file: "3. Multi-Protocol Routing" or "In Summary:"
+SECTION_HEADING = re.compile(r"^(\d+\.\s+\S.*|In Summary:)\s*$")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words too common in the context to say anything about relevance
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "how", "i", "in", "is", "it", "its", "of", "on", "or", "such", "that", "the", "their",
+    "this", "to", "what", "when", "which", "who", "why", "will", "with", "you", "your"
+}
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+def split_sections(text: str) -> List[str]:
+    """Split the context into its numbered sections
+
+    Paragraphs before the first heading each become their own section, so the
+    introduction can be retrieved piecemeal like everything else.
+    """
+    sections = []
+    current: List[str] = []
+    seen_heading = False
+
+    for line in text.splitlines():
+        if SECTION_HEADING.match(line.strip()):
+            seen_heading = True
+            if current:
+                sections.append("\n".join(current).strip())
+            current = [line]
+        elif not seen_heading and not line.strip():
+            # Blank line between intro paragraphs
+            if current:
+                sections.append("\n".join(current).strip())
+            current = []
+        else:
+            current.append(line)
+
+    if current:
+        sections.append("\n".join(current).strip())
+    return [section for section in sections if section]
+
+@dataclass
+class ContextIndex:
+    """Okapi BM25 index over the sections of the Q&A context
+
+    Built once at startup; each question then sends only its top-k sections to
+    the LLM instead of the whole file.
+    """
+    sections: List[str]
+    k1: float = 1.5
+    b: float = 0.75
+    _term_counts: List[Counter] = field(default_factory=list, repr=False)
+    _idf: Dict[str, float] = field(default_factory=dict, repr=False)
+    _avg_length: float = 0.0
+
+    def __post_init__(self):
+        self._term_counts = [Counter(tokenize(section)) for section in self.sections]
+        lengths = [sum(counts.values()) for counts in self._term_counts]
+        self._avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+
+        document_frequency = Counter()
+        for counts in self._term_counts:
+            document_frequency.update(counts.keys())
+        total = len(self.sections)
+        self._idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    @classmethod
+    def from_text(cls, text: str) -> "ContextIndex":
+        return cls(split_sections(text))
+
+    def scores(self, query: str) -> List[float]:
+        """BM25 score of every section for the query"""
+        terms = tokenize(query)
+        scores = []
+        for counts in self._term_counts:
+            length = sum(counts.values())
+            score = 0.0
+            for term in terms:
+                frequency = counts.get(term, 0)
+                if not frequency:
+                    continue
+                norm = frequency + self.k1 * (1 - self.b + self.b * length / (self._avg_length or 1))
+                score += self._idf[term] * frequency * (self.k1 + 1) / norm
+            scores.append(score)
+        return scores
+
+    def top_k(self, query: str, k: int) -> List[str]:
+        """The k most relevant sections, kept in their original order
+
+        Falls back to the leading sections when nothing in the query matches.
+        """
+        scores = self.scores(query)
+        ranked = sorted(range(len(self.sections)), key=lambda i: scores[i], reverse=True)
+        chosen = [i for i in ranked[:k] if scores[i] > 0] or list(range(min(k, len(self.sections))))
+        return [self.sections[i] for i in sorted(chosen)]
+
+    def build_context(self, query: str, k: int) -> str:
+        return "\n\n".join(self.top_k(query, k))
@@ -1,12 +1,18 @@
 # api/main.py
 
 from fastapi import FastAPI, HTTPException, Depends
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Callable, Tuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 import sys
 import os
 import json
+import copy
+import contextvars
+import time
 from decimal import Decimal
 import openai  # For the chatbot endpoint
 from openai import OpenAI
@@ -14,16 +20,57 @@ from openai import OpenAI
 # Add the parent directory to sys.path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from ai.strategy_generator import StrategyGenerator
-from ai.services.aave_service import AaveService
-from ai.services.ambient_service import AmbientService
-from ai.services.quill_service import QuillService
+from ai.strategy_generator import StrategyGenerator, GenerationStats
+from ai.services.aave_service import AaveService, AsyncAaveService
+from ai.services.ambient_service import AmbientService, AsyncAmbientService
+from ai.services.quill_service import QuillService, AsyncQuillService
 from ai.services.wallet_service import WalletService
+from ai.services.service_registry import ServiceRegistry
+from ai.services.snapshot_cache import SnapshotCache, Snapshot
+from ai.services.block_context import pinned_block, read_at_block
+from ai.services.market_refresher import MarketRefresher, MARKET_REFRESH_ENABLED
+from ai.services.price_service import FALLBACK_TOKEN_PRICES, PriceService
+from ai.services.web3_provider import rpc_provider_factory
+from api.context_index import ContextIndex
 
 # Set up OpenAI key
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-app = FastAPI(title="Bulwark API", description="AI-powered DeFi strategies for Scroll network")
+# Shared service instances, built once per process instead of once per request
+service_registry = ServiceRegistry({
+    # Validates strategies against the shared on-chain prices
+    "strategy_generator": lambda: StrategyGenerator(price_service=service_registry.get("prices")),
+    "aave": AaveService,
+    # Fall back to the last on-chain prices when a pool or feed can't be read
+    "ambient": lambda: AmbientService(price_service=service_registry.get("prices")),
+    "quill": lambda: QuillService(price_service=service_registry.get("prices")),
+    # AsyncWeb3 variants for the async read endpoints; the strategy pipeline
+    # runs in worker threads and keeps the sync services
+    "aave_async": AsyncAaveService,
+    "ambient_async": lambda: AsyncAmbientService(price_service=service_registry.get("prices")),
+    "quill_async": lambda: AsyncQuillService(price_service=service_registry.get("prices")),
+    "wallet": WalletService,
+    # Every tracked token's USD price, one batched read per block
+    "prices": lambda: PriceService(service_registry.get, snapshot_cache),
+    "openai": lambda: OpenAI(api_key=os.getenv("OPENAI_API_KEY")),
+})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    service_registry.start()
+    if MARKET_REFRESH_ENABLED:
+        market_refresher.start()
+    yield
+    await market_refresher.stop()
+    service_registry.shutdown()
+    rpc_provider_factory.close()
+    await rpc_provider_factory.aclose()
+
+app = FastAPI(
+    title="Bulwark API",
+    description="AI-powered DeFi strategies for Scroll network",
+    lifespan=lifespan
+)
 
 # Enable CORS
 app.add_middleware(
@@ -53,127 +100,530 @@ try:
 except Exception as e:
     print(f"Warning: Could not load Bulwark context file: {e}")
 
+# Sections of the context sent with each question; 0 sends the whole file
+ASK_CONTEXT_TOP_K = int(os.getenv("ASK_CONTEXT_TOP_K", "4"))
+
+# Lexical index over the context sections, built once at startup
+context_index = ContextIndex.from_text(BULWARK_CONTEXT)
+
+# Per-provider deadline (seconds) for the market data fan-out
+PROVIDER_TIMEOUT_SECONDS = float(os.getenv("PROVIDER_TIMEOUT_SECONDS", "10"))
+
+# Bounded pool shared by all requests so slow RPCs can't spawn unbounded threads
+provider_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PROVIDER_MAX_WORKERS", "16")),
+    thread_name_prefix="provider"
+)
+
+# Most wallets accepted by one batch strategy request
+STRATEGY_BATCH_MAX_WALLETS = int(os.getenv("STRATEGY_BATCH_MAX_WALLETS", "100"))
+
+# Most trade sizes accepted by one swap impact ladder request
+SWAP_IMPACT_LADDER_MAX_AMOUNTS = int(os.getenv("SWAP_IMPACT_LADDER_MAX_AMOUNTS", "100"))
+
+# Fallback data used when a provider fails or misses its deadline
+AAVE_FALLBACK_MARKET_DATA = {
+    "rates": {
+        "AAVE": {
+            "supply_apy": {"USDC": 3.75, "ETH": 1.82, "SRC": 2.5},
+            "borrow_apy": {"USDC": 4.5, "ETH": 2.1, "SRC": 3.0}
+        }
+    },
+    "tvl": {"AAVE": 80320000},
+    "conditions": "stable"
+}
+
+AMBIENT_FALLBACK_MARKET_DATA = {
+    "dex": "Ambient",
+    "pools": {
+        "ETH-USDC": {
+            "price": 2000.0,
+            "total_liquidity": 1000000,
+            "volume_24h": 1000000,
+            "fee": 0.003
+        },
+        "ETH-SRC": {
+            "price": 0.005,
+            "total_liquidity": 1000000,
+            "volume_24h": 1000000,
+            "fee": 0.003
+        },
+        "USDC-SRC": {
+            "price": 0.01,
+            "total_liquidity": 1000000,
+            "volume_24h": 1000000,
+            "fee": 0.003
+        }
+    },
+    "swap_fees": 0.003
+}
+
+QUILL_FALLBACK_MARKET_DATA = {
+    "protocol": "Quill",
+    "collaterals": {
+        "ETH": {"price_usd": 2000.0, "min_collateral_ratio": 1.1},
+        "SRC": {"price_usd": 10.0, "min_collateral_ratio": 1.15}
+    },
+    "stability_pools": {
+        "ETH": {
+            "total_deposits_usdq": 1000000,
+            "pool_collateral": 500,
+            "estimated_apr": 5.0
+        },
+        "SRC": {
+            "total_deposits_usdq": 500000,
+            "pool_collateral": 50000,
+            "estimated_apr": 7.0
+        }
+    },
+    "interest_rates": {
+        "min": 6.0,
+        "max": 350.0,
+        "recommended": {
+            "low_risk": 6.0,
+            "medium_risk": 10.0,
+            "high_risk": 15.0
+        }
+    }
+}
+
+FALLBACK_RISK_METRICS = {
+    "health_factor": 1.8,
+    "liquidation_threshold": 0.85,
+    "current_ratio": 1.5
+}
+
+# Which shared service backs each provider in the fan-out
+PROVIDER_SERVICES = {
+    "aave": "aave",
+    "ambient": "ambient",
+    "quill": "quill",
+    "risk_metrics": "aave",
+    "prices": "aave",
+}
+
+def resolve_fallback(fallback: Any) -> Any:
+    """Evaluate a lazy fallback, or copy a static one so callers can't mutate it"""
+    if callable(fallback):
+        return fallback()
+    return copy.deepcopy(fallback)
+
+def fetch_providers_concurrently(
+    fetchers: Dict[str, Tuple[Callable[[], Any], Any]],
+    timeout: Optional[float] = None,
+    on_failure: Optional[Callable[[str], None]] = None
+) -> Dict[str, Any]:
+    """Run provider fetchers in parallel, each with its own deadline.
+
+    Args:
+        fetchers: Mapping of provider name to (fetch function, fallback), where
+            the fallback is a value or a function returning one
+        timeout: Per-provider deadline in seconds (defaults to PROVIDER_TIMEOUT_SECONDS)
+        on_failure: Called with the provider name whenever a fallback is used
+
+    Returns:
+        Mapping of provider name to the fetched data, or a copy of its fallback
+        if the fetch raised or did not finish before its deadline
+    """
+    timeout = PROVIDER_TIMEOUT_SECONDS if timeout is None else timeout
+    started = time.monotonic()
+    # Each worker runs in a copy of the caller's context so a pinned block carries over
+    futures = {
+        name: provider_executor.submit(contextvars.copy_context().run, fetch)
+        for name, (fetch, _) in fetchers.items()
+    }
+
+    results = {}
+    for name, future in futures.items():
+        fallback = fetchers[name][1]
+        # All fetches started together, so each waits only for what's left of its own deadline
+        remaining = max(0.0, started + timeout - time.monotonic())
+        try:
+            results[name] = future.result(timeout=remaining)
+            print(f"Using real data from {name}")
+        except FuturesTimeoutError:
+            print(f"Timed out after {timeout}s fetching {name}, using fallback data")
+            results[name] = resolve_fallback(fallback)
+            if on_failure:
+                on_failure(name)
+        except Exception as e:
+            print(f"Error fetching {name}: {e}, using fallback data")
+            results[name] = resolve_fallback(fallback)
+            if on_failure:
+                on_failure(name)
+
+    return results
+
+# Market snapshots shared by every endpoint, keyed by (provider, block number)
+snapshot_cache = SnapshotCache()
+
+# Snapshots failing these checks are degraded reads that shouldn't replace a good one
+SNAPSHOT_VALIDATORS = {
+    "aave": lambda data: bool(data.get("rates", {}).get("AAVE", {}).get("supply_apy")),
+    "ambient": lambda data: bool(data.get("pools")),
+    "quill": lambda data: any(
+        collateral.get("price_usd") is not None
+        for collateral in data.get("collaterals", {}).values()
+    ),
+}
+
+# Keeps the snapshots current as blocks arrive, so requests read them with no RPC
+market_refresher = MarketRefresher(
+    snapshot_cache,
+    lambda provider: service_registry.get(f"{provider}_async"),
+    validators=SNAPSHOT_VALIDATORS,
+    on_failure=lambda provider: service_registry.mark_unhealthy(f"{provider}_async")
+)
+
+def circuit_open_snapshot(provider: str, service: Any) -> Optional[Snapshot]:
+    """The last good snapshot, while the service's RPC circuit is open
+
+    Reads would only fail fast into fallback data, so the last snapshot is
+    served as is, however old. A request pinned to a block only gets the
+    snapshot cached for that block.
+    """
+    endpoint = getattr(service, "SCROLL_RPC_URL", None)
+    if endpoint is None or not rpc_provider_factory.circuit_open(endpoint):
+        return None
+    pinned = pinned_block()
+    if pinned is not None:
+        return snapshot_cache.get_at(provider, pinned)
+    return snapshot_cache.latest(provider)
+
+def get_market_snapshot(provider: str, service: Any) -> Snapshot:
+    """Get a provider's market data through the shared snapshot cache"""
+    published = market_refresher.snapshot(provider) or circuit_open_snapshot(provider, service)
+    if published is not None:
+        return published
+
+    def block_number():
+        return service.w3.eth.block_number if service.w3 is not None else None
+
+    return snapshot_cache.get(
+        provider,
+        service.get_market_data,
+        block_number=block_number,
+        validate=SNAPSHOT_VALIDATORS.get(provider)
+    )
+
+async def aget_market_snapshot(provider: str, service: Any) -> Snapshot:
+    """get_market_snapshot for the async services, sharing the same cache"""
+    published = market_refresher.snapshot(provider) or circuit_open_snapshot(provider, service)
+    if published is not None:
+        return published
+
+    async def block_number():
+        return await service.w3.eth.block_number if service.w3 is not None else None
+
+    return await snapshot_cache.aget(
+        provider,
+        service.get_market_data,
+        block_number=block_number,
+        validate=SNAPSHOT_VALIDATORS.get(provider)
+    )
+
+async def aresolve_block(service: Any, block: Optional[int] = None) -> Optional[int]:
+    """The block a request reads at: the one asked for, else the service's current head
+
+    The head is the background refresher's block while it is current, so
+    requests read at the block its snapshots were taken at. Returns None
+    (reads follow "latest") if the head can't be read.
+    """
+    if block is not None:
+        return block
+    head = market_refresher.current_block()
+    if head is not None:
+        return head
+    try:
+        return await service.w3.eth.block_number if service is not None and service.w3 is not None else None
+    except Exception as e:
+        print(f"Error fetching block number, reading at latest: {e}")
+        return None
+
+def describe_snapshots() -> Dict[str, Optional[Dict]]:
+    """Block number and age of each provider's latest market snapshot"""
+    return {
+        provider: snapshot_cache.describe(provider)
+        for provider in ("aave", "ambient", "quill")
+    }
+
 # Create service dependencies
 def get_strategy_generator():
-    return StrategyGenerator()
+    return service_registry.get("strategy_generator")
 
 def get_aave_service():
-    return AaveService()
+    return service_registry.get("aave")
 
 def get_ambient_service():
-    return AmbientService()
+    return service_registry.get("ambient")
 
 def get_quill_service():
-    return QuillService()
+    return service_registry.get("quill")
+
+async def get_async_aave_service():
+    return service_registry.get("aave_async")
+
+async def get_async_ambient_service():
+    return service_registry.get("ambient_async")
+
+async def get_async_quill_service():
+    return service_registry.get("quill_async")
 
 def get_wallet_service():
-    return WalletService()
+    return service_registry.get("wallet")
+
+def get_openai_client():
+    return service_registry.get("openai")
+
+def get_price_service():
+    return service_registry.get("prices")
 
 class WalletRequest(BaseModel):
     address: str
     balances: Optional[Dict[str, float]] = None
+    # Read every provider at this block (defaults to the latest snapshots)
+    block: Optional[int] = None
 
 class GenerateStrategiesResponse(BaseModel):
     strategies: List[Dict]
     wallet: Dict
     market_data: Dict
+    snapshots: Optional[Dict] = None
+    generation: Optional[Dict] = None
+    block_number: Optional[int] = None
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Welcome to Bulwark API", "version": "1.0"}
 
 @app.get("/api/market-data")
-def get_market_data(aave_service: AaveService = Depends(get_aave_service)):
+async def get_market_data(
+    block: Optional[int] = None,
+    aave_service: AsyncAaveService = Depends(get_async_aave_service)
+):
     """Get current market data from AAVE"""
     try:
-        market_data = aave_service.get_market_data()
+        # Latest snapshot unless a specific block was asked for
+        with read_at_block(block):
+            snapshot = await aget_market_snapshot("aave", aave_service)
         return {
             "success": True,
-            "data": market_data
+            "data": snapshot.data,
+            "block_number": snapshot.block_number,
+            "snapshot": snapshot.metadata(snapshot_cache.ttl)
         }
     except Exception as e:
+        service_registry.mark_unhealthy("aave_async")
         raise HTTPException(status_code=500, detail=f"Error fetching market data: {str(e)}")
 
 @app.get("/api/ambient-market-data")
-def get_ambient_market_data(ambient_service: AmbientService = Depends(get_ambient_service)):
+async def get_ambient_market_data(
+    block: Optional[int] = None,
+    ambient_service: AsyncAmbientService = Depends(get_async_ambient_service)
+):
     """Get current market data from Ambient DEX"""
     try:
-        market_data = ambient_service.get_market_data()
+        # Latest snapshot unless a specific block was asked for
+        with read_at_block(block):
+            snapshot = await aget_market_snapshot("ambient", ambient_service)
         return {
             "success": True,
-            "data": market_data
+            "data": snapshot.data,
+            "block_number": snapshot.block_number,
+            "snapshot": snapshot.metadata(snapshot_cache.ttl)
         }
     except Exception as e:
+        service_registry.mark_unhealthy("ambient_async")
         raise HTTPException(status_code=500, detail=f"Error fetching Ambient market data: {str(e)}")
 
 @app.get("/api/quill-market-data")
-def get_quill_market_data(quill_service: QuillService = Depends(get_quill_service)):
+async def get_quill_market_data(
+    block: Optional[int] = None,
+    quill_service: AsyncQuillService = Depends(get_async_quill_service)
+):
     """Get current market data from Quill Finance"""
     try:
-        market_data = quill_service.get_market_data()
+        # Latest snapshot unless a specific block was asked for
+        with read_at_block(block):
+            snapshot = await aget_market_snapshot("quill", quill_service)
         return {
             "success": True,
-            "data": market_data
+            "data": snapshot.data,
+            "block_number": snapshot.block_number,
+            "snapshot": snapshot.metadata(snapshot_cache.ttl)
         }
     except Exception as e:
+        service_registry.mark_unhealthy("quill_async")
         raise HTTPException(status_code=500, detail=f"Error fetching Quill market data: {str(e)}")
 
 @app.get("/api/quill-positions/{address}")
-def get_quill_positions(address: str, quill_service: QuillService = Depends(get_quill_service)):
+async def get_quill_positions(
+    address: str,
+    block: Optional[int] = None,
+    quill_service: AsyncQuillService = Depends(get_async_quill_service)
+):
     """Get Quill positions for a specific wallet"""
     try:
-        positions = quill_service.get_user_positions(address)
+        with read_at_block(await aresolve_block(quill_service, block)) as block_number:
+            positions = await quill_service.get_user_positions(address)
         return {
             "success": True,
-            "data": positions
+            "data": positions,
+            "block_number": block_number
         }
     except Exception as e:
+        service_registry.mark_unhealthy("quill_async")
+        raise HTTPException(status_code=500, detail=f"Error fetching Quill positions: {str(e)}")
+
+class QuillPositionsBatchRequest(BaseModel):
+    addresses: List[str]
+    block: Optional[int] = None
+
+@app.post("/api/quill-positions")
+async def get_quill_positions_batch(
+    request: QuillPositionsBatchRequest,
+    quill_service: AsyncQuillService = Depends(get_async_quill_service)
+):
+    """Get Quill positions for many wallets at once, keyed by wallet"""
+    try:
+        with read_at_block(await aresolve_block(quill_service, request.block)) as block_number:
+            positions = await quill_service.get_user_positions_batch(request.addresses)
+        return {
+            "success": True,
+            "data": positions,
+            "block_number": block_number
+        }
+    except Exception as e:
+        service_registry.mark_unhealthy("quill_async")
         raise HTTPException(status_code=500, detail=f"Error fetching Quill positions: {str(e)}")
 
 @app.get("/api/quill-max-borrowable")
-def calculate_max_borrowable(
+async def calculate_max_borrowable(
     collateral_token: str,
     amount: float,
-    quill_service: QuillService = Depends(get_quill_service)
+    block: Optional[int] = None,
+    quill_service: AsyncQuillService = Depends(get_async_quill_service)
 ):
     """Calculate the maximum USDQ borrowable for a given collateral amount"""
     try:
-        max_borrowable = quill_service.get_max_borrowable_amount(
-            collateral_token,
-            Decimal(str(amount))
-        )
+        with read_at_block(await aresolve_block(quill_service, block)) as block_number:
+            max_borrowable = await quill_service.get_max_borrowable_amount(
+                collateral_token,
+                Decimal(str(amount))
+            )
         return {
             "success": True,
             "data": {
                 "collateral_token": collateral_token,
                 "collateral_amount": amount,
                 "max_borrowable_usdq": float(max_borrowable)
-            }
+            },
+            "block_number": block_number
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error calculating max borrowable amount: {str(e)}")
 
 @app.get("/api/swap-impact")
-def calculate_swap_impact(
+async def calculate_swap_impact(
     from_token: str,
     to_token: str,
     amount: float,
-    ambient_service: AmbientService = Depends(get_ambient_service)
+    block: Optional[int] = None,
+    ambient_service: AsyncAmbientService = Depends(get_async_ambient_service)
 ):
     """Calculate the impact of swapping tokens"""
     try:
-        impact = ambient_service.calculate_swap_impact(
-            from_token,
-            to_token,
-            Decimal(str(amount))
-        )
+        with read_at_block(await aresolve_block(ambient_service, block)) as block_number:
+            impact = await ambient_service.calculate_swap_impact(
+                from_token,
+                to_token,
+                Decimal(str(amount))
+            )
         return {
             "success": True,
-            "data": impact
+            "data": impact,
+            "block_number": block_number
         }
     except Exception as e:
+        service_registry.mark_unhealthy("ambient_async")
         raise HTTPException(status_code=500, detail=f"Error calculating swap impact: {str(e)}")
 
+@app.get("/api/swap-route")
+async def find_swap_route(
+    from_token: str,
+    to_token: str,
+    amount: float,
+    max_hops: Optional[int] = None,
+    block: Optional[int] = None,
+    ambient_service: AsyncAmbientService = Depends(get_async_ambient_service)
+):
+    """Best route for a swap through the known Ambient pools, with each hop's amounts"""
+    try:
+        with read_at_block(await aresolve_block(ambient_service, block)) as block_number:
+            route = await ambient_service.find_swap_route(
+                from_token,
+                to_token,
+                Decimal(str(amount)),
+                max_hops=max_hops
+            )
+        return {
+            "success": True,
+            "data": route,
+            "block_number": block_number
+        }
+    except Exception as e:
+        service_registry.mark_unhealthy("ambient_async")
+        raise HTTPException(status_code=500, detail=f"Error finding swap route: {str(e)}")
+
+class SwapImpactLadderRequest(BaseModel):
+    from_token: str
+    to_token: str
+    amounts: List[float]
+    # Quote against the pool at this block (defaults to the current head)
+    block: Optional[int] = None
+
+@app.post("/api/swap-impact/ladder")
+async def calculate_swap_impact_ladder(
+    request: SwapImpactLadderRequest,
+    ambient_service: AsyncAmbientService = Depends(get_async_ambient_service)
+):
+    """Output amount and price impact for many trade sizes of one swap, from a single read of the pool"""
+    if not request.amounts:
+        raise HTTPException(status_code=400, detail="At least one amount is required")
+    if len(request.amounts) > SWAP_IMPACT_LADDER_MAX_AMOUNTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {SWAP_IMPACT_LADDER_MAX_AMOUNTS} amounts per ladder, got {len(request.amounts)}"
+        )
+    
+    try:
+        with read_at_block(await aresolve_block(ambient_service, request.block)) as block_number:
+            ladder = await ambient_service.calculate_swap_impact_ladder(
+                request.from_token,
+                request.to_token,
+                [Decimal(str(amount)) for amount in request.amounts]
+            )
+        return {
+            "success": True,
+            "data": ladder,
+            "block_number": block_number
+        }
+    except Exception as e:
+        service_registry.mark_unhealthy("ambient_async")
+        raise HTTPException(status_code=500, detail=f"Error calculating swap impact ladder: {str(e)}")
+
+@app.get("/api/prices")
+def get_prices(
+    block: Optional[int] = None,
+    price_service: PriceService = Depends(get_price_service)
+):
+    """USD price of every tracked token, with each price's source and the snapshot's block and age"""
+    with read_at_block(block):
+        return {
+            "success": True,
+            "data": price_service.describe()
+        }
+
 @app.get("/api/wallet/{address}")
 def analyze_wallet(address: str, wallet_service: WalletService = Depends(get_wallet_service)):
     """Analyze wallet contents"""
@@ -186,6 +636,118 @@ def analyze_wallet(address: str, wallet_service: WalletService = Depends(get_wal
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing wallet: {str(e)}")
 
+def resolve_wallet_balances(
+    address: str,
+    balances: Optional[Dict[str, float]],
+    wallet_service: WalletService
+) -> Dict[str, float]:
+    """The request's balances, or the wallet's on-chain balances, with ETH and WETH interchangeable"""
+    # If balances not provided, fetch them from the chain
+    wallet_balances = balances
+    if not wallet_balances:
+        print("No balances provided in request, fetching from blockchain...")
+        wallet_data = wallet_service.analyze_wallet(address)
+        wallet_balances = wallet_data.get("balances", {})
+
+    print(f"Balances: {wallet_balances}")
+
+    # Handle ETH/WETH equivalences
+    if "ETH" in wallet_balances and "WETH" not in wallet_balances:
+        wallet_balances["WETH"] = wallet_balances["ETH"]
+    elif "WETH" in wallet_balances and "ETH" not in wallet_balances:
+        wallet_balances["ETH"] = wallet_balances["WETH"]
+
+    # Convert balances to float
+    sanitized_balances = {}
+    for token, amount in wallet_balances.items():
+        try:
+            sanitized_balances[token] = amount
+        except Exception as e:
+            print(f"Error converting balance for {token}: {e}")
+            sanitized_balances[token] = 0
+
+    return sanitized_balances
+
+def market_data_fetchers(
+    aave_service: AaveService,
+    ambient_service: AmbientService,
+    quill_service: QuillService
+) -> Dict[str, Tuple[Callable[[], Any], Any]]:
+    """fetch_providers_concurrently entries for the three protocols' market data
+
+    Market data comes from the shared snapshots; the last good snapshot is
+    the first fallback, the hardcoded dicts only apply when there is none
+    """
+    return {
+        "aave": (
+            lambda: get_market_snapshot("aave", aave_service).data,
+            lambda: snapshot_cache.last_good("aave", AAVE_FALLBACK_MARKET_DATA)
+        ),
+        "ambient": (
+            lambda: get_market_snapshot("ambient", ambient_service).data,
+            lambda: snapshot_cache.last_good("ambient", AMBIENT_FALLBACK_MARKET_DATA)
+        ),
+        "quill": (
+            lambda: get_market_snapshot("quill", quill_service).data,
+            lambda: snapshot_cache.last_good("quill", QUILL_FALLBACK_MARKET_DATA)
+        ),
+        "prices": (
+            lambda: service_registry.get("prices").prices(),
+            lambda: dict(FALLBACK_TOKEN_PRICES)
+        ),
+    }
+
+def combine_market_data(provider_data: Dict[str, Any]) -> Dict:
+    """The market data strategies are built from, out of each protocol's data"""
+    aave_market_data = provider_data["aave"]
+    return {
+        "rates": aave_market_data.get("rates", {}),
+        "tvl": aave_market_data.get("tvl", {}),
+        "conditions": aave_market_data.get("conditions", "stable"),
+        "dex": provider_data["ambient"],
+        "quill": provider_data["quill"],
+        "prices": provider_data.get("prices", {})
+    }
+
+def collect_strategy_inputs(
+    address: str,
+    balances: Optional[Dict[str, float]],
+    aave_service: AaveService,
+    ambient_service: AmbientService,
+    quill_service: QuillService,
+    wallet_service: WalletService
+) -> Tuple[Dict, Dict, Dict]:
+    """Gather the wallet balances, combined market data and risk metrics strategies are built from"""
+    sanitized_balances = resolve_wallet_balances(address, balances, wallet_service)
+
+    # Fan out to every provider at once; each one falls back independently
+    provider_data = fetch_providers_concurrently({
+        **market_data_fetchers(aave_service, ambient_service, quill_service),
+        "risk_metrics": (
+            lambda: aave_service.get_user_risk_metrics(address),
+            FALLBACK_RISK_METRICS
+        ),
+    }, on_failure=lambda name: service_registry.mark_unhealthy(PROVIDER_SERVICES[name]))
+
+    return sanitized_balances, combine_market_data(provider_data), provider_data["risk_metrics"]
+
+def collect_batch_inputs(
+    addresses: List[str],
+    aave_service: AaveService,
+    ambient_service: AmbientService,
+    quill_service: QuillService
+) -> Tuple[Dict, Dict[str, Dict]]:
+    """One market snapshot plus every wallet's risk metrics, read in a single batched call"""
+    provider_data = fetch_providers_concurrently({
+        **market_data_fetchers(aave_service, ambient_service, quill_service),
+        "risk_metrics": (
+            lambda: aave_service.get_user_risk_metrics_batch(addresses),
+            lambda: {address: dict(FALLBACK_RISK_METRICS) for address in addresses}
+        ),
+    }, on_failure=lambda name: service_registry.mark_unhealthy(PROVIDER_SERVICES[name]))
+
+    return combine_market_data(provider_data), provider_data["risk_metrics"]
+
 @app.post("/api/generate-strategies", response_model=GenerateStrategiesResponse)
 def generate_strategies(
     request: WalletRequest,
@@ -199,133 +761,17 @@ def generate_strategies(
     try:
         print(f"Generating strategies for wallet: {request.address}")
 
-        # If balances not provided, fetch them from the chain
-        wallet_balances = request.balances
-        if not wallet_balances:
-            print("No balances provided in request, fetching from blockchain...")
-            wallet_data = wallet_service.analyze_wallet(request.address)
-            wallet_balances = wallet_data.get("balances", {})
-
-        print(f"Balances: {wallet_balances}")
-
-        # Handle ETH/WETH equivalences
-        if "ETH" in wallet_balances and "WETH" not in wallet_balances:
-            wallet_balances["WETH"] = wallet_balances["ETH"]
-        elif "WETH" in wallet_balances and "ETH" not in wallet_balances:
-            wallet_balances["ETH"] = wallet_balances["WETH"]
-
-        # Convert balances to float
-        sanitized_balances = {}
-        for token, amount in wallet_balances.items():
-            try:
-                sanitized_balances[token] = amount
-            except Exception as e:
-                print(f"Error converting balance for {token}: {e}")
-                sanitized_balances[token] = 0
-
-        # Attempt real market data from AAVE
-        try:
-            aave_market_data = aave_service.get_market_data()
-            print("Using real market data from AAVE")
-        except Exception as e:
-            print(f"Error fetching market data from AAVE: {e}, using fallback data")
-            aave_market_data = {
-                "rates": {
-                    "AAVE": {
-                        "supply_apy": {"USDC": 3.75, "ETH": 1.82, "SRC": 2.5},
-                        "borrow_apy": {"USDC": 4.5, "ETH": 2.1, "SRC": 3.0}
-                    }
-                },
-                "tvl": {"AAVE": 80320000},
-                "conditions": "stable"
-            }
-
-        # Ambient data
-        try:
-            ambient_market_data = ambient_service.get_market_data()
-            print("Using real market data from Ambient")
-        except Exception as e:
-            print(f"Error fetching market data from Ambient: {e}, using fallback data")
-            ambient_market_data = {
-                "dex": "Ambient",
-                "pools": {
-                    "ETH-USDC": {
-                        "price": 2000.0,
-                        "total_liquidity": 1000000,
-                        "volume_24h": 1000000,
-                        "fee": 0.003
-                    },
-                    "ETH-SRC": {
-                        "price": 0.005,
-                        "total_liquidity": 1000000,
-                        "volume_24h": 1000000,
-                        "fee": 0.003
-                    },
-                    "USDC-SRC": {
-                        "price": 0.01,
-                        "total_liquidity": 1000000,
-                        "volume_24h": 1000000,
-                        "fee": 0.003
-                    }
-                },
-                "swap_fees": 0.003
-            }
-
-        # Quill data
-        try:
-            quill_market_data = quill_service.get_market_data()
-            print("Using real market data from Quill")
-        except Exception as e:
-            print(f"Error fetching market data from Quill: {e}, using fallback data")
-            quill_market_data = {
-                "protocol": "Quill",
-                "collaterals": {
-                    "ETH": {"price_usd": 2000.0, "min_collateral_ratio": 1.1},
-                    "SRC": {"price_usd": 10.0, "min_collateral_ratio": 1.15}
-                },
-                "stability_pools": {
-                    "ETH": {
-                        "total_deposits_usdq": 1000000,
-                        "pool_collateral": 500,
-                        "estimated_apr": 5.0
-                    },
-                    "SRC": {
-                        "total_deposits_usdq": 500000,
-                        "pool_collateral": 50000,
-                        "estimated_apr": 7.0
-                    }
-                },
-                "interest_rates": {
-                    "min": 6.0,
-                    "max": 350.0,
-                    "recommended": {
-                        "low_risk": 6.0,
-                        "medium_risk": 10.0,
-                        "high_risk": 15.0
-                    }
-                }
-            }
-
-        # Combine data
-        combined_market_data = {
-            "rates": aave_market_data.get("rates", {}),
-            "tvl": aave_market_data.get("tvl", {}),
-            "conditions": aave_market_data.get("conditions", "stable"),
-            "dex": ambient_market_data,
-            "quill": quill_market_data
-        }
-
-        # Risk metrics
-        try:
-            risk_metrics = aave_service.get_user_risk_metrics(request.address)
-            print("Using real risk metrics from AAVE")
-        except Exception as e:
-            print(f"Error fetching risk metrics from AAVE: {e}, using fallback data")
-            risk_metrics = {
-                "health_factor": 1.8,
-                "liquidation_threshold": 0.85,
-                "current_ratio": 1.5
-            }
+        # Pinned only when a block was asked for: unpinned reads are served from
+        # the snapshots, fresh or stale-while-revalidate
+        with read_at_block(request.block) as block_number:
+            sanitized_balances, combined_market_data, risk_metrics = collect_strategy_inputs(
+                request.address,
+                request.balances,
+                aave_service,
+                ambient_service,
+                quill_service,
+                wallet_service
+            )
 
         # Generate strategies
         strategies_json = strategy_generator.generate_strategies_json(
@@ -334,6 +780,10 @@ def generate_strategies(
             risk_metrics
         )
 
+        # Which block (and how old) each provider's market data came from
+        strategies_json["snapshots"] = describe_snapshots()
+        strategies_json["block_number"] = block_number
+
         return strategies_json
 
     except Exception as e:
@@ -342,11 +792,193 @@ def generate_strategies(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+# Wire formats for the streaming strategy endpoint
+STREAM_MEDIA_TYPES = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson"
+}
+
+def encode_stream_event(event: str, data: Dict, stream_format: str) -> str:
+    """Encode one event as a Server-Sent Event or an NDJSON line"""
+    if stream_format == "ndjson":
+        return json.dumps({"event": event, "data": data}, default=str) + "\n"
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/api/generate-strategies/stream")
+def stream_strategies(
+    request: WalletRequest,
+    format: str = "sse",
+    strategy_generator: StrategyGenerator = Depends(get_strategy_generator),
+    aave_service: AaveService = Depends(get_aave_service),
+    ambient_service: AmbientService = Depends(get_ambient_service),
+    quill_service: QuillService = Depends(get_quill_service),
+    wallet_service: WalletService = Depends(get_wallet_service)
+):
+    """Stream strategies as they are generated
+
+    Emits a "snapshot" event with the market snapshot metadata as soon as the
+    market data is in, then a "strategy" event per validated strategy in the
+    order they finish (or an "error" event for a tier that failed), and a
+    final "done" event with generation stats. Server-Sent Events by default,
+    NDJSON with ?format=ndjson.
+    """
+    if format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported stream format: {format}")
+
+    def events():
+        try:
+            print(f"Streaming strategies for wallet: {request.address}")
+
+            # The pin must not span a yield: each chunk is pulled in a fresh context
+            with read_at_block(request.block) as block_number:
+                sanitized_balances, combined_market_data, risk_metrics = collect_strategy_inputs(
+                    request.address,
+                    request.balances,
+                    aave_service,
+                    ambient_service,
+                    quill_service,
+                    wallet_service
+                )
+
+            yield encode_stream_event("snapshot", {
+                "block_number": block_number,
+                "snapshots": describe_snapshots(),
+                "wallet": {"balances": sanitized_balances},
+                "market_data": {"conditions": combined_market_data.get("conditions", "stable")}
+            }, format)
+
+            stats = GenerationStats(mode=strategy_generator.generation_mode)
+            for event, data in strategy_generator.stream_strategies_json(
+                sanitized_balances,
+                combined_market_data,
+                risk_metrics,
+                stats=stats
+            ):
+                yield encode_stream_event(event, data, format)
+
+            yield encode_stream_event("done", {"generation": stats.to_dict()}, format)
+
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            print(f"Error streaming strategies: {e}")
+            import traceback
+            traceback.print_exc()
+            yield encode_stream_event("error", {"strategy_type": None, "error": str(e)}, format)
+
+    return StreamingResponse(
+        events(),
+        media_type=STREAM_MEDIA_TYPES[format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+class BatchWallet(BaseModel):
+    address: str
+    balances: Optional[Dict[str, float]] = None
+
+class BatchStrategiesRequest(BaseModel):
+    wallets: List[BatchWallet]
+    # Read every provider at this block (defaults to the latest snapshots)
+    block: Optional[int] = None
+
+@app.post("/api/generate-strategies/batch")
+def stream_batch_strategies(
+    request: BatchStrategiesRequest,
+    strategy_generator: StrategyGenerator = Depends(get_strategy_generator),
+    aave_service: AaveService = Depends(get_aave_service),
+    ambient_service: AmbientService = Depends(get_ambient_service),
+    quill_service: QuillService = Depends(get_quill_service),
+    wallet_service: WalletService = Depends(get_wallet_service)
+):
+    """Generate strategies for many wallets from one market snapshot, as NDJSON
+
+    Market data is fetched once and every wallet's risk metrics come from one
+    batched read. Emits a "snapshot" event, then a "wallet" event per wallet
+    in the order they finish (or an "error" event for a wallet that failed),
+    and a final "done" event with counts.
+    """
+    # A wallet listed twice is generated once
+    addresses = list(dict.fromkeys(wallet.address for wallet in request.wallets))
+    if not addresses:
+        raise HTTPException(status_code=400, detail="No wallets given")
+    if len(addresses) > STRATEGY_BATCH_MAX_WALLETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {STRATEGY_BATCH_MAX_WALLETS} wallets per batch, got {len(addresses)}"
+        )
+
+    def events():
+        started = time.monotonic()
+        try:
+            print(f"Generating strategies for {len(addresses)} wallets")
+
+            # The pin must not span a yield: each chunk is pulled in a fresh context
+            with read_at_block(request.block) as block_number:
+                combined_market_data, risk_metrics_by_wallet = collect_batch_inputs(
+                    addresses,
+                    aave_service,
+                    ambient_service,
+                    quill_service
+                )
+
+            yield encode_stream_event("snapshot", {
+                "block_number": block_number,
+                "snapshots": describe_snapshots(),
+                "wallets": len(addresses),
+                "market_data": {"conditions": combined_market_data.get("conditions", "stable")}
+            }, "ndjson")
+
+            # Balances not in the request are read on the generation workers,
+            # at the requested block if there is one
+            def load_balances(address: str) -> Dict[str, float]:
+                with read_at_block(block_number):
+                    return resolve_wallet_balances(address, None, wallet_service)
+
+            wallets = {}
+            for wallet in request.wallets:
+                wallets[wallet.address] = (
+                    resolve_wallet_balances(wallet.address, wallet.balances, wallet_service)
+                    if wallet.balances else None
+                )
+
+            counts = {"succeeded": 0, "failed": 0}
+            for event, data in strategy_generator.stream_batch_strategies_json(
+                wallets,
+                combined_market_data,
+                risk_metrics_by_wallet,
+                load_balances=load_balances
+            ):
+                counts["succeeded" if event == "wallet" else "failed"] += 1
+                yield encode_stream_event(event, data, "ndjson")
+
+            yield encode_stream_event("done", {
+                "wallets": len(addresses),
+                **counts,
+                "latency_seconds": time.monotonic() - started
+            }, "ndjson")
+
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            print(f"Error generating batch strategies: {e}")
+            import traceback
+            traceback.print_exc()
+            yield encode_stream_event("error", {"address": None, "error": str(e)}, "ndjson")
+
+    return StreamingResponse(
+        events(),
+        media_type=STREAM_MEDIA_TYPES["ndjson"],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/health")
-def health_check():
+async def health_check():
     """API health check endpoint"""
     return {"status": "ok"}
 
+@app.get("/api/rpc-stats")
+async def rpc_stats():
+    """Connection pool settings and reuse per RPC host, for sizing RPC_POOL_SIZE, and each endpoint's circuit breaker"""
+    return rpc_provider_factory.stats()
+
 # ---------------------------
 #      NEW CHAT ENDPOINT
 # ---------------------------
@@ -354,41 +986,45 @@ def health_check():
 class ChatRequest(BaseModel):
     user_query: str
 
+def build_ask_messages(user_question: str, top_k: int = ASK_CONTEXT_TOP_K) -> List[Dict[str, str]]:
+    """System + user messages for a question, with only the context sections relevant to it"""
+    if not user_question:
+        raise ValueError("Query cannot be empty")
+
+    context = context_index.build_context(user_question, top_k) if top_k > 0 else BULWARK_CONTEXT
+
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You are a helpful assistant with specialized knowledge about the Bulwark DeFi strategy platform on Scroll. "
+                "Use the following context to answer questions accurately:\n\n"
+                f"{context}\n\n"
+                "If the user asks something not in the context, do your best to answer. Be concise but informative."
+            )
+        },
+        {
+            "role": "user",
+            "content": user_question
+        }
+    ]
+
 @app.post("/api/ask")
-def ask_bulwark(request: ChatRequest):
+def ask_bulwark(request: ChatRequest, client: OpenAI = Depends(get_openai_client)):
     """
     Q&A Endpoint for Bulwark. Accepts a user_query,
-    then uses the content from BULWARK_CONTEXT plus
+    then uses the most relevant sections of BULWARK_CONTEXT plus
     OpenAI to generate an answer.
     """
     try:
-        user_question = request.user_query
-        if not user_question:
-            raise ValueError("Query cannot be empty")
-
-        # Build the prompt using system + user
-        messages = [
-            {
-                "role": "system",
-                "content": (
-                    "You are a helpful assistant with specialized knowledge about the Bulwark DeFi strategy platform on Scroll. "
-                    "Use the following context to answer questions accurately:\n\n"
-                    f"{BULWARK_CONTEXT}\n\n"
-                    "If the user asks something not in the context, do your best to answer. Be concise but informative."
-                )
-            },
-            {
-                "role": "user",
-                "content": user_question
-            }
-        ]
+        messages = build_ask_messages(request.user_query)
 
-        # Create a client with your API key
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        if client is None:
+            raise RuntimeError("OpenAI client is not available")
 
         response = client.chat.completions.create(
             model="gpt-3.5-turbo",
-            messages=messages,   # <-- pass the system + user messages you constructed
+            messages=messages,
             temperature=0.7
         )
 
@@ -398,6 +1034,45 @@ def ask_bulwark(request: ChatRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
+@app.post("/api/ask/stream")
+def ask_bulwark_stream(request: ChatRequest, client: OpenAI = Depends(get_openai_client)):
+    """
+    Streaming variant of /api/ask. Sends the answer as Server-Sent Events:
+    a "token" event per chunk of text as the model produces it, then "done".
+    """
+    try:
+        messages = build_ask_messages(request.user_query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if client is None:
+        raise HTTPException(status_code=500, detail="Error: OpenAI client is not available")
+
+    def events():
+        try:
+            stream = client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=messages,
+                temperature=0.7,
+                stream=True
+            )
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    yield encode_stream_event("token", {"text": text}, "sse")
+            yield encode_stream_event("done", {}, "sse")
+        except Exception as e:
+            print(f"Error streaming answer: {e}")
+            yield encode_stream_event("error", {"error": str(e)}, "sse")
+
+    return StreamingResponse(
+        events(),
+        media_type=STREAM_MEDIA_TYPES["sse"],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,82 @@
+# api/test_ask.py
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+import api.main as main
+from api.context_index import ContextIndex, split_sections
+
+CONTEXT = """Bulwark is a DeFi strategy optimizer.
+
+It runs on Scroll.
+1. Lending
+AAVE supplies and borrows tokens. Health factor keeps positions safe.
+2. Swaps
+Ambient handles swaps and price impact.
+3. Stablecoins
+Quill lets users borrow USDQ against ETH collateral.
+In Summary:
+Bulwark makes DeFi simple."""
+
+def test_context_split_into_sections():
+    sections = split_sections(CONTEXT)
+
+    assert sections[0] == "Bulwark is a DeFi strategy optimizer."
+    assert sections[1] == "It runs on Scroll."
+    assert [section.splitlines()[0] for section in sections[2:]] == ["1. Lending", "2. Swaps", "3. Stablecoins", "In Summary:"]
+
+def test_top_k_picks_relevant_sections_in_document_order():
+    index = ContextIndex.from_text(CONTEXT)
+
+    assert index.top_k("How do I borrow USDQ?", 1)[0].startswith("3. Stablecoins")
+    assert [s.splitlines()[0] for s in index.top_k("health factor and price impact", 2)] == ["1. Lending", "2. Swaps"]
+    # No matching terms falls back to the opening sections
+    assert index.top_k("xyzzy", 2) == split_sections(CONTEXT)[:2]
+
+def test_ask_prompt_only_carries_relevant_context():
+    trimmed = main.build_ask_messages("How do I borrow USDQ on Quill?", top_k=2)
+    full = main.build_ask_messages("How do I borrow USDQ on Quill?", top_k=0)
+
+    assert "Quill" in trimmed[0]["content"]
+    assert len(trimmed[0]["content"]) < len(full[0]["content"]) / 2
+    assert main.BULWARK_CONTEXT in full[0]["content"]
+
+class FakeStreamingClient:
+    """Yields an answer in chunks, like chat.completions.create(stream=True)"""
+
+    def __init__(self, chunks):
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.chunks = chunks
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return iter([
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+            for text in self.chunks
+        ])
+
+def test_answer_streamed_token_by_token():
+    client = FakeStreamingClient(["Quill ", None, "lends ", "USDQ."])
+    main.app.dependency_overrides[main.get_openai_client] = lambda: client
+    try:
+        response = TestClient(main.app).post("/api/ask/stream", json={"user_query": "What is Quill?"})
+        empty = TestClient(main.app).post("/api/ask/stream", json={"user_query": ""})
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+        for block in response.text.strip().split("\n\n")
+    ]
+    assert [data.get("text") for event, data in events if event == "token"] == ["Quill ", "lends ", "USDQ."]
+    assert events[-1][0] == "done"
+    assert client.requests[0]["stream"] is True
+    assert empty.status_code == 400
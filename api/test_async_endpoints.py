@@ -0,0 +1,104 @@
+# api/test_async_endpoints.py
+import asyncio
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from fastapi import HTTPException
+
+import api.main as main
+from ai.services.ambient_service import AsyncAmbientService
+from ai.services.quill_service import AsyncQuillService
+from ai.services.web3_provider import rpc_provider_factory
+from ai.tests.rpc_stub import EMPTY_WALLET, WALLET_WITH_TROVE, build_curve_stub, build_quill_stub, build_router_stub, register_quill_positions, usdc_eth_pool
+
+def test_quill_endpoints_await_the_async_service():
+    stub = build_quill_stub()
+    register_quill_positions(stub)
+
+    class StubQuillService(AsyncQuillService):
+        SCROLL_RPC_URL = stub.url
+
+    async def requests(service):
+        try:
+            return await asyncio.gather(
+                main.get_quill_market_data(quill_service=service),
+                main.get_quill_positions(WALLET_WITH_TROVE, quill_service=service),
+                main.get_quill_positions_batch(
+                    main.QuillPositionsBatchRequest(addresses=[EMPTY_WALLET], block=990),
+                    quill_service=service
+                )
+            )
+        finally:
+            await rpc_provider_factory.aclose()
+
+    main.snapshot_cache.clear()
+    try:
+        market, positions, batch = asyncio.run(requests(StubQuillService()))
+    finally:
+        main.snapshot_cache.clear()
+        stub.stop()
+
+    assert market["data"]["collaterals"]["ETH"]["price_usd"] == 2500
+    assert market["snapshot"]["block_number"] == stub.block_number
+    assert set(positions["data"]["troves"]) == {"ETH"}
+    # Positions read at the head unless a block is asked for
+    assert positions["block_number"] == stub.block_number
+    assert batch["block_number"] == 990
+    assert batch["data"] == {EMPTY_WALLET: {"troves": {}, "stability_deposits": {}}}
+
+def test_swap_impact_ladder_endpoint():
+    stub = build_curve_stub(usdc_eth_pool())
+
+    class StubAmbientService(AsyncAmbientService):
+        SCROLL_RPC_URL = stub.url
+
+    async def request(service, amounts):
+        try:
+            return await main.calculate_swap_impact_ladder(
+                main.SwapImpactLadderRequest(from_token="ETH", to_token="USDC", amounts=amounts, block=990),
+                ambient_service=service
+            )
+        finally:
+            await rpc_provider_factory.aclose()
+
+    try:
+        service = StubAmbientService()
+        response = asyncio.run(request(service, [0.5, 1, 10, 100]))
+        with pytest.raises(HTTPException) as too_many:
+            asyncio.run(request(service, [1.0] * (main.SWAP_IMPACT_LADDER_MAX_AMOUNTS + 1)))
+    finally:
+        stub.stop()
+
+    assert response["block_number"] == 990
+    # Quoted on the simulated curve, not by CrocImpact
+    assert stub.called("calcImpact") == 0
+    data = response["data"]
+    assert data["input_amounts"] == [0.5, 1, 10, 100]
+    assert len(data["output_amounts"]) == len(data["price_impacts"]) == 4
+    assert data["output_amounts"] == sorted(data["output_amounts"])
+    assert too_many.value.status_code == 400
+
+def test_swap_route_endpoint():
+    stub = build_router_stub()
+
+    class StubAmbientService(AsyncAmbientService):
+        SCROLL_RPC_URL = stub.url
+
+    async def request(service):
+        try:
+            return await main.find_swap_route("SRC", "USDC", 1000, block=990, ambient_service=service)
+        finally:
+            await rpc_provider_factory.aclose()
+
+    try:
+        response = asyncio.run(request(StubAmbientService()))
+    finally:
+        stub.stop()
+
+    assert response["block_number"] == 990
+    assert response["data"]["route"] == ["SRC", "ETH", "USDC"]
+    assert [hop["to_token"] for hop in response["data"]["hops"]] == ["ETH", "USDC"]
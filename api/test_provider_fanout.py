@@ -0,0 +1,110 @@
+# api/test_provider_fanout.py
+import asyncio
+import os
+import sys
+import time
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from api.main import fetch_providers_concurrently
+
+def test_providers_run_concurrently():
+    """Data phase should cost max(provider) rather than sum(provider)"""
+    def slow(value):
+        def fetch():
+            time.sleep(0.3)
+            return value
+        return fetch
+
+    started = time.monotonic()
+    results = fetch_providers_concurrently({
+        "a": (slow("a"), "fallback"),
+        "b": (slow("b"), "fallback"),
+        "c": (slow("c"), "fallback"),
+    }, timeout=2.0)
+    elapsed = time.monotonic() - started
+
+    assert results == {"a": "a", "b": "b", "c": "c"}
+    assert elapsed < 0.8, f"Expected concurrent fetches, took {elapsed:.2f}s"
+
+def test_deadline_applies_per_provider():
+    """A provider missing its deadline gets its fallback without holding up the rest"""
+    def hang():
+        time.sleep(2.0)
+        return {"real": True}
+
+    def fail():
+        raise RuntimeError("RPC down")
+
+    fallback = {"fallback": True}
+    started = time.monotonic()
+    results = fetch_providers_concurrently({
+        "slow": (hang, fallback),
+        "broken": (fail, {"broken_fallback": True}),
+        "fast": (lambda: {"real": True}, fallback),
+    }, timeout=0.2)
+    elapsed = time.monotonic() - started
+
+    assert results["slow"] == fallback
+    assert results["slow"] is not fallback  # Callers may mutate their copy
+    assert results["broken"] == {"broken_fallback": True}
+    assert results["fast"] == {"real": True}
+    assert elapsed < 1.0, f"Expected deadline to cut the wait, took {elapsed:.2f}s"
+
+if __name__ == "__main__":
+    test_providers_run_concurrently()
+    test_deadline_applies_per_provider()
+    print("Provider fan-out tests passed")
+
+def test_published_snapshots_read_without_rpc(monkeypatch):
+    """While the background refresher is current, requests take its block and snapshots"""
+    import api.main as main
+    from ai.services.market_refresher import MarketState
+    from ai.services.snapshot_cache import Snapshot
+    from ai.services.block_context import read_at_block
+
+    class Unreachable:
+        @property
+        def w3(self):
+            raise AssertionError("request hit the RPC")
+
+        def get_market_data(self):
+            raise AssertionError("request hit the RPC")
+
+    published = Snapshot(provider="aave", data={"rates": {}}, block_number=500)
+    monkeypatch.setattr(main.market_refresher, "_state", MarketState(block_number=500, snapshots={"aave": published}))
+
+    block = asyncio.run(main.aresolve_block(Unreachable()))
+    with read_at_block(block):
+        snapshot = main.get_market_snapshot("aave", Unreachable())
+
+    assert block == 500
+    assert snapshot is published
+
+def test_open_circuit_serves_the_last_snapshot(monkeypatch):
+    """While a service's RPC circuit is open, the last good snapshot is served however old"""
+    import api.main as main
+    from ai.services.block_context import read_at_block
+
+    class Unreachable:
+        SCROLL_RPC_URL = "http://rpc.invalid"
+
+        def get_market_data(self):
+            raise AssertionError("request hit the RPC")
+
+    main.snapshot_cache.clear()
+    try:
+        last_good = main.snapshot_cache.put("aave", {"rates": {}}, block_number=400)
+        last_good.fetched_at -= main.snapshot_cache.max_stale + 1
+        monkeypatch.setattr(main.rpc_provider_factory, "circuit_open", lambda uri: uri == Unreachable.SCROLL_RPC_URL)
+
+        assert main.get_market_snapshot("aave", Unreachable()) is last_good
+        # A pinned request gets the snapshot for its block, not the latest
+        at_390 = main.snapshot_cache.put("aave", {"rates": {}}, block_number=390)
+        with read_at_block(390):
+            assert main.circuit_open_snapshot("aave", Unreachable()) is at_390
+        with read_at_block(395):
+            assert main.circuit_open_snapshot("aave", Unreachable()) is None
+    finally:
+        main.snapshot_cache.clear()
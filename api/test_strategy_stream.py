@@ -0,0 +1,179 @@
+# api/test_strategy_stream.py
+import json
+import os
+import sys
+import threading
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+import api.main as main
+from ai.tests.llm_stub import FakeLLMGenerator
+
+def make_client(generator, monkeypatch):
+    monkeypatch.setattr(main, "collect_strategy_inputs", lambda *args: (
+        {"USDC": 100.0},
+        {"rates": {}, "tvl": {}, "conditions": "stable", "dex": {}, "quill": {}},
+        dict(main.FALLBACK_RISK_METRICS)
+    ))
+    main.app.dependency_overrides[main.get_strategy_generator] = lambda: generator
+    for getter in (main.get_aave_service, main.get_ambient_service, main.get_quill_service, main.get_wallet_service):
+        main.app.dependency_overrides[getter] = lambda: None
+    return TestClient(main.app)
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_strategies_streamed_as_they_finish(monkeypatch):
+    """Snapshot metadata first, then each validated strategy in completion order"""
+    generator = FakeLLMGenerator({"Anchor": 0.4, "Zenith": 0.0, "Wildcard": 0.2}, failures={"Wildcard"})
+    try:
+        client = make_client(generator, monkeypatch)
+        response = client.post("/api/generate-strategies/stream", json={"address": "0x" + "aa" * 20})
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_sse(response.text)
+    assert [event for event, _ in events] == ["snapshot", "strategy", "error", "strategy", "done"]
+    assert set(events[0][1]["snapshots"]) == {"aave", "ambient", "quill"}
+    assert events[1][1]["name"] == "Zenith"
+    assert events[2][1]["strategy_type"] == "Wildcard"
+    assert events[3][1]["name"] == "Anchor"
+
+    # Strategies are fitted to the wallet like the non-streaming endpoint
+    assert events[1][1]["steps"][0]["amount"] == 95.0
+    assert events[4][1]["generation"]["mode"] == "per_tier"
+
+def test_ndjson_format(monkeypatch):
+    generator = FakeLLMGenerator({})
+    try:
+        client = make_client(generator, monkeypatch)
+        response = client.post("/api/generate-strategies/stream?format=ndjson", json={"address": "0x" + "aa" * 20})
+        unsupported = client.post("/api/generate-strategies/stream?format=xml", json={"address": "0x" + "aa" * 20})
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0]["event"] == "snapshot"
+    assert sorted(e["data"]["name"] for e in events if e["event"] == "strategy") == ["Anchor", "Wildcard", "Zenith"]
+    assert events[-1]["event"] == "done"
+    assert unsupported.status_code == 400
+
+def test_stream_pins_only_a_requested_block(monkeypatch):
+    """Without a block the market data comes from the snapshots, not a read pinned to the head"""
+    from ai.services.block_context import pinned_block
+    from ai.services.market_refresher import MarketState
+
+    generator = FakeLLMGenerator({})
+    pins = []
+    # A current refresher doesn't pin the request to its block either
+    monkeypatch.setattr(main.market_refresher, "_state", MarketState(block_number=500, snapshots={}))
+    try:
+        client = make_client(generator, monkeypatch)
+        collect = main.collect_strategy_inputs
+        monkeypatch.setattr(main, "collect_strategy_inputs", lambda *args: pins.append(pinned_block()) or collect(*args))
+        unpinned = client.post("/api/generate-strategies/stream?format=ndjson", json={"address": "0x" + "aa" * 20})
+        pinned = client.post("/api/generate-strategies/stream?format=ndjson", json={"address": "0x" + "aa" * 20, "block": 990})
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert pins == [None, 990]
+    assert json.loads(unpinned.text.splitlines()[0])["data"]["block_number"] is None
+    assert json.loads(pinned.text.splitlines()[0])["data"]["block_number"] == 990
+
+def make_batch_client(generator, monkeypatch, loaded):
+    risk_by_wallet = {}
+
+    def collect_batch_inputs(addresses, *args):
+        risk_by_wallet.update({address: {"health_factor": 2.0} for address in addresses})
+        return {"rates": {}, "tvl": {}, "conditions": "stable", "dex": {}, "quill": {}}, risk_by_wallet
+
+    def resolve_wallet_balances(address, balances, wallet_service):
+        if balances is None:
+            loaded.append(address)
+            return {"USDC": 200.0}
+        return balances
+
+    monkeypatch.setattr(main, "collect_batch_inputs", collect_batch_inputs)
+    monkeypatch.setattr(main, "resolve_wallet_balances", resolve_wallet_balances)
+    main.app.dependency_overrides[main.get_strategy_generator] = lambda: generator
+    for getter in (main.get_aave_service, main.get_ambient_service, main.get_quill_service, main.get_wallet_service):
+        main.app.dependency_overrides[getter] = lambda: None
+    return TestClient(main.app)
+
+def test_batch_streams_each_wallet_from_one_snapshot(monkeypatch):
+    generator = FakeLLMGenerator({})
+    given, fetched = "0x" + "aa" * 20, "0x" + "bb" * 20
+    loaded = []
+    try:
+        client = make_batch_client(generator, monkeypatch, loaded)
+        response = client.post("/api/generate-strategies/batch", json={"wallets": [
+            {"address": given, "balances": {"USDC": 100.0}},
+            {"address": fetched},
+            {"address": given, "balances": {"USDC": 100.0}}
+        ]})
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0]["event"] == "snapshot"
+    assert events[0]["data"]["wallets"] == 2
+    wallets = {e["data"]["address"]: e["data"] for e in events if e["event"] == "wallet"}
+    assert set(wallets) == {given, fetched}
+    # Balances missing from the request are fetched, only for that wallet
+    assert loaded == [fetched]
+    assert wallets[given]["strategies"][0]["steps"][0]["amount"] == 95.0
+    assert wallets[fetched]["strategies"][0]["steps"][0]["amount"] == 190.0
+    assert events[-1] == {"event": "done", "data": {**events[-1]["data"], "wallets": 2, "succeeded": 2, "failed": 0}}
+
+def test_batch_generation_is_bounded_and_isolates_failures(monkeypatch):
+    """No more than STRATEGY_BATCH_CONCURRENCY wallets run at once; one failing wallet doesn't stop the rest"""
+    generator = FakeLLMGenerator({"Anchor": 0.05})
+    running, peak, lock = [0], [0], threading.Lock()
+    original = generator.generate_strategies_json
+
+    def generate_strategies_json(wallet_data, market_data, risk_metrics):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        try:
+            if "DAI" in wallet_data:
+                raise ValueError("bad wallet")
+            return original(wallet_data, market_data, risk_metrics)
+        finally:
+            with lock:
+                running[0] -= 1
+
+    generator.generate_strategies_json = generate_strategies_json
+    wallets = {f"0x{i:040x}": {"USDC": 10.0} for i in range(10)}
+    wallets["0x" + "dd" * 20] = {"DAI": 1.0}
+
+    events = list(generator.stream_batch_strategies_json(wallets, {}, {}))
+
+    assert peak[0] <= generator.batch_executor._max_workers
+    assert sum(event == "wallet" for event, _ in events) == 10
+    assert [data for event, data in events if event == "error"] == [{"address": "0x" + "dd" * 20, "error": "bad wallet"}]
+
+def test_batch_rejects_empty_and_oversized_requests(monkeypatch):
+    monkeypatch.setattr(main, "STRATEGY_BATCH_MAX_WALLETS", 2)
+    try:
+        client = make_batch_client(FakeLLMGenerator({}), monkeypatch, [])
+        empty = client.post("/api/generate-strategies/batch", json={"wallets": []})
+        oversized = client.post("/api/generate-strategies/batch", json={"wallets": [{"address": f"0x{i:040x}"} for i in range(3)]})
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert empty.status_code == 400
+    assert oversized.status_code == 400
+    assert "At most 2 wallets" in oversized.json()["detail"]